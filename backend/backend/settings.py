@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -18,6 +20,95 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATABASE_NAME = "ira"
 DATABASE_USER = "postgres"
 DATABASE_PASSWORD = "postgres"
+DATABASE_HOST = os.environ.get("IRA_DATABASE_HOST", "127.0.0.1")
+DATABASE_PORT = os.environ.get("IRA_DATABASE_PORT", "5432")
+
+# Pool of database connections kept open across requests, per worker process; times are in seconds
+DATABASE_POOL_MIN_SIZE = int(os.environ.get("IRA_DATABASE_POOL_MIN_SIZE", 1))
+DATABASE_POOL_MAX_SIZE = int(os.environ.get("IRA_DATABASE_POOL_MAX_SIZE", 10))
+DATABASE_POOL_MAX_LIFETIME = float(os.environ.get("IRA_DATABASE_POOL_MAX_LIFETIME", 1800))
+DATABASE_POOL_MAX_IDLE = float(os.environ.get("IRA_DATABASE_POOL_MAX_IDLE", 600))
+# A connection idle for longer is checked before it is handed out
+DATABASE_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get("IRA_DATABASE_POOL_HEALTH_CHECK_INTERVAL", 30))
+DATABASE_POOL_WAIT_TIMEOUT = float(os.environ.get("IRA_DATABASE_POOL_WAIT_TIMEOUT", 30))
+# Pool of the async execution path, per event loop; it shares the lifetime, idle time and wait timeout above
+ASYNC_DATABASE_POOL_MIN_SIZE = int(os.environ.get("IRA_ASYNC_DATABASE_POOL_MIN_SIZE", 1))
+ASYNC_DATABASE_POOL_MAX_SIZE = int(os.environ.get("IRA_ASYNC_DATABASE_POOL_MAX_SIZE", 20))
+
+# Statements prepared per connection for the shapes of recurring queries, as psycopg 3 does by default: a shape is
+# prepared once it has been executed this many times on a connection, and the least recently used statements beyond
+# the maximum are deallocated. A maximum of 0 disables preparing.
+PREPARED_STATEMENT_THRESHOLD = int(os.environ.get("IRA_PREPARED_STATEMENT_THRESHOLD", 5))
+PREPARED_STATEMENT_MAX_ENTRIES = int(os.environ.get("IRA_PREPARED_STATEMENT_MAX_ENTRIES", 100))
+
+# Compiled RA query cache; the on-disk tier is disabled unless a directory is given
+COMPILE_CACHE_MAX_ENTRIES = int(os.environ.get("IRA_COMPILE_CACHE_MAX_ENTRIES", 1024))
+COMPILE_CACHE_DIRECTORY = os.environ.get("IRA_COMPILE_CACHE_DIRECTORY")
+
+# Rewriting RA queries with selection and projection pushdown before generating their SQL
+RA_OPTIMISER_ENABLED = os.environ.get("IRA_RA_OPTIMISER_ENABLED", "true").lower() == "true"
+
+# Subexpressions repeated within a RA query are formed once as common table expressions; a cheap one is only
+# materialised when referred to at least this many times
+CTE_MATERIALISE_MIN_FAN_OUT = int(os.environ.get("IRA_CTE_MATERIALISE_MIN_FAN_OUT", 3))
+
+# Query result cache shared by the worker processes of a host; a budget of 0 bytes disables it
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("IRA_RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_DIRECTORY = os.environ.get(
+    "IRA_RESULT_CACHE_DIRECTORY",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "ira-result-cache"))
+
+# Number of rows fetched per round trip when streaming a result
+STREAM_BATCH_SIZE = int(os.environ.get("IRA_STREAM_BATCH_SIZE", 2000))
+
+# Keyset pagination of results
+DEFAULT_PAGE_SIZE = int(os.environ.get("IRA_DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.environ.get("IRA_MAX_PAGE_SIZE", 10000))
+
+# Statement timeout of a request in milliseconds, unless the request asks for another one up to the maximum; 0
+# disables it
+STATEMENT_TIMEOUT_MS = int(os.environ.get("IRA_STATEMENT_TIMEOUT_MS", 30000))
+MAX_STATEMENT_TIMEOUT_MS = int(os.environ.get("IRA_MAX_STATEMENT_TIMEOUT_MS", 300000))
+# How often a running query checks whether its client has disconnected, in seconds
+DISCONNECT_POLL_INTERVAL = float(os.environ.get("IRA_DISCONNECT_POLL_INTERVAL", 0.5))
+
+# Planner estimates checked before a query is executed; a query estimated above either threshold is only executed
+# once the request confirms it. A threshold of 0 disables it.
+PREFLIGHT_ENABLED = os.environ.get("IRA_PREFLIGHT_ENABLED", "true").lower() == "true"
+PREFLIGHT_MAX_ESTIMATED_ROWS = int(os.environ.get("IRA_PREFLIGHT_MAX_ESTIMATED_ROWS", 1000000))
+PREFLIGHT_MAX_ESTIMATED_COST = float(os.environ.get("IRA_PREFLIGHT_MAX_ESTIMATED_COST", 10000000))
+
+# Pre-population of the CSV files under resources/prepopulation. Files are loaded concurrently by the workers, each
+# streaming its file into postgres in chunks of about the given bytes, so that memory stays bounded whatever the size
+# of the files. Progress of a file is reported at the given interval in seconds.
+PREPOPULATION_WORKERS = int(os.environ.get("IRA_PREPOPULATION_WORKERS", 4))
+PREPOPULATION_CHUNK_BYTES = int(os.environ.get("IRA_PREPOPULATION_CHUNK_BYTES", 8 * 1024 * 1024))
+PREPOPULATION_PROGRESS_INTERVAL = float(os.environ.get("IRA_PREPOPULATION_PROGRESS_INTERVAL", 5))
+# Whether the CSV files are loaded by a thread of their own, so that requests are served while they load; a query of a
+# relation which is still loading is answered with 503 Service Unavailable
+PREPOPULATION_IN_BACKGROUND = os.environ.get("IRA_PREPOPULATION_IN_BACKGROUND", "true").lower() == "true"
+
+# Index advisor, which tallies the columns the executed queries select and join on over the most recently executed
+# queries of a process, and estimates the benefit of indexing the most used ones which have no index yet. Advised
+# indexes are only ever created, concurrently, when opted into.
+INDEX_ADVISOR_MAX_QUERIES = int(os.environ.get("IRA_INDEX_ADVISOR_MAX_QUERIES", 256))
+INDEX_ADVISOR_MAX_CANDIDATES = int(os.environ.get("IRA_INDEX_ADVISOR_MAX_CANDIDATES", 10))
+INDEX_ADVISOR_CREATES_INDEXES = os.environ.get("IRA_INDEX_ADVISOR_CREATES_INDEXES", "false").lower() == "true"
+
+# Queries of relations of up to this many rows in total are evaluated in memory rather than by postgres, with every
+# relation read once and kept as columns until it changes; a query whose intermediate results would grow beyond it is
+# left to postgres. A maximum of 0 disables evaluating in memory.
+COLUMNAR_ENGINE_MAX_ROWS = int(os.environ.get("IRA_COLUMNAR_ENGINE_MAX_ROWS", 10000))
+
+# Embedded in-memory SQLite database, which executes the queries of the relations pre-populated from the CSV files in
+# process rather than in postgres, loading every relation from its file on first use; a query of another relation, or
+# one SQLite fails to execute, is left to postgres. SQLite compares values by its own rules, hence a query comparing
+# values postgres refuses to compare, such as text with a number, is left to postgres too.
+SQLITE_BACKEND_ENABLED = os.environ.get("IRA_SQLITE_BACKEND_ENABLED", "false").lower() == "true"
+
+# Relations of up to this many rows are loaded into SQLite, without reading the rest of a larger file; a query of a
+# larger relation is left to postgres.
+SQLITE_BACKEND_MAX_ROWS = int(os.environ.get("IRA_SQLITE_BACKEND_MAX_ROWS", 100000))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.1/howto/deployment/checklist/
@@ -81,12 +172,13 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        # Postgres, with connections taken from a pool of the worker process
+        'ENGINE': 'ira.db_backend',
         'NAME': DATABASE_NAME,
         'USER': DATABASE_USER,
         'PASSWORD': DATABASE_PASSWORD,
-        'HOST': '127.0.0.1',
-        'PORT': '5432',
+        'HOST': DATABASE_HOST,
+        'PORT': DATABASE_PORT,
     }
 }
 
@@ -141,4 +233,15 @@ CORS_ALLOW_METHODS = [
     "PATCH",
     "POST",
     "PUT",
-]
\ No newline at end of file
+]
+
+# Pre-populates the test database, which the catalog of the tests is read from
+TEST_RUNNER = "ira.tests.runner.PrePopulatingTestRunner"
+
+# Messages of the application, such as the progress of pre-population, go to the console
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"ira": {"handlers": ["console"], "level": os.environ.get("IRA_LOG_LEVEL", "INFO")}},
+}
@@ -0,0 +1,119 @@
+"""
+Compares how the synchronous and the async execute endpoints scale with the number of concurrent long-running
+queries, when both are served by a single ASGI worker. Django runs each synchronous view of an ASGI application on a
+thread of its own, holding a connection of the worker's pool throughout, whereas the async view awaits postgres on
+the event loop, hence its throughput is only bounded by the size of its own connection pool.
+
+Two workloads are run: queries which keep postgres busy computing, which only overlap given spare cores on the
+database server, and queries which wait inside postgres, as they do on locks or on disk, standing in for the latter
+by a view calling pg_sleep which exists for the duration of the benchmark.
+
+Run from the backend folder: python -m benchmarks.async_concurrency
+It starts a uvicorn worker of its own on the given port, against the database of the settings; the result cache and
+the pre-flight check are disabled, so that every request reaches postgres only once.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg
+
+from backend.settings import DATABASES
+
+PORT = 8765
+
+ENDPOINTS = ("execute_ra_query", "execute_ra_query_async")
+
+CONCURRENCIES = (1, 4, 16, 32)
+
+REQUESTS_PER_CLIENT = 4
+
+WAIT_RELATION = "benchmark_wait"
+
+WORKLOADS = {
+    # A cross product of some million rows, which takes postgres a fifth of a second to aggregate into a few rows
+    "computing": "π sepal_length (σ sepal_width>petal_length ((π sepal_length (iris)) ⨯ (π sepal_width (iris)) ⨯ "
+                 "(π petal_length (iris))))",
+    # A fifth of a second of waiting, with no work for postgres to do
+    "waiting": WAIT_RELATION,
+}
+
+CREATE_WAIT_RELATION_QUERY = "create view {relation} as select 1 as waited from pg_sleep(0.2)" \
+    .format(relation=WAIT_RELATION)
+DROP_WAIT_RELATION_QUERY = "drop view if exists {relation}".format(relation=WAIT_RELATION)
+
+
+def start_server() -> subprocess.Popen:
+    environment = dict(os.environ, IRA_RESULT_CACHE_MAX_BYTES="0", IRA_PREFLIGHT_ENABLED="false")
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.asgi:application", "--port", str(PORT),
+                               "--workers", "1", "--log-level", "warning"], env=environment)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            execute("execute_ra_query", WAIT_RELATION)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise Exception("uvicorn did not start within 30 seconds")
+
+
+def execute(endpoint: str, ra_query: str) -> float:
+    request = urllib.request.Request("http://127.0.0.1:{port}/v1/ira/{endpoint}".format(port=PORT, endpoint=endpoint),
+                                     json.dumps({"raQuery": ra_query}).encode(), {"Content-Type": "application/json"})
+    started_at = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+    return time.perf_counter() - started_at
+
+
+def run_clients(endpoint: str, ra_query: str, concurrency: int):
+    def run_client(_):
+        return [execute(endpoint, ra_query) for _ in range(REQUESTS_PER_CLIENT)]
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = [latency for client_latencies in executor.map(run_client, range(concurrency))
+                     for latency in client_latencies]
+    return time.perf_counter() - started_at, latencies
+
+
+def execute_on_database(sql_query: str):
+    database = DATABASES["default"]
+    with psycopg.connect(dbname=database["NAME"], user=database["USER"], password=database["PASSWORD"],
+                         host=database["HOST"], port=database["PORT"], autocommit=True) as connection:
+        connection.execute(sql_query)
+
+
+def main():
+    execute_on_database(DROP_WAIT_RELATION_QUERY)
+    execute_on_database(CREATE_WAIT_RELATION_QUERY)
+    server = None
+    try:
+        server = start_server()
+        for workload, ra_query in WORKLOADS.items():
+            for endpoint in ENDPOINTS:
+                # Warming up the compile cache and the connection pools
+                execute(endpoint, ra_query)
+                print("{workload} queries, {endpoint}".format(workload=workload, endpoint=endpoint))
+                for concurrency in CONCURRENCIES:
+                    seconds, latencies = run_clients(endpoint, ra_query, concurrency)
+                    print("{concurrency:>4} clients {throughput:>8.1f} queries/s  p50 {p50:>8.1f} ms  "
+                          "max {maximum:>8.1f} ms".format(concurrency=concurrency,
+                                                          throughput=len(latencies) / seconds,
+                                                          p50=statistics.median(latencies) * 1000,
+                                                          maximum=max(latencies) * 1000))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        execute_on_database(DROP_WAIT_RELATION_QUERY)
+
+
+if __name__ == "__main__":
+    main()
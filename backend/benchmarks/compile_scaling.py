@@ -0,0 +1,47 @@
+"""
+Measures how compiling generated RA expressions to SQL scales with their size, split into lexing, parsing and
+transforming; every stage is meant to take a flat time per operator as the number of operators doubles.
+
+Run from the backend folder: python -m benchmarks.compile_scaling
+"""
+import timeit
+
+from ira.service.lexer import Lexer
+from ira.service.parser import Parser
+from ira.service.transformer import transform
+
+NUMBER_OF_RUNS = 3
+
+NUMBERS_OF_OPERATORS = (500, 1000, 2000, 4000, 8000)
+
+
+def generate_flat_expression(number_of_operators: int) -> str:
+    term = "π ProductID,Quantity (σ Quantity > 2 (sales ⧑ sales.ProductID = products.ProductID (products)))"
+    number_of_terms = max(1, number_of_operators // 4)
+    return " ∪ ".join([term] * number_of_terms)
+
+
+def generate_nested_expression(number_of_operators: int) -> str:
+    return "σ Quantity > 2 (" * number_of_operators + "sales" + ")" * number_of_operators
+
+
+def main():
+    lexer = Lexer()
+    parser = Parser()
+    for name, generate_expression in (("flat", generate_flat_expression), ("nested", generate_nested_expression)):
+        print(name)
+        for number_of_operators in NUMBERS_OF_OPERATORS:
+            expression = generate_expression(number_of_operators)
+            tokens = lexer.tokenize(expression)
+            parsed_postfix_tokens = parser.parse(tokens)
+            timings = []
+            for stage in (lambda: lexer.tokenize(expression), lambda: parser.parse(tokens),
+                          lambda: transform(parsed_postfix_tokens)):
+                seconds = min(timeit.repeat(stage, number=1, repeat=NUMBER_OF_RUNS))
+                timings.append(seconds * 1e6 / number_of_operators)
+            print("{number_of_operators:>8} operators; us/operator lex {0:>6.2f} parse {1:>6.2f} transform {2:>6.2f}"
+                  .format(*timings, number_of_operators=number_of_operators))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares pre-populating generated csv files the way it used to be done, reading each file whole into a pandas
+dataframe inserted through to_sql, with streaming them in chunks through COPY on a pool of workers. Each way runs in
+a process of its own, so that its peak memory is measured apart from the others'.
+
+Run from the backend folder: python -m benchmarks.csv_loading [number of rows per file]
+The files are loaded into tables of their own in the database of the settings, which are dropped afterwards.
+"""
+import csv
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from ira.service.csv_loader import CsvFile, load_csv_files, read_column_names  # noqa: E402
+
+DEFAULT_NUMBER_OF_ROWS = 500000
+NUMBER_OF_FILES = 4
+TABLE_NAME = "benchmark_loading_{index}"
+DROP_TABLE_QUERY = "drop table if exists {table_name}"
+
+WAYS = ("pandas", "copy, 1 worker", "copy, {workers} workers".format(workers=NUMBER_OF_FILES))
+
+
+def write_csv_file(path: str, number_of_rows: int):
+    generator = random.Random(path)
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "amount", "name", "is_active"])
+        for index in range(number_of_rows):
+            writer.writerow([index, round(generator.uniform(0, 1000), 2),
+                             "name, {value}".format(value=generator.randrange(10000)), generator.random() < 0.5])
+
+
+def drop_tables():
+    with connection.cursor() as cursor:
+        for index in range(NUMBER_OF_FILES):
+            cursor.execute(DROP_TABLE_QUERY.format(table_name=TABLE_NAME.format(index=index)))
+
+
+def load(way: str, paths):
+    """Loads the files in the current process, the way named"""
+    if way == "pandas":
+        import pandas
+        from sqlalchemy import create_engine
+        engine = create_engine("postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{NAME}".format(**connection.settings_dict))
+        for index, path in enumerate(paths):
+            pandas.read_csv(path).to_sql(TABLE_NAME.format(index=index), engine, index=False)
+        engine.dispose()
+        return
+    csv_files = [CsvFile(path, TABLE_NAME.format(index=index), read_column_names(path))
+                 for index, path in enumerate(paths)]
+    load_csv_files(csv_files, workers=1 if way == WAYS[1] else NUMBER_OF_FILES)
+
+
+def run(way: str, paths):
+    drop_tables()
+    started_at = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "benchmarks.csv_loading", "--load", way] + paths, check=True,
+                   stderr=subprocess.DEVNULL)
+    seconds = time.perf_counter() - started_at
+    # The peak of the largest child waited for so far, hence ways are run from the least memory hungry one
+    return seconds, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def main():
+    if sys.argv[1:2] == ["--load"]:
+        load(sys.argv[2], sys.argv[3:])
+        return
+    number_of_rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER_OF_ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, "{index}.csv".format(index=index)) for index in range(NUMBER_OF_FILES)]
+        for path in paths:
+            write_csv_file(path, number_of_rows)
+        megabytes = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        print("{number_of_files} files of {number_of_rows} rows, {megabytes:.0f} MiB".format(
+            number_of_files=NUMBER_OF_FILES, number_of_rows=number_of_rows, megabytes=megabytes))
+        try:
+            for way in reversed(WAYS):
+                seconds, peak_megabytes = run(way, paths)
+                print("{way:>17} {seconds:>8.2f} s {rows_per_second:>10.0f} rows/s  peak {peak:>7.0f} MiB".format(
+                    way=way, seconds=seconds, rows_per_second=NUMBER_OF_FILES * number_of_rows / seconds,
+                    peak=peak_megabytes))
+        finally:
+            drop_tables()
+
+
+if __name__ == "__main__":
+    main()
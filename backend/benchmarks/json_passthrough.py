@@ -0,0 +1,71 @@
+"""
+Compares fetching a result through Python rows against Postgres-side JSON aggregation, on the bundled relations
+scaled up by copying their rows. Needs the database of backend/settings.py, pre-populated with the bundled relations.
+
+Run from the backend folder: python -m benchmarks.json_passthrough [scale]
+"""
+import os
+import sys
+import timeit
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from ira.enum.result_format import ResultFormat  # noqa: E402
+from ira.model.query import Query  # noqa: E402
+from ira.service.db_executor import execute_sql_query, execute_sql_query_as_json  # noqa: E402
+from ira.service.result_cache import RESULT_CACHE  # noqa: E402
+from ira.service.result_encoder import encode  # noqa: E402
+
+BUNDLED_TABLE_NAMES = ("iris", "sales", "products")
+SCALED_TABLE_NAME = "benchmark_{table_name}"
+DEFAULT_SCALE = 200
+NUMBER_OF_RUNS = 5
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SCALE
+    # Leaving the result cache out of the measurement
+    RESULT_CACHE.max_bytes = 0
+    with connection.cursor() as cursor:
+        for table_name in BUNDLED_TABLE_NAMES:
+            scaled_table_name = SCALED_TABLE_NAME.format(table_name=table_name)
+            cursor.execute("drop table if exists {scaled_table_name}".format(scaled_table_name=scaled_table_name))
+            cursor.execute("create table {scaled_table_name} as select {table_name}.* from {table_name}, "
+                           "generate_series(1, %s)".format(scaled_table_name=scaled_table_name,
+                                                           table_name=table_name), [scale])
+    try:
+        queries = [Query("select * from {scaled_table_name};"
+                         .format(scaled_table_name=SCALED_TABLE_NAME.format(table_name=table_name)))
+                   for table_name in BUNDLED_TABLE_NAMES]
+        queries.append(Query("select * from benchmark_sales natural join products;"))
+        for query in queries:
+            print(query.value)
+            for result_format in ResultFormat:
+                def through_python_rows():
+                    output = execute_sql_query(query, result_format)
+                    return encode(output.value)
+
+                def through_postgres_json():
+                    return execute_sql_query_as_json(query, result_format)[1]
+
+                for name, candidate in (("python rows", through_python_rows),
+                                        ("postgres json", through_postgres_json)):
+                    payload = candidate()
+                    seconds = min(timeit.repeat(candidate, number=1, repeat=NUMBER_OF_RUNS))
+                    print("  {format:<9} {name:<14} {size:>10} bytes {milliseconds:>8.1f} ms"
+                          .format(format=result_format.value, name=name, size=len(payload),
+                                  milliseconds=seconds * 1000))
+    finally:
+        with connection.cursor() as cursor:
+            for table_name in BUNDLED_TABLE_NAMES:
+                cursor.execute("drop table if exists {scaled_table_name}"
+                               .format(scaled_table_name=SCALED_TABLE_NAME.format(table_name=table_name)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Measures how lexing time scales with the length of generated RA expressions; a linear lexer keeps the time per
+operator flat as the number of operators doubles.
+
+Run from the backend folder: python -m benchmarks.lexer_scaling
+"""
+import timeit
+
+from ira.service.lexer import Lexer
+
+NUMBER_OF_RUNS = 3
+
+NUMBERS_OF_OPERATORS = (500, 1000, 2000, 4000, 8000)
+
+
+def generate_flat_expression(number_of_operators: int) -> str:
+    # Every term brings a selection with a condition, a projection and a join with a condition, chained by unions
+    term = "π ProductID,Quantity (σ Quantity > 2 and ProductID <= 9 (sales ⧑ sales.ProductID = products.ProductID " \
+           "(products)))"
+    number_of_terms = max(1, number_of_operators // 5)
+    return " ∪ ".join([term] * number_of_terms)
+
+
+def generate_nested_expression(number_of_operators: int) -> str:
+    return "σ Quantity > 2 (" * number_of_operators + "sales" + ")" * number_of_operators
+
+
+def main():
+    lexer = Lexer()
+    for name, generate_expression in (("flat", generate_flat_expression), ("nested", generate_nested_expression)):
+        print(name)
+        for number_of_operators in NUMBERS_OF_OPERATORS:
+            expression = generate_expression(number_of_operators)
+            seconds = min(timeit.repeat(lambda: lexer.tokenize(expression), number=1, repeat=NUMBER_OF_RUNS))
+            print("{number_of_operators:>8} operators {length:>9} characters {milliseconds:>9.1f} ms "
+                  "{microseconds:>7.2f} us/operator".format(number_of_operators=number_of_operators,
+                                                           length=len(expression), milliseconds=seconds * 1000,
+                                                           microseconds=seconds * 1e6 / number_of_operators))
+
+
+if __name__ == "__main__":
+    main()
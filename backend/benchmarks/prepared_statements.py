@@ -0,0 +1,68 @@
+"""
+Measures executing many selections of the same shape which only differ by their literals, with their statements
+executed as they are against prepared once per shape; the result cache is left out, so that every query reaches
+postgres. Needs the database of backend/settings.py, pre-populated with the bundled relations.
+
+Run from the backend folder: python -m benchmarks.prepared_statements [number of queries]
+"""
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from ira.enum.result_format import ResultFormat  # noqa: E402
+from ira.service.compile_cache import COMPILE_CACHE  # noqa: E402
+from ira.service.db_executor import execute_sql_query  # noqa: E402
+from ira.service.prepared_statements import get_prepared_statements  # noqa: E402
+from ira.service.result_cache import RESULT_CACHE  # noqa: E402
+
+DEFAULT_NUMBER_OF_QUERIES = 2000
+NUMBER_OF_RUNS = 7
+
+RA_QUERIES = (
+    "σ ProductID > {value} (sales)",
+    "π ProductID,InvoiceNumber (σ ProductID > {value} and InvoiceNumber < 5000000 (sales ⋈ products))",
+    "π sepal_length (σ sepal_length > {value} (iris)) ∩ π sepal_length (σ petal_length < 4.5 and sepal_width > 3 "
+    "(iris)) ∪ π sepal_length (σ sepal_width > 2.5 (iris))",
+)
+
+
+def run(queries) -> float:
+    started_at = time.perf_counter()
+    for query in queries:
+        execute_sql_query(query, ResultFormat.COMPACT)
+    return time.perf_counter() - started_at
+
+
+def main():
+    number_of_queries = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER_OF_QUERIES
+    RESULT_CACHE.max_bytes = 0
+    connection.ensure_connection()
+    prepared_statements = get_prepared_statements(connection.connection)
+    max_entries = prepared_statements.max_entries
+    for ra_query in RA_QUERIES:
+        # Compiled up front, so that only the execution is measured
+        queries = [COMPILE_CACHE.get_query(ra_query.format(value=index % 10))
+                   for index in range(number_of_queries)]
+        print(queries[0].shape)
+        # The runs of either way alternate, so that both see the same load of the host
+        seconds = {"as is": [], "prepared": []}
+        for _ in range(NUMBER_OF_RUNS):
+            for name, entries in (("as is", 0), ("prepared", max_entries)):
+                prepared_statements.max_entries = entries
+                seconds[name].append(run(queries))
+        for name, run_seconds in seconds.items():
+            print("{name:>9} {milliseconds:>9.1f} ms {microseconds:>8.1f} us/query".format(
+                name=name, milliseconds=min(run_seconds) * 1000,
+                microseconds=min(run_seconds) * 1e6 / number_of_queries))
+    print(prepared_statements.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares payload size and serialisation time of the result formats, on the cross product of the bundled relations.
+
+Run from the backend folder: python -m benchmarks.result_encoding
+"""
+import csv
+import itertools
+import json
+import os
+import timeit
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ira.enum.result_format import ResultFormat
+from ira.service.result_encoder import encode, format_result
+
+PREPOPULATION_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    "ira", "resources", "prepopulation")
+
+NUMBER_OF_RUNS = 5
+
+
+def read_relation(table_name):
+    with open(os.path.join(PREPOPULATION_FOLDER, table_name + ".csv")) as file:
+        reader = csv.reader(file)
+        column_names = next(reader)
+        rows = [tuple(to_value(value) for value in row) for row in reader]
+    return column_names, rows
+
+
+def to_value(value):
+    for value_type in (int, float):
+        try:
+            return value_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main():
+    relations = [read_relation(table_name) for table_name in ("iris", "sales", "products")]
+    # Same shape as the result of iris ⨯ sales ⨯ products, including its duplicate column names
+    column_names = [column_name for relation_column_names, _ in relations for column_name in relation_column_names]
+    rows = [sum(combination, ()) for combination in itertools.product(*(rows for _, rows in relations))]
+    print("{number_of_rows} rows of {number_of_columns} columns".format(number_of_rows=len(rows),
+                                                                       number_of_columns=len(column_names)))
+
+    def encode_with_json_response():
+        # What JsonResponse does for the default format
+        return json.dumps({"result": format_result(column_names, rows, ResultFormat.OBJECTS)},
+                          cls=DjangoJSONEncoder).encode()
+
+    candidates = [("objects (JsonResponse)", encode_with_json_response)]
+    for result_format in (ResultFormat.OBJECTS, ResultFormat.COMPACT, ResultFormat.COLUMNAR):
+        candidates.append(("{format} (encode)".format(format=result_format.value),
+                           lambda result_format=result_format:
+                           encode({"result": format_result(column_names, rows, result_format)})))
+
+    for name, candidate in candidates:
+        payload = candidate()
+        seconds = min(timeit.repeat(candidate, number=1, repeat=NUMBER_OF_RUNS))
+        print("{name:<24} {size:>10} bytes {milliseconds:>8.1f} ms".format(name=name, size=len(payload),
+                                                                         milliseconds=seconds * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from django.apps import AppConfig
 
-from ira.service.pre_populator import pre_populate
+from ira.service.pre_populator import start_pre_population
 
 
 class IraConfig(AppConfig):
@@ -8,7 +8,7 @@ class IraConfig(AppConfig):
     name = 'ira'
 
     def ready(self):
-        pre_populate()
+        start_pre_population()
 
 
 
@@ -28,6 +28,10 @@ OPEN_PARENTHESIS = '('
 CLOSED_PARENTHESIS = ')'
 
 LOGICAL_OPERATORS = (AND, OR, NOT)
+
+# Operands of a condition which are values rather than column names
+LITERAL_PREFIXES = ("'", ".", "-", "0", "1", "2", "3", "4", "5", "6", "7", "8", "9")
+LITERAL_KEYWORDS = ("true", "false", "null")
 COMPARATIVE_OPERATORS = (GREATER_THAN, GREATER_THAN_OR_EQUALS_TO, LESSER_THAN, LESSER_THAN_OR_EQUALS_TO, EQUALS)
 
 LOGICAL_OPERATORS_TO_TOKEN_TYPE = {AND: TokenType.AND, NOT: TokenType.NOT, OR: TokenType.OR}
@@ -0,0 +1,46 @@
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgresDatabaseCreation
+
+from ira.service.connection_pool import close_connection_pools, get_connection_pool
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Postgres refuses to drop a database which pooled connections are still connected to
+        close_connection_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Takes connections from the connection pool of the database rather than opening them, and returns them to the
+    pool rather than closing them. Django closes the connection of a request once the request has finished, unless
+    CONN_MAX_AGE keeps it.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Pool of the current connection
+        self.connection_pool = None
+
+    def get_new_connection(self, conn_params):
+        self.connection_pool = get_connection_pool(conn_params, lambda: connect(conn_params))
+        connection = self.connection_pool.get_connection()
+        # Django needs the isolation level before it sets autocommit, which overrides the isolation level
+        self.isolation_level = self.settings_dict["OPTIONS"].get("isolation_level", connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.connection_pool.put_connection(self.connection)
+
+
+def connect(conn_params: dict):
+    connection = base.Database.connect(**conn_params)
+    # As Django registers for a connection it opens; JSON is left for JSONField to decode
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
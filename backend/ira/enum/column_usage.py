@@ -0,0 +1,8 @@
+import enum
+
+
+class ColumnUsage(enum.Enum):
+    # The column is compared in the condition of a selection
+    SELECTION = "selection"
+    # The column is a join attribute, either common to both sides of a natural join or in the condition of a join
+    JOIN = "join"
@@ -0,0 +1,14 @@
+import enum
+
+
+class ErrorCode(enum.Enum):
+    # The query ran longer than the statement timeout of the request
+    STATEMENT_TIMEOUT = "statementTimeout"
+    # The query was cancelled, as its client disconnected or asked for it
+    QUERY_CANCELLED = "queryCancelled"
+    # The query is estimated to be too large to be executed unless the request confirms it
+    CONFIRMATION_REQUIRED = "confirmationRequired"
+    # A relation of the query is still being pre-populated
+    RELATION_LOADING = "relationLoading"
+    # Advised indexes are only created once the deployment opts into it
+    INDEX_CREATION_DISABLED = "indexCreationDisabled"
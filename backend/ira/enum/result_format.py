@@ -0,0 +1,10 @@
+import enum
+
+
+class ResultFormat(enum.Enum):
+    # One object per row, in which duplicate column names are kept as duplicate keys
+    OBJECTS = "objects"
+    # {"columns": [...], "rows": [[...], ...]}
+    COMPACT = "compact"
+    # {"columns": [...], "values": [[...], ...]}, holding one array per column
+    COLUMNAR = "columnar"
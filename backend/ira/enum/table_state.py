@@ -0,0 +1,11 @@
+import enum
+
+
+class TableState(enum.Enum):
+    # Not loaded yet, hence it cannot be queried
+    LOADING = "loading"
+    # Its file has changed, and the table loaded from it before is queried until it is replaced
+    RELOADING = "reloading"
+    READY = "ready"
+    # Its file failed to load, and there is no table loaded from it before
+    FAILED = "failed"
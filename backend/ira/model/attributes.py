@@ -1,4 +1,4 @@
-from ira.constants import LOGICAL_OPERATORS, COMPARATIVE_OPERATORS
+from ira.constants import LOGICAL_OPERATORS, COMPARATIVE_OPERATORS, LITERAL_KEYWORDS, LITERAL_PREFIXES
 from ira.enum.token_type import TokenType
 from ira.service.util import split_string
 
@@ -36,9 +36,14 @@ class Attributes:
             for condition in conditions:
                 condition_segments = split_string(
                     condition, COMPARATIVE_OPERATORS)
-                column_name_with_possible_alias = condition_segments[0]
-                column_name = column_name_with_possible_alias.split('.')[-1]
-                column_names.add(column_name)
+                for condition_segment in condition_segments:
+                    # Stripping the whitespace around logical operators and the parentheses grouping conditions
+                    column_name_with_possible_alias = condition_segment.strip(" ()")
+                    if not column_name_with_possible_alias or \
+                            column_name_with_possible_alias.startswith(LITERAL_PREFIXES) or \
+                            column_name_with_possible_alias.lower() in LITERAL_KEYWORDS:
+                        continue
+                    column_names.add(column_name_with_possible_alias.split('.')[-1])
             return column_names
 
 
@@ -4,17 +4,22 @@ from ira.model.query import Query
 
 
 class Output:
-    def __init__(self, status_code, query: Optional[Query], result=None, message=""):
+    def __init__(self, status_code, query: Optional[Query], result=None, message="", error: Optional[dict] = None,
+                 estimate: Optional[dict] = None):
         if result is None:
             result = dict()
         self.status_code = status_code
         self.message = message
         self.result = result
+        self.error = error
         if query:
             self.value = {"sqlQuery": query.value,
-                          "message": message,
-                          "result": result}
+                          "message": message}
         else:
-            self.value = {"message": message,
-                          "result": result}
-
+            self.value = {"message": message}
+        if estimate is not None:
+            self.value["estimate"] = estimate
+        # The result stays last but for the error, as the JSON passthrough splices the result in at the end
+        self.value["result"] = result
+        if error is not None:
+            self.value["error"] = error
@@ -1,14 +1,35 @@
+import hashlib
+
 from ira.constants import OPEN_PARENTHESIS
 
 SELECT = "SELECT"
+WITH = "WITH"
+QUERY_SEMI_COLON = ';'
 
 
 class Query:
 
-    def __init__(self, value):
+    def __init__(self, value, relation_names=(), shape=None, parameters=(), column_usages=()):
         self.value = value
+        # Base relations read by the query
+        self.relation_names = frozenset(relation_names)
+        # The query with its literals lifted out as %s placeholders, which queries differing only by their literals
+        # share, alongside the literals in order of their placeholders
+        self.shape = shape
+        self.parameters = tuple(parameters)
+        # Columns of the base relations which the query selects and joins on, as (relation name, column name, usage)
+        self.column_usages = frozenset(column_usages)
         self.is_dql = self._is_dql()
+        self.fingerprint = hashlib.sha256(value.encode()).hexdigest()[:32]
+
+    def get_value_without_semi_colon(self):
+        """For embedding the query as a subquery"""
+        return self.value.rstrip().rstrip(QUERY_SEMI_COLON)
+
+    def get_shape_without_semi_colon(self):
+        return self.shape.rstrip().rstrip(QUERY_SEMI_COLON) if self.shape is not None else None
 
     def _is_dql(self):
         upper_case_value = self.value.upper()
-        return upper_case_value.startswith(SELECT) or upper_case_value.lstrip(OPEN_PARENTHESIS).startswith(SELECT)
+        return upper_case_value.startswith((SELECT, WITH)) or \
+            upper_case_value.lstrip(OPEN_PARENTHESIS).startswith(SELECT)
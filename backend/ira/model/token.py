@@ -14,6 +14,12 @@ class Token:
         self.right_child_token = None
         self.parent_token = None
         self.level = None
+        # Output column names of the subexpression rooted at this token, filled by schema inference
+        self.output_column_names = None
+        # Whether a projection removes duplicates itself; the optimiser clears it when an operator above does
+        self.is_distinct = True
+        # Name of the common table expression the subexpression rooted at this token is referred to by, if any
+        self.cte_name = None
 
     def __eq__(self, __o: object) -> bool:
         return isinstance(__o, Token) and \
@@ -22,25 +28,3 @@ class Token:
     def __str__(self):
         return f'Token is {self.value} of type {self.type} with attribute {self.attributes} ' \
                f'with query{self.sql_query} with post fix index {self.post_fix_index}'
-
-    def set_parent_token(self, parent_token):
-        self.parent_token = parent_token
-        self.level = self.get_level_based_on_parent_token()
-
-    def get_level_based_on_parent_token(self):
-        if self.parent_token is None:
-            return 0
-        elif self.parent_token.level:
-            return self.parent_token.level + 1
-        else:
-            token = self.parent_token
-            level = 1
-            while token.parent_token:
-                token = token.parent_token
-                level += 1
-            return level
-
-    def initialise_for_transformer(self, sql_query, post_fix_index, parent_token):
-        self.sql_query = sql_query
-        self.post_fix_index = post_fix_index
-        self.set_parent_token(parent_token)
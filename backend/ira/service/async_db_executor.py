@@ -0,0 +1,161 @@
+import asyncio
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from typing import Optional
+
+import psycopg
+from asgiref.sync import sync_to_async
+from psycopg_pool import AsyncConnectionPool
+
+from backend.settings import ASYNC_DATABASE_POOL_MAX_SIZE, ASYNC_DATABASE_POOL_MIN_SIZE, DATABASE_POOL_MAX_IDLE, \
+    DATABASE_POOL_MAX_LIFETIME, DATABASE_POOL_WAIT_TIMEOUT, PREFLIGHT_ENABLED, PREPARED_STATEMENT_MAX_ENTRIES, \
+    PREPARED_STATEMENT_THRESHOLD, STATEMENT_TIMEOUT_MS
+from ira.enum.result_format import ResultFormat
+from ira.model.output import Output
+from ira.model.query import Query
+from ira.service.catalog import CATALOG, get_connection_info
+from ira.service.db_executor import ESTIMATE_QUERY, check_estimate, get_column_names
+from ira.service.result_cache import RESULT_CACHE
+from ira.service.result_encoder import format_result
+from ira.service.statement_guard import APPLICATION_NAME, get_failure_output
+
+# psycopg 3 binds parameters on the server, which SET does not take, hence the settings are made by set_config;
+# true makes them local to the transaction, as SET LOCAL does
+STATEMENT_TIMEOUT_QUERY = "select set_config('statement_timeout', %s, true)"
+APPLICATION_NAME_QUERY = "select set_config('application_name', %s, true)"
+
+# A pool is bound to the event loop it has been opened in; pools are only opened for loops which serve every request
+ASYNC_CONNECTION_POOLS = dict()
+
+
+async def execute_sql_query_async(query: Query, result_format: ResultFormat = ResultFormat.OBJECTS,
+                                  timeout: int = STATEMENT_TIMEOUT_MS, request_id: Optional[str] = None,
+                                  is_confirmed: bool = False, is_pooled: bool = True) -> Output:
+    """
+    Executes the query as execute_sql_query does, under a statement guard and after the pre-flight check, while
+    awaiting postgres through psycopg 3 rather than blocking a thread. Connections come from a pool of the running
+    event loop, which only pays off for a loop serving every request, as under an ASGI server; otherwise a connection
+    is opened for the query alone.
+    """
+    async with get_async_connection(is_pooled) as connection:
+        try:
+            async with connection.transaction():
+                await connection.execute(STATEMENT_TIMEOUT_QUERY, [str(timeout)])
+                if request_id is not None:
+                    await connection.execute(APPLICATION_NAME_QUERY,
+                                             [APPLICATION_NAME.format(request_id=request_id)])
+                return await execute_guarded_sql_query(connection, query, result_format, is_confirmed)
+        except Exception as exception:
+            return get_failure_output(query, exception)
+        finally:
+            if not query.is_dql:
+                # Outside of the transaction, which has either committed the write or rolled it back
+                await sync_to_async(RESULT_CACHE.bump_versions, thread_sensitive=False)(
+                    query.relation_names or CATALOG.get_relation_names())
+
+
+async def execute_guarded_sql_query(connection: psycopg.AsyncConnection, query: Query, result_format: ResultFormat,
+                                    is_confirmed: bool) -> Output:
+    estimate = None
+    if PREFLIGHT_ENABLED and query.is_dql:
+        try:
+            # Within a savepoint, so that a query which fails to be planned can still be executed to report its error
+            async with connection.transaction():
+                cursor = await connection.execute(ESTIMATE_QUERY.format(query=query.get_value_without_semi_colon()))
+                explanation = (await cursor.fetchone())[0]
+        except psycopg.Error as exception:
+            failure_output = get_failure_output(query, exception)
+            if failure_output.error is not None:
+                return failure_output
+        else:
+            estimate, output = check_estimate(query, explanation, is_confirmed)
+            if output is not None:
+                return output
+
+    # The result cache lives on disk, hence it is read and written off the event loop
+    if query.is_dql:
+        entry_path = await sync_to_async(RESULT_CACHE.get_entry_path, thread_sensitive=False)(query)
+        cached_result = await sync_to_async(RESULT_CACHE.get, thread_sensitive=False)(query, entry_path)
+        if cached_result is not None:
+            column_names, rows = cached_result
+            return Output(HTTPStatus.OK,
+                          query,
+                          result=format_result(column_names, rows, result_format),
+                          estimate=estimate)
+    # psycopg 3 prepares a query on the connection itself once it recurs, keyed by its text, hence by the shape
+    if query.shape is not None:
+        cursor = await connection.execute(query.shape, query.parameters)
+    else:
+        cursor = await connection.execute(query.value)
+    if query.is_dql:
+        column_names = get_column_names(cursor)
+        rows = await cursor.fetchall()
+        await sync_to_async(RESULT_CACHE.put, thread_sensitive=False)(query, column_names, rows, entry_path)
+        return Output(HTTPStatus.OK,
+                      query,
+                      result=format_result(column_names, rows, result_format),
+                      estimate=estimate)
+    return Output(HTTPStatus.OK,
+                  query,
+                  message="Query has affected {number_of_rows} row(s).".format(number_of_rows=cursor.rowcount))
+
+
+@asynccontextmanager
+async def get_async_connection(is_pooled: bool):
+    if is_pooled:
+        connection_pool = await get_async_connection_pool()
+        async with connection_pool.connection() as connection:
+            yield connection
+    else:
+        async with await psycopg.AsyncConnection.connect(get_connection_info(), **get_connection_arguments()) \
+                as connection:
+            await configure_connection(connection)
+            yield connection
+
+
+async def get_async_connection_pool() -> AsyncConnectionPool:
+    loop = asyncio.get_running_loop()
+    opening = ASYNC_CONNECTION_POOLS.get(loop)
+    if opening is None:
+        # Concurrent requests of the loop await the same pool while it opens
+        opening = asyncio.ensure_future(open_async_connection_pool())
+        ASYNC_CONNECTION_POOLS[loop] = opening
+    return await asyncio.shield(opening)
+
+
+async def open_async_connection_pool() -> AsyncConnectionPool:
+    connection_pool = AsyncConnectionPool(get_connection_info(),
+                                          kwargs=get_connection_arguments(),
+                                          configure=configure_connection,
+                                          min_size=ASYNC_DATABASE_POOL_MIN_SIZE,
+                                          max_size=ASYNC_DATABASE_POOL_MAX_SIZE,
+                                          max_lifetime=DATABASE_POOL_MAX_LIFETIME,
+                                          max_idle=DATABASE_POOL_MAX_IDLE,
+                                          timeout=DATABASE_POOL_WAIT_TIMEOUT,
+                                          open=False)
+    await connection_pool.open()
+    return connection_pool
+
+
+async def close_async_connection_pool():
+    """Closes the pool of the running event loop, if it has one"""
+    opening = ASYNC_CONNECTION_POOLS.pop(asyncio.get_running_loop(), None)
+    if opening is not None:
+        await (await opening).close()
+
+
+def get_async_connection_pool_stats() -> dict:
+    return {str(index): opening.result().get_stats()
+            for index, opening in enumerate(list(ASYNC_CONNECTION_POOLS.values()))
+            if opening.done() and not opening.cancelled() and opening.exception() is None}
+
+
+def get_connection_arguments() -> dict:
+    # A threshold of None keeps psycopg from preparing statements
+    return {"autocommit": True,
+            "prepare_threshold": PREPARED_STATEMENT_THRESHOLD if PREPARED_STATEMENT_MAX_ENTRIES > 0 else None}
+
+
+async def configure_connection(connection: psycopg.AsyncConnection):
+    connection.prepared_max = PREPARED_STATEMENT_MAX_ENTRIES
+
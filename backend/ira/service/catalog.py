@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import psycopg
+from django.db import connections
+from psycopg.conninfo import make_conninfo
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "ira_catalog"
+LISTEN_QUERY = "listen {channel}".format(channel=CATALOG_CHANNEL)
+# Delivered once the transaction it is sent in commits, and only once however often it is sent in it
+NOTIFY_QUERY = "select pg_notify('{channel}', '')".format(channel=CATALOG_CHANNEL)
+
+MANIFEST_EXISTS_QUERY = "select to_regclass('ira_prepopulation_manifest') is not null"
+# The relations which have been pre-populated, with their columns and column types as postgres has them, leaving out
+# the tables of Django and of the manifest itself
+CATALOG_QUERY = "select columns.table_name, columns.column_name, columns.data_type from information_schema.columns " \
+                "join ira_prepopulation_manifest on ira_prepopulation_manifest.table_name = columns.table_name " \
+                "where columns.table_schema = current_schema() " \
+                "order by columns.table_name, columns.ordinal_position"
+
+# How long listening waits for a notification before checking whether it is to stop, and how long it waits before
+# connecting again once its connection has failed
+LISTEN_POLL_SECONDS = 1.0
+LISTEN_RETRY_SECONDS = 5.0
+
+
+class CatalogSnapshot:
+    def __init__(self, database_name: str, relation_to_column_names: Dict[str, Tuple[str, ...]],
+                 relation_to_column_types: Dict[str, Tuple[str, ...]], generation: int):
+        self.database_name = database_name
+        self.relation_to_column_names = relation_to_column_names
+        self.generation = generation
+        self.fingerprint = get_fingerprint(relation_to_column_names, relation_to_column_types)
+
+
+class Catalog:
+    """
+    Relations of the database and their column names, looked up from a snapshot read from information_schema, so
+    that a lookup never costs a round trip to postgres. The snapshot is read on the first lookup and once again on
+    the first lookup after it has been invalidated, which a change of the schema does in every process: the process
+    making the change notifies the others through postgres, which a thread of every process listens for. Whenever
+    listening starts over, the snapshot is invalidated, as changes may have been missed while it was not listening.
+    """
+
+    def __init__(self):
+        self.snapshot: Optional[CatalogSnapshot] = None
+        # Bumped by every invalidation; a snapshot read before the latest one is stale
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.listener: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.is_listening = False
+        self.reads = 0
+        self.invalidations = 0
+
+    def is_relation(self, relation_name: str) -> bool:
+        return relation_name in self._get_snapshot().relation_to_column_names
+
+    def get_column_names(self, relation_name: str) -> Optional[Tuple[str, ...]]:
+        return self._get_snapshot().relation_to_column_names.get(relation_name)
+
+    def get_relation_names(self) -> List[str]:
+        return list(self._get_snapshot().relation_to_column_names)
+
+    def get_fingerprint(self) -> str:
+        return self._get_snapshot().fingerprint
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+
+    def get_stats(self) -> dict:
+        snapshot = self.snapshot
+        return {"relations": len(snapshot.relation_to_column_names) if snapshot is not None else 0,
+                "reads": self.reads,
+                "invalidations": self.invalidations,
+                "isListening": self.is_listening}
+
+    def stop_listening(self):
+        """Stops the listening thread, which Django needs of a database it is about to drop"""
+        listener = self.listener
+        if listener is not None:
+            self.stop_event.set()
+            listener.join()
+            self.listener = None
+            self.stop_event.clear()
+
+    def _get_snapshot(self) -> CatalogSnapshot:
+        database_name = connections["default"].settings_dict["NAME"]
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.generation == self.generation and \
+                snapshot.database_name == database_name:
+            return snapshot
+        with self.lock:
+            snapshot = self.snapshot
+            if snapshot is not None and snapshot.generation == self.generation and \
+                    snapshot.database_name == database_name:
+                return snapshot
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self._listen, name="catalog-listener", daemon=True)
+                self.listener.start()
+            generation = self.generation
+            try:
+                relation_to_column_names, relation_to_column_types = read_catalog()
+            except Exception as exception:
+                if snapshot is None or snapshot.database_name != database_name:
+                    raise
+                # Still better than failing every query while postgres cannot be reached
+                logger.warning("Could not read the catalog, keeping the previous one; {exception}"
+                               .format(exception=exception))
+                return snapshot
+            self.reads += 1
+            self.snapshot = CatalogSnapshot(database_name, relation_to_column_names, relation_to_column_types,
+                                            generation)
+            return self.snapshot
+
+    def _listen(self):
+        while not self.stop_event.is_set():
+            database_name = connections["default"].settings_dict["NAME"]
+            try:
+                with psycopg.connect(get_connection_info(), autocommit=True) as connection:
+                    connection.execute(LISTEN_QUERY)
+                    self.is_listening = True
+                    self.invalidate()
+                    # Until asked to stop, or until the database of Django changes, as it does for tests
+                    while not self.stop_event.is_set() and \
+                            database_name == connections["default"].settings_dict["NAME"]:
+                        if any(True for _ in connection.notifies(timeout=LISTEN_POLL_SECONDS)):
+                            self.invalidate()
+            except Exception as exception:
+                logger.warning("Stopped listening for catalog changes; {exception}".format(exception=exception))
+                self.stop_event.wait(LISTEN_RETRY_SECONDS)
+            finally:
+                self.is_listening = False
+                self.invalidate()
+
+
+def read_catalog() -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, Tuple[str, ...]]]:
+    """The column names and the column types of every relation, in the order of the columns"""
+    relation_to_column_names = dict()
+    relation_to_column_types = dict()
+    with psycopg.connect(get_connection_info(), autocommit=True) as connection:
+        if not connection.execute(MANIFEST_EXISTS_QUERY).fetchone()[0]:
+            return relation_to_column_names, relation_to_column_types
+        for relation_name, column_name, column_type in connection.execute(CATALOG_QUERY):
+            relation_to_column_names[relation_name] = relation_to_column_names.get(relation_name, ()) + (column_name,)
+            relation_to_column_types[relation_name] = relation_to_column_types.get(relation_name, ()) + (column_type,)
+    return relation_to_column_names, relation_to_column_types
+
+
+def get_fingerprint(relation_to_column_names: Dict[str, Tuple[str, ...]],
+                    relation_to_column_types: Dict[str, Tuple[str, ...]]) -> str:
+    # The columns stay in their order, which the SQL compiled for a relation depends on, alongside their types, which
+    # the statements prepared for it depend on
+    catalog = sorted((relation_name, tuple(column_names), relation_to_column_types.get(relation_name, ()))
+                     for relation_name, column_names in relation_to_column_names.items())
+    return hashlib.sha256(repr(catalog).encode()).hexdigest()
+
+
+def notify_catalog_changed(cursor):
+    """Has every process read the catalog again once the transaction of the cursor commits"""
+    cursor.execute(NOTIFY_QUERY)
+
+
+def get_connection_info() -> str:
+    """Connects where Django does, which is the test database while testing"""
+    settings_dict = connections["default"].settings_dict
+    # Django has postgres convert text into UTF-8 as well, which psycopg decodes
+    return make_conninfo(dbname=settings_dict["NAME"], user=settings_dict["USER"],
+                         password=settings_dict["PASSWORD"], host=settings_dict["HOST"],
+                         port=settings_dict["PORT"], client_encoding="utf8")
+
+
+CATALOG = Catalog()
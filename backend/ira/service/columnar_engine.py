@@ -0,0 +1,676 @@
+import logging
+import operator
+import re
+import threading
+import time
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+import pandas
+from django.db import connection, connections
+
+from backend.settings import COLUMNAR_ENGINE_MAX_ROWS, STATEMENT_TIMEOUT_MS
+from ira.enum.result_format import ResultFormat
+from ira.enum.token_type import TokenType
+from ira.model.output import Output
+from ira.model.query import Query
+from ira.model.token import Token
+from ira.service.catalog import CATALOG
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.csv_loader import quote_identifier
+from ira.service.db_executor import is_result_above_threshold
+from ira.service.result_cache import RESULT_CACHE
+from ira.service.result_encoder import format_result
+from ira.service.schema_inferrer import get_common_column_names
+from ira.service.statement_guard import get_timeout_output
+from ira.service.transformer import get_numeric_parameter
+from ira.service.util import is_unary_operator
+
+logger = logging.getLogger(__name__)
+
+# One row more than the maximum is read, which tells a relation too large apart from one which just fits
+RELATION_QUERY = "select * from {table_name} limit %s"
+
+# numpy types of the postgres types a relation loaded from a file has, by the oid of the latter
+TYPE_OID_TO_DTYPE = {16: numpy.bool_, 20: numpy.int64, 21: numpy.int64, 23: numpy.int64, 700: numpy.float64,
+                     701: numpy.float64, 25: numpy.object_, 1043: numpy.object_}
+# Values standing in for NULL, by the kind of the numpy type
+KIND_TO_FILLER = {"b": False, "i": 0, "f": 0.0, "O": ""}
+NUMERIC_KINDS = ("i", "f")
+STRING_KIND = "O"
+# Bounds of bigint, beyond which postgres refuses a string compared with it
+MIN_BIGINT = -2 ** 63
+MAX_BIGINT = 2 ** 63 - 1
+
+CONDITION_TOKEN_PATTERN = re.compile(r"\s*(?:'(?P<string>(?:[^']|'')*)'"
+                                     r"|(?P<number>-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)(?![\w.])"
+                                     r"|(?P<operator><=|>=|<>|!=|=|<|>)"
+                                     r"|(?P<parenthesis>[()])"
+                                     r"|(?P<word>[^\s()=<>!']+))")
+COMPARATIVE_OPERATOR_TO_FUNCTION = {"=": operator.eq, "<>": operator.ne, "!=": operator.ne, "<": operator.lt,
+                                    ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+EQUALITY_OPERATORS = ("=", "<>", "!=")
+# Strings postgres reads as booleans
+TRUE_STRINGS = ("t", "true", "y", "yes", "on", "1")
+FALSE_STRINGS = ("f", "false", "n", "no", "off", "0")
+
+JOIN_TOKEN_TYPE_TO_HOW = {TokenType.NATURAL_JOIN: "inner", TokenType.LEFT_JOIN: "left",
+                          TokenType.RIGHT_JOIN: "right", TokenType.FULL_JOIN: "full"}
+SET_OPERATOR_TOKEN_TYPES = (TokenType.UNION, TokenType.INTERSECTION, TokenType.DIFFERENCE)
+# Operators whose children the transformer forms into a single from clause, where a relation is named as it is
+FROM_CLAUSE_TOKEN_TYPES = (TokenType.CARTESIAN, *JOIN_TOKEN_TYPE_TO_HOW)
+
+
+class Column:
+    """Values of a column as a numpy array, alongside a mask of the rows which are NULL, whose values are a filler"""
+
+    def __init__(self, values: numpy.ndarray, is_null: numpy.ndarray):
+        self.values = values
+        self.is_null = is_null
+
+    @classmethod
+    def from_values(cls, values: list, dtype) -> "Column":
+        filler = KIND_TO_FILLER[numpy.dtype(dtype).kind]
+        return cls(numpy.array([filler if value is None else value for value in values], dtype=dtype),
+                   numpy.array([value is None for value in values], dtype=bool))
+
+    @classmethod
+    def concatenate(cls, columns: List["Column"]) -> "Column":
+        return cls(numpy.concatenate([column.values for column in columns]),
+                   numpy.concatenate([column.is_null for column in columns]))
+
+    @property
+    def kind(self) -> str:
+        return self.values.dtype.kind
+
+    def take(self, indices: numpy.ndarray, allow_fill: bool = False) -> "Column":
+        """The rows at the indices, where an index of -1 takes NULL if allowed to"""
+        if not allow_fill:
+            return Column(self.values[indices], self.is_null[indices])
+        # Index -1 takes the NULL appended last
+        return Column(numpy.append(self.values, KIND_TO_FILLER[self.kind])[indices],
+                      numpy.append(self.is_null, True)[indices])
+
+    def astype(self, dtype) -> "Column":
+        return Column(self.values.astype(dtype, copy=False), self.is_null)
+
+    def get_codes(self) -> Tuple[numpy.ndarray, int]:
+        """Numbers the distinct values by hashing them, where NULL is a value of its own"""
+        codes, uniques = pandas.factorize(self.values)
+        codes[self.is_null] = len(uniques)
+        return codes, len(uniques) + 1
+
+    def to_list(self) -> list:
+        # Object arrays hold Python values, which encode as JSON
+        values = self.values.astype(object)
+        values[self.is_null] = None
+        return values.tolist()
+
+
+class ColumnarRelation:
+    """Columns of a relation or of an intermediate result, in order, as their names may repeat"""
+
+    def __init__(self, column_names: Tuple[str, ...], columns: List[Column], number_of_rows: int):
+        self.column_names = column_names
+        self.columns = columns
+        self.number_of_rows = number_of_rows
+
+    def __len__(self):
+        return self.number_of_rows
+
+    def get_position(self, column_name: str) -> int:
+        """Position of a column referred to by name, which postgres would refuse to resolve unless it is unique"""
+        positions = [position for position, name in enumerate(self.column_names) if name == column_name]
+        if len(positions) != 1:
+            raise Exception("Column {column_name} is {problem}".format(
+                column_name=column_name, problem="ambiguous" if positions else "missing"))
+        return positions[0]
+
+    def take(self, indices: numpy.ndarray, allow_fill: bool = False) -> "ColumnarRelation":
+        return ColumnarRelation(self.column_names, [column.take(indices, allow_fill) for column in self.columns],
+                                len(indices))
+
+    def to_rows(self) -> List[tuple]:
+        return list(zip(*[column.to_list() for column in self.columns]))
+
+
+class Truth:
+    """Outcome of a condition for every row, which is NULL where postgres would find the condition NULL"""
+
+    def __init__(self, values: numpy.ndarray, is_null: numpy.ndarray):
+        self.values = values
+        self.is_null = is_null
+
+    def is_true(self) -> numpy.ndarray:
+        return self.values & ~self.is_null
+
+    def is_false(self) -> numpy.ndarray:
+        return ~self.values & ~self.is_null
+
+    def __invert__(self) -> "Truth":
+        return Truth(~self.values, self.is_null)
+
+    def __and__(self, other: "Truth") -> "Truth":
+        # False wins over NULL
+        is_null = (self.is_null | other.is_null) & ~(self.is_false() | other.is_false())
+        return Truth(self.is_true() & other.is_true(), is_null)
+
+    def __or__(self, other: "Truth") -> "Truth":
+        # True wins over NULL
+        values = self.is_true() | other.is_true()
+        return Truth(values, (self.is_null | other.is_null) & ~values)
+
+
+class ColumnarEngine:
+    """
+    Evaluates the operator tree of a RA query on the columns of its relations in memory, rather than having
+    postgres plan and execute its SQL, for queries of relations of up to the maximum number of rows in total. Every
+    relation is read once and kept as numpy arrays until it changes, which the generation of the catalog and the
+    version of the relation in the result cache tell. Selections are evaluated as vectorised masks, joins and anti
+    joins as hash joins, and duplicates are removed by hashing whole rows. Anything whose semantics could differ from
+    postgres, such as ordering strings by collation or an error postgres would report, is left to postgres, as is a
+    result with more rows than an unconfirmed query is executed with. An evaluation running longer than the timeout
+    of the request is reported as postgres reports it.
+    """
+
+    def __init__(self, max_rows: int = COLUMNAR_ENGINE_MAX_ROWS):
+        self.max_rows = max_rows
+        # Relation by its name, alongside the version it has been read at; None for a relation which is too large
+        self.relation_to_entry: Dict[str, Tuple[tuple, Optional[ColumnarRelation]]] = dict()
+        self.lock = threading.Lock()
+        self.executions = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.reads = 0
+
+    def is_enabled(self) -> bool:
+        return self.max_rows > 0
+
+    def execute(self, parsed_postfix_tokens: List[Token], query: Query,
+                result_format: ResultFormat = ResultFormat.OBJECTS, timeout: int = STATEMENT_TIMEOUT_MS,
+                is_confirmed: bool = False) -> Optional[Output]:
+        """Returns the output of the query, or None when it is to be executed by postgres instead"""
+        if not self.is_enabled() or not query.is_dql or not parsed_postfix_tokens:
+            return None
+        deadline = time.monotonic() + timeout / 1000
+        result = None
+        is_timed_out = False
+        try:
+            relation_to_columnar_relation = self.get_relations(query.relation_names)
+            if relation_to_columnar_relation is not None:
+                result = evaluate(parsed_postfix_tokens, relation_to_columnar_relation, self.max_rows, deadline)
+        except Exception as exception:
+            logger.debug("Leaving the query to postgres; {exception}".format(exception=exception))
+            # The time of the request has been spent, hence the query is not executed by postgres once more
+            is_timed_out = time.monotonic() > deadline
+        if result is not None and not is_confirmed and is_result_above_threshold(len(result)):
+            # Postgres asks for the confirmation as it checks the query before executing it
+            result = None
+        with self.lock:
+            if is_timed_out:
+                self.timeouts += 1
+                return get_timeout_output(query)
+            if result is None:
+                self.fallbacks += 1
+                return None
+            self.executions += 1
+        return Output(HTTPStatus.OK,
+                      query,
+                      result=format_result(list(result.column_names), result.to_rows(), result_format))
+
+    def get_relations(self, relation_names) -> Optional[Dict[str, ColumnarRelation]]:
+        """The relations by their names, or None unless all of them fit within the maximum number of rows"""
+        relation_to_columnar_relation = dict()
+        number_of_rows = 0
+        for relation_name in relation_names:
+            columnar_relation = self.get_relation(relation_name)
+            if columnar_relation is None:
+                return None
+            number_of_rows += len(columnar_relation)
+            if number_of_rows > self.max_rows:
+                return None
+            relation_to_columnar_relation[relation_name] = columnar_relation
+        return relation_to_columnar_relation
+
+    def get_relation(self, relation_name: str) -> Optional[ColumnarRelation]:
+        if not CATALOG.is_relation(relation_name):
+            return None
+        # Taken before the relation is read, so that a change while reading it has it read once more
+        version = (connections["default"].settings_dict["NAME"], CATALOG.generation,
+                   RESULT_CACHE.get_version(relation_name))
+        with self.lock:
+            entry = self.relation_to_entry.get(relation_name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        columnar_relation = read_relation(relation_name, self.max_rows)
+        with self.lock:
+            self.reads += 1
+            # Relations which have been dropped since are let go of
+            for stale_relation_name in [name for name in self.relation_to_entry if not CATALOG.is_relation(name)]:
+                del self.relation_to_entry[stale_relation_name]
+            self.relation_to_entry[relation_name] = (version, columnar_relation)
+        return columnar_relation
+
+    def clear(self):
+        with self.lock:
+            self.relation_to_entry.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            columnar_relations = [relation for _, relation in self.relation_to_entry.values() if relation is not None]
+            return {"relations": len(columnar_relations),
+                    "rows": sum(len(relation) for relation in columnar_relations),
+                    "maxRows": self.max_rows,
+                    "executions": self.executions,
+                    "fallbacks": self.fallbacks,
+                    "timeouts": self.timeouts,
+                    "reads": self.reads}
+
+
+def read_relation(relation_name: str, max_rows: int) -> Optional[ColumnarRelation]:
+    """Reads the relation into columns, unless it has more rows than the maximum or a column of another type"""
+    with connection.cursor() as cursor:
+        cursor.execute(RELATION_QUERY.format(table_name=quote_identifier(relation_name)), [max_rows + 1])
+        rows = cursor.fetchall()
+        description = cursor.description
+    dtypes = [TYPE_OID_TO_DTYPE.get(column.type_code) for column in description]
+    if len(rows) > max_rows or None in dtypes:
+        return None
+    columns = zip(*rows) if rows else [()] * len(description)
+    return ColumnarRelation(tuple(column.name for column in description),
+                            [Column.from_values(values, dtype) for values, dtype in zip(columns, dtypes)], len(rows))
+
+
+def evaluate(parsed_postfix_tokens: List[Token], relation_to_columnar_relation: Dict[str, ColumnarRelation],
+             max_rows: int, deadline: float) -> ColumnarRelation:
+    """
+    Evaluates the operator tree in a single pass in postfix order, which evaluates the children of an operator
+    before the operator, holding on to the result of a token until its parent has been evaluated. The deadline is
+    checked between operators.
+    """
+    token_to_result: Dict[int, ColumnarRelation] = dict()
+    result = None
+    for token in parsed_postfix_tokens:
+        if time.monotonic() > deadline:
+            raise Exception("Evaluation ran longer than the statement timeout")
+        if token.type == TokenType.IDENT:
+            result = relation_to_columnar_relation[token.value]
+        elif is_unary_operator(token.type):
+            result = evaluate_unary_operator(token, token_to_result.pop(id(token.right_child_token)))
+        else:
+            left = token_to_result.pop(id(token.left_child_token))
+            right = token_to_result.pop(id(token.right_child_token))
+            result = evaluate_binary_operator(token, left, right, max_rows)
+        token_to_result[id(token)] = result
+    return result
+
+
+def evaluate_unary_operator(token: Token, relation: ColumnarRelation) -> ColumnarRelation:
+    if token.type == TokenType.SELECT:
+        return select(relation, str(token.attributes))
+    if token.type == TokenType.PROJECTION:
+        return project(relation, token.attributes.get_column_names(), token.is_distinct)
+    raise Exception("Operator {operator} is not supported".format(operator=token.value))
+
+
+def evaluate_binary_operator(token: Token, left: ColumnarRelation, right: ColumnarRelation,
+                             max_rows: int) -> ColumnarRelation:
+    token_type = token.type
+    left_child_token, right_child_token = token.left_child_token, token.right_child_token
+    if token_type in FROM_CLAUSE_TOKEN_TYPES and left_child_token.type == right_child_token.type == TokenType.IDENT \
+            and left_child_token.value == right_child_token.value:
+        # Postgres refuses a from clause which names a relation twice, as in a join of a relation with itself
+        raise Exception("Relation {relation_name} is specified more than once".format(
+            relation_name=left_child_token.value))
+    if token_type in SET_OPERATOR_TOKEN_TYPES:
+        return combine(left, right, token_type)
+    if token_type == TokenType.CARTESIAN:
+        return multiply(left, right, max_rows)
+    if token_type == TokenType.ANTI_JOIN and not token.attributes:
+        return anti_join(left, right)
+    if token_type == TokenType.NATURAL_JOIN:
+        result = join(left, right, JOIN_TOKEN_TYPE_TO_HOW[token_type], max_rows)
+        # Conditions of a natural join filter its result
+        return select(result, str(token.attributes)) if token.attributes else result
+    if token_type in JOIN_TOKEN_TYPE_TO_HOW and not token.attributes:
+        return join(left, right, JOIN_TOKEN_TYPE_TO_HOW[token_type], max_rows)
+    raise Exception("Operator {operator} is not supported".format(operator=token.value))
+
+
+def check_size(number_of_rows: int, max_rows: int):
+    if number_of_rows > max_rows:
+        raise Exception("Intermediate result of {number_of_rows} rows exceeds {max_rows} rows"
+                        .format(number_of_rows=number_of_rows, max_rows=max_rows))
+
+
+def select(relation: ColumnarRelation, conditions: str) -> ColumnarRelation:
+    # A condition which is NULL does not hold, as in a where clause
+    return relation.take(numpy.flatnonzero(ConditionEvaluator(relation, conditions).evaluate().is_true()))
+
+
+def project(relation: ColumnarRelation, column_names: List[str], is_distinct: bool) -> ColumnarRelation:
+    columns = [relation.columns[relation.get_position(column_name)] for column_name in column_names]
+    result = ColumnarRelation(tuple(column_names), columns, len(relation))
+    return distinct(result) if is_distinct else result
+
+
+def distinct(relation: ColumnarRelation) -> ColumnarRelation:
+    """Keeps the first of the rows sharing a code, where NULL equals NULL, as for select distinct"""
+    _, first_indices = numpy.unique(get_row_codes(relation.columns, len(relation)), return_index=True)
+    return relation.take(numpy.sort(first_indices))
+
+
+def multiply(left: ColumnarRelation, right: ColumnarRelation, max_rows: int) -> ColumnarRelation:
+    check_size(len(left) * len(right), max_rows)
+    left_indices = numpy.repeat(numpy.arange(len(left)), len(right))
+    right_indices = numpy.tile(numpy.arange(len(right)), len(left))
+    return ColumnarRelation(left.column_names + right.column_names,
+                            left.take(left_indices).columns + right.take(right_indices).columns, len(left_indices))
+
+
+def join(left: ColumnarRelation, right: ColumnarRelation, how: str, max_rows: int) -> ColumnarRelation:
+    """
+    Natural join of both relations as a hash join on their common columns. A row with NULL in a common column
+    matches no row, hence it only makes it into the result of an outer join, unmatched. Postgres merges the common
+    columns of both sides into one, which holds the value of whichever side the row has.
+    """
+    common_column_names = get_common_column_names(left.column_names, right.column_names)
+    if not common_column_names:
+        if how != "inner":
+            raise Exception("Outer join without common columns is not supported")
+        return multiply(left, right, max_rows)
+    left_keys, right_keys = get_keys(left, right, common_column_names)
+    left_codes, right_codes = get_key_codes(left_keys, right_keys)
+    left_indices, right_indices = match(left_codes, right_codes, how, max_rows)
+    common_columns = [coalesce(left_key.take(left_indices, allow_fill=True),
+                               right_key.take(right_indices, allow_fill=True))
+                      for left_key, right_key in zip(left_keys, right_keys)]
+    return get_natural_join_result(left.take(left_indices, allow_fill=True),
+                                   right.take(right_indices, allow_fill=True), common_column_names, common_columns)
+
+
+def anti_join(left: ColumnarRelation, right: ColumnarRelation) -> ColumnarRelation:
+    """
+    Rows of the left relation whose common columns match no row of the right one, found by hashing. As it is formed
+    as a natural left join, the columns of the right relation come last, all NULL.
+    """
+    common_column_names = get_common_column_names(left.column_names, right.column_names)
+    if not common_column_names:
+        raise Exception("Anti join without common columns is not supported")
+    left_keys, right_keys = get_keys(left, right, common_column_names)
+    left_codes, right_codes = get_key_codes(left_keys, right_keys)
+    number_of_codes = max(left_codes.max(initial=-1), right_codes.max(initial=-1)) + 1
+    left_indices = numpy.flatnonzero(count_codes(right_codes, number_of_codes)[left_codes] == 0)
+    right_indices = numpy.full(len(left_indices), -1)
+    return get_natural_join_result(left.take(left_indices), right.take(right_indices, allow_fill=True),
+                                   common_column_names, [left_key.take(left_indices) for left_key in left_keys])
+
+
+def combine(left: ColumnarRelation, right: ColumnarRelation, token_type: TokenType) -> ColumnarRelation:
+    """
+    Union, intersection or difference of both relations, which are matched by the positions of their columns and
+    leave no duplicates, as postgres has them without all. The rows of both are coded alike, so that a row is in
+    the other relation when its code is.
+    """
+    if len(left.column_names) != len(right.column_names):
+        raise Exception("Relations of a set operation differ in their number of columns")
+    columns = [Column.concatenate(align_columns(left_column, right_column))
+               for left_column, right_column in zip(left.columns, right.columns)]
+    rows = ColumnarRelation(left.column_names, columns, len(left) + len(right))
+    codes = get_row_codes(columns, len(rows))
+    if token_type == TokenType.UNION:
+        _, first_indices = numpy.unique(codes, return_index=True)
+        return rows.take(numpy.sort(first_indices))
+    left_codes, right_codes = codes[:len(left)], codes[len(left):]
+    _, first_indices = numpy.unique(left_codes, return_index=True)
+    first_indices = numpy.sort(first_indices)
+    is_in_right = numpy.isin(left_codes[first_indices], right_codes)
+    return rows.take(first_indices[is_in_right if token_type == TokenType.INTERSECTION else ~is_in_right])
+
+
+def get_keys(left: ColumnarRelation, right: ColumnarRelation, common_column_names: Tuple[str, ...]) -> tuple:
+    """The common columns of both relations, converted to a common type"""
+    keys = [align_columns(left.columns[left.get_position(column_name)],
+                          right.columns[right.get_position(column_name)]) for column_name in common_column_names]
+    return [left_key for left_key, _ in keys], [right_key for _, right_key in keys]
+
+
+def get_key_codes(left_keys: List[Column], right_keys: List[Column]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Codes the keys of the rows of both sides alike; a key with NULL in it matches no key, hence it is coded -1"""
+    keys = [Column.concatenate([left_key, right_key]) for left_key, right_key in zip(left_keys, right_keys)]
+    codes = get_row_codes(keys, len(keys[0].values))
+    codes[numpy.logical_or.reduce([key.is_null for key in keys])] = -1
+    number_of_left_rows = len(left_keys[0].values)
+    return codes[:number_of_left_rows], codes[number_of_left_rows:]
+
+
+def get_row_codes(columns: List[Column], number_of_rows: int) -> numpy.ndarray:
+    """
+    Numbers the distinct rows of the columns, where NULL is a value of its own, by hashing the codes of one column
+    after another alongside the codes of the columns before, which keeps the codes dense
+    """
+    row_codes = numpy.zeros(number_of_rows, dtype=numpy.int64)
+    for position, column in enumerate(columns):
+        codes, number_of_codes = column.get_codes()
+        row_codes = codes if position == 0 else pandas.factorize(row_codes * number_of_codes + codes)[0]
+    return row_codes
+
+
+def count_codes(codes: numpy.ndarray, number_of_codes: int) -> numpy.ndarray:
+    """Rows per code, with a last count of 0 which a code of -1 looks up"""
+    return numpy.bincount(codes[codes >= 0], minlength=number_of_codes + 1)
+
+
+def match(left_codes: numpy.ndarray, right_codes: numpy.ndarray, how: str,
+          max_rows: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Pairs the rows of both sides with equal codes: the right rows are grouped by their code through a stable sort,
+    and every left row is paired with every row of the group of its code, hence the size of the result is known
+    before it is formed. Returns the indices of the paired rows, with -1 for the side an unmatched row of an outer
+    join lacks.
+    """
+    number_of_codes = max(left_codes.max(initial=-1), right_codes.max(initial=-1)) + 1
+    right_order = numpy.argsort(right_codes, kind="stable")
+    right_counts = count_codes(right_codes, number_of_codes)
+    # Rows coded -1 are sorted first
+    right_starts = numpy.cumsum(right_counts) - right_counts + numpy.count_nonzero(right_codes < 0)
+    match_counts = right_counts[left_codes]
+    number_of_matches = int(match_counts.sum())
+    left_unmatched_indices = numpy.flatnonzero(match_counts == 0) if how in ("left", "full") else \
+        numpy.empty(0, dtype=numpy.int64)
+    right_unmatched_indices = numpy.flatnonzero(count_codes(left_codes, number_of_codes)[right_codes] == 0) \
+        if how in ("right", "full") else numpy.empty(0, dtype=numpy.int64)
+    check_size(number_of_matches + len(left_unmatched_indices) + len(right_unmatched_indices), max_rows)
+
+    left_indices = numpy.repeat(numpy.arange(len(left_codes)), match_counts)
+    # Position of every pair within the group of its left row
+    offsets = numpy.arange(number_of_matches) - numpy.repeat(numpy.cumsum(match_counts) - match_counts, match_counts)
+    right_indices = right_order[numpy.repeat(right_starts[left_codes], match_counts) + offsets]
+    return (numpy.concatenate((left_indices, left_unmatched_indices, numpy.full(len(right_unmatched_indices), -1))),
+            numpy.concatenate((right_indices, numpy.full(len(left_unmatched_indices), -1), right_unmatched_indices)))
+
+
+def get_natural_join_result(left: ColumnarRelation, right: ColumnarRelation, common_column_names: Tuple[str, ...],
+                            common_columns: List[Column]) -> ColumnarRelation:
+    """Postgres outputs the common columns first, followed by the remaining columns of the left and right side"""
+    left_rest = [position for position, name in enumerate(left.column_names) if name not in common_column_names]
+    right_rest = [position for position, name in enumerate(right.column_names) if name not in common_column_names]
+    return ColumnarRelation(common_column_names + tuple(left.column_names[position] for position in left_rest) +
+                            tuple(right.column_names[position] for position in right_rest),
+                            common_columns + [left.columns[position] for position in left_rest] +
+                            [right.columns[position] for position in right_rest], len(left))
+
+
+def align_columns(left_column: Column, right_column: Column) -> Tuple[Column, Column]:
+    """Converts columns of different numeric types into double precision, as postgres would"""
+    if left_column.kind == right_column.kind:
+        return left_column, right_column
+    if left_column.kind in NUMERIC_KINDS and right_column.kind in NUMERIC_KINDS:
+        return left_column.astype(numpy.float64), right_column.astype(numpy.float64)
+    raise Exception("Columns of types {left_type} and {right_type} cannot be matched"
+                    .format(left_type=left_column.values.dtype, right_type=right_column.values.dtype))
+
+
+def coalesce(column: Column, other_column: Column) -> Column:
+    return Column(numpy.where(column.is_null, other_column.values, column.values),
+                  column.is_null & other_column.is_null)
+
+
+class ConditionEvaluator:
+    """
+    Evaluates the conditions of a selection on all rows of a relation at once: not binds tighter than and, which
+    binds tighter than or. Comparisons follow the types of postgres, of which a string literal takes the type of
+    what it is compared with.
+    """
+
+    def __init__(self, relation: ColumnarRelation, conditions: str):
+        self.relation = relation
+        self.conditions = conditions
+        self.tokens = tokenize_conditions(conditions)
+        self.index = 0
+
+    def evaluate(self) -> Truth:
+        truth = self.evaluate_or()
+        if self.index != len(self.tokens):
+            raise self.get_exception()
+        return truth
+
+    def evaluate_or(self) -> Truth:
+        truth = self.evaluate_and()
+        while self.accept("word", "or"):
+            truth = truth | self.evaluate_and()
+        return truth
+
+    def evaluate_and(self) -> Truth:
+        truth = self.evaluate_not()
+        while self.accept("word", "and"):
+            truth = truth & self.evaluate_not()
+        return truth
+
+    def evaluate_not(self) -> Truth:
+        if self.accept("word", "not"):
+            return ~self.evaluate_not()
+        if self.accept("parenthesis", "("):
+            truth = self.evaluate_or()
+            if not self.accept("parenthesis", ")"):
+                raise self.get_exception()
+            return truth
+        return self.evaluate_comparison()
+
+    def evaluate_comparison(self) -> Truth:
+        left_operand = self.read_operand()
+        if self.index == len(self.tokens) or self.tokens[self.index][0] != "operator":
+            raise self.get_exception()
+        comparative_operator = self.tokens[self.index][1]
+        self.index += 1
+        right_operand = self.read_operand()
+        return compare(left_operand, comparative_operator, right_operand, len(self.relation))
+
+    def read_operand(self):
+        """A column, or a literal as its type alongside its value"""
+        if self.index == len(self.tokens):
+            raise self.get_exception()
+        token_kind, value = self.tokens[self.index]
+        self.index += 1
+        if token_kind == "string":
+            return "unknown", value.replace("''", "'")
+        if token_kind == "number":
+            number, _ = get_numeric_parameter(value.lstrip("-"))
+            if not isinstance(number, (int, float)):
+                raise Exception("Literal {value} does not fit a double".format(value=value))
+            return "number", -number if value.startswith("-") else number
+        if token_kind == "word":
+            keyword = value.lower()
+            if keyword in ("true", "false"):
+                return "boolean", keyword == "true"
+            if keyword == "null":
+                return "null", None
+            return self.relation.columns[self.relation.get_position(value)]
+        raise self.get_exception()
+
+    def accept(self, token_kind: str, value: str) -> bool:
+        if self.index < len(self.tokens) and self.tokens[self.index][0] == token_kind and \
+                self.tokens[self.index][1].lower() == value:
+            self.index += 1
+            return True
+        return False
+
+    def get_exception(self) -> Exception:
+        return Exception("Conditions {conditions} are not supported".format(conditions=self.conditions))
+
+
+def tokenize_conditions(conditions: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    conditions = conditions.rstrip()
+    while position < len(conditions):
+        match = CONDITION_TOKEN_PATTERN.match(conditions, position)
+        if match is None:
+            raise Exception("Conditions {conditions} are not supported".format(conditions=conditions))
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+def compare(left_operand, comparative_operator: str, right_operand, number_of_rows: int) -> Truth:
+    if not isinstance(left_operand, Column) and not isinstance(right_operand, Column):
+        raise Exception("Comparing literals is not supported")
+    if not isinstance(left_operand, Column) and left_operand[0] == "null" or \
+            not isinstance(right_operand, Column) and right_operand[0] == "null":
+        return Truth(numpy.zeros(number_of_rows, dtype=bool), numpy.ones(number_of_rows, dtype=bool))
+    column = left_operand if isinstance(left_operand, Column) else right_operand
+    # Postgres orders strings by its collation
+    if column.kind == STRING_KIND and comparative_operator not in EQUALITY_OPERATORS:
+        raise Exception("Ordering strings is not supported")
+    left_values, left_is_null = get_operand_values(left_operand, column)
+    right_values, right_is_null = get_operand_values(right_operand, column)
+    values = COMPARATIVE_OPERATOR_TO_FUNCTION[comparative_operator](left_values, right_values)
+    return Truth(numpy.asarray(values, dtype=bool), left_is_null | right_is_null)
+
+
+def get_operand_values(operand, column: Column) -> tuple:
+    if not isinstance(operand, Column):
+        literal_type, value = operand
+        return convert_literal(literal_type, value, column.kind), False
+    if operand.kind != column.kind and not (operand.kind in NUMERIC_KINDS and column.kind in NUMERIC_KINDS):
+        raise Exception("Columns of types {left_type} and {right_type} cannot be compared"
+                        .format(left_type=operand.values.dtype, right_type=column.values.dtype))
+    return operand.values, operand.is_null
+
+
+def convert_literal(literal_type: str, value, column_kind: str):
+    """Converts a literal into the type of the column it is compared with, as postgres would or fails to"""
+    if column_kind in NUMERIC_KINDS and literal_type == "number":
+        return value
+    if column_kind == "i" and literal_type == "unknown":
+        number = int(value)
+        if not MIN_BIGINT <= number <= MAX_BIGINT:
+            raise Exception("Literal {value} is out of range for bigint".format(value=value))
+        return number
+    if column_kind == "f" and literal_type == "unknown":
+        number = float(value)
+        # Postgres orders NaN above every number, unlike numpy
+        if number != number:
+            raise Exception("Comparing with NaN is not supported")
+        return number
+    if column_kind == STRING_KIND and literal_type == "unknown":
+        return value
+    if column_kind == "b" and literal_type == "boolean":
+        return value
+    if column_kind == "b" and literal_type == "unknown" and value.strip().lower() in TRUE_STRINGS + FALSE_STRINGS:
+        return value.strip().lower() in TRUE_STRINGS
+    raise Exception("Literal {value} cannot be compared with a column of type {column_kind}"
+                    .format(value=value, column_kind=column_kind))
+
+
+def execute_ra_query_in_memory(ra_query: str, query: Query, result_format: ResultFormat = ResultFormat.OBJECTS,
+                               timeout: int = STATEMENT_TIMEOUT_MS, is_confirmed: bool = False) -> Optional[Output]:
+    """Evaluates the RA query in memory if it qualifies, returning None when it is to be executed by postgres"""
+    if not COLUMNAR_ENGINE.is_enabled() or not query.is_dql:
+        return None
+    return COLUMNAR_ENGINE.execute(COMPILE_CACHE.get_operator_tree(ra_query), query, result_format, timeout,
+                                   is_confirmed)
+
+
+COLUMNAR_ENGINE = ColumnarEngine()
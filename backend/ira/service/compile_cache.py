@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from backend.settings import COMPILE_CACHE_MAX_ENTRIES, COMPILE_CACHE_DIRECTORY, RA_OPTIMISER_ENABLED
+from ira.model.query import Query
+from ira.model.token import Token
+from ira.service.lexer import Lexer
+from ira.service.optimiser import optimise
+from ira.service.parser import Parser
+from ira.service.catalog import CATALOG
+from ira.service.dialect import POSTGRES_DIALECT, SQLITE_DIALECT, Dialect
+from ira.service.transformer import transform
+from ira.service.util import make_private_directory
+from ira.service.xml_convertor import convert_tokenized_ra_to_xml
+
+DISK_ENTRY_SUFFIX = ".pickle"
+
+
+class CompiledRaQuery:
+    """Artifacts compiled from a single RA query; each one is filled lazily on first use"""
+
+    def __init__(self, catalog_fingerprint: str, is_optimised: bool):
+        self.catalog_fingerprint = catalog_fingerprint
+        self.is_optimised = is_optimised
+        self.query: Optional[Query] = None
+        self.xml_tree: Optional[str] = None
+        # Tokens of the operator tree in postfix order, for evaluating the query in memory
+        self.operator_tree: Optional[List[Token]] = None
+        # The query formed in the dialect of SQLite, for the embedded SQLite backend
+        self.sqlite_query: Optional[Query] = None
+
+    def __getstate__(self):
+        # The operator tree is compiled again rather than kept on disk, as pickling a deeply nested tree could exceed
+        # the recursion limit
+        state = dict(self.__dict__)
+        state["operator_tree"] = None
+        return state
+
+
+class CompileCache:
+    """
+    Bounded LRU cache from a whitespace normalised RA query to its compiled artifacts.
+    An optional on-disk tier keeps the artifacts across restarts. Every entry is tied to the
+    fingerprint of the catalog it was compiled against, so that a schema change invalidates it.
+    """
+
+    def __init__(self, max_entries: int, directory: Optional[str] = None, is_optimiser_enabled: bool = True):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.is_optimiser_enabled = is_optimiser_enabled
+        self.entries = OrderedDict()
+        self.fingerprint_to_key = dict()
+        self.catalog_fingerprint = get_catalog_fingerprint()
+        self.lock = threading.Lock()
+        self.lexer = Lexer()
+        self.parser = Parser()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if directory and not make_private_directory(directory):
+            logging.error("Disabling the disk tier of the compile cache, as directory {directory} is not private to "
+                          "the current user".format(directory=directory))
+            self.directory = None
+
+    def get_query(self, ra_query: str) -> Query:
+        return self._get_artifact(ra_query, "query", self._compile_query)
+
+    def get_xml_tree(self, ra_query: str) -> str:
+        return self._get_artifact(ra_query, "xml_tree", self._compile_xml_tree)
+
+    def get_operator_tree(self, ra_query: str) -> List[Token]:
+        return self._get_artifact(ra_query, "operator_tree", self._compile_operator_tree)
+
+    def get_sqlite_query(self, ra_query: str) -> Query:
+        return self._get_artifact(ra_query, "sqlite_query", self._compile_sqlite_query)
+
+    def get_query_by_fingerprint(self, fingerprint: str) -> Optional[Query]:
+        """Looks up an already compiled query by the fingerprint of its SQL, without compiling anything"""
+        with self.lock:
+            self._invalidate_if_catalog_changed()
+            key = self.fingerprint_to_key.get(fingerprint)
+            entry = self._lookup_entry(key) if key is not None else None
+            if entry is None or entry.query is None or entry.query.fingerprint != fingerprint:
+                return None
+            self.hits += 1
+            return entry.query
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.fingerprint_to_key.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"size": len(self.entries),
+                    "maxEntries": self.max_entries,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "diskHits": self.disk_hits,
+                    "evictions": self.evictions,
+                    "invalidations": self.invalidations,
+                    "diskTierEnabled": bool(self.directory)}
+
+    def _get_artifact(self, ra_query: str, artifact_name: str, compile_artifact: Callable):
+        key = normalise_ra_query(ra_query)
+        with self.lock:
+            self._invalidate_if_catalog_changed()
+            entry = self._lookup_entry(key)
+            # Entries kept on disk by an older version may lack the newer artifacts
+            artifact = getattr(entry, artifact_name, None) if entry is not None else None
+            if artifact is not None:
+                self.hits += 1
+                return artifact
+            self.misses += 1
+            catalog_fingerprint = self.catalog_fingerprint
+
+        # Compilation happens outside of the lock, so that a slow compilation does not block other requests
+        artifact = compile_artifact(key)
+
+        with self.lock:
+            if catalog_fingerprint == self.catalog_fingerprint:
+                entry = self._lookup_entry(key)
+                if entry is None:
+                    entry = CompiledRaQuery(catalog_fingerprint, self.is_optimiser_enabled)
+                    self._add_entry(key, entry)
+                setattr(entry, artifact_name, artifact)
+                self._index_fingerprint(key, entry)
+                self._write_to_disk(key, entry)
+        return artifact
+
+    def _lookup_entry(self, key: str) -> Optional[CompiledRaQuery]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        entry = self._read_from_disk(key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._add_entry(key, entry)
+            self._index_fingerprint(key, entry)
+        return entry
+
+    def _add_entry(self, key: str, entry: CompiledRaQuery):
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            evicted_key, evicted_entry = self.entries.popitem(last=False)
+            if evicted_entry.query is not None and \
+                    self.fingerprint_to_key.get(evicted_entry.query.fingerprint) == evicted_key:
+                del self.fingerprint_to_key[evicted_entry.query.fingerprint]
+            self.evictions += 1
+
+    def _index_fingerprint(self, key: str, entry: CompiledRaQuery):
+        if entry.query is not None:
+            self.fingerprint_to_key[entry.query.fingerprint] = key
+
+    def _invalidate_if_catalog_changed(self):
+        catalog_fingerprint = get_catalog_fingerprint()
+        if catalog_fingerprint != self.catalog_fingerprint:
+            self.catalog_fingerprint = catalog_fingerprint
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.fingerprint_to_key.clear()
+
+    def compile_operator_tree(self, ra_query: str, dialect: Dialect = POSTGRES_DIALECT) -> Tuple[List[Token], Query]:
+        """
+        Compiles the RA query the way it is cached, returning the tokens of the operator tree its SQL was formed
+        from alongside it, in the dialect of postgres unless given otherwise
+        """
+        tokens = self.lexer.tokenize(ra_query)
+        parsed_postfix_tokens = self.parser.parse(tokens)
+        if self.is_optimiser_enabled:
+            parsed_postfix_tokens = optimise(parsed_postfix_tokens)
+        return parsed_postfix_tokens, transform(parsed_postfix_tokens, dialect)
+
+    def _compile_query(self, ra_query: str) -> Query:
+        return self.compile_operator_tree(ra_query)[1]
+
+    def _compile_operator_tree(self, ra_query: str) -> List[Token]:
+        return self.compile_operator_tree(ra_query)[0]
+
+    def _compile_sqlite_query(self, ra_query: str) -> Query:
+        return self.compile_operator_tree(ra_query, SQLITE_DIALECT)[1]
+
+    def _compile_xml_tree(self, ra_query: str) -> str:
+        tokens = self.lexer.tokenize(ra_query)
+        return convert_tokenized_ra_to_xml(tokens).get_tree()
+
+    def _get_disk_path(self, key: str) -> str:
+        file_name = hashlib.sha256(key.encode()).hexdigest() + DISK_ENTRY_SUFFIX
+        return os.path.join(self.directory, file_name)
+
+    def _read_from_disk(self, key: str) -> Optional[CompiledRaQuery]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._get_disk_path(key), "rb") as file:
+                stored_key, entry = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as exception:
+            logging.warning("Ignoring unreadable compile cache entry; {exception}".format(exception=exception))
+            return None
+        if stored_key != key or entry.catalog_fingerprint != self.catalog_fingerprint or \
+                entry.is_optimised != self.is_optimiser_enabled:
+            return None
+        return entry
+
+    def _write_to_disk(self, key: str, entry: CompiledRaQuery):
+        if not self.directory:
+            return
+        disk_path = self._get_disk_path(key)
+        # Of the thread, as threads of a process may compile the same query at once
+        temporary_path = "{disk_path}.{pid}.{thread_id}.tmp".format(disk_path=disk_path, pid=os.getpid(),
+                                                                    thread_id=threading.get_ident())
+        try:
+            with open(temporary_path, "wb") as file:
+                pickle.dump((key, entry), file)
+            # Atomic, so that concurrent workers never observe a partially written entry
+            os.replace(temporary_path, disk_path)
+        except OSError as exception:
+            logging.warning("Could not persist compile cache entry; {exception}".format(exception=exception))
+
+
+def normalise_ra_query(ra_query: str) -> str:
+    """Runs of whitespace only ever separate tokens, hence they are collapsed into a single space"""
+    return " ".join(ra_query.split())
+
+
+def get_catalog_fingerprint() -> str:
+    return CATALOG.get_fingerprint()
+
+
+COMPILE_CACHE = CompileCache(COMPILE_CACHE_MAX_ENTRIES, COMPILE_CACHE_DIRECTORY, RA_OPTIMISER_ENABLED)
@@ -0,0 +1,263 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN, connection as Connection
+
+from backend.settings import DATABASE_POOL_HEALTH_CHECK_INTERVAL, DATABASE_POOL_MAX_IDLE, \
+    DATABASE_POOL_MAX_LIFETIME, DATABASE_POOL_MAX_SIZE, DATABASE_POOL_MIN_SIZE, DATABASE_POOL_WAIT_TIMEOUT
+
+HEALTH_CHECK_QUERY = "select 1"
+
+
+class ConnectionPool:
+    """
+    Keeps connections to postgres open across requests, as opening one costs more than running a small query.
+    A connection is checked out for a request and returned at its end; it is closed instead once it has outlived
+    its maximum lifetime, or when it is broken. A connection which has been idle for a while is checked before it
+    is handed out, and idle connections beyond the minimum size are closed after the maximum idle time. Once the
+    maximum size is reached, checking out waits for a connection to be returned.
+    """
+
+    def __init__(self, connect: Callable[[], Connection], min_size: int = DATABASE_POOL_MIN_SIZE,
+                 max_size: int = DATABASE_POOL_MAX_SIZE, max_lifetime: float = DATABASE_POOL_MAX_LIFETIME,
+                 max_idle: float = DATABASE_POOL_MAX_IDLE,
+                 health_check_interval: float = DATABASE_POOL_HEALTH_CHECK_INTERVAL,
+                 wait_timeout: float = DATABASE_POOL_WAIT_TIMEOUT):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.wait_timeout = wait_timeout
+        self.condition = threading.Condition()
+        # Connections paired with the time they were returned at; the most recently returned one is handed out first,
+        # which lets the others idle out when the load drops
+        self.idle_connections = deque()
+        self.opened_at: Dict[Connection, float] = dict()
+        # Includes the connections being opened
+        self.size = 0
+        self.opened = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def get_connection(self) -> Connection:
+        while True:
+            connection, returned_at = self._check_out()
+            if connection is None:
+                return self._open_connection()
+            if time.monotonic() - returned_at < self.health_check_interval or is_healthy(connection):
+                return connection
+            self._discard(connection)
+
+    def put_connection(self, connection: Connection):
+        is_reusable = reset(connection)
+        now = time.monotonic()
+        with self.condition:
+            if is_reusable and now - self.opened_at[connection] < self.max_lifetime:
+                self.idle_connections.append((connection, now))
+                self.condition.notify()
+                expired_connections = self._pop_expired_idle_connections(now)
+            else:
+                self._forget(connection)
+                expired_connections = [connection]
+        close_connections(expired_connections)
+
+    @contextmanager
+    def borrow_connection(self):
+        connection = self.get_connection()
+        try:
+            yield connection
+        finally:
+            self.put_connection(connection)
+
+    def fill(self):
+        """Opens connections up to the minimum size"""
+        while True:
+            with self.condition:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            self.put_connection(self._open_connection())
+
+    def close(self):
+        """Closes the idle connections; connections in use are pooled again once returned"""
+        with self.condition:
+            idle_connections = [connection for connection, _ in self.idle_connections]
+            self.idle_connections.clear()
+            for connection in idle_connections:
+                self._forget(connection)
+        close_connections(idle_connections)
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            return {"size": self.size,
+                    "idle": len(self.idle_connections),
+                    "inUse": self.size - len(self.idle_connections),
+                    "minSize": self.min_size,
+                    "maxSize": self.max_size,
+                    "opened": self.opened,
+                    "closed": self.closed,
+                    "checkouts": self.checkouts,
+                    "waits": self.waits,
+                    "timeouts": self.timeouts,
+                    "totalWaitMilliseconds": round(self.total_wait_time * 1000, 3),
+                    "maxWaitMilliseconds": round(self.max_wait_time * 1000, 3)}
+
+    def _check_out(self) -> Tuple[Connection, float]:
+        """An idle connection with the time it was returned at, or None once a new connection may be opened"""
+        started_at = time.monotonic()
+        expired_connections = []
+        try:
+            with self.condition:
+                self.checkouts += 1
+                is_waiting = False
+                while True:
+                    now = time.monotonic()
+                    expired_connections.extend(self._pop_expired_idle_connections(now))
+                    while self.idle_connections:
+                        connection, returned_at = self.idle_connections.pop()
+                        if now - self.opened_at[connection] < self.max_lifetime:
+                            self._record_wait(is_waiting, now - started_at)
+                            return connection, returned_at
+                        self._forget(connection)
+                        expired_connections.append(connection)
+                    if self.size < self.max_size:
+                        # Reserving the place of the connection which is about to be opened
+                        self.size += 1
+                        self._record_wait(is_waiting, now - started_at)
+                        return None, now
+                    remaining_wait_time = started_at + self.wait_timeout - now
+                    if remaining_wait_time <= 0:
+                        self.timeouts += 1
+                        raise Exception("No database connection became available within {wait_timeout} seconds; "
+                                        "All {max_size} connections are in use"
+                                        .format(wait_timeout=self.wait_timeout, max_size=self.max_size))
+                    is_waiting = True
+                    self.condition.wait(remaining_wait_time)
+        finally:
+            close_connections(expired_connections)
+
+    def _open_connection(self) -> Connection:
+        """Opens a connection in the place reserved for it"""
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened_at[connection] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def _discard(self, connection: Connection):
+        with self.condition:
+            self._forget(connection)
+        close_connections([connection])
+
+    def _forget(self, connection: Connection):
+        """Gives up the place of the connection, which is to be closed; the condition must be held"""
+        self.opened_at.pop(connection, None)
+        self.size -= 1
+        self.closed += 1
+        self.condition.notify()
+
+    def _pop_expired_idle_connections(self, now: float):
+        """
+        Gives up the idle connections beyond the minimum size which have been idle for too long, returning them to be
+        closed; the oldest are leftmost. The condition must be held.
+        """
+        expired_connections = []
+        while self.idle_connections and self.size > self.min_size and \
+                now - self.idle_connections[0][1] >= self.max_idle:
+            connection = self.idle_connections.popleft()[0]
+            self._forget(connection)
+            expired_connections.append(connection)
+        return expired_connections
+
+    def _record_wait(self, is_waiting: bool, wait_time: float):
+        if is_waiting:
+            self.waits += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+
+def close_connections(connections):
+    for connection in connections:
+        try:
+            connection.close()
+        except Exception:
+            # Closing a broken connection has nothing left to release
+            pass
+
+
+def reset(connection: Connection) -> bool:
+    """Leaves the connection outside of any transaction, returning whether it can be reused"""
+    if connection.closed:
+        return False
+    transaction_status = connection.info.transaction_status
+    if transaction_status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if transaction_status != TRANSACTION_STATUS_IDLE:
+        try:
+            connection.rollback()
+        except Exception:
+            return False
+    return True
+
+
+def is_healthy(connection: Connection) -> bool:
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(HEALTH_CHECK_QUERY)
+        # Leaving no transaction behind, in case the connection is not in autocommit mode
+        return reset(connection)
+    except Exception:
+        return False
+
+
+CONNECTION_POOLS: Dict[tuple, ConnectionPool] = dict()
+
+CONNECTION_POOLS_LOCK = threading.Lock()
+
+
+def get_connection_pool(connection_parameters: dict, connect: Callable[[], Connection]) -> ConnectionPool:
+    """One pool per database and credentials, created the first time they are connected to"""
+    key = tuple(sorted((name, str(value)) for name, value in connection_parameters.items()))
+    with CONNECTION_POOLS_LOCK:
+        connection_pool = CONNECTION_POOLS.get(key)
+        if connection_pool is None:
+            connection_pool = ConnectionPool(connect)
+            CONNECTION_POOLS[key] = connection_pool
+            is_created = True
+        else:
+            is_created = False
+    if is_created:
+        connection_pool.fill()
+    return connection_pool
+
+
+def close_connection_pools(database_name: str = None):
+    """Closes the idle connections of the pools of the database, or of every pool"""
+    with CONNECTION_POOLS_LOCK:
+        connection_pools = [connection_pool for key, connection_pool in CONNECTION_POOLS.items()
+                            if database_name is None or ("database", database_name) in key]
+    for connection_pool in connection_pools:
+        connection_pool.close()
+
+
+def get_connection_pool_stats() -> dict:
+    with CONNECTION_POOLS_LOCK:
+        connection_pools = list(CONNECTION_POOLS.items())
+    return {dict(key).get("database"): connection_pool.get_stats() for key, connection_pool in connection_pools}
@@ -0,0 +1,413 @@
+import csv
+import hashlib
+import io
+import itertools
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from django.db import connection, transaction
+from psycopg2 import errorcodes
+
+from backend.settings import PREPOPULATION_CHUNK_BYTES, PREPOPULATION_PROGRESS_INTERVAL, PREPOPULATION_WORKERS
+
+logger = logging.getLogger(__name__)
+
+BOOLEAN = "boolean"
+BIGINT = "bigint"
+DOUBLE_PRECISION = "double precision"
+TEXT = "text"
+
+# A column whose values fail to be read as its type is promoted to the next type, up to text which reads any value
+TYPE_PROMOTIONS = {BOOLEAN: TEXT, BIGINT: DOUBLE_PRECISION, DOUBLE_PRECISION: TEXT}
+
+BOOLEAN_VALUES = ("true", "false")
+INTEGER_PATTERN = re.compile(r"\s*[+-]?\d+\s*")
+DOUBLE_PRECISION_PATTERN = re.compile(r"\s*[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|nan|inf|infinity)\s*",
+                                      re.IGNORECASE)
+BIGINT_RANGE = range(-2 ** 63, 2 ** 63)
+
+# Values pandas reads as missing by default, which are null in a column of any type but text
+MISSING_VALUES = frozenset(("", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                            "<NA>", "N/A", "NA", "NULL", "NaN", "n/a", "nan", "null"))
+
+# Column types are inferred from the records at the start of a file, and promoted should later records disagree
+TYPE_SAMPLE_BYTES = 1024 * 1024
+TYPE_SAMPLE_RECORDS = 1000
+
+QUOTE = b'"'
+NEWLINE = b"\n"
+
+TABLE_EXISTS_QUERY = "select to_regclass(%s) is not null"
+CREATE_TABLE_QUERY = "create table {table_name} ({column_definitions})"
+COLUMN_DEFINITION = "{column_name} {column_type}"
+# An unquoted empty value is null
+COPY_QUERY = "copy {table_name} ({column_names}) from stdin with (format csv, delimiter '{delimiter}', encoding 'UTF8')"
+ALTER_COLUMN_TYPE_QUERY = "alter table {table_name} alter column {column_name} type {column_type} " \
+                          "using {column_name}::{column_type}"
+ANALYZE_QUERY = "analyze {table_name}"
+# A table being replaced is loaded under another name, and swapped in once loaded
+SHADOW_TABLE_NAME = "ira_shadow_{table_name_hash}"
+DROP_TABLE_QUERY = "drop table if exists {table_name}"
+RENAME_TABLE_QUERY = "alter table {shadow_table_name} rename to {table_name}"
+
+CSV_DELIMITER = ","
+TSV_DELIMITER = "\t"
+TSV_EXTENSION = ".tsv"
+TSV_CONTENT_TYPE = "text/tab-separated-values"
+
+# Errors of a value which the type of its column cannot read
+TYPE_ERROR_CODES = (errorcodes.INVALID_TEXT_REPRESENTATION, errorcodes.NUMERIC_VALUE_OUT_OF_RANGE)
+
+
+class CsvFile:
+    def __init__(self, path: str, table_name: str, column_names: List[str], is_replacing: bool = False,
+                 delimiter: str = CSV_DELIMITER):
+        self.path = path
+        self.table_name = table_name
+        self.column_names = column_names
+        # Whether a table of the same name is replaced, rather than refused
+        self.is_replacing = is_replacing
+        self.delimiter = delimiter
+
+
+class LoadResult:
+    def __init__(self, table_name: str, number_of_rows: int, number_of_bytes: int, seconds: float,
+                 column_types: List[str], file_stat: os.stat_result, file_hash: str):
+        self.table_name = table_name
+        self.number_of_rows = number_of_rows
+        self.number_of_bytes = number_of_bytes
+        self.seconds = seconds
+        self.column_types = column_types
+        # Of the file as it was loaded
+        self.file_stat = file_stat
+        self.file_hash = file_hash
+
+    def get_rows_per_second(self) -> float:
+        return self.number_of_rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def read_column_names(csv_file_path: str, delimiter: str = CSV_DELIMITER) -> List[str]:
+    with open(csv_file_path, encoding="utf-8-sig", newline="") as file:
+        return next(csv.reader(file, delimiter=delimiter), [])
+
+
+def parse_column_names(header: bytes, delimiter: str = CSV_DELIMITER) -> List[str]:
+    return next(csv.reader(io.StringIO(header.decode("utf-8-sig"), newline=""), delimiter=delimiter), [])
+
+
+def get_delimiter(file_name: str, content_type: str = "") -> str:
+    """Values of a TSV file are separated by tabs, and those of any other file by commas"""
+    if file_name.lower().endswith(TSV_EXTENSION) or content_type == TSV_CONTENT_TYPE:
+        return TSV_DELIMITER
+    return CSV_DELIMITER
+
+
+def load_csv_files(csv_files: Sequence[CsvFile], workers: int = PREPOPULATION_WORKERS,
+                   on_loaded: Optional[Callable] = None) -> List[LoadResult]:
+    """
+    Loads the files concurrently, each on a connection of its own, returning the result of every file which has been
+    loaded; the error of a file which has not is logged, without affecting the other files
+    """
+    started_at = time.monotonic()
+    results = []
+    with ThreadPoolExecutor(max(1, min(workers, len(csv_files)))) as executor:
+        futures = [executor.submit(load_csv_file_on_own_connection, csv_file, on_loaded) for csv_file in csv_files]
+        for csv_file, future in zip(csv_files, futures):
+            try:
+                results.append(future.result())
+            except Exception:
+                logger.exception("Loading table {table_name}, and failed".format(table_name=csv_file.table_name))
+    seconds = time.monotonic() - started_at
+    number_of_rows = sum(result.number_of_rows for result in results)
+    logger.info("Loaded {number_of_tables} table(s) with {number_of_rows} rows in {seconds:.2f} s "
+                "({rows_per_second:.0f} rows/s)"
+                .format(number_of_tables=len(results), number_of_rows=number_of_rows, seconds=seconds,
+                        rows_per_second=number_of_rows / seconds if seconds > 0 else 0.0))
+    return results
+
+
+def load_csv_file_on_own_connection(csv_file: CsvFile, on_loaded: Optional[Callable] = None) -> LoadResult:
+    # Connections are per thread, hence the connection of the worker is returned to the pool once the file is loaded
+    try:
+        return load_csv_file(csv_file, on_loaded=on_loaded)
+    finally:
+        connection.close()
+
+
+def load_csv_file(csv_file: CsvFile, chunk_bytes: int = PREPOPULATION_CHUNK_BYTES,
+                  on_loaded: Optional[Callable] = None) -> LoadResult:
+    """
+    Loads the file into its table within a single transaction, so that a file which fails to load leaves no table
+    behind. on_loaded is called with the cursor, the file and the result before the transaction commits.
+    """
+    with open(csv_file.path, "rb") as file, transaction.atomic(), connection.cursor() as cursor:
+        file_stat = os.fstat(file.fileno())
+        table_loader = TableLoader(csv_file, cursor, file.readline(), file_stat.st_size)
+        for chunk in read_chunks(file, chunk_bytes):
+            table_loader.copy(chunk)
+        result = table_loader.finish(file_stat)
+        if on_loaded is not None:
+            on_loaded(cursor, csv_file, result)
+    log_load(result)
+    return result
+
+
+def log_load(result: LoadResult):
+    logger.info("Loaded table {table_name}: {number_of_rows} rows, {number_of_bytes} bytes in {seconds:.2f} s "
+                "({rows_per_second:.0f} rows/s)"
+                .format(table_name=result.table_name, number_of_rows=result.number_of_rows,
+                        number_of_bytes=result.number_of_bytes, seconds=result.seconds,
+                        rows_per_second=result.get_rows_per_second()))
+
+
+class TableLoader:
+    """
+    Creates the table of a file and streams the records of the file into it through COPY, a chunk of whole records
+    at a time as they are read, hence at most a couple of chunks are held in memory however large the file is. The
+    table is created within the transaction of the cursor, with the types of its columns inferred from the first
+    chunk. A table being replaced is only dropped once its replacement is loaded, so that it is locked for no longer
+    than the swap.
+    """
+
+    def __init__(self, csv_file: CsvFile, cursor, header: bytes, total_bytes: Optional[int] = None):
+        self.csv_file = csv_file
+        self.cursor = cursor
+        self.total_bytes = total_bytes
+        self.loading_table_name = get_loading_table_name(csv_file)
+        self.column_types: Optional[List[str]] = None
+        self.file_hash = hashlib.sha256(header)
+        self.number_of_rows = 0
+        self.number_of_bytes = len(header)
+        self.started_at = time.monotonic()
+        self.reported_at = self.started_at
+        cursor.execute(TABLE_EXISTS_QUERY, [quote_identifier(self.loading_table_name)])
+        if cursor.fetchone()[0]:
+            raise Exception("Table '{table_name}' already exists.".format(table_name=self.loading_table_name))
+
+    def copy(self, chunk: bytes):
+        """Copies a chunk of whole records, the records of the file in order"""
+        if self.column_types is None:
+            self.create_table(chunk)
+        self.file_hash.update(chunk)
+        self.number_of_rows += copy_chunk(self.cursor, self.loading_table_name, self.csv_file, chunk,
+                                          self.column_types)
+        self.number_of_bytes += len(chunk)
+        now = time.monotonic()
+        if now - self.reported_at >= PREPOPULATION_PROGRESS_INTERVAL:
+            self.reported_at = now
+            percentage = " ({percentage:.0f}% of {total_bytes})".format(
+                percentage=100 * self.number_of_bytes / max(self.total_bytes, 1), total_bytes=self.total_bytes) \
+                if self.total_bytes is not None else ""
+            logger.info("Loading table {table_name}: {number_of_rows} rows, {number_of_bytes} bytes{percentage} "
+                        "({rows_per_second:.0f} rows/s)"
+                        .format(table_name=self.csv_file.table_name, number_of_rows=self.number_of_rows,
+                                number_of_bytes=self.number_of_bytes, percentage=percentage,
+                                rows_per_second=self.number_of_rows / (now - self.started_at)))
+
+    def finish(self, file_stat: Optional[os.stat_result] = None) -> LoadResult:
+        if self.column_types is None:
+            # A file with a header alone makes a table of text columns
+            self.create_table(b"")
+        table_name = quote_identifier(self.loading_table_name)
+        # Leaving the planner with statistics of the table, rather than with a guess
+        self.cursor.execute(ANALYZE_QUERY.format(table_name=table_name))
+        if self.csv_file.is_replacing:
+            self.cursor.execute(DROP_TABLE_QUERY.format(table_name=quote_identifier(self.csv_file.table_name)))
+            self.cursor.execute(RENAME_TABLE_QUERY.format(shadow_table_name=table_name,
+                                                          table_name=quote_identifier(self.csv_file.table_name)))
+        return LoadResult(self.csv_file.table_name, self.number_of_rows, self.number_of_bytes,
+                          time.monotonic() - self.started_at, self.column_types, file_stat,
+                          self.file_hash.hexdigest())
+
+    def create_table(self, first_chunk: bytes):
+        self.column_types = infer_column_types(first_chunk, len(self.csv_file.column_names), self.csv_file.delimiter)
+        column_definitions = ", ".join(COLUMN_DEFINITION.format(column_name=quote_identifier(column_name),
+                                                                column_type=column_type)
+                                       for column_name, column_type in zip(self.csv_file.column_names,
+                                                                           self.column_types))
+        self.cursor.execute(CREATE_TABLE_QUERY.format(table_name=quote_identifier(self.loading_table_name),
+                                                      column_definitions=column_definitions))
+
+
+def copy_chunk(cursor, loading_table_name: str, csv_file: CsvFile, chunk: bytes, column_types: List[str]) -> int:
+    """
+    Copies the records of the chunk into the table within a savepoint, until it is copied. A column which fails to
+    read a value is promoted, and a chunk holding missing values other than an empty one, which COPY only reads as
+    null, is rewritten with those emptied, before the chunk is copied again. Returns the number of rows copied.
+    """
+    table_name = quote_identifier(loading_table_name)
+    copy_query = COPY_QUERY.format(table_name=table_name,
+                                   column_names=", ".join(quote_identifier(column_name)
+                                                          for column_name in csv_file.column_names),
+                                   delimiter=csv_file.delimiter)
+    is_rewritten = False
+    while True:
+        try:
+            with transaction.atomic():
+                cursor.copy_expert(copy_query, io.BytesIO(chunk))
+                return cursor.rowcount
+        except Exception as exception:
+            failed_value = get_failed_value(exception, csv_file.column_names)
+            if failed_value is None:
+                raise Exception("Pre-populating database, and failed to load table {table_name}; {exception}"
+                                .format(table_name=csv_file.table_name, exception=exception))
+            column_index, value = failed_value
+            if value in MISSING_VALUES and not is_rewritten:
+                chunk = empty_missing_values(chunk, column_types, csv_file.delimiter)
+                is_rewritten = True
+                continue
+            if column_types[column_index] not in TYPE_PROMOTIONS:
+                raise Exception("Pre-populating database, and failed to load table {table_name}; {exception}"
+                                .format(table_name=csv_file.table_name, exception=exception))
+            column_type = TYPE_PROMOTIONS[column_types[column_index]]
+            cursor.execute(ALTER_COLUMN_TYPE_QUERY.format(
+                table_name=table_name, column_name=quote_identifier(csv_file.column_names[column_index]),
+                column_type=column_type))
+            logger.info("Promoted column {column_name} of table {table_name} from {from_type} to {to_type}"
+                        .format(column_name=csv_file.column_names[column_index], table_name=csv_file.table_name,
+                                from_type=column_types[column_index], to_type=column_type))
+            column_types[column_index] = column_type
+
+
+def get_loading_table_name(csv_file: CsvFile) -> str:
+    if not csv_file.is_replacing:
+        return csv_file.table_name
+    # Hashed, as the name of the table with a suffix could exceed the length postgres allows
+    return SHADOW_TABLE_NAME.format(table_name_hash=hashlib.sha1(csv_file.table_name.encode()).hexdigest()[:16])
+
+
+def get_failed_value(exception: Exception, column_names: List[str]) -> Optional[Tuple[int, str]]:
+    """
+    Finds the column whose type could not read a value, and the value, which postgres names in the context of the
+    error; a long value is cut short there
+    """
+    database_error = exception.__cause__ or exception
+    if getattr(database_error, "pgcode", None) not in TYPE_ERROR_CODES:
+        return None
+    context = getattr(getattr(database_error, "diag", None), "context", None) or ""
+    # The longest name matching, as a column name may end with another
+    matching_indexes = [index for index, column_name in enumerate(column_names)
+                        if ", column {column_name}: ".format(column_name=column_name) in context]
+    column_index = max(matching_indexes, key=lambda index: len(column_names[index]), default=None)
+    if column_index is None:
+        return None
+    value = context.split(", column {column_name}: ".format(column_name=column_names[column_index]), 1)[1]
+    return column_index, value[1:-1] if value.startswith('"') and value.endswith('"') else value
+
+
+def empty_missing_values(chunk: bytes, column_types: List[str], delimiter: str = CSV_DELIMITER) -> bytes:
+    """Rewrites the records of the chunk with the missing values of the columns other than text ones emptied"""
+    typed_column_indexes = [index for index, column_type in enumerate(column_types) if column_type != TEXT]
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=delimiter, lineterminator="\n")
+    for record in csv.reader(io.StringIO(chunk.decode("utf-8"), newline=""), delimiter=delimiter):
+        for index in typed_column_indexes:
+            if index < len(record) and record[index] in MISSING_VALUES:
+                record[index] = ""
+        if record == [""]:
+            # Rather than the quoted empty value the writer makes of it, which is not null
+            output.write("\n")
+        else:
+            writer.writerow(record)
+    return output.getvalue().encode("utf-8")
+
+
+def get_file_hash(path: str, block_bytes: int = PREPOPULATION_CHUNK_BYTES) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_bytes), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def read_chunks(file: BinaryIO, chunk_bytes: int) -> Iterator[bytes]:
+    """Reads the rest of the file in chunks of whole records of about the given size"""
+    record_chunker = RecordChunker(chunk_bytes)
+    for block in iter(lambda: file.read(chunk_bytes), b""):
+        chunk = record_chunker.push(block)
+        if chunk is not None:
+            yield chunk
+    chunk = record_chunker.flush()
+    if chunk:
+        yield chunk
+
+
+class RecordChunker:
+    """
+    Gathers the data pushed to it into chunks of whole records of about the given size, whatever the size of the
+    pieces the data comes in; a record longer than a chunk makes a chunk of its own
+    """
+
+    def __init__(self, chunk_bytes: int):
+        self.chunk_bytes = chunk_bytes
+        self.pending = bytearray()
+
+    def push(self, data: bytes) -> Optional[bytes]:
+        """The next chunk, once the data pending makes one"""
+        self.pending += data
+        if len(self.pending) < self.chunk_bytes:
+            return None
+        boundary = find_record_boundary(self.pending)
+        if boundary is None:
+            return None
+        chunk = bytes(self.pending[:boundary])
+        del self.pending[:boundary]
+        return chunk
+
+    def flush(self) -> bytes:
+        """The data left pending, which ends with the last record"""
+        chunk = bytes(self.pending)
+        self.pending.clear()
+        return chunk
+
+
+def find_record_boundary(data) -> Optional[int]:
+    """
+    Position after the last newline which ends a record; a newline within a quoted value is preceded by an odd number
+    of quotes, as quotes within a quoted value are doubled
+    """
+    end = len(data)
+    while True:
+        newline = data.rfind(NEWLINE, 0, end)
+        if newline < 0:
+            return None
+        if data.count(QUOTE, 0, newline) % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+def infer_column_types(chunk: bytes, number_of_columns: int, delimiter: str = CSV_DELIMITER) -> List[str]:
+    sample = chunk
+    if len(chunk) > TYPE_SAMPLE_BYTES:
+        sample = chunk[:find_record_boundary(chunk[:TYPE_SAMPLE_BYTES]) or TYPE_SAMPLE_BYTES]
+    records = csv.reader(io.StringIO(sample.decode("utf-8", errors="replace"), newline=""), delimiter=delimiter)
+    columns = [[] for _ in range(number_of_columns)]
+    for record in itertools.islice(records, TYPE_SAMPLE_RECORDS):
+        for column, value in zip(columns, record):
+            if value not in MISSING_VALUES:
+                column.append(value)
+    return [infer_column_type(column) for column in columns]
+
+
+def infer_column_type(values: List[str]) -> str:
+    """
+    The narrowest type reading every value other than a missing one, the way pandas types a column; a column of
+    missing values alone is text
+    """
+    if not values:
+        return TEXT
+    if all(value.strip().lower() in BOOLEAN_VALUES for value in values):
+        return BOOLEAN
+    if all(INTEGER_PATTERN.fullmatch(value) and int(value) in BIGINT_RANGE for value in values):
+        return BIGINT
+    if all(DOUBLE_PRECISION_PATTERN.fullmatch(value) for value in values):
+        return DOUBLE_PRECISION
+    return TEXT
+
+
+def quote_identifier(identifier: str) -> str:
+    return '"{identifier}"'.format(identifier=identifier.replace('"', '""'))
@@ -1,45 +1,230 @@
-from django.db import connection
+import json
+from typing import Iterator, Optional, Tuple
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from backend.settings import PREFLIGHT_ENABLED, PREFLIGHT_MAX_ESTIMATED_COST, PREFLIGHT_MAX_ESTIMATED_ROWS, \
+    STREAM_BATCH_SIZE
 from ira.model.output import Output
 from ira.model.query import Query
 from http import HTTPStatus
 
+from ira.enum.error_code import ErrorCode
+from ira.enum.result_format import ResultFormat
+from ira.service.catalog import CATALOG
+from ira.service.prepared_statements import get_prepared_statements
+from ira.service.result_cache import RESULT_CACHE
+from ira.service.result_encoder import encode, format_result, to_duplicate_key_dicts
+from ira.service.statement_guard import StatementGuard, get_failure_output
+
+# Postgres builds the JSON text of the result itself. row_to_json keeps duplicate column names as duplicate keys.
+# string_agg is used over json_agg, as the latter separates elements with whitespace.
+OBJECTS_JSON_QUERY = "select '[' || coalesce(string_agg(row_to_json(result)::text, ','), '') || ']' " \
+                     "from ({query}) as result"
+# Columns are renamed positionally, as duplicate column names could not be referred to otherwise
+COMPACT_JSON_QUERY = "select '[' || coalesce(string_agg(array_to_json(array[{column_values}])::text, ','), '') " \
+                     "|| ']' from ({query}) as result({column_aliases})"
+COLUMNAR_JSON_QUERY = "select '[' || array_to_string(array[{column_arrays}], ',') || ']' " \
+                      "from ({query}) as result({column_aliases})"
+COLUMNAR_JSON_COLUMN_ARRAY = "'[' || coalesce(string_agg(coalesce(to_json({column_alias})::text, 'null'), ','), '') " \
+                             "|| ']'"
+EMPTY_RESULT_SUFFIX = b'"result":[]}'
+DESCRIBE_QUERY = "select * from ({query}) as result limit 0"
+# Plain explain only plans the query
+ESTIMATE_QUERY = "explain (format json) {query}"
 
-def execute_sql_query(query: Query) -> Output:
+
+def execute_sql_query(query: Query, result_format: ResultFormat = ResultFormat.OBJECTS,
+                      estimate: Optional[dict] = None) -> Output:
+    if query.is_dql:
+        entry_path = RESULT_CACHE.get_entry_path(query)
+        cached_result = RESULT_CACHE.get(query, entry_path)
+        if cached_result is not None:
+            column_names, rows = cached_result
+            return Output(HTTPStatus.OK,
+                          query,
+                          result=format_result(column_names, rows, result_format),
+                          estimate=estimate)
     with connection.cursor() as cursor:
         try:
-            cursor.execute(query.value)
+            execute_query(cursor, query)
             if query.is_dql:
+                column_names = get_column_names(cursor)
+                rows = cursor.fetchall()
+                RESULT_CACHE.put(query, column_names, rows, entry_path)
                 return Output(HTTPStatus.OK,
                               query,
-                              result=fetch_all(cursor))
+                              result=format_result(column_names, rows, result_format),
+                              estimate=estimate)
+            # Right away in autocommit mode, otherwise once the transaction of the statement guard has committed
+            transaction.on_commit(lambda: RESULT_CACHE.bump_versions(query.relation_names or
+                                                                     CATALOG.get_relation_names()))
             return Output(HTTPStatus.OK,
                           query,
                           message="Query has affected {number_of_rows} row(s)."
                           .format(query=query.value, number_of_rows=cursor.rowcount))
         except Exception as exception:
-            return Output(HTTPStatus.BAD_REQUEST,
-                          query,
-                          message="Query faced logic issue; "
-                                  "See exception message:{exception_message}"
-                          .format(query=query.value, exception_message=exception))
+            return get_failure_output(query, exception)
+
+
+def execute_sql_query_as_json(query: Query, result_format: ResultFormat = ResultFormat.OBJECTS,
+                              estimate: Optional[dict] = None) -> Tuple[HTTPStatus, bytes]:
+    """
+    Executes a DQL query so that Postgres returns the result already encoded as JSON, and passes those bytes through
+    into the response body without decoding any row in Python. Numeric values come out as JSON numbers, whereas
+    JsonResponse would have encoded a Decimal as a string.
+    """
+    if not query.is_dql:
+        output = execute_sql_query(query, result_format)
+        return output.status_code, encode(output.value)
+
+    with connection.cursor() as cursor:
+        try:
+            # Within a savepoint, so that a failing query can still be executed as it is, to report its own error
+            # rather than one of the query building its JSON
+            with transaction.atomic():
+                if result_format == ResultFormat.OBJECTS:
+                    execute_query(cursor, query, OBJECTS_JSON_QUERY)
+                    result = cursor.fetchone()[0].encode()
+                else:
+                    # Planning a query without rows is enough to learn its columns
+                    execute_query(cursor, query, DESCRIBE_QUERY)
+                    column_names = get_column_names(cursor)
+                    column_aliases = ['"c{index}"'.format(index=index) for index in range(len(column_names))]
+                    if result_format == ResultFormat.COMPACT:
+                        column_values = ", ".join("to_json({column_alias})".format(column_alias=column_alias)
+                                                  for column_alias in column_aliases)
+                        execute_query(cursor, query, COMPACT_JSON_QUERY, column_aliases=", ".join(column_aliases),
+                                      column_values=column_values)
+                        result_key = b"rows"
+                    else:
+                        column_arrays = ", ".join(COLUMNAR_JSON_COLUMN_ARRAY.format(column_alias=column_alias)
+                                                  for column_alias in column_aliases)
+                        execute_query(cursor, query, COLUMNAR_JSON_QUERY, column_aliases=", ".join(column_aliases),
+                                      column_arrays=column_arrays)
+                        result_key = b"values"
+                    result = b'{"columns":' + encode(column_names) + b',"' + result_key + b'":' + \
+                        cursor.fetchone()[0].encode() + b'}'
+        except Exception as exception:
+            output = get_failure_output(query, exception)
+            # Unless it has been cancelled or has timed out, the query fails the same way once executed
+            if output.error is None:
+                output = execute_sql_query(query, result_format, estimate)
+            return output.status_code, encode(output.value)
+
+    # Splicing the result in place of the empty one, which is encoded last
+    output = Output(HTTPStatus.OK, query, result=[], estimate=estimate)
+    content = encode(output.value)
+    if not content.endswith(EMPTY_RESULT_SUFFIX):
+        raise Exception("Logical error; The result of the output must be encoded last to be spliced in")
+    return output.status_code, content[:-len(b'[]}')] + result + b'}'
+
 
+def execute_query(cursor, query: Query, template: Optional[str] = None, **template_arguments):
+    """
+    Executes the query, or the query formatted into the template as a subquery, through the statement prepared on
+    the connection for its shape once the shape recurs
+    """
+    if template is None:
+        sql_query, shape = query.value, query.shape
+    else:
+        sql_query = template.format(query=query.get_value_without_semi_colon(), **template_arguments)
+        shape = template.format(query=query.get_shape_without_semi_colon(), **template_arguments) \
+            if query.shape is not None else None
+    get_prepared_statements(connection.connection).execute(cursor, sql_query, shape, query.parameters)
 
-# Got the idea on how to create a dictionary which allows duplicate key from here:
-# https://stackoverflow.com/questions/29519858/adding-duplicate-keys-to-json-with-python
-class DuplicateKeyDict(dict):
-    def __init__(self, items):
-        if items:
-            self[None] = None
-        self._items = items
 
-    def items(self):
-        return self._items
+def stream_sql_query(query: Query, statement_guard: Optional[StatementGuard] = None,
+                     estimate: Optional[dict] = None) -> Iterator[bytes]:
+    """
+    Streams the result of a DQL query as newline delimited JSON; a header record with the column names comes first,
+    followed by one array per row. Rows are read in batches through a server-side cursor, hence memory usage does
+    not depend on the size of the result. The query is executed once the header is requested, within the transaction
+    of the statement guard if one is given.
+    """
+    # A server-side cursor opened outside of a transaction would be materialised in full by Postgres (WITH HOLD)
+    with statement_guard or transaction.atomic(), connection.chunked_cursor() as cursor:
+        cursor.execute(query.value)
+        # A server-side cursor only describes its columns once the first batch has been fetched
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        header = {"sqlQuery": query.value, "columns": get_column_names(cursor)}
+        if estimate is not None:
+            header["estimate"] = estimate
+        yield to_json_line(header)
+        try:
+            while rows:
+                yield b"".join(to_json_line(row) for row in rows)
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        except Exception as exception:
+            # The response has already started, hence the error can only be reported as the last record, and the
+            # failed transaction is rolled back rather than committed
+            transaction.set_rollback(True)
+            output = get_failure_output(None, exception)
+            record = {"message": output.message}
+            if output.error is not None:
+                record["error"] = output.error
+            yield to_json_line(record)
+
+
+def preflight_sql_query(query: Query, is_confirmed: bool = False) -> Tuple[Optional[dict], Optional[Output]]:
+    """
+    Asks the planner for the estimated rows and cost of a DQL query before it is executed; planning without
+    executing takes next to no time. Returns the estimate, alongside the output to respond with instead of executing
+    the query, which is the case when the estimate exceeds a threshold the request has not confirmed, or when the
+    planning has been cancelled.
+    """
+    if not PREFLIGHT_ENABLED or not query.is_dql:
+        return None, None
+    try:
+        # Within a savepoint, so that a query which fails to be planned can still be executed to report its error
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(ESTIMATE_QUERY.format(query=query.get_value_without_semi_colon()))
+            explanation = cursor.fetchone()[0]
+    except Exception as exception:
+        failure_output = get_failure_output(query, exception)
+        # Unless the planning has been cancelled, the query fails the same way once executed
+        return None, failure_output if failure_output.error is not None else None
+    return check_estimate(query, explanation, is_confirmed)
+
+
+def check_estimate(query: Query, explanation, is_confirmed: bool) -> Tuple[dict, Optional[Output]]:
+    """Reads the estimate off the explanation, refusing the query when it is estimated above a threshold"""
+    # The driver only decodes the plan when it recognises the json type
+    if isinstance(explanation, str):
+        explanation = json.loads(explanation)
+    plan = explanation[0]["Plan"]
+    estimate = {"rows": plan["Plan Rows"], "cost": plan["Total Cost"]}
+    if is_confirmed or not is_estimate_above_thresholds(estimate):
+        return estimate, None
+    return estimate, Output(HTTPStatus.PRECONDITION_REQUIRED,
+                            query,
+                            message="Query is estimated to return {rows} row(s) at a cost of {cost}; Please confirm "
+                                    "to execute it anyway".format(rows=estimate["rows"], cost=estimate["cost"]),
+                            error={"code": ErrorCode.CONFIRMATION_REQUIRED.value},
+                            estimate=estimate)
+
+
+def is_estimate_above_thresholds(estimate: dict) -> bool:
+    return 0 < PREFLIGHT_MAX_ESTIMATED_ROWS < estimate["rows"] or \
+        0 < PREFLIGHT_MAX_ESTIMATED_COST < estimate["cost"]
+
+
+def is_result_above_threshold(number_of_rows: int) -> bool:
+    """
+    Whether a result computed outside of postgres, which is never planned, has more rows than a query is executed
+    with unless confirmed; the threshold of the cost has no counterpart there
+    """
+    return PREFLIGHT_ENABLED and 0 < PREFLIGHT_MAX_ESTIMATED_ROWS < number_of_rows
+
+
+def to_json_line(value) -> bytes:
+    return (json.dumps(value, cls=DjangoJSONEncoder) + "\n").encode()
 
 
 def fetch_all(cursor):
-    column_names = [column[0] for column in cursor.description]
-    result = []
-    for row in cursor.fetchall():
-        result.append(DuplicateKeyDict(list((zip(column_names, row)))))
-    return result
+    return to_duplicate_key_dicts(get_column_names(cursor), cursor.fetchall())
+
+
+def get_column_names(cursor):
+    return [column[0] for column in cursor.description]
@@ -0,0 +1,186 @@
+import sqlite3
+from typing import Optional, Tuple
+
+from ira.enum.token_type import TokenType
+from ira.model.token import Token
+from ira.service.csv_loader import quote_identifier
+from ira.service.schema_inferrer import get_natural_join_column_names
+from ira.service.util import is_unary_operator
+
+N_JOIN_BASE_QUERY = ("select * from {{}} natural {join_type} join {{}}",
+                     "select * from {{}} {join_type} join {{}} on {{conditions}}")
+
+
+def get_join_queries(join_type):
+    return tuple(query.format(join_type=join_type) for query in N_JOIN_BASE_QUERY)
+
+
+QUERY_MAPPER = {TokenType.SELECT: "select * from {{}} where {conditions}",
+                TokenType.PROJECTION: "select distinct {column_names} from {{}}",
+                TokenType.NATURAL_JOIN: ("select * from {} natural join {}",
+                                         "select * from {} natural join {} where {conditions}"),
+                TokenType.IDENT: "select * from {table_name}",
+                TokenType.CARTESIAN: "select * from {} cross join {}",
+                TokenType.UNION: "{} union {}",
+                TokenType.INTERSECTION: "{} intersect {}",
+                TokenType.DIFFERENCE: "{} except {}",
+                TokenType.LEFT_JOIN: get_join_queries("left"),
+                TokenType.RIGHT_JOIN: get_join_queries("right"),
+                TokenType.FULL_JOIN: get_join_queries("full"),
+                TokenType.ANTI_JOIN: "select * from {{}}  natural left join {{}} as {anti_join_right_alias}"
+                                     " where {null_conditions}"}
+
+NON_DISTINCT_PROJECTION_QUERY = "select {column_names} from {{}}"
+
+MATERIALIZED = "materialized "
+
+NOT_MATERIALIZED = "not materialized "
+
+SELECT_ALL = "select *"
+
+LISTED_COLUMN = "{column_name} as {column_name}"
+
+# SQLite reads right and full joins from 3.39 on, and the materialisation of common table expressions from 3.35 on
+SQLITE_OUTER_JOINS_VERSION = (3, 39, 0)
+SQLITE_MATERIALIZED_VERSION = (3, 35, 0)
+
+# Either side is formed once as a common table expression, so that the emulation refers to it twice while the query of
+# each child is still formed in its single placeholder. Names starting with ira_ are never given to relations, and are
+# suffixed by the index of the join, as a nested join may not define a name its own definition refers to.
+EMULATED_JOIN_SIDES = "with {left_name} as (select * from {{}}), {right_name} as (select * from {{}}) "
+EMULATED_RIGHT_JOIN_QUERY = "select * from (" + EMULATED_JOIN_SIDES + \
+                            "select {column_names} from {right_name} natural left join {left_name})"
+# The rows of the right side which match no row of the left one are told apart by a column only the left side has
+EMULATED_FULL_JOIN_QUERY = "select * from (" + EMULATED_JOIN_SIDES + \
+                           "select {column_names} from {left_name} natural left join {right_name} union all " \
+                           "select {column_names} from {right_name} " \
+                           "natural left join (select *, 1 as {matched_name} from {left_name}) " \
+                           "where {matched_name} is null)"
+EMULATED_LEFT_NAME = "ira_left{}"
+EMULATED_RIGHT_NAME = "ira_right{}"
+EMULATED_MATCHED_NAME = "ira_matched"
+
+NATURAL_JOIN_TOKEN_TYPES = (TokenType.NATURAL_JOIN, TokenType.LEFT_JOIN, TokenType.RIGHT_JOIN, TokenType.FULL_JOIN,
+                            TokenType.ANTI_JOIN)
+EMULATED_JOIN_TOKEN_TYPES = (TokenType.RIGHT_JOIN, TokenType.FULL_JOIN)
+
+
+class Dialect:
+    """
+    SQL which the operators of a RA query are formed into, as postgres reads it; the query of an operator has a {}
+    placeholder for the query of each child, in order. Other databases override whatever they read otherwise.
+    """
+    name = "postgres"
+    query_mapper = QUERY_MAPPER
+    non_distinct_projection_query = NON_DISTINCT_PROJECTION_QUERY
+    materialized = MATERIALIZED
+    not_materialized = NOT_MATERIALIZED
+    # Whether the literals are lifted out of the query, for its statement to be prepared once per shape
+    is_parameterised = True
+
+    def get_join_query(self, token: Token, query: str) -> str:
+        """
+        Query of a join, anti join or cartesian product, given the query of the mapper. Postgres outputs the common
+        columns of a natural join first, followed by the remaining columns of the left and right side.
+        """
+        return query
+
+    def get_set_operand(self, child_token: Token) -> list:
+        """Fragments of the subquery of a child combined by a set operator"""
+        return ["(", child_token, ")"]
+
+    def check_column_names(self, token: Token):
+        """
+        Checks the columns of the operands of an operator and those named by its attributes; postgres reports a
+        missing or ambiguous one itself
+        """
+        pass
+
+
+class SqliteDialect(Dialect):
+    """
+    SQL as SQLite reads it. SQLite leaves the common columns of a natural join where the left side has them, hence
+    the columns are listed in the order of postgres, and it reads no parenthesised operand of a set operator. Before
+    3.39 it has no right nor full joins either, which are emulated by left joins.
+    """
+    name = "sqlite"
+    is_parameterised = False
+
+    def __init__(self, has_outer_joins: bool = sqlite3.sqlite_version_info >= SQLITE_OUTER_JOINS_VERSION):
+        self.has_outer_joins = has_outer_joins
+        if sqlite3.sqlite_version_info < SQLITE_MATERIALIZED_VERSION:
+            self.materialized = self.not_materialized = ""
+
+    def get_join_query(self, token: Token, query: str) -> str:
+        token_type = token.type
+        is_emulated = token_type in EMULATED_JOIN_TOKEN_TYPES and not self.has_outer_joins
+        # The conditions of a natural join filter its result, whereas those of another join match its rows
+        if token_type not in NATURAL_JOIN_TOKEN_TYPES or (token.attributes and token_type != TokenType.NATURAL_JOIN):
+            if is_emulated:
+                raise Exception("Logical error; Operator {operator} with conditions is not supported by SQLite "
+                                "{version}".format(operator=token.value, version=sqlite3.sqlite_version))
+            return query
+        column_names = get_listed_column_names(token)
+        # SQLite names a column merged by a full join after its expression, hence the columns of one are named
+        listed_column = LISTED_COLUMN if token_type == TokenType.FULL_JOIN and not is_emulated else "{column_name}"
+        listed_column_names = ", ".join(listed_column.format(column_name=quote_identifier(column_name))
+                                        for column_name in column_names)
+        if not is_emulated:
+            return "select " + listed_column_names + query[len(SELECT_ALL):]
+        if EMULATED_MATCHED_NAME in column_names:
+            raise Exception("Logical error; Operator {operator} is emulated for SQLite {version} and the column name "
+                            "{column_name} is reserved for it".format(operator=token.value,
+                                                                      version=sqlite3.sqlite_version,
+                                                                      column_name=EMULATED_MATCHED_NAME))
+        emulated_query = EMULATED_RIGHT_JOIN_QUERY if token_type == TokenType.RIGHT_JOIN else EMULATED_FULL_JOIN_QUERY
+        return emulated_query.format(left_name=EMULATED_LEFT_NAME.format(token.post_fix_index),
+                                     right_name=EMULATED_RIGHT_NAME.format(token.post_fix_index),
+                                     matched_name=EMULATED_MATCHED_NAME, column_names=listed_column_names)
+
+    def get_set_operand(self, child_token: Token) -> list:
+        return ["select * from (", child_token, ")"]
+
+    def check_column_names(self, token: Token):
+        """
+        SQLite reads a quoted name which is no column as a string, hence only known columns may be named. Of the
+        columns of a subquery sharing a name, SQLite reads a reference as the first where postgres reports it as
+        ambiguous, and names the others after it suffixed by :1 and on, hence no subquery may repeat a name.
+        """
+        child_tokens = [token.right_child_token] if is_unary_operator(token.type) else \
+            [token.left_child_token, token.right_child_token]
+        column_names = set()
+        for child_token in child_tokens:
+            if child_token.output_column_names is None:
+                raise Exception("Logical error; Columns of the relation/subquery for the {operator} operator must be "
+                                "known to be checked for SQLite".format(operator=token.value))
+            if child_token.type != TokenType.IDENT and not is_known_and_unique(child_token.output_column_names):
+                raise Exception("Logical error; Columns of the subquery for the {operator} operator must be unique, "
+                                "which SQLite renames or reads ambiguous references of otherwise than postgres"
+                                .format(operator=token.value))
+            column_names.update(child_token.output_column_names)
+        if not token.attributes:
+            return
+        missing_column_names = set(token.attributes.column_names) - column_names
+        if missing_column_names:
+            raise Exception("Logical error; Column(s) {column_names} of the {operator} operator are missing from its "
+                            "relation/subquery".format(column_names=", ".join(sorted(missing_column_names)),
+                                                       operator=token.value))
+
+
+def get_listed_column_names(token: Token) -> Tuple[str, ...]:
+    """Columns of a natural join in the order of postgres, which are only listed when either side names each once"""
+    left_column_names = token.left_child_token.output_column_names
+    right_column_names = token.right_child_token.output_column_names
+    if not is_known_and_unique(left_column_names) or not is_known_and_unique(right_column_names):
+        raise Exception("Logical error; Columns of the relation/subquery for the {operator} operator must be known "
+                        "and unique to be listed for SQLite".format(operator=token.value))
+    return get_natural_join_column_names(left_column_names, right_column_names)
+
+
+def is_known_and_unique(column_names: Optional[Tuple[str, ...]]) -> bool:
+    return column_names is not None and len(set(column_names)) == len(column_names)
+
+
+POSTGRES_DIALECT = Dialect()
+
+SQLITE_DIALECT = SqliteDialect()
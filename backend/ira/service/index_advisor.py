@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import psycopg
+from django.db import connection, transaction
+
+from backend.settings import INDEX_ADVISOR_MAX_CANDIDATES, INDEX_ADVISOR_MAX_QUERIES
+from ira.enum.column_usage import ColumnUsage
+from ira.model.query import Query
+from ira.service.catalog import CATALOG, get_connection_info
+from ira.service.csv_loader import quote_identifier
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME_PREFIX = "ira_index_"
+CREATE_INDEX_QUERY = "create index {index_name} on {table_name} ({column_name})"
+CREATE_INDEX_CONCURRENTLY_QUERY = "create index concurrently if not exists {index_name} on {table_name} ({column_name})"
+# A concurrent build which fails leaves an invalid index behind
+IS_INDEX_INVALID_QUERY = "select not indisvalid from pg_index where indexrelid = to_regclass(%s)"
+DROP_INDEX_QUERY = "drop index concurrently if exists {index_name}"
+# Plain explain only plans the query
+COST_QUERY = "explain (format json) {query}"
+# Columns which lead a valid index of a relation of the current schema, as a condition on such a column can already
+# be looked up through it
+INDEXED_COLUMNS_QUERY = "select class.relname, attribute.attname from pg_index " \
+                        "join pg_class class on class.oid = pg_index.indrelid " \
+                        "join pg_attribute attribute on attribute.attrelid = pg_index.indrelid " \
+                        "and attribute.attnum = pg_index.indkey[0] " \
+                        "where class.relnamespace = current_schema()::regnamespace and pg_index.indisvalid"
+HYPOPG_INSTALLED_QUERY = "select exists (select from pg_extension where extname = 'hypopg')"
+HYPOPG_CREATE_INDEX_QUERY = "select indexrelid from hypopg_create_index(%s)"
+HYPOPG_RESET_QUERY = "select hypopg_reset()"
+# An index built only to plan with waits this long at most for the lock of its table, rather than holding up the
+# reload of the table behind it, and is built for this long at most, as it holds the lock while it sorts the table
+LOCK_TIMEOUT_QUERY = "set local lock_timeout = {milliseconds}"
+LOCK_TIMEOUT_MS = 1000
+BUILD_TIMEOUT_QUERY = "set local statement_timeout = {milliseconds}"
+BUILD_TIMEOUT_MS = 10000
+
+
+class CandidateIndex:
+    def __init__(self, relation_name: str, column_name: str):
+        self.relation_name = relation_name
+        self.column_name = column_name
+        # Bounded in length whatever the names, as postgres truncates identifiers
+        self.index_name = INDEX_NAME_PREFIX + hashlib.sha1(repr((relation_name, column_name)).encode()).hexdigest()[:16]
+
+    def get_definition(self, is_concurrent: bool = False) -> str:
+        create_index_query = CREATE_INDEX_CONCURRENTLY_QUERY if is_concurrent else CREATE_INDEX_QUERY
+        return create_index_query.format(index_name=self.index_name, table_name=quote_identifier(self.relation_name),
+                                         column_name=quote_identifier(self.column_name))
+
+
+class IndexAdvisor:
+    """
+    Tallies the columns of the base relations which the executed queries compare in selections and join on, and
+    advises a B-tree index on each of the most used columns which no index leads yet. The benefit of a candidate is
+    estimated by planning the recorded queries using its column with and without it, weighted by how often each has
+    been executed: with a hypothetical index of hypopg where the extension is installed, otherwise with the index
+    built in a transaction which is rolled back, hence never seen by another connection. Building an index blocks the
+    writes to its relation, hence a candidate is left unpriced unless building is allowed. The workload is that of
+    the current process, over its most recently executed queries.
+    """
+
+    def __init__(self, max_queries: int = INDEX_ADVISOR_MAX_QUERIES,
+                 max_candidates: int = INDEX_ADVISOR_MAX_CANDIDATES):
+        self.max_queries = max_queries
+        self.max_candidates = max_candidates
+        # Every recorded query by its fingerprint, alongside the times it has been executed, least recent first
+        self.fingerprint_to_executions: OrderedDict = OrderedDict()
+        self.column_to_usage_counts: Dict[Tuple[str, str], Dict[ColumnUsage, int]] = dict()
+        self.lock = threading.Lock()
+
+    def record(self, query: Query):
+        # Queries compiled into the on-disk tier of the compile cache before usages were kept have none
+        column_usages = getattr(query, "column_usages", ())
+        if not query.is_dql or not column_usages:
+            return
+        with self.lock:
+            for relation_name, column_name, usage in column_usages:
+                usage_counts = self.column_to_usage_counts.setdefault((relation_name, column_name), dict())
+                usage_counts[usage] = usage_counts.get(usage, 0) + 1
+            _, executions = self.fingerprint_to_executions.pop(query.fingerprint, (query, 0))
+            self.fingerprint_to_executions[query.fingerprint] = (query, executions + 1)
+            while len(self.fingerprint_to_executions) > self.max_queries:
+                self.fingerprint_to_executions.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.fingerprint_to_executions.clear()
+            self.column_to_usage_counts.clear()
+
+    def advise(self, is_building_allowed: bool = False) -> List[dict]:
+        """
+        Candidate indexes of the most used columns, the most beneficial first, followed by those left unpriced in order
+        of use
+        """
+        with self.lock:
+            query_executions = list(self.fingerprint_to_executions.values())
+            column_to_usage_counts = {column: dict(usage_counts)
+                                      for column, usage_counts in self.column_to_usage_counts.items()}
+        # The most used columns first
+        columns = sorted(column_to_usage_counts,
+                         key=lambda column: (-sum(column_to_usage_counts[column].values()), column))
+        advice = []
+        with connection.cursor() as cursor:
+            cursor.execute(INDEXED_COLUMNS_QUERY)
+            indexed_columns = set(cursor.fetchall())
+            cursor.execute(HYPOPG_INSTALLED_QUERY)
+            is_hypothetical = cursor.fetchone()[0]
+            fingerprint_to_cost = dict()
+            for relation_name, column_name in columns:
+                if len(advice) == self.max_candidates:
+                    break
+                if (relation_name, column_name) in indexed_columns or \
+                        column_name not in (CATALOG.get_column_names(relation_name) or ()):
+                    continue
+                candidate_executions = [(query, executions) for query, executions in query_executions
+                                        if any(column_usage[:2] == (relation_name, column_name)
+                                               for column_usage in query.column_usages)]
+                for query, _ in candidate_executions:
+                    if query.fingerprint not in fingerprint_to_cost:
+                        fingerprint_to_cost[query.fingerprint] = get_cost(cursor, query)
+                # A query which cannot be planned, such as one of a relation dropped since, is left out
+                candidate_executions = [(query, executions) for query, executions in candidate_executions
+                                        if fingerprint_to_cost[query.fingerprint] is not None]
+                if not candidate_executions:
+                    continue
+                candidate_index = CandidateIndex(relation_name, column_name)
+                is_priced = is_hypothetical or is_building_allowed
+                costs_with_index = [None] * len(candidate_executions)
+                if is_priced:
+                    try:
+                        costs_with_index = get_costs_with_index(cursor, candidate_index,
+                                                                [query for query, _ in candidate_executions],
+                                                                is_hypothetical)
+                    except Exception as exception:
+                        logger.warning("Could not evaluate the index on {relation_name}.{column_name}; {exception}"
+                                       .format(relation_name=relation_name, column_name=column_name,
+                                               exception=exception))
+                        continue
+                cost = 0.0
+                cost_with_index = 0.0
+                for (query, executions), query_cost_with_index in zip(candidate_executions, costs_with_index):
+                    # A query which could not be planned with the index is left out of either cost
+                    if is_priced and query_cost_with_index is None:
+                        continue
+                    cost += executions * fingerprint_to_cost[query.fingerprint]
+                    if is_priced:
+                        cost_with_index += executions * query_cost_with_index
+                benefit = round(cost - cost_with_index, 2) if is_priced else None
+                usage_counts = column_to_usage_counts[relation_name, column_name]
+                advice.append({"relationName": relation_name,
+                               "columnName": column_name,
+                               "usages": {usage.value: count for usage, count in usage_counts.items()},
+                               "queries": len(candidate_executions),
+                               "executions": sum(executions for _, executions in candidate_executions),
+                               "estimatedCost": round(cost, 2),
+                               "estimatedCostWithIndex": round(cost_with_index, 2) if is_priced else None,
+                               "estimatedBenefit": benefit,
+                               "isAdvised": is_priced and benefit > 0,
+                               "isPriced": is_priced,
+                               "isHypothetical": is_hypothetical,
+                               "indexName": candidate_index.index_name,
+                               "definition": candidate_index.get_definition(is_concurrent=True)})
+        advice.sort(key=lambda candidate: (not candidate["isPriced"], -(candidate["estimatedBenefit"] or 0.0)))
+        return advice
+
+
+def get_cost(cursor, query: Query) -> Optional[float]:
+    try:
+        # Within a savepoint, so that a query which fails to be planned leaves the transaction around it usable
+        with transaction.atomic():
+            cursor.execute(COST_QUERY.format(query=query.get_value_without_semi_colon()))
+            explanation = cursor.fetchone()[0]
+    except Exception:
+        return None
+    # The driver only decodes the plan when it recognises the json type
+    if isinstance(explanation, str):
+        explanation = json.loads(explanation)
+    return explanation[0]["Plan"]["Total Cost"]
+
+
+def get_costs_with_index(cursor, candidate_index: CandidateIndex, queries: List[Query],
+                         is_hypothetical: bool) -> List[Optional[float]]:
+    if is_hypothetical:
+        cursor.execute(HYPOPG_CREATE_INDEX_QUERY, [candidate_index.get_definition()])
+        try:
+            return [get_cost(cursor, query) for query in queries]
+        finally:
+            cursor.execute(HYPOPG_RESET_QUERY)
+    with transaction.atomic():
+        cursor.execute(LOCK_TIMEOUT_QUERY.format(milliseconds=LOCK_TIMEOUT_MS))
+        cursor.execute(BUILD_TIMEOUT_QUERY.format(milliseconds=BUILD_TIMEOUT_MS))
+        cursor.execute(candidate_index.get_definition())
+        costs = [get_cost(cursor, query) for query in queries]
+        # The index has only been built to plan with
+        transaction.set_rollback(True)
+    return costs
+
+
+def create_indexes(advice: List[dict]) -> List[str]:
+    """
+    Creates the advised indexes concurrently, so that their relations stay writable while they are built, returning
+    the names of those created. A concurrent build cannot run within a transaction, hence it runs on a connection of
+    its own.
+    """
+    index_names = []
+    with psycopg.connect(get_connection_info(), autocommit=True) as db_connection:
+        for candidate in advice:
+            if not candidate["isAdvised"]:
+                continue
+            try:
+                db_connection.execute(candidate["definition"])
+            except Exception as exception:
+                logger.warning("Could not create the index on {relation_name}.{column_name}; {exception}"
+                               .format(relation_name=candidate["relationName"], column_name=candidate["columnName"],
+                                       exception=exception))
+                is_invalid = db_connection.execute(IS_INDEX_INVALID_QUERY, [candidate["indexName"]]).fetchone()
+                if is_invalid is not None and is_invalid[0]:
+                    db_connection.execute(DROP_INDEX_QUERY.format(index_name=candidate["indexName"]))
+                continue
+            index_names.append(candidate["indexName"])
+    return index_names
+
+
+INDEX_ADVISOR = IndexAdvisor()
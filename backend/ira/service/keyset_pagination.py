@@ -0,0 +1,121 @@
+from http import HTTPStatus
+from typing import List, Optional
+
+from django.core import signing
+from django.db import connection
+
+from ira.model.output import Output
+from ira.model.query import Query
+from ira.enum.result_format import ResultFormat
+from ira.service.db_executor import get_column_names
+from ira.service.result_encoder import format_result
+from ira.service.statement_guard import get_failure_output
+
+CONTINUATION_TOKEN_SALT = "ira.keyset_pagination"
+
+# The whole row is the key; ordering by the alias of the subquery orders by all output columns, which works
+# even when the output has duplicate column names.
+FIRST_PAGE_QUERY = "select * from ({query}) as page order by page limit %s"
+NEXT_PAGE_QUERY = "select * from ({query}) as page where page >= row({last_row_key}) order by page limit %s"
+
+TYPE_NAMES_QUERY = "select oid, format_type(oid, null) from pg_type where oid = any(%s)"
+
+OID_TO_TYPE_NAME = dict()
+
+
+class ContinuationToken:
+    """
+    Opaque, signed token pointing right after the last row of a page.
+    Rows are compared as records, in which two NULLs are equal and NULL is larger than any value. As rows may
+    repeat, the token also tracks how many copies of the last row have already been returned.
+    """
+
+    def __init__(self, fingerprint: str, column_types: List[str], last_row_key: list, number_of_last_rows_seen: int):
+        self.fingerprint = fingerprint
+        self.column_types = column_types
+        self.last_row_key = last_row_key
+        self.number_of_last_rows_seen = number_of_last_rows_seen
+
+    def dumps(self) -> str:
+        return signing.dumps({"f": self.fingerprint, "t": self.column_types,
+                              "k": self.last_row_key, "n": self.number_of_last_rows_seen},
+                             salt=CONTINUATION_TOKEN_SALT, compress=True)
+
+    @staticmethod
+    def loads(continuation_token: str):
+        try:
+            payload = signing.loads(continuation_token, salt=CONTINUATION_TOKEN_SALT)
+        except signing.BadSignature:
+            raise Exception("Continuation token is not valid")
+        return ContinuationToken(payload["f"], payload["t"], payload["k"], payload["n"])
+
+
+def execute_sql_query_page(query: Query, page_size: int, continuation_token: Optional[ContinuationToken] = None,
+                           result_format: ResultFormat = ResultFormat.OBJECTS,
+                           estimate: Optional[dict] = None) -> Output:
+    """Fetches the page of the query's result which starts right after the continuation token, by a keyset seek"""
+    if not query.is_dql:
+        raise Exception("Logical error; Only a query which returns rows can be paginated")
+    if continuation_token is not None and continuation_token.fingerprint != query.fingerprint:
+        raise Exception("Continuation token was issued for a different query")
+
+    # Escaping, as the query text is formatted by the driver alongside the parameters
+    subquery = query.get_value_without_semi_colon().replace("%", "%%")
+    with connection.cursor() as cursor:
+        try:
+            # One more row than needed tells whether there is a next page
+            if continuation_token is None:
+                number_of_rows_to_skip = 0
+                cursor.execute(FIRST_PAGE_QUERY.format(query=subquery), [page_size + 1])
+            else:
+                number_of_rows_to_skip = continuation_token.number_of_last_rows_seen
+                last_row_key = ", ".join("%s::{column_type}".format(column_type=column_type)
+                                         for column_type in continuation_token.column_types)
+                cursor.execute(NEXT_PAGE_QUERY.format(query=subquery, last_row_key=last_row_key),
+                               [*continuation_token.last_row_key, number_of_rows_to_skip + page_size + 1])
+            rows = cursor.fetchall()[number_of_rows_to_skip:]
+            column_names = get_column_names(cursor)
+            column_types = continuation_token.column_types if continuation_token \
+                else get_type_names(cursor, [column.type_code for column in cursor.description])
+        except Exception as exception:
+            return get_failure_output(query, exception)
+
+    page = rows[:page_size]
+    next_continuation_token = None
+    if len(rows) > page_size:
+        last_row = page[-1]
+        number_of_last_rows_seen = 0
+        for row in reversed(page):
+            if row != last_row:
+                break
+            number_of_last_rows_seen += 1
+        if number_of_last_rows_seen == len(page) and continuation_token is not None and \
+                to_json_values(last_row) == continuation_token.last_row_key:
+            number_of_last_rows_seen += continuation_token.number_of_last_rows_seen
+        next_continuation_token = ContinuationToken(query.fingerprint, column_types, to_json_values(last_row),
+                                                    number_of_last_rows_seen).dumps()
+
+    output = Output(HTTPStatus.OK, query, result=format_result(column_names, page, result_format), estimate=estimate)
+    output.value["continuationToken"] = next_continuation_token
+    return output
+
+
+def get_type_names(cursor, oids: List[int]) -> List[str]:
+    unknown_oids = [oid for oid in set(oids) if oid not in OID_TO_TYPE_NAME]
+    if unknown_oids:
+        cursor.execute(TYPE_NAMES_QUERY, [unknown_oids])
+        OID_TO_TYPE_NAME.update(cursor.fetchall())
+    return [OID_TO_TYPE_NAME[oid] for oid in oids]
+
+
+def to_json_values(row) -> list:
+    """Decimal, date and alike are kept in their full precision text form, which the typed row comparison casts back"""
+    return [to_json_value(value) for value in row]
+
+
+def to_json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (bytes, memoryview)):
+        return "\\x" + bytes(value).hex()
+    return str(value)
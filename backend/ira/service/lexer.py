@@ -3,6 +3,8 @@ from typing import List, Optional, Tuple
 from ira.model.token import Token
 from ira.constants import *
 
+JOIN_TOKEN_TYPES = (TokenType.LEFT_JOIN, TokenType.RIGHT_JOIN, TokenType.NATURAL_JOIN, TokenType.FULL_JOIN)
+
 
 class Lexer:
     """
@@ -15,9 +17,7 @@ class Lexer:
             **COMPARATIVE_OPERATORS_TO_TOKEN_TYPE
         }
 
-        self.unary_tokens = {
-            **UNARY_OPERATORS_TO_TOKEN_TYPE
-        }
+        self.max_reserved_token_length = max(len(reserved_token) for reserved_token in self.reserved_tokens)
 
         self.brackets = {
             OPEN_PARENTHESIS: TokenType.OPEN_PARENTHESIS, CLOSED_PARENTHESIS: TokenType.CLOSED_PARENTHESIS
@@ -25,19 +25,22 @@ class Lexer:
 
     def tokenize(self, input: str):
         """
-        Tokenize the input into known tokens
+        Tokenize the input into known tokens, in a single pass over the input
         Assumptions: One line of input and the expression is correct
         """
         tokens = []
-        cur_ident = ""
+        # The current identifier is kept as a slice of the input, so that it is never rebuilt character by character
+        ident_start = 0
+        ident_length = 0
+        is_ident_numeric = False
         length_of_input = len(input)
         index = 0
         while index < length_of_input:
             ch = input[index]
             # Check if it is the end of an identifier, which could be a whitespace or an operator
             if self.is_end_of_ident(ch):
-                if len(cur_ident) > 0:
-                    tokens.append(self.get_literal_token(cur_ident))
+                if ident_length > 0:
+                    tokens.append(self.get_literal_token(input[ident_start:ident_start + ident_length]))
                 #  Checking for <= and >=
                 if ch in (LESSER_THAN, GREATER_THAN):
                     if index + 1 < length_of_input:
@@ -48,66 +51,69 @@ class Lexer:
                 # Add the token for a reserved keyword
                 if ch in self.reserved_tokens:
                     tokens.append(Token(ch, self.reserved_tokens[ch]))
-                cur_ident = ""
+                ident_length = 0
+                is_ident_numeric = False
             elif ch in self.brackets:  # Tokenize parenthesised expressions
-                if len(cur_ident) > 0:
-                    tokens.append(self.get_literal_token(cur_ident))
-                    cur_ident = ""
+                if ident_length > 0:
+                    tokens.append(self.get_literal_token(input[ident_start:ident_start + ident_length]))
+                    ident_length = 0
+                    is_ident_numeric = False
                 # Add the bracket in the tokens
                 tokens.append(Token(ch, self.brackets[ch]))
             # Identify if it is an IDENT token or DIGIT token
-            elif not self.is_same_type(cur_ident, ch):
-                if len(cur_ident) > 0:
-                    tokens.append(self.get_literal_token(cur_ident))
-                cur_ident = ch
+            elif is_ident_numeric and not ch.isnumeric():
+                tokens.append(self.get_literal_token(input[ident_start:ident_start + ident_length]))
+                ident_start = index
+                ident_length = 1
+                is_ident_numeric = False
             else:  # Append the characters to get a word
-                cur_ident += ch
-                if cur_ident in self.reserved_tokens:
-                    tokens.append(
-                        Token(cur_ident, self.reserved_tokens[cur_ident]))
-                    cur_ident = ""
+                if ident_length == 0:
+                    ident_start = index
+                    is_ident_numeric = ch.isnumeric()
+                else:
+                    is_ident_numeric = is_ident_numeric and ch.isnumeric()
+                ident_length += 1
+                # Only words as short as the longest reserved keyword can be one
+                if ident_length <= self.max_reserved_token_length:
+                    cur_ident = input[ident_start:ident_start + ident_length]
+                    if cur_ident in self.reserved_tokens:
+                        tokens.append(Token(cur_ident, self.reserved_tokens[cur_ident]))
+                        ident_length = 0
+                        is_ident_numeric = False
             index += 1
-        if len(cur_ident) > 0:
-            tokens.append(self.get_literal_token(cur_ident))
+        if ident_length > 0:
+            tokens.append(self.get_literal_token(input[ident_start:ident_start + ident_length]))
         tokens = self.post_process(tokens)
         return tokens
 
     def post_process(self, tokens: List[Token]):
         new_tokens = []
-        while len(tokens) > 0:
-            current_token = tokens[0]
+        index = 0
+        length_of_tokens = len(tokens)
+        while index < length_of_tokens:
+            current_token = tokens[index]
             current_token_type = current_token.type
-            if current_token_type in self.unary_tokens:  # Unary operators
-                tokens = tokens[1:]  # Remove operator from the tokens
-
-                if tokens[0].type == TokenType.OPEN_PARENTHESIS:
-                    parenthesis_end = self.find_parenthesis_position(tokens,
-                                                                     '(', self.find_matching_parenthesis(tokens))
-                else:
-                    parenthesis_end = self.find_parenthesis_position(tokens, '(')
-
-                if parenthesis_end == -1:
-                    raise Exception(
-                        '( could not be found in a unary operation')
-                attributes = tokens[:parenthesis_end]
-                new_tokens.append(Token(current_token.value, current_token_type, attributes))
-                tokens = tokens[parenthesis_end:]  # Removing parameter from the tokens
-            elif current_token_type in (TokenType.LEFT_JOIN, TokenType.RIGHT_JOIN,
-                                        TokenType.NATURAL_JOIN, TokenType.FULL_JOIN, TokenType.SELECT,
-                                        TokenType.PROJECTION):
-                attributes = self.get_subsequent_attributes(tokens)
+            if current_token_type in (*JOIN_TOKEN_TYPES, TokenType.SELECT, TokenType.PROJECTION):
+                attributes = self.get_subsequent_attributes(tokens, index)
+                if current_token_type in JOIN_TOKEN_TYPES and not self.is_condition(attributes):
+                    # What follows the join is its right operand rather than a join condition
+                    attributes = []
                 if attributes:
                     new_tokens.append(Token(current_token.value, current_token_type, attributes))
                     # +1 to account for current_token
-                    tokens = tokens[len(attributes) + 1:]
+                    index += len(attributes) + 1
                 else:
-                    new_tokens.append(tokens[0])
-                    tokens = tokens[1:]
+                    new_tokens.append(current_token)
+                    index += 1
             else:
-                new_tokens.append(tokens[0])
-                tokens = tokens[1:]
+                new_tokens.append(current_token)
+                index += 1
         return new_tokens
 
+    def is_condition(self, attributes: List[Token]) -> bool:
+        return any(attribute.type in (*LOGICAL_OPERATORS_TOKEN_TYPE, *COMPARATIVE_OPERATORS_TOKEN_TYPE)
+                   for attribute in attributes)
+
     def is_end_of_ident(self, ch):
         return ch == " " or ch in self.reserved_tokens
 
@@ -117,11 +123,6 @@ class Lexer:
         else:
             return (Token(cur_ident, TokenType.IDENT))
 
-    def is_same_type(self, cur_ident, ch):
-        if cur_ident.isnumeric() and not ch.isnumeric():
-            return False
-        return True
-
     def find_matching_parenthesis(self, tokens: List[Token], start=0) -> Optional[int]:
         '''Finds the ending bracket which matches the opening bracket'''
         # Count of open brackets
@@ -144,22 +145,23 @@ class Lexer:
         '''
         r = -1
         for i in range(start, len(tokens)):
-            if tokens[i:][0].value == (token_value):
+            if tokens[i].value == token_value:
                 return i
         return r
 
-    def get_subsequent_attributes(self, tokens: List[Token]) -> List[Token]:
-        previous_token_type = tokens[0]
-        tokens = tokens[1:]
+    def get_subsequent_attributes(self, tokens: List[Token], operator_index: int = 0) -> List[Token]:
+        """Collects the attributes following the operator at operator_index, without copying the tokens"""
+        previous_token_type = None
+        start = operator_index + 1
         attributes = []
         parenthesis_stack = []
-        length_of_tokens = len(tokens)
+        length_of_tokens = len(tokens) - start
         if length_of_tokens == 1:
             # For scenario in which there is ideally an identifier after an operator with attribute capability,
             # there is no attributes to store, hence return nothing
             return attributes
         for current_token_index in range(length_of_tokens):
-            current_token = tokens[current_token_index]
+            current_token = tokens[start + current_token_index]
             current_token_type = current_token.type
             if current_token_type == TokenType.OPEN_PARENTHESIS:
                 # 2nd argument in the below list keeps track of whether there
@@ -170,6 +172,9 @@ class Lexer:
                     parenthesis_index, is_logical_comparative_operator_persisted = parenthesis_stack.pop()
                     if not is_logical_comparative_operator_persisted:
                             return attributes[:parenthesis_index]
+                elif tokens[operator_index].type in JOIN_TOKEN_TYPES:
+                    # Closes the parenthesis around the join, as in σ a=1 (R ⋈ S)
+                    return attributes
                 else:
                     raise Exception("Syntactical exception; Found a closed parenthesis before an open parenthesis")
             elif current_token_type == TokenType.IDENT and previous_token_type == TokenType.IDENT:
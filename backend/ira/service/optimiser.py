@@ -0,0 +1,257 @@
+from typing import Callable, List, Optional, Set
+
+from ira.constants import AND, CLOSED_PARENTHESIS, LITERAL_KEYWORDS, LITERAL_PREFIXES, OPEN_PARENTHESIS, \
+    PROJECTION, SELECT
+from ira.enum.token_type import TokenType
+from ira.model.token import Token
+from ira.service.parser import build_tree
+from ira.service.schema_inferrer import SET_OPERATOR_TOKEN_TYPES, get_common_column_names, \
+    get_output_column_names, infer_column_names
+
+CHILD_TOKEN_ATTRIBUTES = ("left_child_token", "right_child_token")
+
+
+def optimise(parsed_postfix_tokens: List[Token]) -> List[Token]:
+    """
+    Rewrites the operator tree into an equivalent one which leaves less for postgres to untangle, returning the
+    tokens of the rewritten tree in postfix order:
+    1. Cascaded selections are merged, and selections are pushed below joins, set operators and projections
+    2. Projections absorb the projections below them, and are pushed below natural joins and cartesian products
+    3. Projections under an operator which removes duplicates anyway skip their own distinct
+    A rewrite is only made where the inferred schemas prove it safe; conditions with qualified column names and
+    joins with conditions are left as they are, as a subquery would hide the relation names they refer to.
+    """
+    root_token = build_tree(parsed_postfix_tokens)
+    infer_column_names(parsed_postfix_tokens)
+    root_token = rewrite_top_down(root_token, push_down_selections)
+    root_token = rewrite_top_down(root_token, push_down_projections)
+    drop_redundant_distinct(root_token)
+    return get_postfix_tokens(root_token)
+
+
+def rewrite_top_down(root_token: Token, rewrite: Callable[[Token], Token]) -> Token:
+    """Replaces every token, from the root downwards, with the token the rewrite returns for it"""
+    root_token = rewrite(root_token)
+    pending = [root_token]
+    while pending:
+        token = pending.pop()
+        for child_token_attribute in CHILD_TOKEN_ATTRIBUTES:
+            child_token = getattr(token, child_token_attribute)
+            if child_token is not None:
+                child_token = rewrite(child_token)
+                setattr(token, child_token_attribute, child_token)
+                child_token.parent_token = token
+                pending.append(child_token)
+    return root_token
+
+
+def push_down_selections(token: Token) -> Token:
+    if token.type != TokenType.SELECT:
+        return token
+    # Merging the cascade of selections, as each of them is pushed down on its own
+    selection_tokens = []
+    base_token = token
+    while base_token.type == TokenType.SELECT:
+        selection_tokens.append(base_token)
+        base_token = base_token.right_child_token
+
+    remaining_selection_tokens = []
+    for selection_token in reversed(selection_tokens):
+        if not push_down_selection(selection_token, base_token):
+            remaining_selection_tokens.append(selection_token)
+    if not remaining_selection_tokens:
+        return base_token
+    return create_selection_token(remaining_selection_tokens, base_token)
+
+
+def push_down_selection(selection_token: Token, base_token: Token) -> bool:
+    """Moves the selection right above the children of the base token which it can be applied to, if any"""
+    column_names = get_referenced_column_names(selection_token)
+    # A selection which is bound to fail where it is stays there
+    if column_names is None or base_token.output_column_names is None or \
+            not column_names.issubset(base_token.output_column_names):
+        return False
+
+    base_token_type = base_token.type
+    if base_token_type == TokenType.PROJECTION:
+        child_token_attributes = ["right_child_token"]
+    elif base_token_type in SET_OPERATOR_TOKEN_TYPES:
+        left_column_names = base_token.left_child_token.output_column_names
+        right_column_names = base_token.right_child_token.output_column_names
+        # The right side names its columns differently, when they are named differently
+        child_token_attributes = ["left_child_token", "right_child_token"] \
+            if left_column_names == right_column_names else ["left_child_token"]
+        if base_token_type == TokenType.UNION and len(child_token_attributes) == 1:
+            return False
+    elif base_token.attributes or base_token_type not in (TokenType.NATURAL_JOIN, TokenType.CARTESIAN,
+                                                          TokenType.LEFT_JOIN, TokenType.RIGHT_JOIN,
+                                                          TokenType.ANTI_JOIN):
+        return False
+    else:
+        child_token_attribute = get_join_side_for_selection(base_token, column_names)
+        if child_token_attribute is None:
+            return False
+        child_token_attributes = [child_token_attribute]
+
+    for child_token_attribute in child_token_attributes:
+        child_token = getattr(base_token, child_token_attribute)
+        if child_token.output_column_names is None or not column_names.issubset(child_token.output_column_names):
+            return False
+    for child_token_attribute in child_token_attributes:
+        child_token = getattr(base_token, child_token_attribute)
+        setattr(base_token, child_token_attribute, create_selection_token([selection_token], child_token))
+    return True
+
+
+def get_join_side_for_selection(join_token: Token, column_names: Set[str]) -> Optional[str]:
+    left_column_names = join_token.left_child_token.output_column_names
+    right_column_names = join_token.right_child_token.output_column_names
+    if left_column_names is None or right_column_names is None:
+        return None
+    join_token_type = join_token.type
+    if join_token_type in (TokenType.NATURAL_JOIN, TokenType.CARTESIAN):
+        if join_token_type == TokenType.CARTESIAN and column_names.intersection(left_column_names,
+                                                                                right_column_names):
+            # Ambiguous above the cartesian product, hence it is kept there to fail as it would
+            return None
+        if column_names.issubset(left_column_names):
+            return "left_child_token"
+        if column_names.issubset(right_column_names):
+            return "right_child_token"
+        return None
+    # Only columns of the side whose rows are all kept, which the other side does not have, are safe to filter on
+    if join_token_type in (TokenType.LEFT_JOIN, TokenType.ANTI_JOIN):
+        kept_column_names, other_column_names, child_token_attribute = \
+            left_column_names, right_column_names, "left_child_token"
+    else:
+        kept_column_names, other_column_names, child_token_attribute = \
+            right_column_names, left_column_names, "right_child_token"
+    if column_names.issubset(kept_column_names) and not column_names.intersection(other_column_names):
+        return child_token_attribute
+    return None
+
+
+def push_down_projections(token: Token) -> Token:
+    if token.type != TokenType.PROJECTION or token.output_column_names is None:
+        return token
+    column_names = set(token.output_column_names)
+    # Walking down through the selections; a projection below them is absorbed as long as it keeps every column
+    # needed above it, since this projection removes the duplicates anyway
+    parent_token = token
+    base_token = token.right_child_token
+    selection_tokens = []
+    while base_token.type in (TokenType.SELECT, TokenType.PROJECTION):
+        if base_token.type == TokenType.SELECT:
+            referenced_column_names = get_referenced_column_names(base_token)
+            if referenced_column_names is None:
+                break
+            column_names.update(referenced_column_names)
+            selection_tokens.append(base_token)
+            parent_token = base_token
+        elif base_token.output_column_names is None or not column_names.issubset(base_token.output_column_names):
+            break
+        else:
+            parent_token.right_child_token = base_token.right_child_token
+        base_token = base_token.right_child_token
+    parent_token.right_child_token = base_token
+    for selection_token in reversed(selection_tokens):
+        selection_token.output_column_names = selection_token.right_child_token.output_column_names
+
+    if base_token.type in (TokenType.NATURAL_JOIN, TokenType.CARTESIAN) and not base_token.attributes:
+        push_down_projection_into_join(base_token, column_names)
+    return token
+
+
+def push_down_projection_into_join(join_token: Token, column_names: Set[str]):
+    left_column_names = join_token.left_child_token.output_column_names
+    right_column_names = join_token.right_child_token.output_column_names
+    if left_column_names is None or right_column_names is None:
+        return
+    common_column_names = get_common_column_names(left_column_names, right_column_names)
+    if join_token.type == TokenType.CARTESIAN and common_column_names:
+        return
+    # Natural join needs all of the common columns on both sides
+    column_names = column_names.union(common_column_names)
+    for child_token_attribute in CHILD_TOKEN_ATTRIBUTES:
+        child_token = getattr(join_token, child_token_attribute)
+        kept_column_names = [column_name for column_name in child_token.output_column_names
+                             if column_name in column_names]
+        if kept_column_names and len(kept_column_names) < len(child_token.output_column_names):
+            setattr(join_token, child_token_attribute, create_projection_token(kept_column_names, child_token))
+
+
+def drop_redundant_distinct(root_token: Token):
+    """
+    A projection only needs distinct when no operator above it removes the duplicates; projections, union,
+    intersection and difference all do, and every other operator gives the same rows when its operands have no
+    duplicates, up to duplicates.
+    """
+    pending = [(root_token, False)]
+    while pending:
+        token, is_deduplicated_above = pending.pop()
+        if token.type == TokenType.PROJECTION:
+            token.is_distinct = not is_deduplicated_above
+            is_deduplicated_above = True
+        elif token.type in SET_OPERATOR_TOKEN_TYPES:
+            is_deduplicated_above = True
+        for child_token_attribute in CHILD_TOKEN_ATTRIBUTES:
+            child_token = getattr(token, child_token_attribute)
+            if child_token is not None:
+                pending.append((child_token, is_deduplicated_above))
+
+
+def get_postfix_tokens(root_token: Token) -> List[Token]:
+    postfix_tokens = []
+    pending = [root_token]
+    while pending:
+        token = pending.pop()
+        postfix_tokens.append(token)
+        for child_token_attribute in CHILD_TOKEN_ATTRIBUTES:
+            child_token = getattr(token, child_token_attribute)
+            if child_token is not None:
+                pending.append(child_token)
+    # Visited as root, right, left; reversing it gives left, right, root
+    postfix_tokens.reverse()
+    return postfix_tokens
+
+
+def get_referenced_column_names(selection_token: Token) -> Optional[Set[str]]:
+    """Names of the columns the condition refers to, or None if it refers to a column by a qualified name"""
+    column_names = set()
+    for attribute_token in selection_token.attributes.value:
+        if attribute_token.type != TokenType.IDENT or attribute_token.value.startswith(LITERAL_PREFIXES) or \
+                attribute_token.value.lower() in LITERAL_KEYWORDS:
+            continue
+        if "." in attribute_token.value or attribute_token.value.startswith('"'):
+            return None
+        column_names.add(attribute_token.value)
+    return column_names
+
+
+def create_selection_token(selection_tokens: List[Token], child_token: Token) -> Token:
+    """Selection on the conjunction of the conditions of the selections, each in parenthesis"""
+    if len(selection_tokens) == 1:
+        attribute_tokens = selection_tokens[0].attributes.value
+    else:
+        attribute_tokens = [Token(OPEN_PARENTHESIS, TokenType.OPEN_PARENTHESIS)]
+        for index, selection_token in enumerate(selection_tokens):
+            if index > 0:
+                attribute_tokens.append(Token(AND, TokenType.AND))
+            attribute_tokens.extend([Token(OPEN_PARENTHESIS, TokenType.OPEN_PARENTHESIS),
+                                     *selection_token.attributes.value,
+                                     Token(CLOSED_PARENTHESIS, TokenType.CLOSED_PARENTHESIS)])
+        # The outermost parentheses are stripped when the conditions are turned into text
+        attribute_tokens.append(Token(CLOSED_PARENTHESIS, TokenType.CLOSED_PARENTHESIS))
+    return create_unary_token(Token(SELECT, TokenType.SELECT, attribute_tokens), child_token)
+
+
+def create_projection_token(column_names: List[str], child_token: Token) -> Token:
+    return create_unary_token(Token(PROJECTION, TokenType.PROJECTION, [Token(",".join(column_names), TokenType.IDENT)]),
+                              child_token)
+
+
+def create_unary_token(token: Token, child_token: Token) -> Token:
+    token.right_child_token = child_token
+    child_token.parent_token = token
+    token.output_column_names = get_output_column_names(token)
+    return token
@@ -1,6 +1,7 @@
 from ira.model.token import Token
 from typing import List
 from ira.constants import *
+from ira.service.util import is_binary_operator, is_unary_operator
 
 
 class Parser:
@@ -37,5 +38,42 @@ class Parser:
 
         return output_queue
 
+    def parse_tree(self, tokens: List[Token]) -> Token:
+        """Parses the tokens into an operator tree, returning its root"""
+        return build_tree(self.parse(tokens))
+
     def is_binary_op(self, token: Token):
         return self.precedence[token.type] == 2
+
+
+def build_tree(parsed_postfix_tokens: List[Token]) -> Token:
+    """
+    Links the postfix tokens into an operator tree in one pass; a unary operator keeps its operand as the right child.
+    Children always precede their parent in postfix order, hence the postfix order is also a post-order of the tree.
+    """
+    operand_stack: List[Token] = []
+    for index, token in enumerate(parsed_postfix_tokens):
+        token.post_fix_index = index
+        token.parent_token = None
+        token.left_child_token = None
+        token.right_child_token = None
+        if is_unary_operator(token.type):
+            if not operand_stack:
+                raise Exception("Logical error; Relational algebra query is not well formed.")
+            token.right_child_token = operand_stack.pop()
+            token.right_child_token.parent_token = token
+        elif is_binary_operator(token.type):
+            if len(operand_stack) < 2:
+                raise Exception("Logical error; Relational algebra query is not well formed.")
+            token.right_child_token = operand_stack.pop()
+            token.left_child_token = operand_stack.pop()
+            token.right_child_token.parent_token = token
+            token.left_child_token.parent_token = token
+        operand_stack.append(token)
+    if len(operand_stack) != 1:
+        raise Exception("Logical error; Relational algebra query is not well formed.")
+
+    # Parents come after their children in postfix order, hence levels are assigned walking it backwards
+    for token in reversed(parsed_postfix_tokens):
+        token.level = token.parent_token.level + 1 if token.parent_token is not None else 0
+    return operand_stack[0]
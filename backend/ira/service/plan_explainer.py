@@ -0,0 +1,397 @@
+import json
+import re
+from http import HTTPStatus
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from django.db import connection
+
+from ira.enum.token_type import TokenType
+from ira.model.output import Output
+from ira.model.token import Token
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.schema_inferrer import SET_OPERATOR_TOKEN_TYPES
+from ira.service.statement_guard import get_failure_output
+from ira.service.transformer import get_child_tokens
+from ira.service.util import is_unary_operator
+
+EXPLAIN_QUERY = "explain (format json{options}) {query}"
+
+ANALYZE_OPTION = ", analyze"
+
+BUFFERS_OPTION = ", buffers"
+
+# Aliases the transformer gives to the subquery of the token with the postfix index, and to the right side of the
+# anti join with the postfix index
+SUBQUERY_ALIAS_PATTERN = re.compile(r"q(\d+)")
+ANTI_JOIN_ALIAS_PATTERN = re.compile(r"cq(\d+)")
+
+CTE_SUBPLAN_NAME_PREFIX = "CTE "
+
+# Plans evaluated on the side rather than as an input of their parent node, such as a materialised CTE
+SIDE_PLAN_PARENT_RELATIONSHIPS = ("InitPlan", "SubPlan")
+
+DEDUPLICATING_PLAN_NODE_TYPES = ("Aggregate", "Unique", "Group")
+
+SET_OPERATION_PLAN_NODE_TYPE = "SetOp"
+
+SCAN_CONDITION_KEYS = ("Filter", "Index Cond", "Recheck Cond")
+
+RA_POSTFIX_INDEX_KEY = "raPostfixIndex"
+
+RA_POSTFIX_INDEXES_KEY = "raPostfixIndexes"
+
+PLAN_NODE_STATISTICS_KEYS = ("planNodeType", "isMerged", "estimatedRows", "estimatedCost", "actualRows",
+                             "actualTime", "loops")
+
+
+def explain_ra_query(ra_query: str, is_analysed: bool = False, is_buffers_reported: bool = False) -> Output:
+    """
+    Explains the SQL query compiled from the RA query. Every node of the plan is annotated with the postfix indexes
+    of the RA operators it evaluates, and every RA operator of the compiled operator tree is reported alongside the
+    estimated and, once analysed, actual figures of the plan node which outputs its rows.
+    """
+    parsed_postfix_tokens, query = COMPILE_CACHE.compile_operator_tree(ra_query)
+    if not query.is_dql:
+        raise Exception("Logical error; Only a query which returns rows can be explained")
+    options = (ANALYZE_OPTION if is_analysed else "") + (BUFFERS_OPTION if is_buffers_reported else "")
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(EXPLAIN_QUERY.format(options=options, query=query.get_value_without_semi_colon()))
+            explanation = cursor.fetchone()[0]
+        except Exception as exception:
+            return get_failure_output(query, exception)
+    # The driver only decodes the plan when it recognises the json type
+    if isinstance(explanation, str):
+        explanation = json.loads(explanation)
+    explanation = explanation[0]
+
+    operator_tree = OperatorTree(parsed_postfix_tokens)
+    plan = explanation["Plan"]
+    annotate_plan(plan, operator_tree)
+    return Output(HTTPStatus.OK,
+                  query,
+                  result={"plan": plan,
+                          "operators": get_operator_statistics(plan, operator_tree),
+                          "planningTime": explanation.get("Planning Time"),
+                          "executionTime": explanation.get("Execution Time")})
+
+
+class OperatorTree:
+    """Operator tree the SQL query was formed from, where tokens are referred to by their postfix index"""
+
+    def __init__(self, parsed_postfix_tokens: List[Token]):
+        self.tokens = parsed_postfix_tokens
+        self.depths = [0] * len(parsed_postfix_tokens)
+        # Parents follow their children in postfix order
+        for token in reversed(parsed_postfix_tokens):
+            if token.parent_token is not None:
+                self.depths[token.post_fix_index] = self.depths[token.parent_token.post_fix_index] + 1
+        self.relation_to_indexes: Dict[str, List[int]] = dict()
+        self.cte_name_to_indexes: Dict[str, List[int]] = dict()
+        for token in parsed_postfix_tokens:
+            if token.type == TokenType.IDENT:
+                self.relation_to_indexes.setdefault(token.value, []).append(token.post_fix_index)
+            if token.cte_name is not None:
+                self.cte_name_to_indexes.setdefault(token.cte_name, []).append(token.post_fix_index)
+        self.counterpart_indexes = self.get_counterpart_indexes()
+
+    def get_parent_index(self, index: int) -> Optional[int]:
+        parent_token = self.tokens[index].parent_token
+        return parent_token.post_fix_index if parent_token is not None else None
+
+    def get_ancestor_indexes(self, index: int) -> List[int]:
+        """The index itself, followed by the indexes of its ancestors up to the root"""
+        ancestor_indexes = []
+        while index is not None:
+            ancestor_indexes.append(index)
+            index = self.get_parent_index(index)
+        return ancestor_indexes
+
+    def is_ancestor(self, ancestor_index: int, index: int) -> bool:
+        """Whether the former token is the latter one, or one of its ancestors"""
+        while index is not None and self.depths[index] > self.depths[ancestor_index]:
+            index = self.get_parent_index(index)
+        return index == ancestor_index
+
+    def get_descendant_indexes(self, ancestor_index: int, indexes: List[int]) -> List[int]:
+        return [index for index in indexes if self.is_ancestor(ancestor_index, index)]
+
+    def get_branch_indexes(self, ancestor_index: int, indexes: List[int]) -> Set[int]:
+        """Indexes of the children of the ancestor, under which the tokens strictly below it are"""
+        branch_indexes = set()
+        for index in indexes:
+            if index != ancestor_index and self.is_ancestor(ancestor_index, index):
+                while self.get_parent_index(index) != ancestor_index:
+                    index = self.get_parent_index(index)
+                branch_indexes.add(index)
+        return branch_indexes
+
+    def get_nearest_ancestor_indexes(self, indexes: List[int], is_matching: Callable[[Token], bool]) -> List[int]:
+        nearest_ancestor_indexes = set()
+        for index in indexes:
+            for ancestor_index in self.get_ancestor_indexes(index):
+                if is_matching(self.tokens[ancestor_index]):
+                    nearest_ancestor_indexes.add(ancestor_index)
+                    break
+        return sorted(nearest_ancestor_indexes)
+
+    def get_lowest_common_ancestor_indexes(self, candidate_index_lists: List[List[int]]) -> List[int]:
+        """
+        The deepest tokens which have a candidate of every input strictly below them, where the inputs do not all
+        come from the same branch. A relation read several times is ambiguous between its occurrences, hence so
+        may be the tokens, until the nodes above settle on one of them. Postgres may reorder joins, in which case
+        the inputs need not be apart, and the node is traced to their lowest common ancestor.
+        """
+        ancestor_index_sets = [{ancestor_index for index in candidate_indexes
+                                for ancestor_index in self.get_ancestor_indexes(index)}
+                               for candidate_indexes in candidate_index_lists]
+        common_ancestor_indexes = sorted(set.intersection(*ancestor_index_sets),
+                                         key=lambda index: (-self.depths[index], index))
+        lowest_common_ancestor_indexes = []
+        for ancestor_index in common_ancestor_indexes:
+            if lowest_common_ancestor_indexes and \
+                    self.depths[ancestor_index] < self.depths[lowest_common_ancestor_indexes[0]]:
+                break
+            branch_index_sets = [self.get_branch_indexes(ancestor_index, candidate_indexes)
+                                 for candidate_indexes in candidate_index_lists]
+            if all(branch_index_sets) and len(set.union(*branch_index_sets)) > 1:
+                lowest_common_ancestor_indexes.append(ancestor_index)
+        return lowest_common_ancestor_indexes or common_ancestor_indexes[:1]
+
+    def get_counterpart_indexes(self) -> Dict[int, int]:
+        """
+        Maps every repeated occurrence of a common table expression, and every token under it, to the matching
+        token of its first occurrence, as only the latter is formed into SQL
+        """
+        counterpart_indexes = dict()
+        for indexes in self.cte_name_to_indexes.values():
+            first_token = self.tokens[indexes[0]]
+            for index in indexes[1:]:
+                counterpart_indexes[index] = indexes[0]
+                pending = list(zip(get_child_tokens(self.tokens[index]), get_child_tokens(first_token)))
+                while pending:
+                    token, counterpart_token = pending.pop()
+                    counterpart_indexes[token.post_fix_index] = counterpart_token.post_fix_index
+                    if token.type != TokenType.IDENT:
+                        pending.extend(zip(get_child_tokens(token), get_child_tokens(counterpart_token)))
+        return counterpart_indexes
+
+
+def annotate_plan(plan: dict, operator_tree: OperatorTree):
+    """
+    Postgres flattens most subqueries into the query around them, hence their aliases rarely make it into the
+    plan. Plan nodes are therefore traced bottom-up: scans by the relation, CTE or subquery alias they read,
+    joins and set operations by the lowest RA operator their inputs have in common, and deduplications by the
+    nearest projection or set operator above their input. Going top-down, every node then takes over the RA
+    operators between its own one and the one of its parent node, which Postgres merged into it, such as a
+    selection turned into the filter of a scan.
+    """
+    candidate_indexes = dict()
+    for plan_node in get_plan_nodes_bottom_up(plan):
+        input_candidate_indexes = [candidate_indexes[id(input_plan_node)]
+                                   for input_plan_node in get_input_plan_nodes(plan_node)]
+        candidate_indexes[id(plan_node)] = get_candidate_indexes(plan_node, input_candidate_indexes, operator_tree)
+
+    pending = [(plan, None)]
+    while pending:
+        plan_node, parent_index = pending.pop()
+        indexes = candidate_indexes[id(plan_node)]
+        if parent_index is not None:
+            # A materialised common table expression is only evaluated as its first occurrence
+            indexes = operator_tree.get_descendant_indexes(parent_index, indexes) or \
+                operator_tree.get_descendant_indexes(parent_index, [operator_tree.counterpart_indexes.get(index, index)
+                                                                    for index in indexes]) or indexes
+        index = indexes[0] if indexes else parent_index
+        merged_indexes = get_merged_indexes(index, parent_index, plan_node is plan, operator_tree)
+        plan_node[RA_POSTFIX_INDEX_KEY] = merged_indexes[-1] if merged_indexes else None
+        plan_node[RA_POSTFIX_INDEXES_KEY] = merged_indexes
+
+        input_plan_nodes = get_input_plan_nodes(plan_node)
+        for input_plan_node, input_indexes in zip(input_plan_nodes, get_preferred_input_indexes(
+                index, [candidate_indexes[id(input_plan_node)] for input_plan_node in input_plan_nodes],
+                operator_tree)):
+            candidate_indexes[id(input_plan_node)] = input_indexes
+            pending.append((input_plan_node, index))
+        for side_plan_node in get_side_plan_nodes(plan_node):
+            pending.append((side_plan_node, None))
+
+
+def get_candidate_indexes(plan_node: dict, input_candidate_indexes: List[List[int]],
+                          operator_tree: OperatorTree) -> List[int]:
+    alias_indexes = get_alias_indexes(plan_node, operator_tree)
+    if alias_indexes is not None:
+        return alias_indexes
+    input_candidate_indexes = [candidate_indexes for candidate_indexes in input_candidate_indexes
+                               if candidate_indexes]
+    if len(input_candidate_indexes) > 1:
+        return operator_tree.get_lowest_common_ancestor_indexes(input_candidate_indexes)
+    if not input_candidate_indexes:
+        return []
+    indexes = input_candidate_indexes[0]
+    plan_node_type = plan_node["Node Type"]
+    if plan_node_type in DEDUPLICATING_PLAN_NODE_TYPES:
+        return operator_tree.get_nearest_ancestor_indexes(indexes, is_deduplicating) or indexes
+    if plan_node_type == SET_OPERATION_PLAN_NODE_TYPE:
+        return operator_tree.get_nearest_ancestor_indexes(
+            indexes, lambda token: token.type in (TokenType.INTERSECTION, TokenType.DIFFERENCE)) or indexes
+    # Nodes such as sorts and hashes prepare their input for the node above
+    return indexes
+
+
+def get_alias_indexes(plan_node: dict, operator_tree: OperatorTree) -> Optional[List[int]]:
+    subplan_name = plan_node.get("Subplan Name", "")
+    if subplan_name.startswith(CTE_SUBPLAN_NAME_PREFIX):
+        indexes = operator_tree.cte_name_to_indexes.get(subplan_name[len(CTE_SUBPLAN_NAME_PREFIX):])
+        if indexes:
+            # A common table expression is formed out of its first occurrence
+            return indexes[:1]
+
+    relation_name = plan_node.get("Relation Name")
+    if relation_name in operator_tree.relation_to_indexes:
+        indexes = operator_tree.relation_to_indexes[relation_name]
+        if len(indexes) > 1:
+            # Telling the occurrences of a relation apart by whether they are filtered, whenever that is enough
+            is_filtered = any(key in plan_node for key in SCAN_CONDITION_KEYS)
+            indexes = [index for index in indexes if is_selected(operator_tree.tokens[index]) == is_filtered] or \
+                indexes
+        return indexes
+
+    alias = plan_node.get("Alias", "")
+    match = SUBQUERY_ALIAS_PATTERN.fullmatch(alias)
+    if match and int(match.group(1)) < len(operator_tree.tokens):
+        return [int(match.group(1))]
+    match = ANTI_JOIN_ALIAS_PATTERN.fullmatch(alias)
+    if match and int(match.group(1)) < len(operator_tree.tokens):
+        anti_join_token = operator_tree.tokens[int(match.group(1))]
+        if anti_join_token.type == TokenType.ANTI_JOIN:
+            return [anti_join_token.right_child_token.post_fix_index]
+    indexes = operator_tree.cte_name_to_indexes.get(plan_node.get("CTE Name"))
+    if indexes:
+        return indexes
+    return None
+
+
+def get_preferred_input_indexes(index: Optional[int], input_candidate_indexes: List[List[int]],
+                                operator_tree: OperatorTree) -> List[List[int]]:
+    """
+    Inputs of a node come from different branches of its RA operator; an input which is ambiguous between several
+    branches leaves the branches which other inputs can only come from to them
+    """
+    if index is None or len(input_candidate_indexes) < 2:
+        return input_candidate_indexes
+    input_branch_indexes = [operator_tree.get_branch_indexes(index, candidate_indexes)
+                            for candidate_indexes in input_candidate_indexes]
+    used_branch_indexes = set().union(*(branch_indexes for branch_indexes in input_branch_indexes
+                                        if len(branch_indexes) == 1))
+    preferred_input_indexes = []
+    for candidate_indexes, branch_indexes in zip(input_candidate_indexes, input_branch_indexes):
+        unused_branch_indexes = branch_indexes - used_branch_indexes
+        if len(branch_indexes) > 1 and unused_branch_indexes:
+            branch_index = min(unused_branch_indexes)
+            used_branch_indexes.add(branch_index)
+            candidate_indexes = [candidate_index for candidate_index in candidate_indexes
+                                 if operator_tree.is_ancestor(branch_index, candidate_index)]
+        preferred_input_indexes.append(candidate_indexes)
+    return preferred_input_indexes
+
+
+def get_merged_indexes(index: Optional[int], parent_index: Optional[int], is_plan_root: bool,
+                       operator_tree: OperatorTree) -> List[int]:
+    """Indexes of the RA operators the plan node evaluates, from its own one up to the one whose rows it outputs"""
+    if index is None:
+        return []
+    if index == parent_index:
+        # Prepares the input of its parent node, such as a sort or a hash does
+        return [index]
+    ancestor_indexes = operator_tree.get_ancestor_indexes(index)
+    if is_plan_root:
+        # The root of the plan outputs the rows of the whole RA query
+        return ancestor_indexes
+    if parent_index is None or parent_index not in ancestor_indexes:
+        return [index]
+    return ancestor_indexes[:ancestor_indexes.index(parent_index)]
+
+
+def get_operator_statistics(plan: dict, operator_tree: OperatorTree) -> List[dict]:
+    """
+    Figures of every RA operator are those of the topmost plan node evaluating it; the operators under a repeated
+    occurrence of a common table expression share the figures of their counterparts under its first occurrence
+    """
+    index_to_plan_node = dict()
+    for plan_node in get_plan_nodes_top_down(plan):
+        for index in plan_node[RA_POSTFIX_INDEXES_KEY]:
+            index_to_plan_node.setdefault(index, plan_node)
+
+    ra_expressions = []
+    operator_statistics = []
+    for token in operator_tree.tokens:
+        ra_expressions.append(get_ra_expression(token, ra_expressions))
+        index = token.post_fix_index
+        plan_node = index_to_plan_node.get(index)
+        while plan_node is None and index in operator_tree.counterpart_indexes:
+            index = operator_tree.counterpart_indexes[index]
+            plan_node = index_to_plan_node.get(index)
+        operator_statistics.append({"postfixIndex": token.post_fix_index,
+                                    "operator": token.value,
+                                    "raExpression": ra_expressions[-1],
+                                    **get_plan_node_statistics(plan_node)})
+    return operator_statistics
+
+
+def get_plan_node_statistics(plan_node: Optional[dict]) -> dict:
+    if plan_node is None:
+        return dict.fromkeys(PLAN_NODE_STATISTICS_KEYS)
+    # Actual figures are averaged over the loops of the node
+    loops = plan_node.get("Actual Loops")
+    return {"planNodeType": plan_node["Node Type"],
+            "isMerged": len(plan_node[RA_POSTFIX_INDEXES_KEY]) > 1,
+            "estimatedRows": plan_node.get("Plan Rows"),
+            "estimatedCost": plan_node.get("Total Cost"),
+            "actualRows": plan_node.get("Actual Rows", 0) * loops if loops is not None else None,
+            "actualTime": plan_node.get("Actual Total Time", 0) * loops if loops is not None else None,
+            "loops": loops}
+
+
+def get_ra_expression(token: Token, ra_expressions: List[str]) -> str:
+    """RA expression of the token, out of the expressions of its children which precede it in postfix order"""
+    if token.type == TokenType.IDENT:
+        return token.value
+    attributes = " {attributes}".format(attributes=token.attributes) if token.attributes else ""
+    if is_unary_operator(token.type):
+        return "{operator}{attributes} ({operand})".format(
+            operator=token.value, attributes=attributes,
+            operand=ra_expressions[token.right_child_token.post_fix_index])
+    return "({left_operand}) {operator}{attributes} ({right_operand})".format(
+        left_operand=ra_expressions[token.left_child_token.post_fix_index], operator=token.value,
+        attributes=attributes, right_operand=ra_expressions[token.right_child_token.post_fix_index])
+
+
+def is_deduplicating(token: Token) -> bool:
+    return (token.type == TokenType.PROJECTION and token.is_distinct) or token.type in SET_OPERATOR_TOKEN_TYPES
+
+
+def is_selected(token: Token) -> bool:
+    return token.parent_token is not None and token.parent_token.type == TokenType.SELECT
+
+
+def get_input_plan_nodes(plan_node: dict) -> List[dict]:
+    return [child_plan_node for child_plan_node in plan_node.get("Plans", [])
+            if child_plan_node.get("Parent Relationship") not in SIDE_PLAN_PARENT_RELATIONSHIPS]
+
+
+def get_side_plan_nodes(plan_node: dict) -> List[dict]:
+    return [child_plan_node for child_plan_node in plan_node.get("Plans", [])
+            if child_plan_node.get("Parent Relationship") in SIDE_PLAN_PARENT_RELATIONSHIPS]
+
+
+def get_plan_nodes_top_down(plan: dict) -> Iterator[dict]:
+    pending = [plan]
+    while pending:
+        plan_node = pending.pop()
+        yield plan_node
+        pending.extend(reversed(plan_node.get("Plans", [])))
+
+
+def get_plan_nodes_bottom_up(plan: dict) -> List[dict]:
+    # Every node comes after its children when the top-down order is reversed
+    return list(get_plan_nodes_top_down(plan))[::-1]
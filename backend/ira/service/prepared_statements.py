@@ -0,0 +1,166 @@
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from django.db import DatabaseError
+from psycopg2 import errorcodes
+from psycopg2.extensions import TRANSACTION_STATUS_INTRANS
+
+from backend.settings import PREPARED_STATEMENT_MAX_ENTRIES, PREPARED_STATEMENT_THRESHOLD
+from ira.service.compile_cache import get_catalog_fingerprint
+from ira.service.statement_guard import get_sql_state
+
+STATEMENT_NAME = "ira_{index}"
+PREPARE_QUERY = "prepare {name} as {query}"
+EXECUTE_QUERY = "execute {name}"
+EXECUTE_WITH_PARAMETERS_QUERY = "execute {name} ({placeholders})"
+DEALLOCATE_QUERY = "deallocate {name}"
+DEALLOCATE_ALL_QUERY = "deallocate all"
+# Sent along with the execution of a statement in a transaction, so that a statement which postgres refuses to execute
+# does not abort the transaction; left unreleased, as releasing it would take a round trip of its own
+SAVEPOINT_QUERY = "savepoint ira_prepared_execution; "
+ROLLBACK_TO_SAVEPOINT_QUERY = "rollback to savepoint ira_prepared_execution"
+
+# Placeholders of a shape, and the percent signs doubled within it
+PLACEHOLDER_PATTERN = re.compile(r"%[s%]")
+
+
+class PreparedStatements:
+    """
+    Statements prepared on a single connection for the shapes of the queries executed on it, so that a query whose
+    shape recurs skips parsing, and planning once postgres settles on a generic plan. A shape is executed as it is
+    until it has been executed the threshold number of times, as preparing takes a round trip of its own which a
+    query executed once never pays back. Prepared statements outlive transactions, hence they last as long as the
+    connection; the least recently used ones are deallocated beyond the maximum, and all of them once the catalog
+    changes, as postgres refuses to execute a statement whose result columns have changed. A statement refused as
+    such before the catalog has been read again is deallocated, and its query executed as it is.
+    """
+
+    def __init__(self, max_entries: int = PREPARED_STATEMENT_MAX_ENTRIES,
+                 threshold: int = PREPARED_STATEMENT_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        # Shape to the name of its statement, or to the number of times it has been executed unprepared
+        self.entries = OrderedDict()
+        self.catalog_fingerprint = get_catalog_fingerprint()
+        self.next_index = 0
+        self.prepares = 0
+        self.prepared_executions = 0
+        self.unprepared_executions = 0
+        self.evictions = 0
+        self.stale_statements = 0
+
+    def execute(self, cursor, sql_query: str, shape: Optional[str] = None, parameters: Sequence = ()):
+        """Executes the query, through the statement prepared for its shape if there is one"""
+        if shape is None or self.max_entries <= 0:
+            cursor.execute(sql_query)
+            return
+        self._deallocate_all_if_catalog_changed(cursor)
+        entry = self.entries.get(shape)
+        if isinstance(entry, str):
+            self.entries.move_to_end(shape)
+            self._execute_statement(cursor, entry, sql_query, shape, parameters)
+            return
+        if entry is None:
+            # Before the query, whose result is to be left for the cursor to fetch
+            self._make_room(cursor)
+        executions = entry or 0
+        if executions + 1 < self.threshold:
+            cursor.execute(sql_query)
+            # Only counted once executed, so that a query which fails is never prepared
+            self.unprepared_executions += 1
+            self.entries[shape] = executions + 1
+            self.entries.move_to_end(shape)
+            return
+        name = STATEMENT_NAME.format(index=self.next_index)
+        self.next_index += 1
+        cursor.execute(PREPARE_QUERY.format(name=name, query=to_positional_parameters(shape)))
+        self.prepares += 1
+        self.entries[shape] = name
+        self.entries.move_to_end(shape)
+        cursor.execute(get_execute_query(name, len(parameters)), parameters)
+        self.prepared_executions += 1
+
+    def get_stats(self) -> dict:
+        return {"statements": sum(isinstance(entry, str) for entry in list(self.entries.values())),
+                "prepares": self.prepares,
+                "preparedExecutions": self.prepared_executions,
+                "unpreparedExecutions": self.unprepared_executions,
+                "evictions": self.evictions,
+                "staleStatements": self.stale_statements}
+
+    def _execute_statement(self, cursor, name: str, sql_query: str, shape: str, parameters: Sequence):
+        is_in_transaction = cursor.connection.get_transaction_status() == TRANSACTION_STATUS_INTRANS
+        execute_query = get_execute_query(name, len(parameters))
+        try:
+            cursor.execute(SAVEPOINT_QUERY + execute_query if is_in_transaction else execute_query, parameters)
+        except DatabaseError as exception:
+            # The result of a relation the statement reads has changed its columns or their types
+            if get_sql_state(exception) != errorcodes.FEATURE_NOT_SUPPORTED:
+                raise
+            if is_in_transaction:
+                cursor.execute(ROLLBACK_TO_SAVEPOINT_QUERY)
+            cursor.execute(DEALLOCATE_QUERY.format(name=name))
+            del self.entries[shape]
+            self.stale_statements += 1
+            cursor.execute(sql_query)
+            self.unprepared_executions += 1
+            return
+        self.prepared_executions += 1
+
+    def _make_room(self, cursor):
+        """Evicts the least recently used shapes until there is room for another one"""
+        while self.entries and len(self.entries) >= self.max_entries:
+            _, evicted_entry = self.entries.popitem(last=False)
+            if isinstance(evicted_entry, str):
+                cursor.execute(DEALLOCATE_QUERY.format(name=evicted_entry))
+                self.evictions += 1
+
+    def _deallocate_all_if_catalog_changed(self, cursor):
+        catalog_fingerprint = get_catalog_fingerprint()
+        if catalog_fingerprint != self.catalog_fingerprint:
+            if any(isinstance(entry, str) for entry in self.entries.values()):
+                cursor.execute(DEALLOCATE_ALL_QUERY)
+            self.entries.clear()
+            self.catalog_fingerprint = catalog_fingerprint
+
+
+def get_execute_query(name: str, number_of_parameters: int) -> str:
+    if number_of_parameters == 0:
+        return EXECUTE_QUERY.format(name=name)
+    return EXECUTE_WITH_PARAMETERS_QUERY.format(name=name, placeholders=", ".join(["%s"] * number_of_parameters))
+
+
+def to_positional_parameters(shape: str) -> str:
+    """Numbers the placeholders of the shape as postgres does the parameters of a prepared statement"""
+    indexes = iter(range(1, shape.count("%s") + 1))
+    return PLACEHOLDER_PATTERN.sub(lambda match: "%" if match.group() == "%%" else "${index}".format(
+        index=next(indexes)), shape)
+
+
+PREPARED_STATEMENTS = weakref.WeakKeyDictionary()
+
+PREPARED_STATEMENTS_LOCK = threading.Lock()
+
+
+def get_prepared_statements(database_connection) -> PreparedStatements:
+    """Statements of the driver connection, which go away along with it"""
+    with PREPARED_STATEMENTS_LOCK:
+        prepared_statements = PREPARED_STATEMENTS.get(database_connection)
+        if prepared_statements is None:
+            prepared_statements = PreparedStatements()
+            PREPARED_STATEMENTS[database_connection] = prepared_statements
+        return prepared_statements
+
+
+def get_prepared_statement_stats() -> dict:
+    """Figures summed over the open connections of the worker process"""
+    with PREPARED_STATEMENTS_LOCK:
+        all_prepared_statements = list(PREPARED_STATEMENTS.values())
+    stats = {"connections": len(all_prepared_statements)}
+    for prepared_statements in all_prepared_statements:
+        for name, value in prepared_statements.get_stats().items():
+            stats[name] = stats.get(name, 0) + value
+    return stats
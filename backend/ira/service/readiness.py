@@ -0,0 +1,37 @@
+from http import HTTPStatus
+from typing import List, Optional
+
+from ira.enum.token_type import TokenType
+from ira.enum.error_code import ErrorCode
+from ira.enum.table_state import TableState
+from ira.model.output import Output
+from ira.service.catalog import CATALOG
+from ira.service.lexer import Lexer
+from ira.service.pre_populator import TABLE_TO_STATE
+
+LEXER = Lexer()
+
+
+def get_loading_relation_names(ra_query: str) -> List[str]:
+    """
+    The relations of the query which are still being loaded; a relation which another process has loaded meanwhile
+    is in the catalog already
+    """
+    loading_table_names = {table_name for table_name, state in list(TABLE_TO_STATE.items())
+                           if state == TableState.LOADING and not CATALOG.is_relation(table_name)}
+    # Once every table is loaded, queries are not tokenized twice
+    if not loading_table_names:
+        return []
+    return sorted({token.value for token in LEXER.tokenize(ra_query)
+                   if token.type == TokenType.IDENT and token.value in loading_table_names})
+
+
+def get_loading_output(ra_query: str) -> Optional[Output]:
+    relation_names = get_loading_relation_names(ra_query)
+    if not relation_names:
+        return None
+    return Output(HTTPStatus.SERVICE_UNAVAILABLE,
+                  None,
+                  message="Relation(s) {relation_names} are still being loaded; Please retry shortly"
+                  .format(relation_names=", ".join(relation_names)),
+                  error={"code": ErrorCode.RELATION_LOADING.value, "relations": relation_names})
@@ -0,0 +1,166 @@
+import re
+import time
+from http import HTTPStatus
+from os.path import basename, splitext
+from typing import List, Optional
+
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import connection, transaction
+
+from backend.settings import PREPOPULATION_CHUNK_BYTES
+from ira.model.output import Output
+from ira.service.catalog import CATALOG, notify_catalog_changed
+from ira.service.csv_loader import NEWLINE, CsvFile, LoadResult, RecordChunker, TableLoader, get_delimiter, \
+    log_load, parse_column_names
+from ira.service.pre_populator import TABLE_TO_STATE, UPSERT_MANIFEST_QUERY, create_manifest, is_valid_column_names, \
+    read_manifest
+from ira.service.result_cache import RESULT_CACHE
+
+# Unquoted, as the SQL formed from RA queries refers to relations, which postgres folds into lower case; names starting
+# with ira_ are left to the tables of the application, such as the manifest
+RELATION_NAME_PATTERN = re.compile(r"[a-z_][a-z0-9_]{0,62}")
+RESERVED_RELATION_NAME_PREFIX = "ira_"
+
+# The header is read whole before any record is, hence it is bounded
+MAX_HEADER_BYTES = 1024 * 1024
+
+
+def upload_relation(request, relation_name: Optional[str], is_replacing: bool) -> Output:
+    """
+    Loads the CSV or TSV file of the multipart body of the request into a relation, named after the file unless
+    named otherwise, while the body is read. Only a relation uploaded before may be replaced, in which case it is
+    queried as it was until its replacement has loaded. Every process reads the relation from its catalog once the
+    upload has committed.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        create_manifest(cursor)
+        relation_upload_handler = RelationUploadHandler(request, cursor, relation_name, is_replacing)
+        request.upload_handlers = [relation_upload_handler]
+        # Parsing the body streams the file into postgres
+        request.FILES
+        result = relation_upload_handler.result
+        if result is None:
+            raise Exception("POST request not valid; Please ensure that a CSV or TSV file is uploaded as "
+                            "multipart/form-data")
+        csv_file = relation_upload_handler.csv_file
+        record_upload(cursor, csv_file, result)
+    log_load(result)
+    return Output(HTTPStatus.CREATED,
+                  None,
+                  message="Uploaded relation {relation_name} with {number_of_rows} row(s) in {seconds:.2f} s "
+                          "({rows_per_second:.0f} rows/s)."
+                  .format(relation_name=result.table_name, number_of_rows=result.number_of_rows,
+                          seconds=result.seconds, rows_per_second=result.get_rows_per_second()),
+                  result={"relationName": result.table_name,
+                          "columnNames": csv_file.column_names,
+                          "columnTypes": result.column_types,
+                          "rows": result.number_of_rows,
+                          "bytes": result.number_of_bytes,
+                          "seconds": result.seconds,
+                          "rowsPerSecond": result.get_rows_per_second()})
+
+
+class RelationUploadHandler(FileUploadHandler):
+    """
+    Streams the uploaded file into the table of its relation as Django parses the multipart body, a chunk of whole
+    records at a time, rather than into memory or a temporary file; the table is loaded within the transaction of
+    the cursor
+    """
+
+    def __init__(self, request, cursor, relation_name: Optional[str], is_replacing: bool):
+        super().__init__(request)
+        self.cursor = cursor
+        self.relation_name = relation_name
+        self.is_replacing = is_replacing
+        self.delimiter = None
+        self.header = bytearray()
+        self.csv_file: Optional[CsvFile] = None
+        self.table_loader: Optional[TableLoader] = None
+        self.record_chunker = RecordChunker(PREPOPULATION_CHUNK_BYTES)
+        self.result: Optional[LoadResult] = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if self.delimiter is not None:
+            raise Exception("Uploading relation, and found more than one file; Please upload a single file at a time")
+        self.relation_name = self.relation_name or splitext(basename(file_name))[0]
+        self.delimiter = get_delimiter(file_name, content_type)
+        validate_relation_name(self.relation_name)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.table_loader is None:
+            self.header += raw_data
+            header_end = self.header.find(NEWLINE)
+            if header_end < 0:
+                if len(self.header) > MAX_HEADER_BYTES:
+                    raise Exception("Uploading relation {relation_name}, and found no header within {max_bytes} "
+                                    "bytes".format(relation_name=self.relation_name, max_bytes=MAX_HEADER_BYTES))
+                return None
+            raw_data = bytes(self.header[header_end + 1:])
+            self.start(bytes(self.header[:header_end + 1]))
+        chunk = self.record_chunker.push(raw_data)
+        if chunk is not None:
+            self.table_loader.copy(chunk)
+        # Handled here alone
+        return None
+
+    def file_complete(self, file_size):
+        if self.table_loader is None:
+            self.start(bytes(self.header))
+        chunk = self.record_chunker.flush()
+        if chunk:
+            self.table_loader.copy(chunk)
+        self.result = self.table_loader.finish()
+        # The relation is reported instead of a file
+        return None
+
+    def start(self, header: bytes):
+        column_names = parse_column_names(header, self.delimiter)
+        validate_column_names(self.relation_name, column_names)
+        entry = read_manifest(self.cursor).get(self.relation_name)
+        if (entry is not None and not entry.is_uploaded) or self.relation_name in TABLE_TO_STATE:
+            raise Exception("Uploading relation {relation_name}, and found it to be pre-populated from a file; "
+                            "Please upload it under another name".format(relation_name=self.relation_name))
+        if entry is not None and entry.is_table_existing and not self.is_replacing:
+            raise Exception("Uploading relation {relation_name}, and found it to be uploaded already; Please ask "
+                            "for it to be replaced".format(relation_name=self.relation_name))
+        self.csv_file = CsvFile(self.file_name, self.relation_name, column_names,
+                                is_replacing=entry is not None and entry.is_table_existing, delimiter=self.delimiter)
+        self.table_loader = TableLoader(self.csv_file, self.cursor, header)
+
+
+def validate_relation_name(relation_name: str):
+    if not RELATION_NAME_PATTERN.fullmatch(relation_name) or \
+            relation_name.startswith(RESERVED_RELATION_NAME_PREFIX):
+        raise Exception("Uploading relation, and found the name '{relation_name}' not to be valid; Please use up to "
+                        "63 lower case letters, digits and underscores, not starting with a digit nor with '{prefix}'"
+                        .format(relation_name=relation_name, prefix=RESERVED_RELATION_NAME_PREFIX))
+
+
+def validate_column_names(relation_name: str, column_names: List[str]):
+    """Columns are validated as those of the pre-populated files are"""
+    if not column_names or not all(column_names):
+        raise Exception("Uploading relation {relation_name}, and found a column without a name"
+                        .format(relation_name=relation_name))
+    if not is_valid_column_names(column_names):
+        raise Exception("Uploading relation {relation_name}, and found a column name to have invalid literal '.'"
+                        .format(relation_name=relation_name))
+    if len(column_names) != len(set(column_names)):
+        raise Exception("Uploading relation {relation_name}, and found duplicate column names"
+                        .format(relation_name=relation_name))
+
+
+def record_upload(cursor, csv_file: CsvFile, result: LoadResult):
+    """
+    Records the uploaded relation in the manifest, so that it is in the catalog of every process once the
+    transaction commits, and so that pre-population leaves it be
+    """
+    cursor.execute(UPSERT_MANIFEST_QUERY, [csv_file.table_name, result.number_of_bytes, time.time_ns(),
+                                           result.file_hash, csv_file.column_names, result.column_types, True])
+    notify_catalog_changed(cursor)
+    transaction.on_commit(lambda: mark_uploaded(csv_file.table_name))
+
+
+def mark_uploaded(relation_name: str):
+    CATALOG.invalidate()
+    RESULT_CACHE.bump_versions([relation_name])
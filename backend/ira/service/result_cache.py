@@ -0,0 +1,215 @@
+import fcntl
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connections
+
+from backend.settings import RESULT_CACHE_DIRECTORY, RESULT_CACHE_MAX_BYTES
+from ira.model.query import Query
+from ira.service.util import PRIVATE_DIRECTORY_MODE, make_private_directory
+
+ENTRIES_FOLDER = "entries"
+VERSIONS_FOLDER = "versions"
+VERSIONS_LOCK_FILE = "versions.lock"
+
+# Fraction of the byte budget a process writes before it counts the entries again, as the other worker processes
+# write to the directory too
+EVICTION_SCAN_BUDGET_FRACTION = 0.1
+
+
+class ResultCache:
+    """
+    Caches the result of a DQL query, keyed on the database, its SQL text and the version of every base relation it
+    reads in that database. Entries live as files under a directory, so that all worker processes on a host share
+    them, whichever database each of them is connected to; pointing the directory at a tmpfs such as /dev/shm keeps
+    them in memory. Writing to a relation bumps its version, which
+    makes every entry computed from the older version unreachable. Unreachable and least recently used entries
+    are evicted once the entries exceed the byte budget. The directory is private to the user, as the entries are
+    unpickled from it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.use_directory(directory)
+
+    def use_directory(self, directory: str):
+        """Keeps the entries under the directory from now on, such as one of its own for a test run"""
+        self.directory = directory
+        self.entries_directory = os.path.join(directory, ENTRIES_FOLDER)
+        self.versions_directory = os.path.join(directory, VERSIONS_FOLDER)
+        # Bytes of the entries as last counted, and written by this process since
+        self.scanned_bytes: Optional[int] = None
+        self.written_bytes = 0
+        if self.is_enabled() and not make_private_directory(directory):
+            logging.error("Disabling the result cache, as directory {directory} is not private to the current "
+                          "user".format(directory=directory))
+            self.max_bytes = 0
+        if self.is_enabled():
+            os.makedirs(self.entries_directory, mode=PRIVATE_DIRECTORY_MODE, exist_ok=True)
+            os.makedirs(self.versions_directory, mode=PRIVATE_DIRECTORY_MODE, exist_ok=True)
+
+    def is_enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_entry_path(self, query: Query) -> Optional[str]:
+        """
+        Path of the entry of the query at the current versions of its relations, which is to be taken before the query
+        is executed: a result read before a write committed is then stored under the version preceding the write
+        """
+        if not self.is_enabled():
+            return None
+        return self._get_entry_path(query)
+
+    def get(self, query: Query, entry_path: Optional[str]) -> Optional[Tuple[List[str], List[tuple]]]:
+        """Returns the column names and rows stored for the query at the entry path, if any"""
+        if entry_path is None:
+            return None
+        try:
+            with open(entry_path, "rb") as file:
+                stored_query_value, column_names, rows = pickle.load(file)
+            # Refreshing the modification time, as eviction goes by least recent modification
+            os.utime(entry_path)
+        except FileNotFoundError:
+            stored_query_value = None
+        except Exception as exception:
+            logging.warning("Ignoring unreadable result cache entry; {exception}".format(exception=exception))
+            stored_query_value = None
+
+        with self.lock:
+            if stored_query_value != query.value:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return column_names, rows
+
+    def put(self, query: Query, column_names: List[str], rows: List[tuple], entry_path: Optional[str]):
+        """Stores the result of the query at the entry path taken before the query was executed"""
+        if entry_path is None:
+            return
+        entry = pickle.dumps((query.value, column_names, rows), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(entry) > self.max_bytes:
+            return
+        temporary_path = "{entry_path}.{pid}.{thread_id}.tmp".format(entry_path=entry_path, pid=os.getpid(),
+                                                                     thread_id=threading.get_ident())
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(entry)
+            os.replace(temporary_path, entry_path)
+        except OSError as exception:
+            logging.warning("Could not store result cache entry; {exception}".format(exception=exception))
+            return
+        with self.lock:
+            self.written_bytes += len(entry)
+            if self.scanned_bytes is not None and self.written_bytes < self.max_bytes * EVICTION_SCAN_BUDGET_FRACTION \
+                    and self.scanned_bytes + self.written_bytes <= self.max_bytes:
+                return
+            self.written_bytes = 0
+        self._evict()
+
+    def bump_versions(self, relation_names: Iterable[str]):
+        """To be called once a write to the relations has been committed"""
+        if not self.is_enabled():
+            return
+        with open(os.path.join(self.directory, VERSIONS_LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                for relation_name in relation_names:
+                    version = self._get_version(relation_name) + 1
+                    version_path = self._get_version_path(relation_name)
+                    with open(version_path + ".tmp", "w") as file:
+                        file.write(str(version))
+                    # Atomic, so that a concurrent reader never sees an empty version
+                    os.replace(version_path + ".tmp", version_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_version(self, relation_name: str) -> int:
+        """Version of the relation, which every committed write to it bumps"""
+        return self._get_version(relation_name)
+
+    def get_stats(self) -> dict:
+        number_of_entries, number_of_bytes = 0, 0
+        if self.is_enabled():
+            for entry in self._scan_entries():
+                try:
+                    number_of_bytes += entry.stat().st_size
+                    number_of_entries += 1
+                except FileNotFoundError:
+                    continue
+        with self.lock:
+            return {"entries": number_of_entries,
+                    "bytes": number_of_bytes,
+                    "maxBytes": self.max_bytes,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions}
+
+    def _evict(self):
+        """Counts the bytes of the entries, evicting the least recently used ones while over the budget"""
+        entries = []
+        number_of_bytes = 0
+        for entry in self._scan_entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            number_of_bytes += stat.st_size
+        if number_of_bytes <= self.max_bytes:
+            self._set_scanned_bytes(number_of_bytes)
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if number_of_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                with self.lock:
+                    self.evictions += 1
+            except FileNotFoundError:
+                # Another worker has evicted it in the meantime
+                pass
+            number_of_bytes -= size
+        self._set_scanned_bytes(number_of_bytes)
+
+    def _set_scanned_bytes(self, number_of_bytes: int):
+        with self.lock:
+            self.scanned_bytes = number_of_bytes
+
+    def _scan_entries(self):
+        with os.scandir(self.entries_directory) as entries:
+            return [entry for entry in entries if not entry.name.endswith(".tmp")]
+
+    def _get_entry_path(self, query: Query) -> str:
+        version_vector = [(relation_name, self._get_version(relation_name))
+                          for relation_name in sorted(query.relation_names)]
+        key = repr((get_database_key(), query.value, version_vector))
+        return os.path.join(self.entries_directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def _get_version(self, relation_name: str) -> int:
+        try:
+            with open(self._get_version_path(relation_name)) as file:
+                return int(file.read())
+        except FileNotFoundError:
+            return 0
+
+    def _get_version_path(self, relation_name: str) -> str:
+        file_name = hashlib.sha256(repr((get_database_key(), relation_name)).encode()).hexdigest()
+        return os.path.join(self.versions_directory, file_name)
+
+
+def get_database_key() -> tuple:
+    """The database the relations are read from, which tests switch to a database of their own"""
+    settings_dict = connections["default"].settings_dict
+    return settings_dict["NAME"], settings_dict["HOST"], settings_dict["PORT"]
+
+
+RESULT_CACHE = ResultCache(RESULT_CACHE_DIRECTORY, RESULT_CACHE_MAX_BYTES)
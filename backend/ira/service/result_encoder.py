@@ -0,0 +1,46 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ira.enum.result_format import ResultFormat
+
+# Delegating Decimal, date and alike to Django, so that every format represents them the same way as JsonResponse
+DJANGO_JSON_ENCODER = DjangoJSONEncoder()
+
+
+def format_result(column_names, rows, result_format: ResultFormat):
+    """Shapes the column names and rows, as returned by a cursor, into the result of the requested format"""
+    if result_format == ResultFormat.COMPACT:
+        return {"columns": column_names, "rows": rows}
+    elif result_format == ResultFormat.COLUMNAR:
+        values = [list(column_values) for column_values in zip(*rows)] if rows else [[] for _ in column_names]
+        return {"columns": column_names, "values": values}
+    return to_duplicate_key_dicts(column_names, rows)
+
+
+# Got the idea on how to create a dictionary which allows duplicate key from here:
+# https://stackoverflow.com/questions/29519858/adding-duplicate-keys-to-json-with-python
+class DuplicateKeyDict(dict):
+    def __init__(self, items):
+        if items:
+            self[None] = None
+        self._items = items
+
+    def items(self):
+        return self._items
+
+
+def to_duplicate_key_dicts(column_names, rows):
+    result = []
+    for row in rows:
+        result.append(DuplicateKeyDict(list((zip(column_names, row)))))
+    return result
+
+
+def encode(value) -> bytes:
+    """
+    Encodes with the C accelerated JSON encoder and without any whitespace. Row tuples are encoded as arrays as they
+    are, without building an intermediate object per row.
+    """
+    return json.dumps(value, default=DJANGO_JSON_ENCODER.default, separators=(",", ":"),
+                      ensure_ascii=False).encode()
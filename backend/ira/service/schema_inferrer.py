@@ -0,0 +1,108 @@
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from ira.enum.column_usage import ColumnUsage
+from ira.enum.token_type import TokenType
+from ira.model.token import Token
+from ira.service.catalog import CATALOG
+from ira.service.util import is_unary_operator
+
+SET_OPERATOR_TOKEN_TYPES = (TokenType.UNION, TokenType.INTERSECTION, TokenType.DIFFERENCE)
+
+JOIN_TOKEN_TYPES = (TokenType.NATURAL_JOIN, TokenType.LEFT_JOIN, TokenType.RIGHT_JOIN, TokenType.FULL_JOIN)
+
+
+def infer_column_names(parsed_postfix_tokens: List[Token]):
+    """
+    Infers the output column names of every token of the operator tree, in the order postgres outputs them.
+    Children precede their parent in postfix order, hence every token is inferred exactly once, out of the column
+    names already inferred for its children. Column names stay None where they cannot be known, such as for a
+    relation which has not been populated.
+    """
+    for token in parsed_postfix_tokens:
+        token.output_column_names = get_output_column_names(token)
+
+
+def get_output_column_names(token: Token) -> Optional[Tuple[str, ...]]:
+    token_type = token.type
+    if token_type == TokenType.IDENT:
+        return CATALOG.get_column_names(token.value)
+    if token_type == TokenType.PROJECTION:
+        if not token.attributes:
+            return None
+        column_names = tuple(token.attributes.get_column_names())
+        child_column_names = token.right_child_token.output_column_names
+        # Left unknown when projecting a column the operand does not have, as the query is bound to fail then
+        if child_column_names is not None and not set(column_names).issubset(child_column_names):
+            return None
+        return column_names
+    if is_unary_operator(token_type):
+        return token.right_child_token.output_column_names
+
+    left_column_names = token.left_child_token.output_column_names
+    right_column_names = token.right_child_token.output_column_names
+    if left_column_names is None or right_column_names is None:
+        return None
+    if token_type in SET_OPERATOR_TOKEN_TYPES:
+        if len(left_column_names) != len(right_column_names):
+            raise Exception("Relational query is wrongly formed; Operator: {operator} is supposed to have the"
+                            " same number of columns".format(operator=token.value))
+        return left_column_names
+    # Anti join is formed as a natural left join
+    if token_type == TokenType.ANTI_JOIN or (token_type in JOIN_TOKEN_TYPES and not token.attributes):
+        return get_natural_join_column_names(left_column_names, right_column_names)
+    if token_type in (*JOIN_TOKEN_TYPES, TokenType.CARTESIAN):
+        return left_column_names + right_column_names
+    return None
+
+
+def get_common_column_names(left_column_names: Tuple[str, ...], right_column_names: Tuple[str, ...]) \
+        -> Tuple[str, ...]:
+    """Columns present on both sides, in the order of the left side"""
+    right_column_names = set(right_column_names)
+    return tuple(column_name for column_name in left_column_names if column_name in right_column_names)
+
+
+def get_natural_join_column_names(left_column_names: Tuple[str, ...], right_column_names: Tuple[str, ...]) \
+        -> Tuple[str, ...]:
+    """Postgres outputs the common columns first, followed by the remaining columns of the left and right side"""
+    common_column_names = get_common_column_names(left_column_names, right_column_names)
+    common_column_name_set = set(common_column_names)
+    return common_column_names + \
+        tuple(column_name for column_name in left_column_names if column_name not in common_column_name_set) + \
+        tuple(column_name for column_name in right_column_names if column_name not in common_column_name_set)
+
+
+def get_column_usages(parsed_postfix_tokens: List[Token]) -> Set[Tuple[str, str, ColumnUsage]]:
+    """
+    Columns of base relations which the selections compare and the joins match on, as (relation name, column name,
+    usage), out of the inferred column names. Conditions refer to a column by its name alone, hence the name is
+    attributed to every relation below the operator which has a column of that name.
+    """
+    column_usages = set()
+    # Base relations below every token, filled in postfix order, where children precede their parent
+    token_to_relation_names: Dict[int, FrozenSet[str]] = dict()
+    for token in parsed_postfix_tokens:
+        if token.type == TokenType.IDENT:
+            token_to_relation_names[id(token)] = frozenset((token.value,))
+            continue
+        relation_names = frozenset().union(*(token_to_relation_names[id(child_token)]
+                                             for child_token in (token.left_child_token, token.right_child_token)
+                                             if child_token is not None))
+        token_to_relation_names[id(token)] = relation_names
+        if token.type == TokenType.SELECT and token.attributes:
+            column_names, usage = token.attributes.column_names, ColumnUsage.SELECTION
+        elif token.type in (*JOIN_TOKEN_TYPES, TokenType.ANTI_JOIN) and token.attributes:
+            column_names, usage = token.attributes.column_names, ColumnUsage.JOIN
+        elif token.type in (*JOIN_TOKEN_TYPES, TokenType.ANTI_JOIN):
+            left_column_names = token.left_child_token.output_column_names
+            right_column_names = token.right_child_token.output_column_names
+            if left_column_names is None or right_column_names is None:
+                continue
+            column_names, usage = get_common_column_names(left_column_names, right_column_names), ColumnUsage.JOIN
+        else:
+            continue
+        for relation_name in relation_names:
+            relation_column_names = CATALOG.get_column_names(relation_name) or ()
+            column_usages.update((relation_name, column_name, usage)
+                                 for column_name in column_names if column_name in relation_column_names)
+    return column_usages
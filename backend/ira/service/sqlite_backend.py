@@ -0,0 +1,325 @@
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from http import HTTPStatus
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.db import connections
+
+from backend.settings import SQLITE_BACKEND_ENABLED, SQLITE_BACKEND_MAX_ROWS, STATEMENT_TIMEOUT_MS
+from ira.enum.result_format import ResultFormat
+from ira.enum.token_type import TokenType
+from ira.model.output import Output
+from ira.model.query import Query
+from ira.model.token import Token
+from ira.service.catalog import CATALOG
+from ira.service.columnar_engine import NUMERIC_KINDS, STRING_KIND, convert_literal, tokenize_conditions
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.csv_loader import BIGINT, BOOLEAN, DOUBLE_PRECISION, MISSING_VALUES, TEXT, CsvFile, \
+    infer_column_type, quote_identifier
+from ira.service.db_executor import is_result_above_threshold
+from ira.service.pre_populator import get_csv_files
+from ira.service.result_cache import RESULT_CACHE
+from ira.service.result_encoder import format_result
+from ira.service.statement_guard import get_timeout_output
+from ira.service.util import is_unary_operator
+
+logger = logging.getLogger(__name__)
+
+# Types of the columns of a relation in SQLite, by the type postgres has them in; a boolean is stored as an integer,
+# which is read back as a boolean by its declared type
+COLUMN_TYPE_TO_SQLITE_TYPE = {BOOLEAN: "boolean", BIGINT: "integer", DOUBLE_PRECISION: "real", TEXT: "text"}
+SQLITE_TYPE_TO_COLUMN_TYPE = {sqlite_type: column_type
+                              for column_type, sqlite_type in COLUMN_TYPE_TO_SQLITE_TYPE.items()}
+sqlite3.register_converter("boolean", lambda value: value == b"1")
+# Kinds of the types of the columns, as the columnar engine compares values of them the way postgres does
+COLUMN_TYPE_TO_KIND = {BOOLEAN: "b", BIGINT: "i", DOUBLE_PRECISION: "f", TEXT: STRING_KIND}
+
+DROP_TABLE_QUERY = "drop table if exists {table_name}"
+CREATE_TABLE_QUERY = "create table {table_name} ({column_definitions})"
+INSERT_QUERY = "insert into {table_name} values ({placeholders})"
+TABLE_INFO_QUERY = "pragma table_info({table_name})"
+
+# How many instructions of the virtual machine of SQLite run between checks of the timeout
+TIMEOUT_CHECK_INSTRUCTIONS = 10000
+
+
+class LoadedRelation:
+    def __init__(self, version: tuple, number_of_rows: Optional[int], column_types: Dict[str, str]):
+        # Of the database, the file and the relation, as the relation was loaded
+        self.version = version
+        # None for a relation with more rows than the maximum, which is not loaded
+        self.number_of_rows = number_of_rows
+        self.column_types = column_types
+
+    def is_loaded(self) -> bool:
+        return self.number_of_rows is not None
+
+
+class SqliteBackend:
+    """
+    Embedded in-memory SQLite database, which executes the queries of the relations pre-populated from the CSV files
+    in the process serving them, with no round trip to postgres. A relation is loaded from its file on first use, with
+    the column types postgres infers for it, and loaded again once its file or its version in the result cache has
+    changed, unless it has more rows than the maximum. Queries are formed in the dialect of SQLite, and anything SQLite
+    fails to execute is left to postgres, which reports its own error, as are conditions comparing values postgres
+    refuses to compare, which SQLite compares by its own rules, and a result with more rows than an unconfirmed query
+    is executed with. A query running longer than the timeout of the request is interrupted, and reported as postgres
+    reports it. The connection is shared by every thread, one query at a time.
+    """
+
+    def __init__(self, is_enabled: bool = SQLITE_BACKEND_ENABLED, timeout_ms: int = STATEMENT_TIMEOUT_MS,
+                 max_rows: int = SQLITE_BACKEND_MAX_ROWS):
+        self.is_enabled = is_enabled
+        self.timeout_ms = timeout_ms
+        self.max_rows = max_rows
+        self.connection = sqlite3.connect(":memory:", check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        # Files by the relations loaded from them, which are read once, like pre-population does
+        self.relation_to_csv_file: Optional[Dict[str, CsvFile]] = None
+        self.relation_to_loaded_relation: Dict[str, LoadedRelation] = dict()
+        self.lock = threading.Lock()
+        self.executions = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.loads = 0
+
+    def execute(self, query: Query, result_format: ResultFormat = ResultFormat.OBJECTS,
+                timeout: Optional[int] = None, is_confirmed: bool = False,
+                parsed_postfix_tokens: Optional[List[Token]] = None) -> Optional[Output]:
+        """
+        Returns the output of the query formed for SQLite, or None when it is to be executed by postgres instead; the
+        timeout defaults to that of the backend, and the conditions are checked given the operator tree of the query
+        """
+        if not self.is_enabled or not query.is_dql:
+            return None
+        timeout = self.timeout_ms if timeout is None else timeout
+        # Taken before the lock, as the time waiting for it counts towards the timeout of the request
+        deadline = time.monotonic() + timeout / 1000 if timeout > 0 else None
+        with self.lock:
+            try:
+                if not self.load_relations(query.relation_names):
+                    self.fallbacks += 1
+                    return None
+                if parsed_postfix_tokens is not None:
+                    check_comparisons(parsed_postfix_tokens, self.relation_to_loaded_relation)
+                column_names, rows = self.execute_query(query, deadline)
+            except Exception as exception:
+                if deadline is not None and time.monotonic() > deadline:
+                    # The time of the request has been spent, hence the query is not executed by postgres once more
+                    self.timeouts += 1
+                    return get_timeout_output(query)
+                logger.debug("Leaving the query to postgres; {exception}".format(exception=exception))
+                self.fallbacks += 1
+                return None
+            if not is_confirmed and is_result_above_threshold(len(rows)):
+                # Postgres asks for the confirmation as it checks the query before executing it
+                self.fallbacks += 1
+                return None
+            self.executions += 1
+        return Output(HTTPStatus.OK,
+                      query,
+                      result=format_result(column_names, rows, result_format))
+
+    def load_relations(self, relation_names: Iterable[str]) -> bool:
+        """
+        Loads the relations which are not loaded as they are now, unless one is not pre-populated from a file or has
+        more rows than the maximum
+        """
+        if self.relation_to_csv_file is None:
+            self.relation_to_csv_file = {csv_file.table_name: csv_file for csv_file in get_csv_files()}
+        for relation_name in relation_names:
+            csv_file = self.relation_to_csv_file.get(relation_name)
+            if csv_file is None or not CATALOG.is_relation(relation_name):
+                return False
+            file_stat = os.stat(csv_file.path)
+            version = (connections["default"].settings_dict["NAME"], file_stat.st_size, file_stat.st_mtime_ns,
+                       RESULT_CACHE.get_version(relation_name))
+            loaded_relation = self.relation_to_loaded_relation.get(relation_name)
+            if loaded_relation is None or loaded_relation.version != version:
+                # Forgotten first, so that a file which fails to load leaves the relation to postgres
+                self.relation_to_loaded_relation.pop(relation_name, None)
+                number_of_rows = load_relation(self.connection, csv_file, self.max_rows)
+                # A relation with too many rows is remembered as such, so that its file is not read again until it
+                # changes
+                loaded_relation = LoadedRelation(version, number_of_rows, get_column_types(self.connection, csv_file))
+                self.relation_to_loaded_relation[relation_name] = loaded_relation
+                self.loads += 1
+            if not loaded_relation.is_loaded():
+                return False
+        return True
+
+    def execute_query(self, query: Query, deadline: Optional[float]) -> tuple:
+        if deadline is not None:
+            # Interrupts the query once past the deadline
+            self.connection.set_progress_handler(lambda: time.monotonic() > deadline, TIMEOUT_CHECK_INSTRUCTIONS)
+        try:
+            cursor = self.connection.execute(query.value)
+            rows = cursor.fetchall()
+            return [column[0] for column in cursor.description], rows
+        finally:
+            self.connection.set_progress_handler(None, TIMEOUT_CHECK_INSTRUCTIONS)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            loaded_relations = [loaded_relation for loaded_relation in self.relation_to_loaded_relation.values()
+                                if loaded_relation.is_loaded()]
+            return {"isEnabled": self.is_enabled,
+                    "relations": len(loaded_relations),
+                    "rows": sum(loaded_relation.number_of_rows for loaded_relation in loaded_relations),
+                    "maxRows": self.max_rows,
+                    "executions": self.executions,
+                    "fallbacks": self.fallbacks,
+                    "timeouts": self.timeouts,
+                    "loads": self.loads,
+                    "sqliteVersion": sqlite3.sqlite_version}
+
+
+def load_relation(connection: sqlite3.Connection, csv_file: CsvFile, max_rows: int = SQLITE_BACKEND_MAX_ROWS) \
+        -> Optional[int]:
+    """
+    Loads the file into the table of its relation, replacing the table within a single transaction, and returns the
+    number of rows. The type of every column is inferred from all of its values, which makes the type postgres
+    promotes the column to as it copies the file. A file of more rows than the maximum is read no further than the
+    row beyond it, and leaves no table, returning None.
+    """
+    table_name = quote_identifier(csv_file.table_name)
+    with open(csv_file.path, encoding="utf-8-sig", newline="") as file:
+        records = csv.reader(file, delimiter=csv_file.delimiter)
+        next(records, None)
+        # A blank line, such as one ending the file, holds no record
+        records = list(islice((record for record in records if record), max_rows + 1))
+    if len(records) > max_rows:
+        with connection:
+            connection.execute(DROP_TABLE_QUERY.format(table_name=table_name))
+        return None
+    number_of_columns = len(csv_file.column_names)
+    if any(len(record) != number_of_columns for record in records):
+        raise Exception("Loading table {table_name} into SQLite, and found a record not to have {number_of_columns} "
+                        "value(s)".format(table_name=csv_file.table_name, number_of_columns=number_of_columns))
+    columns = list(zip(*records)) if records else [()] * number_of_columns
+    column_types = [infer_column_type([value for value in column if value not in MISSING_VALUES])
+                    for column in columns]
+    rows = zip(*[[parse_value(value, column_type) for value in column]
+                 for column, column_type in zip(columns, column_types)])
+    column_definitions = ", ".join("{column_name} {column_type}".format(
+        column_name=quote_identifier(column_name), column_type=COLUMN_TYPE_TO_SQLITE_TYPE[column_type])
+        for column_name, column_type in zip(csv_file.column_names, column_types))
+    with connection:
+        connection.execute(DROP_TABLE_QUERY.format(table_name=table_name))
+        connection.execute(CREATE_TABLE_QUERY.format(table_name=table_name, column_definitions=column_definitions))
+        connection.executemany(INSERT_QUERY.format(table_name=table_name,
+                                                   placeholders=", ".join("?" * number_of_columns)), rows)
+    return len(records)
+
+
+def get_column_types(connection: sqlite3.Connection, csv_file: CsvFile) -> Dict[str, str]:
+    """Types of the columns of the table of the relation by their names, as postgres has them; none without a table"""
+    cursor = connection.execute(TABLE_INFO_QUERY.format(table_name=quote_identifier(csv_file.table_name)))
+    return {column_name: SQLITE_TYPE_TO_COLUMN_TYPE[sqlite_type.lower()] for _, column_name, sqlite_type, *_ in cursor}
+
+
+def check_comparisons(parsed_postfix_tokens: List[Token], relation_to_loaded_relation: Dict[str, LoadedRelation]):
+    """
+    Checks that the conditions of every selection and join only compare values postgres compares, as SQLite compares
+    values of any types. A column is typed by the relations below the operator which have a column of its name, or
+    by the relation it is qualified with, and a string literal takes the type of what it is compared with.
+    """
+    for token in parsed_postfix_tokens:
+        if token.type == TokenType.PROJECTION or not token.attributes:
+            continue
+        relation_names = get_relation_names_below(token)
+        conditions = str(token.attributes)
+        tokens = tokenize_conditions(conditions)
+        for index, (token_kind, _) in enumerate(tokens):
+            if token_kind != "operator":
+                continue
+            if index == 0 or index == len(tokens) - 1:
+                raise Exception("Conditions {conditions} are not supported".format(conditions=conditions))
+            left_operand = get_operand(tokens[index - 1], relation_names, relation_to_loaded_relation)
+            right_operand = get_operand(tokens[index + 1], relation_names, relation_to_loaded_relation)
+            check_comparison(left_operand, right_operand)
+
+
+def get_relation_names_below(token: Token) -> Set[str]:
+    if token.type == TokenType.IDENT:
+        return {token.value}
+    child_tokens = [token.right_child_token] if is_unary_operator(token.type) else \
+        [token.left_child_token, token.right_child_token]
+    return set().union(*(get_relation_names_below(child_token) for child_token in child_tokens))
+
+
+def get_operand(condition_token: tuple, relation_names: Set[str],
+                relation_to_loaded_relation: Dict[str, LoadedRelation]) -> tuple:
+    """Whether the operand is a column, alongside the kind of the column or the type and value of the literal"""
+    token_kind, value = condition_token
+    if token_kind == "string":
+        return False, "unknown", value.replace("''", "'")
+    if token_kind == "number":
+        return False, "number", value
+    if token_kind != "word":
+        raise Exception("Operand {value} is not supported".format(value=value))
+    if value.lower() in ("true", "false"):
+        return False, "boolean", value.lower() == "true"
+    if value.lower() == "null":
+        return False, "null", None
+    relation_name, _, column_name = value.rpartition(".")
+    if relation_name in relation_names:
+        relation_names = {relation_name}
+    column_kinds = {COLUMN_TYPE_TO_KIND[relation_to_loaded_relation[name].column_types[column_name]]
+                    for name in relation_names if column_name in relation_to_loaded_relation[name].column_types}
+    if len(column_kinds) != 1:
+        raise Exception("Type of the column {column_name} is not known".format(column_name=value))
+    return True, column_kinds.pop(), None
+
+
+def check_comparison(left_operand: tuple, right_operand: tuple):
+    """Raises unless postgres compares the operands, which fails for a literal of another type than the column"""
+    (is_left_column, left_kind, left_value), (is_right_column, right_kind, right_value) = left_operand, right_operand
+    if not is_left_column and not is_right_column:
+        raise Exception("Comparing literals is not supported")
+    if is_left_column and is_right_column:
+        if left_kind != right_kind and not (left_kind in NUMERIC_KINDS and right_kind in NUMERIC_KINDS):
+            raise Exception("Columns of kinds {left_kind} and {right_kind} cannot be compared"
+                            .format(left_kind=left_kind, right_kind=right_kind))
+        return
+    column_kind, literal_type, value = (left_kind, right_kind, right_value) if is_left_column else \
+        (right_kind, left_kind, left_value)
+    if literal_type != "null":
+        convert_literal(literal_type, value, column_kind)
+
+
+def parse_value(value: str, column_type: str):
+    """
+    Reads a value of the file the way postgres copies it: a missing value is null in a column of any type but text,
+    where only an empty value is, as a reader of CSV cannot tell it from a quoted empty one
+    """
+    if value == "" or (column_type != TEXT and value in MISSING_VALUES):
+        return None
+    if column_type == BIGINT:
+        return int(value)
+    if column_type == DOUBLE_PRECISION:
+        return float(value)
+    if column_type == BOOLEAN:
+        return value.strip().lower() == "true"
+    return value
+
+
+def execute_ra_query_on_sqlite(ra_query: str, query: Query, result_format: ResultFormat = ResultFormat.OBJECTS,
+                               timeout: int = STATEMENT_TIMEOUT_MS, is_confirmed: bool = False) -> Optional[Output]:
+    """Executes the RA query on SQLite if it qualifies, returning None when it is to be executed by postgres"""
+    if not SQLITE_BACKEND.is_enabled or not query.is_dql:
+        return None
+    try:
+        sqlite_query = COMPILE_CACHE.get_sqlite_query(ra_query)
+    except Exception as exception:
+        logger.debug("Leaving the query to postgres; {exception}".format(exception=exception))
+        return None
+    return SQLITE_BACKEND.execute(sqlite_query, result_format, timeout, is_confirmed,
+                                  COMPILE_CACHE.get_operator_tree(ra_query))
+
+
+SQLITE_BACKEND = SqliteBackend()
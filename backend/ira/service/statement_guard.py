@@ -0,0 +1,182 @@
+import re
+import select
+import socket
+import threading
+from http import HTTPStatus
+from typing import Optional
+
+from django.db import connection, transaction
+from django.http import HttpRequest
+from psycopg2 import errorcodes
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
+
+from backend.settings import DISCONNECT_POLL_INTERVAL, MAX_STATEMENT_TIMEOUT_MS, STATEMENT_TIMEOUT_MS
+from ira.enum.error_code import ErrorCode
+from ira.model.output import Output
+from ira.model.query import Query
+
+# A random UUID, which the client draws anew for every request: an ID any other client could guess or happen to reuse
+# would let it cancel a query that is not its own
+REQUEST_ID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}")
+
+# Postgres lists the application name of every backend in pg_stat_activity, which lets any worker process find the
+# backend running the query of a request
+APPLICATION_NAME = "ira:{request_id}"
+
+STATEMENT_TIMEOUT_QUERY = "set local statement_timeout = %s"
+APPLICATION_NAME_QUERY = "set local application_name = %s"
+# Within a transaction, postgres keeps returning the activity it has read first, unless the snapshot is cleared
+CLEAR_ACTIVITY_SNAPSHOT_QUERY = "select pg_stat_clear_snapshot()"
+# An idle backend ignores the signal, hence only a backend running a statement is cancelled
+CANCEL_QUERY = "select count(*) filter (where pg_cancel_backend(pid)) from pg_stat_activity " \
+               "where application_name = %s and state = 'active' and datname = current_database() " \
+               "and pid <> pg_backend_pid()"
+
+
+class StatementGuard:
+    """
+    Runs the statements of a request in a transaction of their own, in which a statement is cancelled by postgres
+    once it runs longer than the timeout, and whose backend is tagged with the request ID so that a cancel request
+    can find it. Where the socket of the client is known, a watchdog cancels the running statement as soon as the
+    client disconnects.
+    """
+
+    def __init__(self, timeout: int = STATEMENT_TIMEOUT_MS, request_id: Optional[str] = None,
+                 client_socket: Optional[socket.socket] = None):
+        self.timeout = timeout
+        self.request_id = request_id
+        self.client_socket = client_socket
+        self.atomic = None
+        self.watchdog = None
+
+    def __enter__(self):
+        self.atomic = transaction.atomic()
+        self.atomic.__enter__()
+        try:
+            with connection.cursor() as cursor:
+                # SET LOCAL only lasts until the end of the transaction, hence nothing leaks into the next request
+                if self.request_id is None:
+                    cursor.execute(STATEMENT_TIMEOUT_QUERY, [self.timeout])
+                else:
+                    cursor.execute(STATEMENT_TIMEOUT_QUERY + "; " + APPLICATION_NAME_QUERY,
+                                   [self.timeout, APPLICATION_NAME.format(request_id=self.request_id)])
+        except BaseException as exception:
+            self.atomic.__exit__(type(exception), exception, exception.__traceback__)
+            raise
+        if self.client_socket is not None:
+            self.watchdog = DisconnectWatchdog(self.client_socket, connection.connection)
+            self.watchdog.start()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+        # A failed statement whose error has been turned into an output leaves the transaction aborted
+        if connection.connection is not None and \
+                connection.connection.info.transaction_status == TRANSACTION_STATUS_INERROR:
+            transaction.set_rollback(True)
+        return self.atomic.__exit__(exception_type, exception, traceback)
+
+
+class DisconnectWatchdog(threading.Thread):
+    def __init__(self, client_socket: socket.socket, database_connection):
+        super().__init__(daemon=True)
+        self.client_socket = client_socket
+        self.database_connection = database_connection
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(DISCONNECT_POLL_INTERVAL):
+            if is_disconnected(self.client_socket):
+                # Cancelling goes through a connection of its own, hence it is safe while the query is running
+                self.database_connection.cancel()
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def is_disconnected(client_socket: socket.socket) -> bool:
+    """A client which has closed its connection makes the socket readable, with nothing left to read"""
+    try:
+        is_readable = bool(select.select([client_socket], [], [], 0)[0])
+        return is_readable and client_socket.recv(1, socket.MSG_PEEK) == b""
+    except BlockingIOError:
+        return False
+    except (OSError, ValueError):
+        return True
+
+
+def get_statement_guard(request: HttpRequest, request_body: dict) -> StatementGuard:
+    return StatementGuard(get_timeout(request_body), get_request_id(request_body), get_client_socket(request))
+
+
+def get_timeout(request_body: dict) -> int:
+    timeout = request_body.get("timeout", STATEMENT_TIMEOUT_MS)
+    if "timeout" in request_body and \
+            (not isinstance(timeout, int) or isinstance(timeout, bool) or not 0 < timeout <= MAX_STATEMENT_TIMEOUT_MS):
+        raise Exception("timeout must be a number of milliseconds from 1 to {max_timeout}"
+                        .format(max_timeout=MAX_STATEMENT_TIMEOUT_MS))
+    return timeout
+
+
+def get_request_id(request_body: dict) -> Optional[str]:
+    request_id = request_body.get("requestId")
+    if request_id is not None and not is_request_id_valid(request_id):
+        raise Exception("requestId must be a random UUID (version 4), in lower case")
+    return request_id
+
+
+def is_request_id_valid(request_id) -> bool:
+    return isinstance(request_id, str) and REQUEST_ID_PATTERN.fullmatch(request_id) is not None
+
+
+def get_client_socket(request: HttpRequest) -> Optional[socket.socket]:
+    """
+    Socket of the client connection, where the server exposes it; gunicorn puts it into the environ, whereas the
+    development server reads the request from a file object over the socket
+    """
+    client_socket = request.META.get("gunicorn.socket")
+    if client_socket is None:
+        stream = getattr(request.META.get("wsgi.input"), "stream", None)
+        client_socket = getattr(getattr(stream, "raw", None), "_sock", None)
+    return client_socket if isinstance(client_socket, socket.socket) else None
+
+
+def cancel_request(request_id: str) -> int:
+    """Cancels the statement the backend of the request is running, returning the number of backends signalled"""
+    with connection.cursor() as cursor:
+        cursor.execute(CLEAR_ACTIVITY_SNAPSHOT_QUERY)
+        cursor.execute(CANCEL_QUERY, [APPLICATION_NAME.format(request_id=request_id)])
+        return cursor.fetchone()[0]
+
+
+def get_failure_output(query: Optional[Query], exception: Exception) -> Output:
+    database_error = exception.__cause__ or exception
+    if get_sql_state(exception) == errorcodes.QUERY_CANCELED:
+        # Postgres only tells a timeout apart from a cancellation by the message
+        if "statement timeout" in str(database_error):
+            return get_timeout_output(query)
+        return Output(HTTPStatus.BAD_REQUEST,
+                      query,
+                      message="Query has been cancelled",
+                      error={"code": ErrorCode.QUERY_CANCELLED.value})
+    return Output(HTTPStatus.BAD_REQUEST,
+                  query,
+                  message="Query faced logic issue; "
+                          "See exception message:{exception_message}"
+                  .format(exception_message=exception))
+
+
+def get_sql_state(exception: Exception) -> Optional[str]:
+    # Django wraps the errors of the driver, which carry the SQLSTATE; psycopg 3 names it differently
+    database_error = exception.__cause__ or exception
+    return getattr(database_error, "pgcode", None) or getattr(database_error, "sqlstate", None)
+
+
+def get_timeout_output(query: Optional[Query]) -> Output:
+    return Output(HTTPStatus.GATEWAY_TIMEOUT,
+                  query,
+                  message="Query ran longer than the statement timeout",
+                  error={"code": ErrorCode.STATEMENT_TIMEOUT.value})
@@ -1,25 +1,24 @@
-from typing import List
+import re
+from decimal import Decimal
+from typing import Dict, List, Tuple
 
-from ira.constants import TOKEN_TYPE_TO_BINARY_OPERATOR, AND, \
-    TOKEN_TYPE_TO_QUERY_BINARY_OPERATOR
+from backend.settings import CTE_MATERIALISE_MIN_FAN_OUT
+from ira.constants import AND, TOKEN_TYPE_TO_QUERY_BINARY_OPERATOR
 from ira.enum.token_type import TokenType
 from ira.model.attributes import Attributes
 from ira.model.query import Query
 from ira.model.token import Token
-from ira.service.pre_populator import TABLE_TO_COLUMN_NAMES
+from ira.service.catalog import CATALOG
+from ira.service.dialect import POSTGRES_DIALECT, Dialect
+from ira.service.parser import build_tree
+from ira.service.schema_inferrer import get_column_usages, get_common_column_names, infer_column_names
 from ira.service.util import is_unary_operator
 
 QUERY_SEMI_COLON = ';'
 
-NUMBER_OF_OPERANDS_UNDER_BINARY_OPERATOR = 2
-
-N_JOIN_BASE_QUERY = ("select * from {{}} natural {join_type} join {{}}",
-                     "select * from {{}} {join_type} join {{}} on {{conditions}}")
-
-
-def get_join_queries(join_type):
-    return tuple(query.format(join_type=join_type) for query in N_JOIN_BASE_QUERY)
+QUERY_PLACEHOLDER = '{}'
 
+COLUMN_NAME_PATTERN = r"(?<![\w\"']){column_name}(?![\w\"'])"
 
 ANTI_JOIN_RIGHT_ALIAS = "cq{}"
 
@@ -27,207 +26,285 @@ CERTAIN_JOIN_TOKEN_TYPES = (TokenType.LEFT_JOIN, TokenType.RIGHT_JOIN, TokenType
 
 SQL_JOIN_TOKEN_TYPE = (*CERTAIN_JOIN_TOKEN_TYPES, TokenType.ANTI_JOIN, TokenType.CARTESIAN)
 
-QUERY_MAPPER = {TokenType.SELECT: "select * from {{}} where {conditions}",
-                TokenType.PROJECTION: "select distinct {column_names} from {{}}",
-                TokenType.NATURAL_JOIN: ("select * from {} natural join {}",
-                                         "select * from {} natural join {} where {conditions}"),
-                TokenType.IDENT: "select * from {table_name}",
-                TokenType.CARTESIAN: "select * from {} cross join {}",
-                TokenType.UNION: "{} union {}",
-                TokenType.INTERSECTION: "{} intersect {}",
-                TokenType.DIFFERENCE: "{} except {}",
-                TokenType.LEFT_JOIN: get_join_queries("left"),
-                TokenType.RIGHT_JOIN: get_join_queries("right"),
-                TokenType.FULL_JOIN: get_join_queries("full"),
-                TokenType.ANTI_JOIN: "select * from {{}}  natural left join {{}} as {anti_join_right_alias}"
-                                     " where {null_conditions}"}
+CTE_NAME = "cte{}"
+
+CTE_QUERY = "{cte_name} as {materialisation}({query})"
+
+WITH_QUERY = "with {cte_queries} {query}"
+
+# Quoted column names are matched first, so that literals are only found outside of them
+LITERAL_PATTERN = re.compile(r'"(?:[^"]|"")*"'
+                             r"|'(?P<string>(?:[^']|'')*)'"
+                             r"|(?<![\w.])(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)(?![\w.])")
+
+PARAMETER_PLACEHOLDER = "%s"
+
+# Postgres types a numeric literal as the first of these which fits it, and as numeric if it has a fraction or an
+# exponent; casting the placeholders alike leaves the comparisons as they would be for the literal
+INTEGER_TYPES = ((2 ** 31, "::integer"), (2 ** 63, "::bigint"))
+NUMERIC_TYPE = "::numeric"
+# Relations loaded from CSV files store fractions as double precision, which a generic plan would otherwise convert
+# every numeric parameter to row by row; a fraction with no more digits than a double holds compares the same way
+DOUBLE_PRECISION_TYPE = "::double precision"
+DOUBLE_PRECISION_DIGITS = 15
+DOUBLE_PRECISION_MAX_EXPONENT = 307
 
 # Needs some special type of processing
 SET_OPERATOR_TOKENS = (TokenType.DIFFERENCE, TokenType.UNION, TokenType.INTERSECTION)
 
 
-def transform(parsed_postfix_tokens: List[Token]) -> Query:
-    binary_operator_tracker = []
-    index = len(parsed_postfix_tokens) - 1
-    previous_token = None
+def transform(parsed_postfix_tokens: List[Token], dialect: Dialect = POSTGRES_DIALECT) -> Query:
+    """Forms the SQL of the operator tree in the dialect, which is that of postgres unless given otherwise"""
+    root_token = build_tree(parsed_postfix_tokens)
+    infer_column_names(parsed_postfix_tokens)
+    relation_names = get_relation_names(parsed_postfix_tokens)
+    column_usages = get_column_usages(parsed_postfix_tokens)
+    if root_token.type == TokenType.IDENT:
+        return form_dialect_query(
+            dialect.query_mapper[root_token.type].format(table_name=root_token.value) + QUERY_SEMI_COLON,
+            relation_names, column_usages, dialect)
 
-    while index >= 0:
-        current_token = parsed_postfix_tokens[index]
-        current_token_type = current_token.type
-        current_token.post_fix_index = index
-        is_previous_token_unary = (previous_token is not None) and is_unary_operator(previous_token.type)
+    # Postfix order visits the children of an operator before the operator, so a single pass forms every query
+    for token in parsed_postfix_tokens:
+        if token.type != TokenType.IDENT:
+            token.sql_query = form_query(token, dialect)
+    cte_queries = [form_cte_query(token, fan_out, dialect)
+                   for token, fan_out in find_common_subexpressions(parsed_postfix_tokens)]
+    query = render_query(root_token, dialect)
+    if cte_queries:
+        query = WITH_QUERY.format(cte_queries=", ".join(cte_queries), query=query)
+    return form_dialect_query(query + QUERY_SEMI_COLON, relation_names, column_usages, dialect)
 
-        if current_token_type == TokenType.IDENT:
-            popped_binary_operator_tracker = None
-            if not is_previous_token_unary and binary_operator_tracker:
-                parent_token, popped_binary_operator_tracker = \
-                    process_for_parent_binary_operator(binary_operator_tracker,
-                                                       current_token)
 
-            elif is_previous_token_unary:
-                parent_token = previous_token
-                # Right side is the default
-                parent_token.right_child_token = current_token
+def form_dialect_query(query: str, relation_names, column_usages, dialect: Dialect) -> Query:
+    if dialect.is_parameterised:
+        return form_parameterised_query(query, relation_names, column_usages)
+    return Query(query, relation_names, column_usages=column_usages)
 
-            elif len(parsed_postfix_tokens) == 1:
-                return Query(QUERY_MAPPER[current_token_type].format(table_name=current_token.value) + QUERY_SEMI_COLON)
-            else:
-                raise Exception("Logical error; Relational algebra query is not well formed.")
 
-            query = get_query_for_identifier_token(current_token, parent_token)
-            current_token.initialise_for_transformer(query, index, parent_token)
+def form_parameterised_query(query: str, relation_names, column_usages=()) -> Query:
+    shape, parameters = parameterise(query)
+    return Query(query, relation_names, shape, parameters, column_usages)
 
-            is_ready_to_process_queries = (popped_binary_operator_tracker is not None) or is_previous_token_unary
-            if is_ready_to_process_queries:
-                process_queries(current_token)
 
+def parameterise(query: str) -> Tuple[str, list]:
+    """
+    Lifts the string and numeric literals of the conditions out of the query, returning its shape with a placeholder
+    in place of each, alongside the literals in order. Queries which only differ by their literals share a shape,
+    hence a statement prepared for the shape serves all of them. A string is left untyped, so that postgres infers
+    its type from what it is compared with, as it does for a string literal.
+    """
+    shape_segments = []
+    parameters = []
+    end = 0
+    for match in LITERAL_PATTERN.finditer(query):
+        if match.group("string") is None and match.group("number") is None:
+            continue
+        # Literal percent signs are doubled, as placeholders are marked by them
+        shape_segments.append(query[end:match.start()].replace("%", "%%"))
+        if match.group("string") is not None:
+            parameters.append(match.group("string").replace("''", "'"))
+            shape_segments.append(PARAMETER_PLACEHOLDER)
         else:
-            # Non identifier scenario
-
-            # Assigning parent token to the current token and children tokens to the previous token
-            if is_previous_token_unary:
-                current_token.set_parent_token(previous_token)
-                # Right is default for unary token
-                previous_token.right_child_token = current_token
-            elif previous_token and binary_operator_tracker:
-                parent_token, popped_binary_operator_tracker = \
-                    process_for_parent_binary_operator(binary_operator_tracker,
-                                                       current_token)
-                current_token.set_parent_token(parent_token)
-
-            if current_token_type == TokenType.SELECT:
-                conditions = sanitise(current_token.attributes, current_token.type)
-                current_token.sql_query = QUERY_MAPPER[current_token.type].format(conditions=conditions)
-
-            elif current_token_type == TokenType.PROJECTION:
-                column_names = sanitise(current_token.attributes, current_token.type)
-                current_token.sql_query = QUERY_MAPPER[current_token.type].format(column_names=column_names)
-
-            elif current_token_type == TokenType.ANTI_JOIN:
-                if current_token.attributes:
-                    raise Exception("Logical error; Anti join implementation does not support conditional/equi join")
-                else:
-                    common_column_names, _ = \
-                        get_common_columns_for_anti_join(parsed_postfix_tokens[:index],
-                                                         index - 1, {}, [])
-                    if not common_column_names:
-                        raise Exception(
-                            "Logical error; There are no common columns for the relation/subquery for the anti join "
-                            "operator")
-                    anti_join_alias = ANTI_JOIN_RIGHT_ALIAS.format(index)
-                    null_conditions = generate_null_condition_for_anti_join(list(common_column_names),
-                                                                            anti_join_alias)
-                    current_token.sql_query = QUERY_MAPPER[current_token.type].format(null_conditions=null_conditions,
-                                                                                      anti_join_right_alias=anti_join_alias)
-                    binary_operator_tracker.append([current_token, NUMBER_OF_OPERANDS_UNDER_BINARY_OPERATOR])
-
-            elif current_token_type in TOKEN_TYPE_TO_QUERY_BINARY_OPERATOR:
-                query = QUERY_MAPPER[current_token_type]
-
-                is_token_join = current_token.type in CERTAIN_JOIN_TOKEN_TYPES
-                if current_token.attributes and is_token_join:
-                    # If join operator has attributes, it implies that it is a type of conditional/equi join
-                    conditions = sanitise(current_token.attributes, current_token.type)
-                    query = query[-1].format("{}", "{}", conditions=conditions)
-                elif is_token_join:
-                    query = query[0]
-
-                current_token.sql_query = query
-                if binary_operator_tracker:
-                    binary_operator_tracker[-1][-1] = 1
-                binary_operator_tracker.append([current_token, NUMBER_OF_OPERANDS_UNDER_BINARY_OPERATOR])
-
-        previous_token = current_token
-        index -= 1
-
-    root_token = parsed_postfix_tokens[-1]
-    return Query(root_token.sql_query + QUERY_SEMI_COLON)
-
-
-def process_for_parent_binary_operator(binary_operator_tracker, current_token):
-    popped_binary_operator_tracker = None
-    parent_binary_token, number_of_operators_seen = binary_operator_tracker[-1]
-    parent_token = parent_binary_token
-    if number_of_operators_seen == NUMBER_OF_OPERANDS_UNDER_BINARY_OPERATOR:
-        parent_binary_token.right_child_token = current_token
-        binary_operator_tracker[-1][-1] = 1
-    elif number_of_operators_seen == 1:
-        parent_binary_token.left_child_token = current_token
-        popped_binary_operator_tracker = binary_operator_tracker.pop()
-    return parent_token, popped_binary_operator_tracker
-
-
-def get_query_for_identifier_token(current_token, parent_token):
+            parameter, cast = get_numeric_parameter(match.group("number"))
+            parameters.append(parameter)
+            shape_segments.append(PARAMETER_PLACEHOLDER + cast)
+        end = match.end()
+    shape_segments.append(query[end:].replace("%", "%%"))
+    return "".join(shape_segments), parameters
+
+
+def get_numeric_parameter(literal: str) -> tuple:
+    if literal.isdigit():
+        number = int(literal)
+        for upper_bound, cast in INTEGER_TYPES:
+            if number < upper_bound:
+                return number, cast
+        return Decimal(literal), NUMERIC_TYPE
+    number = Decimal(literal)
+    if len(number.as_tuple().digits) <= DOUBLE_PRECISION_DIGITS and \
+            abs(number.adjusted()) <= DOUBLE_PRECISION_MAX_EXPONENT:
+        return float(number), DOUBLE_PRECISION_TYPE
+    return number, NUMERIC_TYPE
+
+
+def get_relation_names(parsed_postfix_tokens: List[Token]):
+    return {token.value for token in parsed_postfix_tokens if token.type == TokenType.IDENT}
+
+
+def get_query_for_identifier_token(current_token, parent_token, dialect: Dialect = POSTGRES_DIALECT):
     if parent_token.type in SET_OPERATOR_TOKENS:
-        query = QUERY_MAPPER[current_token.type].format(table_name=current_token.value)
+        query = dialect.query_mapper[current_token.type].format(table_name=current_token.value)
     else:
         query = current_token.value
     return query
 
 
-def process_queries(token):
-    """ Forms and stores queries starting from a leaf token all the till the processed binary token"""
-    current_token = token
-    while current_token.parent_token:
-        parent_token = current_token.parent_token
-        is_query_formation_successful = form_query(parent_token)
-        if not is_query_formation_successful:
-            break
-        current_token = parent_token
+def form_query(token: Token, dialect: Dialect = POSTGRES_DIALECT) -> str:
+    """Forms the query of an operator token, with a {} placeholder for the query of each child"""
+    token_type = token.type
+    query_mapper = dialect.query_mapper
+    dialect.check_column_names(token)
+    if token_type == TokenType.SELECT:
+        conditions = sanitise(token.attributes, token_type)
+        query = query_mapper[token_type].format(conditions=conditions)
+
+    elif token_type == TokenType.PROJECTION:
+        column_names = sanitise(token.attributes, token_type)
+        query = query_mapper[token_type] if token.is_distinct else dialect.non_distinct_projection_query
+        query = query.format(column_names=column_names)
+
+    elif token_type == TokenType.ANTI_JOIN:
+        if token.attributes:
+            raise Exception("Logical error; Anti join implementation does not support conditional/equi join")
+        left_column_names = token.left_child_token.output_column_names
+        right_column_names = token.right_child_token.output_column_names
+        if left_column_names is None or right_column_names is None:
+            raise Exception("Logical error; Columns of the relation/subquery for the anti join operator are not known")
+        common_column_names = get_common_column_names(left_column_names, right_column_names)
+        if not common_column_names:
+            raise Exception("Logical error; There are no common columns for the relation/subquery for the anti join "
+                            "operator")
+        anti_join_alias = ANTI_JOIN_RIGHT_ALIAS.format(token.post_fix_index)
+        null_conditions = generate_null_condition_for_anti_join(list(common_column_names), anti_join_alias)
+        query = query_mapper[token_type].format(null_conditions=null_conditions,
+                                                anti_join_right_alias=anti_join_alias)
+        query = dialect.get_join_query(token, query)
+
+    elif token_type in TOKEN_TYPE_TO_QUERY_BINARY_OPERATOR:
+        query = query_mapper[token_type]
+        is_token_join = token_type in CERTAIN_JOIN_TOKEN_TYPES
+        if token.attributes and is_token_join:
+            # If join operator has attributes, it implies that it is a type of conditional/equi join
+            conditions = sanitise(token.attributes, token_type)
+            query = query[-1].format("{}", "{}", conditions=conditions)
+        elif is_token_join:
+            query = query[0]
+        if token_type in SQL_JOIN_TOKEN_TYPE:
+            query = dialect.get_join_query(token, query)
+
+    else:
+        raise Exception("Logical error; Operator {operator} is not supported".format(operator=token.value))
+
+    if query.count(QUERY_PLACEHOLDER) != len(get_child_tokens(token)):
+        raise Exception("Syntactical exception; Attributes of operator {operator} must not contain {placeholder}"
+                        .format(operator=token.value, placeholder=QUERY_PLACEHOLDER))
+    return query
+
+
+def find_common_subexpressions(parsed_postfix_tokens: List[Token]) -> List[tuple]:
+    """
+    Finds the subexpressions which are repeated within the operator tree, naming every occurrence of each after
+    its first occurrence, and returns the first occurrences alongside their fan-out in postfix order, which forms
+    every subexpression before the ones that refer to it.
+    Every token is keyed by its operator and the ids of the keys of its children, hence keying stays linear in
+    the number of tokens however deeply they are nested. The fan-out of a subexpression counts the distinct
+    subexpressions referring to it, so that a subexpression only repeated within another repeated one is formed
+    as part of the latter.
+    """
+    key_to_id: Dict[tuple, int] = {}
+    token_to_id: Dict[int, int] = {}
+    first_tokens = []
+    fan_outs = []
+    for token in parsed_postfix_tokens:
+        child_ids = tuple(token_to_id[id(child_token)] for child_token in get_child_tokens(token)) \
+            if token.type != TokenType.IDENT else ()
+        key = (token.type, token.value, str(token.attributes) if token.attributes else None, token.is_distinct,
+               child_ids)
+        subexpression_id = key_to_id.get(key)
+        if subexpression_id is None:
+            subexpression_id = key_to_id[key] = len(first_tokens)
+            first_tokens.append(token)
+            fan_outs.append(0)
+            for child_id in child_ids:
+                fan_outs[child_id] += 1
+        token_to_id[id(token)] = subexpression_id
+
+    for token in parsed_postfix_tokens:
+        subexpression_id = token_to_id[id(token)]
+        first_token = first_tokens[subexpression_id]
+        is_common = first_token.type != TokenType.IDENT and fan_outs[subexpression_id] > 1
+        token.cte_name = CTE_NAME.format(first_token.post_fix_index) if is_common else None
+    return [(token, fan_out) for token, fan_out in zip(first_tokens, fan_outs)
+            if token.cte_name is not None]
+
+
+def form_cte_query(token: Token, fan_out: int, dialect: Dialect = POSTGRES_DIALECT) -> str:
+    """
+    Postgres materialises a common table expression referred to more than once, which keeps the conditions of the
+    outer query from reaching the relation below it. A selection on a relation is cheap to evaluate again and may
+    benefit from an index with those conditions, hence it is only materialised when read many times.
+    """
+    is_cheap = token.type == TokenType.SELECT and token.right_child_token.type == TokenType.IDENT
+    materialisation = dialect.materialized if not is_cheap or fan_out >= CTE_MATERIALISE_MIN_FAN_OUT \
+        else dialect.not_materialized
+    return CTE_QUERY.format(cte_name=token.cte_name, materialisation=materialisation,
+                            query=render_query(token, dialect))
 
 
-def form_query(token) -> bool:
-    """ Takes in a parent token and form a query at that token level"""
-    token_type = token.type
-    is_right_child_available = token.right_child_token is not None
-    is_left_child_available = token.left_child_token is not None
-    left_query_value = None
-    right_query_value = None
-    if is_left_child_available:
-        left_query_value = get_query_with_alias(token.left_child_token.sql_query, token.left_child_token.level,
-                                                token.left_child_token.post_fix_index, token.type,
-                                                token.left_child_token.type)
-
-    if is_right_child_available:
-        # Ignore for anti join as it comes with its own alias
-        if token_type == TokenType.ANTI_JOIN:
-            right_query_value = token.right_child_token.sql_query
-        else:
-            right_query_value = get_query_with_alias(token.right_child_token.sql_query,
-                                                     token.right_child_token.level,
-                                                     token.right_child_token.post_fix_index, token.type,
-                                                     token.right_child_token.type)
-
-    if is_unary_operator(token_type):
-        if is_right_child_available:
-            query_value = right_query_value
-            token.sql_query = token.sql_query.format(query_value)
+def render_query(root_token: Token, dialect: Dialect = POSTGRES_DIALECT) -> str:
+    """
+    Fills the placeholders of the queries from the root downwards, joining all fragments once at the end; formatting
+    every child query into its parent query would copy the deeper queries over and over
+    """
+    fragments = []
+    pending = [root_token]
+    while pending:
+        fragment = pending.pop()
+        if isinstance(fragment, str):
+            fragments.append(fragment)
         else:
-            return False
+            pending.extend(reversed(get_query_fragments(fragment, dialect)))
+    return "".join(fragments)
 
-    elif token_type in (*CERTAIN_JOIN_TOKEN_TYPES, TokenType.CARTESIAN, *SET_OPERATOR_TOKENS, TokenType.ANTI_JOIN):
-        if is_left_child_available and is_right_child_available:
-            token.sql_query = token.sql_query.format(left_query_value, right_query_value)
-        else:
-            return False
 
-    return True
+def get_query_fragments(token: Token, dialect: Dialect = POSTGRES_DIALECT) -> list:
+    """Splits the query of an operator token around its placeholders, into strings and child tokens"""
+    query_segments = token.sql_query.split(QUERY_PLACEHOLDER)
+    fragments = [query_segments[0]]
+    for child_token, query_segment in zip(get_child_tokens(token), query_segments[1:]):
+        fragments.extend(get_query_with_alias(token, child_token, dialect))
+        fragments.append(query_segment)
+    return fragments
+
+
+def get_child_tokens(token: Token) -> List[Token]:
+    if is_unary_operator(token.type):
+        return [token.right_child_token]
+    return [token.left_child_token, token.right_child_token]
 
 
 def is_table_name(query):
-    return query in TABLE_TO_COLUMN_NAMES
+    return CATALOG.is_relation(query)
 
 
-def get_query_with_alias(query, level, unique_identifier, parent_token_type, token_type):
+def get_query_with_alias(parent_token: Token, child_token: Token, dialect: Dialect = POSTGRES_DIALECT) -> list:
     """
     Adding alias as postgres must need alias for sub-queries
     """
-    if (level is not None or level == 0) and token_type != TokenType.IDENT:
-        if parent_token_type in SQL_JOIN_TOKEN_TYPE or is_unary_operator(parent_token_type):
-            return "({}) as q{}".format(query, unique_identifier)
-        return "({})".format(query)
-    else:
-        return query
+    if child_token.type == TokenType.IDENT:
+        # A relation may be shared by several parents, hence its query is formed for the given parent
+        return [get_query_for_identifier_token(child_token, parent_token, dialect)]
+    is_anti_join_right_child = parent_token.type == TokenType.ANTI_JOIN and \
+        child_token is parent_token.right_child_token
+    if child_token.cte_name is not None:
+        return [get_query_for_cte_reference(child_token, parent_token, is_anti_join_right_child, dialect)]
+    # Ignore for the right side of anti join as it comes with its own alias
+    if is_anti_join_right_child:
+        return ["(", child_token, ")"]
+    if parent_token.type in SQL_JOIN_TOKEN_TYPE or is_unary_operator(parent_token.type):
+        return ["(", child_token, ") as q{}".format(child_token.post_fix_index)]
+    return dialect.get_set_operand(child_token)
+
+
+def get_query_for_cte_reference(child_token: Token, parent_token: Token, is_anti_join_right_child: bool,
+                                dialect: Dialect = POSTGRES_DIALECT) -> str:
+    """Refers to a common table expression like to a relation, aliased as the same one may be joined with itself"""
+    if parent_token.type in SET_OPERATOR_TOKENS:
+        return dialect.query_mapper[TokenType.IDENT].format(table_name=child_token.cte_name)
+    if is_anti_join_right_child:
+        return child_token.cte_name
+    return "{cte_name} as q{index}".format(cte_name=child_token.cte_name, index=child_token.post_fix_index)
 
 
 def sanitise(attributes: Attributes, token_type: TokenType):
@@ -243,66 +320,13 @@ def sanitise(attributes: Attributes, token_type: TokenType):
                         TokenType.LEFT_JOIN):
         query_segment = str(attributes)
         for column_name in attributes.column_names:
-            query_segment = query_segment.replace(column_name, '"{column_name}"'
-                                                  .format(column_name=column_name))
+            # Only whole names are quoted, so that a column name within another name or a literal is left as is
+            quoted_column_name = '"{column_name}"'.format(column_name=column_name)
+            query_segment = re.sub(COLUMN_NAME_PATTERN.format(column_name=re.escape(column_name)),
+                                   lambda match: quoted_column_name, query_segment)
         return query_segment
 
 
-def get_common_columns_for_anti_join(parsed_postfix_tokens: List[Token], index, common_columns, binary_operator_stack):
-    """Calculates the common columns between the operands of anti-join"""
-    if index < 0:
-        return set(), 0
-    if len(parsed_postfix_tokens) == 2:
-        if parsed_postfix_tokens[0].type == TokenType.IDENT and parsed_postfix_tokens[1].type == TokenType.IDENT:
-            return TABLE_TO_COLUMN_NAMES[parsed_postfix_tokens[0].value].intersection(
-                TABLE_TO_COLUMN_NAMES[parsed_postfix_tokens[1].value]), index
-    current_token = parsed_postfix_tokens[index]
-    if current_token.type == TokenType.IDENT:
-        if index == 0:
-            if len(binary_operator_stack) == 0 or (
-                    len(binary_operator_stack) == 1 and binary_operator_stack[-1][-1] == 1):
-                return TABLE_TO_COLUMN_NAMES[current_token.value], index
-        elif binary_operator_stack:
-            stored_token, number_of_binary_operators_seen = binary_operator_stack[-1]
-            if number_of_binary_operators_seen == 1:
-                binary_operator_stack.pop()
-                return TABLE_TO_COLUMN_NAMES[current_token.value], index
-            else:
-                binary_operator_stack[-1] = (stored_token, 1)
-                right_side_operand_columns = TABLE_TO_COLUMN_NAMES[current_token.value]
-                left_side_operand_common_column, left_side_index = get_common_columns_for_anti_join(
-                    parsed_postfix_tokens, index - 1, common_columns,
-                    binary_operator_stack)
-                # if union  or difference or intersect prefer the left operand over the right  one, since the
-                # assumption for this operator is that the number of columns are same and the column types are same.
-                if stored_token.type in (TokenType.UNION, TokenType.DIFFERENCE, TokenType.INTERSECTION):
-                    if len(left_side_operand_common_column) != len(right_side_operand_columns):
-                        raise Exception("Relational query is wrongly formed; Operator: {token} is supposed to have the"
-                                        " same number of columns".format(token=current_token))
-                    return left_side_operand_common_column, left_side_index
-                # if natural join or anti join use intersection.
-                elif stored_token.type in (TokenType.NATURAL_JOIN, TokenType.ANTI_JOIN):
-                    return right_side_operand_columns \
-                        .intersection(left_side_operand_common_column), left_side_index
-
-                # if other join, cross join
-                return right_side_operand_columns.union(left_side_operand_common_column), left_side_index
-    elif current_token.type in TOKEN_TYPE_TO_BINARY_OPERATOR:
-        # Keeping track of token and the number of identifiers  yet to see
-        binary_operator_stack.append((current_token, NUMBER_OF_OPERANDS_UNDER_BINARY_OPERATOR))
-        if index == len(parsed_postfix_tokens) - 1:
-            # Starting point of anti-join
-            right, last_reached_index = get_common_columns_for_anti_join(parsed_postfix_tokens, index - 1,
-                                                                         common_columns,
-                                                                         binary_operator_stack)
-            left, _ = get_common_columns_for_anti_join(parsed_postfix_tokens, last_reached_index , common_columns,
-                                                       binary_operator_stack)
-            return left.intersection(right), index
-    elif current_token.type == TokenType.PROJECTION:
-        return current_token.attributes.get_column_names()
-    return get_common_columns_for_anti_join(parsed_postfix_tokens, index - 1, common_columns, binary_operator_stack)
-
-
 def generate_null_condition_for_anti_join(common_column_names, alias):
     result = ""
     for index in range(len(common_column_names)):
@@ -1,8 +1,12 @@
+import os
+import stat
 from typing import List
 
 from ira.constants import TOKEN_TYPE_TO_BINARY_OPERATOR, TOKEN_TYPE_TO_UNARY_OPERATOR
 from ira.enum.token_type import TokenType
 
+PRIVATE_DIRECTORY_MODE = 0o700
+
 
 def is_binary_operator(token_type: TokenType):
     return token_type in TOKEN_TYPE_TO_BINARY_OPERATOR
@@ -22,3 +26,18 @@ def split_string(string: str, delimiters: List):
     for delimiter in delimiters:
         string = string.replace(delimiter, delimiters[0])
     return string.split(delimiters[0])
+
+
+def make_private_directory(path: str) -> bool:
+    """
+    Creates the directory, accessible to the current user only, as the files read from it are unpickled and could
+    run code otherwise. Returns whether the directory is private, which one that is a symbolic link or belongs to
+    another user is not; an existing one of the current user is restricted to it.
+    """
+    os.makedirs(path, mode=PRIVATE_DIRECTORY_MODE, exist_ok=True)
+    path_stat = os.lstat(path)
+    if not stat.S_ISDIR(path_stat.st_mode) or path_stat.st_uid != os.getuid():
+        return False
+    if stat.S_IMODE(path_stat.st_mode) != PRIVATE_DIRECTORY_MODE:
+        os.chmod(path, PRIVATE_DIRECTORY_MODE)
+    return True
@@ -1 +1,7 @@
-from .service import *
\ No newline at end of file
+from ira.service.pre_populator import wait_until_pre_populated
+
+# The tests rely on the relations registered by pre-population, which runs in the background
+wait_until_pre_populated()
+
+from .service import *  # noqa: E402
+from .view import *  # noqa: E402
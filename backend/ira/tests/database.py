@@ -0,0 +1,14 @@
+import threading
+
+from ira.service.pre_populator import pre_populate
+
+
+def populate_bundled_relations():
+    """
+    The bundled relations are only pre-populated into the main database, hence tests pre-populate the test database
+    as well; on a thread of its own, so that the tables are committed rather than rolled back along with a test.
+    Files already loaded into the test database are skipped.
+    """
+    thread = threading.Thread(target=pre_populate)
+    thread.start()
+    thread.join()
@@ -0,0 +1,35 @@
+import tempfile
+
+from django.test.runner import DiscoverRunner
+
+from ira.service.catalog import CATALOG
+from ira.service.result_cache import RESULT_CACHE
+from ira.tests.database import populate_bundled_relations
+
+
+class PrePopulatingTestRunner(DiscoverRunner):
+    """
+    Pre-populates the test database as soon as it is created, as the catalog the tests compile against is read
+    from it, and stops listening to it for catalog changes before it is dropped. The result cache is kept in a
+    directory of the test run, which the servers of the host never read.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.result_cache_directory = tempfile.TemporaryDirectory()
+        self.original_result_cache_directory = RESULT_CACHE.directory
+        RESULT_CACHE.use_directory(self.result_cache_directory.name)
+
+    def teardown_test_environment(self, **kwargs):
+        RESULT_CACHE.use_directory(self.original_result_cache_directory)
+        self.result_cache_directory.cleanup()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        populate_bundled_relations()
+        return old_config
+
+    def teardown_databases(self, old_config, **kwargs):
+        CATALOG.stop_listening()
+        super().teardown_databases(old_config, **kwargs)
@@ -1,4 +1,25 @@
 from .lexer import *
 from .transformer import *
 from .xml_convertor import *
-from .raq_converter import *
\ No newline at end of file
+from .raq_converter import *
+from .compile_cache import *
+from .result_cache import *
+from .keyset_pagination import *
+from .result_encoder import *
+from .schema_inferrer import *
+from .optimiser import *
+from .plan_explainer import *
+from .statement_guard import *
+from .db_executor import *
+from .connection_pool import *
+from .async_db_executor import *
+from .prepared_statements import *
+from .csv_loader import *
+from .pre_populator import *
+from .readiness import *
+from .catalog import *
+from .index_advisor import *
+from .relation_uploader import *
+from .columnar_engine import *
+from .dialect import *
+from .sqlite_backend import *
@@ -0,0 +1,43 @@
+import asyncio
+from http import HTTPStatus
+
+from django.test import TestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.model.query import Query
+from ira.service.async_db_executor import close_async_connection_pool, execute_sql_query_async, \
+    get_async_connection_pool
+from ira.service.db_executor import execute_sql_query
+from ira.tests.database import populate_bundled_relations
+
+
+class AsyncDbExecutorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def test_result_same_as_sync(self):
+        query = Query('select * from products where "Price" > 100 order by "ProductID";')
+        output = asyncio.run(execute_sql_query_async(query, is_pooled=False))
+        # The async path checks the estimate before executing the query, which the sync executor leaves to the view
+        self.assertIn("estimate", output.value)
+        output.value.pop("estimate")
+        self.assertEqual(output.value, execute_sql_query(query).value)
+
+    def test_statement_timeout(self):
+        output = asyncio.run(execute_sql_query_async(Query("select pg_sleep(5);"), timeout=50, is_pooled=False))
+        self.assertEqual(output.status_code, HTTPStatus.GATEWAY_TIMEOUT)
+        self.assertEqual(output.value["error"], {"code": ErrorCode.STATEMENT_TIMEOUT.value})
+
+    def test_concurrent_queries_share_pool(self):
+        async def execute_concurrently():
+            try:
+                outputs = await asyncio.gather(*[execute_sql_query_async(Query(
+                    "select pg_sleep(0.2), {index} as index;".format(index=index))) for index in range(4)])
+                return outputs, (await get_async_connection_pool()).get_stats()
+            finally:
+                await close_async_connection_pool()
+
+        outputs, stats = asyncio.run(execute_concurrently())
+        self.assertEqual([output.status_code for output in outputs], [HTTPStatus.OK] * 4)
+        self.assertGreaterEqual(stats["pool_size"], 1)
@@ -0,0 +1,73 @@
+import time
+
+import psycopg
+from django.test import SimpleTestCase
+
+from ira.service.catalog import CATALOG, NOTIFY_QUERY, get_connection_info, get_fingerprint
+
+NOTIFIED_TABLE_QUERIES = (
+    "create table catalog_notified (a bigint, b text)",
+    "insert into ira_prepopulation_manifest (table_name, file_size, file_modified_ns, file_hash, column_names, "
+    "column_types) values ('catalog_notified', 0, 0, '', '{a,b}', '{bigint,text}')",
+    NOTIFY_QUERY,
+)
+DROP_NOTIFIED_TABLE_QUERIES = (
+    "drop table if exists catalog_notified",
+    "delete from ira_prepopulation_manifest where table_name = 'catalog_notified'",
+    NOTIFY_QUERY,
+)
+
+
+class CatalogTestCase(SimpleTestCase):
+    def execute(self, queries):
+        # Committed by a connection of its own, as another process would
+        with psycopg.connect(get_connection_info(), autocommit=True) as connection:
+            with connection.transaction():
+                for query in queries:
+                    connection.execute(query)
+
+    def wait_for(self, condition) -> bool:
+        deadline = time.monotonic() + 10
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def test_pre_populated_relations(self):
+        self.assertEqual(CATALOG.get_column_names("sales"), ("ProductID", "InvoiceNumber"))
+        self.assertTrue(CATALOG.is_relation("iris"))
+        self.assertFalse(CATALOG.is_relation("ira_prepopulation_manifest"))
+        self.assertIsNone(CATALOG.get_column_names("missing"))
+
+    def test_lookups_served_from_snapshot(self):
+        CATALOG.get_fingerprint()
+        self.assertTrue(self.wait_for(lambda: CATALOG.is_listening))
+        reads = CATALOG.get_stats()["reads"]
+        for _ in range(100):
+            CATALOG.is_relation("sales")
+        self.assertEqual(CATALOG.get_stats()["reads"], reads)
+
+    def test_change_notified_by_another_connection(self):
+        CATALOG.get_fingerprint()
+        self.assertTrue(self.wait_for(lambda: CATALOG.is_listening))
+        self.execute(NOTIFIED_TABLE_QUERIES)
+        try:
+            self.assertTrue(self.wait_for(lambda: CATALOG.is_relation("catalog_notified")))
+            self.assertEqual(CATALOG.get_column_names("catalog_notified"), ("a", "b"))
+        finally:
+            self.execute(DROP_NOTIFIED_TABLE_QUERIES)
+        self.assertTrue(self.wait_for(lambda: not CATALOG.is_relation("catalog_notified")))
+
+    def test_fingerprint_follows_column_order(self):
+        column_types = {"sales": ("bigint", "bigint")}
+        self.assertNotEqual(get_fingerprint({"sales": ("ProductID", "InvoiceNumber")}, column_types),
+                            get_fingerprint({"sales": ("InvoiceNumber", "ProductID")}, column_types))
+        column_types = {"sales": ("bigint",), "products": ("bigint",)}
+        self.assertEqual(get_fingerprint({"sales": ("ProductID",), "products": ("Price",)}, column_types),
+                         get_fingerprint({"products": ("Price",), "sales": ("ProductID",)}, column_types))
+
+    def test_fingerprint_follows_column_types(self):
+        relation_to_column_names = {"sales": ("ProductID", "InvoiceNumber")}
+        self.assertNotEqual(get_fingerprint(relation_to_column_names, {"sales": ("bigint", "bigint")}),
+                            get_fingerprint(relation_to_column_names, {"sales": ("bigint", "double precision")}))
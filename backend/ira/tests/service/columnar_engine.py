@@ -0,0 +1,155 @@
+import itertools
+from http import HTTPStatus
+from unittest import mock
+
+import psycopg
+from django.test import SimpleTestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.service import columnar_engine as columnar_engine_module
+from ira.service.catalog import CATALOG, NOTIFY_QUERY, get_connection_info
+from ira.service.columnar_engine import ColumnarEngine
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.db_executor import execute_sql_query
+from ira.service.result_cache import RESULT_CACHE
+from ira.tests.database import populate_bundled_relations
+
+ITEMS_QUERIES = (
+    "create table columnar_items (id bigint, name text, price double precision, in_stock boolean)",
+    "insert into columnar_items values (1, 'a', 1.5, true), (2, 'b', null, false), (3, null, 2.5, null), "
+    "(null, 'd', 0.5, true), (5, 'a', 1.5, true)",
+    "create table columnar_orders (id bigint, quantity bigint)",
+    "insert into columnar_orders values (1, 10), (1, 20), (3, null), (null, 40), (7, 70)",
+    "insert into ira_prepopulation_manifest (table_name, file_size, file_modified_ns, file_hash, column_names, "
+    "column_types) values ('columnar_items', 0, 0, '', '{id,name,price,in_stock}', "
+    "'{bigint,text,double precision,boolean}'), ('columnar_orders', 0, 0, '', '{id,quantity}', '{bigint,bigint}')",
+    NOTIFY_QUERY,
+)
+DROP_ITEMS_QUERIES = (
+    "drop table if exists columnar_items, columnar_orders",
+    "delete from ira_prepopulation_manifest where table_name in ('columnar_items', 'columnar_orders')",
+    NOTIFY_QUERY,
+)
+
+# Every operator the engine evaluates, on the bundled relations and on relations with NULL in their columns, and
+# joins of a relation with itself, which postgres refuses unless one side is a subquery or has an alias
+RA_QUERIES = (
+    "σ ProductID > 2 (sales)",
+    "π ProductName (σ Price >= 500 and ProductID < 5 (products))",
+    "σ variety = 'Setosa' or petal_width > 2 (iris)",
+    "π variety (iris)",
+    "products ⋈ sales",
+    "sales ▷ (σ Price > 500 (products))",
+    "(π ProductID (sales)) ∪ (π ProductID (products))",
+    "(π ProductID (sales)) ∩ (π ProductID (products))",
+    "(π ProductID (products)) - (π ProductID (sales))",
+    "products ⨯ sales",
+    "σ not price > 1 (columnar_items)",
+    "σ in_stock = true and name = 'a' (columnar_items)",
+    "σ price = null or id >= '3' (columnar_items)",
+    "columnar_items ⋈ columnar_orders",
+    "columnar_items ⧑ columnar_orders",
+    "columnar_items ⧒ columnar_orders",
+    "columnar_items ⧓ columnar_orders",
+    "columnar_items ▷ columnar_orders",
+    "(π id (columnar_items)) ∪ (π id (columnar_orders))",
+    "(π id (columnar_items)) - (π id (columnar_orders))",
+    "π name,price (columnar_items)",
+    "(iris) ⋈ (iris)",
+    "sales ⧑ sales",
+    "products ⨯ products",
+    "columnar_items ⧓ columnar_items",
+    "(σ ProductID > 2 (sales)) ⨯ (sales ⨯ sales)",
+    "(σ ProductID > 2 (sales)) ⋈ sales",
+    "sales ▷ sales",
+)
+
+
+class ColumnarEngineTestCase(SimpleTestCase):
+    # Outside of a transaction, as the catalog only reads committed relations
+    databases = {"default"}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        populate_bundled_relations()
+        cls.execute(ITEMS_QUERIES)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.execute(DROP_ITEMS_QUERIES)
+        super().tearDownClass()
+
+    @classmethod
+    def execute(cls, queries):
+        with psycopg.connect(get_connection_info(), autocommit=True) as db_connection:
+            with db_connection.transaction():
+                for query in queries:
+                    db_connection.execute(query)
+        CATALOG.invalidate()
+
+    def execute_in_memory(self, columnar_engine: ColumnarEngine, ra_query: str, **kwargs):
+        return columnar_engine.execute(COMPILE_CACHE.get_operator_tree(ra_query), COMPILE_CACHE.get_query(ra_query),
+                                       **kwargs)
+
+    def test_results_match_postgres(self):
+        columnar_engine = ColumnarEngine(max_rows=1000)
+        number_of_failures = 0
+        for ra_query in RA_QUERIES:
+            with self.subTest(ra_query=ra_query):
+                query = COMPILE_CACHE.get_query(ra_query)
+                output = self.execute_in_memory(columnar_engine, ra_query)
+                expected_output = execute_sql_query(query)
+                if expected_output.status_code != HTTPStatus.OK:
+                    self.assertIsNone(output)
+                    number_of_failures += 1
+                    continue
+                self.assertIsNotNone(output)
+                self.assertEqual(output.value["sqlQuery"], expected_output.value["sqlQuery"])
+                # Rows come in no particular order from either
+                self.assertEqual(sorted((tuple(row.items()) for row in output.result), key=repr),
+                                 sorted((tuple(row.items()) for row in expected_output.result), key=repr))
+        # Queries postgres refuses are left to it
+        self.assertEqual(number_of_failures, 5)
+        self.assertEqual(columnar_engine.get_stats()["fallbacks"], number_of_failures)
+
+    def test_left_to_postgres(self):
+        columnar_engine = ColumnarEngine(max_rows=1000)
+        # Strings are ordered by the collation of postgres, and postgres refuses to compare a number with a string
+        for ra_query in ("σ name < 'b' (columnar_items)", "σ ProductID > 'none' (sales)",
+                         "σ name = 1 (columnar_items)"):
+            with self.subTest(ra_query=ra_query):
+                self.assertIsNone(self.execute_in_memory(columnar_engine, ra_query))
+        # Relations beyond the maximum, and intermediate results growing beyond it
+        self.assertIsNone(self.execute_in_memory(ColumnarEngine(max_rows=100), "π variety (iris)"))
+        self.assertIsNone(self.execute_in_memory(ColumnarEngine(max_rows=30), "products ⨯ sales"))
+        self.assertIsNone(self.execute_in_memory(ColumnarEngine(max_rows=0), "σ ProductID > 2 (sales)"))
+
+    def test_relation_read_again_once_changed(self):
+        columnar_engine = ColumnarEngine(max_rows=1000)
+        for _ in range(3):
+            self.assertIsNotNone(self.execute_in_memory(columnar_engine, "σ ProductID > 2 (sales)"))
+        self.assertEqual(columnar_engine.get_stats()["reads"], 1)
+        CATALOG.invalidate()
+        RESULT_CACHE.bump_versions(["sales"])
+        self.assertIsNotNone(self.execute_in_memory(columnar_engine, "σ ProductID > 2 (sales)"))
+        self.assertEqual(columnar_engine.get_stats()["reads"], 2)
+
+    def test_timeout_reported(self):
+        columnar_engine = ColumnarEngine(max_rows=1000)
+        with mock.patch.object(columnar_engine_module, "time") as time:
+            # A second passes with every look at the clock, hence the second operator is past the deadline
+            time.monotonic.side_effect = itertools.count()
+            output = self.execute_in_memory(columnar_engine, "(σ ProductID > 2 (sales)) ⨯ products", timeout=1000)
+        self.assertEqual(output.status_code, HTTPStatus.GATEWAY_TIMEOUT)
+        self.assertEqual(output.error, {"code": ErrorCode.STATEMENT_TIMEOUT.value})
+        self.assertEqual(columnar_engine.get_stats()["timeouts"], 1)
+        self.assertEqual(columnar_engine.get_stats()["fallbacks"], 0)
+
+    @mock.patch("ira.service.db_executor.PREFLIGHT_MAX_ESTIMATED_ROWS", 2)
+    def test_result_above_preflight_threshold_left_to_postgres_unless_confirmed(self):
+        columnar_engine = ColumnarEngine(max_rows=1000)
+        self.assertIsNone(self.execute_in_memory(columnar_engine, "σ ProductID > 2 (sales)"))
+        self.assertEqual(len(self.execute_in_memory(columnar_engine, "σ ProductID > 2 (sales)",
+                                                    is_confirmed=True).result), 5)
+        self.assertEqual(len(self.execute_in_memory(columnar_engine, "σ ProductID > 4 (sales)").result), 1)
@@ -0,0 +1,103 @@
+import os
+import stat
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ira.service.catalog import CATALOG
+from ira.service.compile_cache import CompileCache, normalise_ra_query
+
+
+class CompileCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.compile_cache = CompileCache(max_entries=2)
+
+    def test_normalise_ra_query(self):
+        self.assertEqual(normalise_ra_query("  σ ProductID > 2   (sales) "), "σ ProductID > 2 (sales)")
+
+    def test_hit_after_miss_for_equivalent_whitespace(self):
+        first_query = self.compile_cache.get_query("sales ∪ sales")
+        second_query = self.compile_cache.get_query("  sales   ∪ sales ")
+        self.assertIs(first_query, second_query)
+        self.assertEqual(first_query.value, "select * from sales union select * from sales;")
+        stats = self.compile_cache.get_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.compile_cache.get_query("sales")
+        self.compile_cache.get_query("products")
+        self.compile_cache.get_query("sales")
+        self.compile_cache.get_query("iris")
+        self.assertEqual(self.compile_cache.get_stats()["evictions"], 1)
+        self.compile_cache.get_query("sales")
+        self.compile_cache.get_query("products")
+        stats = self.compile_cache.get_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 4)
+
+    def test_failed_compilation_is_not_cached(self):
+        with self.assertRaises(Exception):
+            self.compile_cache.get_query("(sales")
+        self.assertEqual(self.compile_cache.get_stats()["size"], 0)
+
+    def test_query_and_xml_tree_share_an_entry(self):
+        self.compile_cache.get_query("sales")
+        xml_tree = self.compile_cache.get_xml_tree("sales")
+        self.assertIn("<relation>", xml_tree)
+        self.assertEqual(self.compile_cache.get_stats()["size"], 1)
+
+    def test_catalog_change_invalidates_entries(self):
+        self.compile_cache.get_query("sales")
+        with mock.patch.object(CATALOG, "get_fingerprint", return_value="changed"):
+            self.compile_cache.get_query("sales")
+        stats = self.compile_cache.get_stats()
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_disk_tier_survives_a_new_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            CompileCache(max_entries=2, directory=directory).get_query("sales")
+            restarted_compile_cache = CompileCache(max_entries=2, directory=directory)
+            query = restarted_compile_cache.get_query("sales")
+            self.assertEqual(query.value, "select * from sales;")
+            self.assertEqual(restarted_compile_cache.get_stats()["diskHits"], 1)
+
+    def test_disk_tier_directory_is_private(self):
+        with tempfile.TemporaryDirectory() as parent_directory:
+            directory = os.path.join(parent_directory, "compile-cache")
+            os.makedirs(directory, mode=0o777)
+            os.chmod(directory, 0o777)
+            CompileCache(max_entries=2, directory=directory).get_query("sales")
+            self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+            # Entries of a directory another user could have written are never unpickled
+            with mock.patch("os.getuid", return_value=os.getuid() + 1):
+                compile_cache = CompileCache(max_entries=2, directory=directory)
+            compile_cache.get_query("sales")
+            stats = compile_cache.get_stats()
+            self.assertFalse(stats["diskTierEnabled"])
+            self.assertEqual(stats["diskHits"], 0)
+
+    def test_disk_tier_written_through_a_file_of_each_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            written_event, done_event = threading.Event(), threading.Event()
+
+            def compile_in_another_thread():
+                CompileCache(max_entries=2, directory=directory).get_query("sales")
+                written_event.set()
+                # Alive until the other thread has written, so that no thread takes over its identity
+                done_event.wait()
+
+            with mock.patch("os.replace", wraps=os.replace) as replace, \
+                    mock.patch.object(CompileCache, "_read_from_disk", return_value=None):
+                thread = threading.Thread(target=compile_in_another_thread)
+                thread.start()
+                written_event.wait()
+                CompileCache(max_entries=2, directory=directory).get_query("sales")
+                done_event.set()
+                thread.join()
+            temporary_paths = [call.args[0] for call in replace.call_args_list]
+            self.assertEqual(len(temporary_paths), 2)
+            self.assertNotEqual(temporary_paths[0], temporary_paths[1])
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import psycopg2
+from django.db import connection
+from django.test import TestCase
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from ira.service.connection_pool import ConnectionPool
+
+
+class ConnectionPoolTestCase(TestCase):
+    def create_connection_pool(self, **kwargs) -> ConnectionPool:
+        connection_parameters = connection.get_connection_params()
+        connection_pool = ConnectionPool(lambda: psycopg2.connect(**connection_parameters), **kwargs)
+        self.addCleanup(connection_pool.close)
+        return connection_pool
+
+    def test_connection_reused(self):
+        connection_pool = self.create_connection_pool()
+        pooled_connection = connection_pool.get_connection()
+        connection_pool.put_connection(pooled_connection)
+        self.assertIs(connection_pool.get_connection(), pooled_connection)
+        stats = connection_pool.get_stats()
+        self.assertEqual((stats["opened"], stats["checkouts"], stats["inUse"]), (1, 2, 1))
+        connection_pool.put_connection(pooled_connection)
+
+    def test_transaction_rolled_back_on_return(self):
+        connection_pool = self.create_connection_pool()
+        with connection_pool.borrow_connection() as pooled_connection:
+            with pooled_connection.cursor() as cursor:
+                cursor.execute("select 1")
+        self.assertEqual(pooled_connection.info.transaction_status, TRANSACTION_STATUS_IDLE)
+
+    def test_wait_for_returned_connection(self):
+        connection_pool = self.create_connection_pool(max_size=1, wait_timeout=5)
+        pooled_connection = connection_pool.get_connection()
+        threading.Timer(0.1, connection_pool.put_connection, [pooled_connection]).start()
+        self.assertIs(connection_pool.get_connection(), pooled_connection)
+        stats = connection_pool.get_stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["maxWaitMilliseconds"], 0)
+        connection_pool.put_connection(pooled_connection)
+
+    def test_wait_timeout(self):
+        connection_pool = self.create_connection_pool(max_size=1, wait_timeout=0.05)
+        with connection_pool.borrow_connection():
+            with self.assertRaises(Exception):
+                connection_pool.get_connection()
+        self.assertEqual(connection_pool.get_stats()["timeouts"], 1)
+
+    def test_broken_and_expired_connections_closed(self):
+        connection_pool = self.create_connection_pool()
+        pooled_connection = connection_pool.get_connection()
+        pooled_connection.close()
+        connection_pool.put_connection(pooled_connection)
+        self.assertEqual(connection_pool.get_stats()["size"], 0)
+
+        connection_pool.max_lifetime = 0
+        pooled_connection = connection_pool.get_connection()
+        connection_pool.put_connection(pooled_connection)
+        self.assertTrue(pooled_connection.closed)
+        self.assertEqual(connection_pool.get_stats()["closed"], 2)
+
+    def test_idle_connections_beyond_min_size_closed(self):
+        connection_pool = self.create_connection_pool(min_size=1, max_idle=0.05)
+        pooled_connections = [connection_pool.get_connection() for _ in range(3)]
+        for pooled_connection in pooled_connections:
+            connection_pool.put_connection(pooled_connection)
+        time.sleep(0.1)
+        connection_pool.put_connection(connection_pool.get_connection())
+        self.assertEqual(connection_pool.get_stats()["size"], 1)
+
+    def test_health_check_replaces_terminated_connection(self):
+        connection_pool = self.create_connection_pool(health_check_interval=0)
+        pooled_connection = connection_pool.get_connection()
+        backend_pid = pooled_connection.get_backend_pid()
+        connection_pool.put_connection(pooled_connection)
+        with connection.cursor() as cursor:
+            cursor.execute("select pg_terminate_backend(%s)", [backend_pid])
+        # Postgres terminates the backend asynchronously
+        time.sleep(0.1)
+        healthy_connection = connection_pool.get_connection()
+        self.assertIsNot(healthy_connection, pooled_connection)
+        self.assertEqual(connection_pool.get_stats()["size"], 1)
+        connection_pool.put_connection(healthy_connection)
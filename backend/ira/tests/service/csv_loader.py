@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from ira.service.csv_loader import BIGINT, BOOLEAN, DOUBLE_PRECISION, TEXT, CsvFile, empty_missing_values, \
+    get_file_hash, infer_column_types, load_csv_file, load_csv_files, read_chunks, read_column_names
+
+COLUMN_TYPES_QUERY = "select data_type from information_schema.columns where table_name = %s order by ordinal_position"
+
+
+class CsvChunkTestCase(SimpleTestCase):
+    def test_chunks_end_with_whole_records(self):
+        data = b'1,"a\nb"\n2,"c ""quoted""\n, d"\n3,e\n4,f'
+        for chunk_bytes in (1, 3, 8, 1024):
+            chunks = list(read_chunks(io.BytesIO(data), chunk_bytes))
+            self.assertEqual(b"".join(chunks), data)
+            self.assertTrue(all(chunk.endswith(b"\n") for chunk in chunks[:-1]))
+            self.assertTrue(all(chunk.count(b'"') % 2 == 0 for chunk in chunks))
+
+    def test_column_types_inferred(self):
+        chunk = b"1,1.5,true,a,,null\n-2,3,False,1,,NA\n,nan,,2,,\n"
+        self.assertEqual(infer_column_types(chunk, 6), [BIGINT, DOUBLE_PRECISION, BOOLEAN, TEXT, TEXT, TEXT])
+        self.assertEqual(infer_column_types(b"9223372036854775808\n", 1), [DOUBLE_PRECISION])
+
+    def test_missing_values_emptied_in_typed_columns(self):
+        chunk = b'null,null\n1,"N/A, or ""NA"""\nNA,\n'
+        self.assertEqual(empty_missing_values(chunk, [BIGINT, TEXT]), b',null\n1,"N/A, or ""NA"""\n,\n')
+        self.assertEqual(empty_missing_values(b"null\n2\n", [BIGINT]), b"\n2\n")
+
+
+class CsvLoaderTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def load(self, table_name: str, content: str, chunk_bytes: int = 1024):
+        path = os.path.join(self.directory, "{table_name}.csv".format(table_name=table_name))
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return load_csv_file(CsvFile(path, table_name, read_column_names(path)), chunk_bytes)
+
+    def get_column_types(self, table_name: str):
+        with connection.cursor() as cursor:
+            cursor.execute(COLUMN_TYPES_QUERY, [table_name])
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_columns_promoted_by_later_chunks(self):
+        rows = ["{index},{index},{index}".format(index=index) for index in range(100)]
+        rows += ["100,100.5,100.5", "101,101,text"]
+        result = self.load("csv_loader_promoted", "id,amount,label\n" + "\n".join(rows) + "\n", chunk_bytes=64)
+        self.assertEqual(result.number_of_rows, 102)
+        self.assertEqual(result.column_types, [BIGINT, DOUBLE_PRECISION, TEXT])
+        self.assertEqual(self.get_column_types("csv_loader_promoted"), ["bigint", "double precision", "text"])
+        with connection.cursor() as cursor:
+            cursor.execute('select sum(amount), max(label) from csv_loader_promoted where id >= 99')
+            self.assertEqual(cursor.fetchone(), (300.5, "text"))
+
+    def test_missing_values_loaded_as_null(self):
+        rows = ["{index},name {index}".format(index=index) for index in range(50)] + ["null,NA", "NaN,"]
+        result = self.load("csv_loader_missing", "ProductID,Name\n" + "\n".join(rows) + "\n", chunk_bytes=128)
+        self.assertEqual(result.column_types, [BIGINT, TEXT])
+        with connection.cursor() as cursor:
+            cursor.execute('select count(*), count("ProductID"), count("Name") from csv_loader_missing')
+            self.assertEqual(cursor.fetchone(), (52, 50, 51))
+
+    def test_quoted_newlines_and_header_only(self):
+        result = self.load("csv_loader_quoted", 'a,b\n1,"x\ny"\n2,"z"\n', chunk_bytes=4)
+        self.assertEqual(result.number_of_rows, 2)
+        with connection.cursor() as cursor:
+            cursor.execute("select b from csv_loader_quoted order by a")
+            self.assertEqual(cursor.fetchall(), [("x\ny",), ("z",)])
+        result = self.load("csv_loader_empty", "a,b\n")
+        self.assertEqual((result.number_of_rows, result.column_types), (0, [TEXT, TEXT]))
+
+    def test_existing_table_not_loaded(self):
+        self.load("csv_loader_existing", "a\n1\n")
+        with self.assertRaisesMessage(Exception, "Table 'csv_loader_existing' already exists."):
+            self.load("csv_loader_existing", "a\n2\n")
+
+    def test_table_replaced_once_loaded(self):
+        self.load("csv_loader_replaced", "a\n1\n")
+        path = os.path.join(self.directory, "csv_loader_replaced.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("a\nx\ny\n")
+        loaded = []
+        result = load_csv_file(CsvFile(path, "csv_loader_replaced", ["a"], is_replacing=True),
+                               on_loaded=lambda cursor, csv_file, result: loaded.append(csv_file.table_name))
+        self.assertEqual(loaded, ["csv_loader_replaced"])
+        self.assertEqual(result.file_hash, get_file_hash(path))
+        self.assertEqual(self.get_column_types("csv_loader_replaced"), ["text"])
+        with connection.cursor() as cursor:
+            cursor.execute("select a from csv_loader_replaced order by a")
+            self.assertEqual(cursor.fetchall(), [("x",), ("y",)])
+            cursor.execute("select count(*) from pg_tables where tablename like 'ira_shadow_%%'")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_failed_load_logged(self):
+        csv_file = CsvFile(os.path.join(self.directory, "csv_loader_missing_file.csv"), "csv_loader_missing_file",
+                           ["a"])
+        with self.assertLogs("ira.service.csv_loader", "ERROR") as logs:
+            self.assertEqual(load_csv_files([csv_file]), [])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("Loading table csv_loader_missing_file, and failed", logs.output[0])
@@ -0,0 +1,118 @@
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.model.query import Query
+from ira.enum.result_format import ResultFormat
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.db_executor import execute_sql_query, execute_sql_query_as_json, preflight_sql_query, \
+    stream_sql_query
+from ira.service.result_encoder import encode
+from ira.tests.database import populate_bundled_relations
+
+# Duplicate column names, NULLs, an empty result and a failing query
+JSON_PASSTHROUGH_RA_QUERIES = ("sales",
+                               "(π ProductID (sales)) ⨯ (π ProductID (products))",
+                               "sales ⧓ products",
+                               "σ ProductID > 100 (sales)",
+                               "σ Missing > 1 (sales)")
+
+# Divides by zero at the fifth row, once the first rows have been streamed
+FAILING_MID_STREAM_QUERY = "select 10 / (5 - n) as quotient from generate_series(1, 10) as n;"
+
+CROSS_PRODUCT_QUERY = "select * from iris as i1 cross join iris as i2 cross join iris as i3 cross join iris as i4;"
+
+
+class PreflightTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def test_estimate_returned(self):
+        query = Query("select * from sales;")
+        estimate, output = preflight_sql_query(query)
+        self.assertIsNone(output)
+        self.assertGreater(estimate["rows"], 0)
+        self.assertGreater(estimate["cost"], 0)
+        self.assertEqual(execute_sql_query(query, estimate=estimate).value["estimate"], estimate)
+
+    def test_cross_product_requires_confirmation(self):
+        estimate, output = preflight_sql_query(Query(CROSS_PRODUCT_QUERY))
+        self.assertEqual(output.status_code, HTTPStatus.PRECONDITION_REQUIRED)
+        self.assertEqual(output.value["error"], {"code": ErrorCode.CONFIRMATION_REQUIRED.value})
+        self.assertEqual(output.value["estimate"], estimate)
+
+        confirmed_estimate, output = preflight_sql_query(Query(CROSS_PRODUCT_QUERY), is_confirmed=True)
+        self.assertIsNone(output)
+        self.assertEqual(confirmed_estimate, estimate)
+
+    def test_query_failing_to_plan(self):
+        query = Query("select missing from sales;")
+        self.assertEqual(preflight_sql_query(query), (None, None))
+        output = execute_sql_query(query)
+        self.assertEqual(output.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertNotIn("explain", output.message)
+
+
+@mock.patch("ira.service.db_executor.STREAM_BATCH_SIZE", 2)
+class StreamTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def test_header_and_rows_across_batches(self):
+        query = Query("select * from sales;")
+        lines = list(stream_sql_query(query, estimate={"rows": 1, "cost": 1}))
+        header = json.loads(lines[0])
+        self.assertEqual(header, {"sqlQuery": query.value, "columns": ["ProductID", "InvoiceNumber"],
+                                  "estimate": {"rows": 1, "cost": 1}})
+        with connection.cursor() as cursor:
+            cursor.execute(query.value)
+            expected_rows = [list(row) for row in cursor.fetchall()]
+        self.assertGreater(len(expected_rows), 2)
+        # One chunk per batch, which holds a line per row
+        self.assertEqual(len(lines), 1 + (len(expected_rows) + 1) // 2)
+        rows = [json.loads(line) for chunk in lines[1:] for line in chunk.splitlines()]
+        self.assertEqual(rows, expected_rows)
+
+    def test_error_reported_as_last_record(self):
+        lines = list(stream_sql_query(Query(FAILING_MID_STREAM_QUERY)))
+        self.assertEqual(json.loads(lines[0])["columns"], ["quotient"])
+        rows = [json.loads(line) for chunk in lines[1:-1] for line in chunk.splitlines()]
+        self.assertEqual(rows, [[2], [3], [5], [10]])
+        last_record = json.loads(lines[-1])
+        self.assertIn("division by zero", last_record["message"])
+        self.assertNotIn("columns", last_record)
+
+
+class JsonPassthroughTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def assert_passed_through(self, query: Query, result_format: ResultFormat):
+        # Each within a savepoint rolled back, as a failing query aborts the transaction of the test
+        with transaction.atomic():
+            status, content = execute_sql_query_as_json(query, result_format)
+            transaction.set_rollback(True)
+        with transaction.atomic():
+            expected_output = execute_sql_query(query, result_format)
+            transaction.set_rollback(True)
+        self.assertEqual(status, expected_output.status_code)
+        # Keys as pairs, so that duplicate column names are compared too
+        self.assertEqual(json.loads(content, object_pairs_hook=list),
+                         json.loads(encode(expected_output.value), object_pairs_hook=list))
+
+    def test_every_format_matches_the_output_encoded_in_python(self):
+        for ra_query in JSON_PASSTHROUGH_RA_QUERIES:
+            for result_format in ResultFormat:
+                with self.subTest(ra_query=ra_query, result_format=result_format):
+                    self.assert_passed_through(COMPILE_CACHE.get_query(ra_query), result_format)
+
+    def test_dml_passed_through(self):
+        self.assert_passed_through(Query("update sales set \"ProductID\" = 1 where \"ProductID\" = 0;", ["sales"]),
+                                   ResultFormat.OBJECTS)
@@ -0,0 +1,67 @@
+from django.test import SimpleTestCase
+
+from ira.service.dialect import SQLITE_DIALECT, SqliteDialect
+from ira.service.lexer import Lexer
+from ira.service.parser import Parser
+from ira.service.transformer import transform
+
+
+class DialectTestCase(SimpleTestCase):
+    def setUp(self):
+        self.lexer = Lexer()
+        self.parser = Parser()
+
+    def transform(self, ra_query, *args):
+        return transform(self.parser.parse(self.lexer.tokenize(ra_query)), *args)
+
+    def test_postgres_by_default(self):
+        query = self.transform("(π InvoiceNumber,ProductID (sales)) ⋈ products")
+        self.assertEqual(query.value, 'select * from (select distinct "InvoiceNumber","ProductID" from sales) as q1 '
+                                      'natural join products;')
+        self.assertIsNotNone(query.shape)
+
+    def test_sqlite_natural_join_lists_columns_in_order_of_postgres(self):
+        query = self.transform("(π InvoiceNumber,ProductID (sales)) ⋈ products", SQLITE_DIALECT)
+        self.assertEqual(query.value, 'select "ProductID", "InvoiceNumber", "ProductName", "Price" from '
+                                      '(select distinct "InvoiceNumber","ProductID" from sales) as q1 '
+                                      'natural join products;')
+        # Literals are left in the query, as its statement is not prepared
+        self.assertIsNone(self.transform("σ ProductID > 2 (sales)", SQLITE_DIALECT).shape)
+
+    def test_sqlite_set_operands_are_not_parenthesised(self):
+        query = self.transform("(σ ProductID > 2 (sales)) ∪ sales", SQLITE_DIALECT)
+        self.assertEqual(query.value, 'select * from (select * from sales where "ProductID">2) union '
+                                      'select * from sales;')
+
+    def test_sqlite_emulates_outer_joins(self):
+        dialect = SqliteDialect(has_outer_joins=False)
+        self.assertEqual(self.transform("sales ⧒ products", dialect).value,
+                         'select * from (with ira_left2 as (select * from sales), ira_right2 as '
+                         '(select * from products) select "ProductID", "InvoiceNumber", "ProductName", "Price" '
+                         'from ira_right2 natural left join ira_left2);')
+        self.assertIn("union all", self.transform("sales ⧓ products", dialect).value)
+        self.assertEqual(self.transform("sales ⧒ products", SqliteDialect(has_outer_joins=True)).value,
+                         'select "ProductID", "InvoiceNumber", "ProductName", "Price" from sales '
+                         'natural right join products;')
+        with self.assertRaises(Exception):
+            self.transform("sales ⧓ sales.ProductID = products.ProductID (products)", dialect)
+
+    def test_sqlite_refuses_unknown_columns(self):
+        # SQLite would read a quoted name which is no column as a string
+        with self.assertRaises(Exception):
+            self.transform("σ unknown_column > 1 (sales)", SQLITE_DIALECT)
+        self.assertIn("unknown_column", self.transform("σ unknown_column > 1 (sales)").value)
+        with self.assertRaises(Exception):
+            self.transform("π unknown_column (sales)", SQLITE_DIALECT)
+        with self.assertRaises(Exception):
+            self.transform("unknown_relation ⋈ sales", SQLITE_DIALECT)
+
+    def test_sqlite_refuses_subqueries_repeating_a_column_name(self):
+        # SQLite would read the reference as the first column, and rename the second one ProductID:1
+        for ra_query in ("σ ProductID > 2 (sales ⨯ products)", "(sales ⨯ products) ⨯ products"):
+            with self.subTest(ra_query=ra_query):
+                with self.assertRaises(Exception):
+                    self.transform(ra_query, SQLITE_DIALECT)
+                self.transform(ra_query)
+        # Relations of the cross product itself are no subqueries
+        self.transform("sales ⨯ products", SQLITE_DIALECT)
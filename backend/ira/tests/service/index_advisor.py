@@ -0,0 +1,137 @@
+from unittest import mock
+
+import psycopg
+from django.db import connection
+from django.test import SimpleTestCase
+
+from ira.service import index_advisor as index_advisor_module
+from ira.service.catalog import CATALOG, NOTIFY_QUERY, get_connection_info
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.index_advisor import IndexAdvisor, create_indexes
+
+ORDERS_QUERIES = (
+    "create table index_advisor_orders as "
+    "select id::bigint, (id % 100)::bigint as customer_id from generate_series(1, 20000) as id",
+    "analyze index_advisor_orders",
+    "insert into ira_prepopulation_manifest (table_name, file_size, file_modified_ns, file_hash, column_names, "
+    "column_types) values ('index_advisor_orders', 0, 0, '', '{id,customer_id}', '{bigint,bigint}')",
+    NOTIFY_QUERY,
+)
+DROP_ORDERS_QUERIES = (
+    "drop table if exists index_advisor_orders",
+    "delete from ira_prepopulation_manifest where table_name = 'index_advisor_orders'",
+    NOTIFY_QUERY,
+)
+INDEX_NAMES_QUERY = "select indexname from pg_indexes where tablename = 'index_advisor_orders'"
+
+
+class IndexAdvisorTestCase(SimpleTestCase):
+    # Outside of a transaction, as a concurrent index build waits for every transaction open before it
+    databases = {"default"}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.execute(ORDERS_QUERIES)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.execute(DROP_ORDERS_QUERIES)
+        super().tearDownClass()
+
+    @classmethod
+    def execute(cls, queries):
+        with psycopg.connect(get_connection_info(), autocommit=True) as db_connection:
+            with db_connection.transaction():
+                for query in queries:
+                    db_connection.execute(query)
+        CATALOG.invalidate()
+
+    def get_index_names(self):
+        with connection.cursor() as cursor:
+            cursor.execute(INDEX_NAMES_QUERY)
+            return [row[0] for row in cursor.fetchall()]
+
+    def record(self, index_advisor: IndexAdvisor, ra_query: str, times: int = 1):
+        for _ in range(times):
+            index_advisor.record(COMPILE_CACHE.get_query(ra_query))
+
+    def test_selected_column_advised(self):
+        index_advisor = IndexAdvisor()
+        self.record(index_advisor, "σ id = 42 (index_advisor_orders)", times=3)
+        self.record(index_advisor, "σ id = 7 (index_advisor_orders)")
+        advice = index_advisor.advise(is_building_allowed=True)
+        self.assertEqual(len(advice), 1)
+        candidate = advice[0]
+        self.assertEqual((candidate["relationName"], candidate["columnName"]), ("index_advisor_orders", "id"))
+        self.assertEqual((candidate["usages"], candidate["queries"], candidate["executions"]),
+                         ({"selection": 4}, 2, 4))
+        self.assertTrue(candidate["isAdvised"])
+        self.assertLess(candidate["estimatedCostWithIndex"], candidate["estimatedCost"])
+        self.assertFalse(candidate["isHypothetical"])
+        # Only built to plan with
+        self.assertEqual(self.get_index_names(), [])
+
+    def test_index_not_advised_without_benefit(self):
+        index_advisor = IndexAdvisor()
+        self.record(index_advisor, "σ customer_id > 0 (index_advisor_orders)")
+        advice = index_advisor.advise(is_building_allowed=True)
+        self.assertEqual([candidate["columnName"] for candidate in advice], ["customer_id"])
+        self.assertFalse(advice[0]["isAdvised"])
+        self.assertEqual(create_indexes(advice), [])
+
+    def test_advised_index_created_concurrently(self):
+        index_advisor = IndexAdvisor()
+        self.record(index_advisor, "σ id = 42 (index_advisor_orders)")
+        advice = index_advisor.advise(is_building_allowed=True)
+        self.assertEqual(create_indexes(advice), [advice[0]["indexName"]])
+        self.assertEqual(self.get_index_names(), [advice[0]["indexName"]])
+        try:
+            # The column is indexed now
+            self.assertEqual(index_advisor.advise(is_building_allowed=True), [])
+        finally:
+            self.execute(["drop index {index_name}".format(index_name=advice[0]["indexName"])])
+
+    def test_recent_queries_kept(self):
+        index_advisor = IndexAdvisor(max_queries=1)
+        self.record(index_advisor, "σ id = 42 (index_advisor_orders)")
+        self.record(index_advisor, "σ customer_id = 4 (index_advisor_orders)")
+        # Neither selecting nor joining on a column
+        self.record(index_advisor, "π id (index_advisor_orders)")
+        self.assertEqual(len(index_advisor.fingerprint_to_executions), 1)
+        # The column of a query no longer kept is still tallied, but there is no query left to plan with it
+        self.assertEqual([candidate["columnName"] for candidate in index_advisor.advise(is_building_allowed=True)],
+                         ["customer_id"])
+
+    def test_candidate_left_unpriced_unless_building_is_allowed(self):
+        index_advisor = IndexAdvisor()
+        self.record(index_advisor, "σ id = 42 (index_advisor_orders)", times=2)
+        with mock.patch.object(index_advisor_module, "get_costs_with_index") as get_costs_with_index:
+            advice = index_advisor.advise()
+        get_costs_with_index.assert_not_called()
+        self.assertEqual(len(advice), 1)
+        candidate = advice[0]
+        self.assertFalse(candidate["isPriced"])
+        self.assertFalse(candidate["isAdvised"])
+        self.assertGreater(candidate["estimatedCost"], 0)
+        self.assertIsNone(candidate["estimatedCostWithIndex"])
+        self.assertIsNone(candidate["estimatedBenefit"])
+        self.assertEqual(create_indexes(advice), [])
+
+    def test_index_built_under_statement_timeout(self):
+        index_advisor = IndexAdvisor()
+        self.record(index_advisor, "σ id = 42 (index_advisor_orders)")
+        statement_timeouts = []
+        get_cost = index_advisor_module.get_cost
+
+        def record_statement_timeout(cursor, query):
+            cursor.execute("show statement_timeout")
+            statement_timeouts.append(cursor.fetchone()[0])
+            return get_cost(cursor, query)
+
+        with mock.patch.object(index_advisor_module, "get_cost", side_effect=record_statement_timeout):
+            index_advisor.advise(is_building_allowed=True)
+        # Planned without the index first, then with it once built
+        build_timeout = "{seconds}s".format(seconds=index_advisor_module.BUILD_TIMEOUT_MS // 1000)
+        self.assertEqual(statement_timeouts[-1], build_timeout)
+        self.assertNotEqual(statement_timeouts[0], statement_timeouts[-1])
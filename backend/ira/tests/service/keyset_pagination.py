@@ -0,0 +1,69 @@
+import datetime
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+
+from ira.enum.result_format import ResultFormat
+from ira.model.query import Query
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.db_executor import execute_sql_query
+from ira.service.keyset_pagination import ContinuationToken, execute_sql_query_page, to_json_values
+from ira.tests.database import populate_bundled_relations
+
+# Plain rows, duplicate column names with values repeated across pages, and rows with NULLs, which records compare
+# as larger than any value
+PAGINATED_RA_QUERIES = ("sales",
+                        "(π ProductID (sales)) ⨯ (π ProductID (sales))",
+                        "sales ⧓ products")
+# Rows repeated across pages, which no RA query returns
+DUPLICATE_ROWS_QUERY = "select \"ProductID\" from sales;"
+
+
+class KeysetPaginationTestCase(SimpleTestCase):
+    def test_continuation_token_round_trip(self):
+        continuation_token = ContinuationToken("fingerprint", ["double precision", "text"], [3.0, None], 2)
+        loaded_continuation_token = ContinuationToken.loads(continuation_token.dumps())
+        self.assertEqual(loaded_continuation_token.fingerprint, "fingerprint")
+        self.assertEqual(loaded_continuation_token.column_types, ["double precision", "text"])
+        self.assertEqual(loaded_continuation_token.last_row_key, [3.0, None])
+        self.assertEqual(loaded_continuation_token.number_of_last_rows_seen, 2)
+
+    def test_tampered_continuation_token_is_rejected(self):
+        continuation_token = ContinuationToken("fingerprint", ["text"], ["a"], 1).dumps()
+        with self.assertRaises(Exception):
+            ContinuationToken.loads(continuation_token[:-1] + ("A" if continuation_token[-1] != "A" else "B"))
+
+    def test_continuation_token_of_another_query_is_rejected(self):
+        continuation_token = ContinuationToken(Query("select * from products;").fingerprint, ["text"], ["a"], 1)
+        with self.assertRaises(Exception):
+            execute_sql_query_page(Query("select * from sales;"), 10, continuation_token)
+
+    def test_values_keep_full_precision(self):
+        self.assertEqual(to_json_values([Decimal("1.10"), datetime.datetime(2023, 1, 1, 10, 0, 0, 123456), None, 1]),
+                         ["1.10", "2023-01-01 10:00:00.123456", None, 1])
+
+
+class KeysetPaginationQueryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def test_pages_make_up_the_result(self):
+        queries = [COMPILE_CACHE.get_query(ra_query) for ra_query in PAGINATED_RA_QUERIES]
+        for query in queries + [Query(DUPLICATE_ROWS_QUERY)]:
+            with self.subTest(query=query.value):
+                rows = []
+                continuation_token = None
+                while True:
+                    output = execute_sql_query_page(query, 3, continuation_token, ResultFormat.COMPACT)
+                    page_rows = output.value["result"]["rows"]
+                    self.assertLessEqual(len(page_rows), 3)
+                    rows.extend(page_rows)
+                    if output.value["continuationToken"] is None:
+                        break
+                    self.assertEqual(len(page_rows), 3)
+                    continuation_token = ContinuationToken.loads(output.value["continuationToken"])
+                expected_rows = execute_sql_query(query, ResultFormat.COMPACT).value["result"]["rows"]
+                self.assertGreater(len(expected_rows), 3)
+                # Pages come in the order of the rows, which the unpaginated result has in no particular order
+                self.assertEqual(sorted(rows, key=repr), sorted(expected_rows, key=repr))
@@ -45,3 +45,10 @@ class LexerTestCase(SimpleTestCase):
             "(", TokenType.OPEN_PARENTHESIS),
             Token("A", TokenType.IDENT), Token(")", TokenType.CLOSED_PARENTHESIS)]
         self.assertListEqual(tokens, expected)
+
+    def test_long_expression(self):
+        term = "σ a>=1 and b<2 (R ⧑ R.a = S.a (S))"
+        term_tokens = self.lexer.tokenize(term)
+        tokens = self.lexer.tokenize(" ∪ ".join([term] * 1000))
+        expected = term_tokens + [token for _ in range(999) for token in [Token("∪", TokenType.UNION), *term_tokens]]
+        self.assertListEqual(tokens, expected)
@@ -0,0 +1,75 @@
+from collections import Counter
+
+from django.db import connection
+from django.test import TestCase
+
+from ira.service.compile_cache import CompileCache
+from ira.service.lexer import Lexer
+from ira.service.optimiser import optimise
+from ira.service.parser import Parser
+from ira.service.transformer import transform
+from ira.tests.database import populate_bundled_relations
+
+EQUIVALENT_RA_QUERIES = (
+    "σ Price>100 (products ⋈ sales)",
+    "σ InvoiceNumber>3000000 (σ Price>100 (products ⋈ sales))",
+    "π ProductName (σ Price>100 (products ⋈ sales))",
+    "π ProductID,InvoiceNumber (σ Price>20 (sales ⋈ products))",
+    "π ProductID (π ProductID,Price (products))",
+    "σ ProductID>2 ((π ProductID (sales)) ∪ (π ProductID (products)))",
+    "σ ProductID>2 ((π ProductID (sales)) - (π ProductID (products)))",
+    "σ ProductID<4 ((π ProductID (sales)) ∩ (π ProductID (products)))",
+    "π variety (σ sepal_length>5 (iris ⨯ products))",
+    "σ InvoiceNumber>3000000 (sales ⧑ products)",
+    "σ ProductName='Mouse' (sales ⧑ products)",
+    "σ InvoiceNumber>3000000 (sales ▷ products)",
+    "σ (ProductID>1 or Price<50) and ProductID<6 (σ not ProductID=3 (products))",
+)
+
+
+class OptimiserTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def compile(self, ra_query, is_optimised=True):
+        parsed_postfix_tokens = Parser().parse(Lexer().tokenize(ra_query))
+        if is_optimised:
+            parsed_postfix_tokens = optimise(parsed_postfix_tokens)
+        return transform(parsed_postfix_tokens).value
+
+    def execute(self, sql_query):
+        with connection.cursor() as cursor:
+            cursor.execute(sql_query)
+            return [column.name for column in cursor.description], Counter(cursor.fetchall())
+
+    def test_equivalent_results(self):
+        for ra_query in EQUIVALENT_RA_QUERIES:
+            with self.subTest(ra_query=ra_query):
+                self.assertEqual(self.execute(self.compile(ra_query)),
+                                 self.execute(self.compile(ra_query, is_optimised=False)))
+
+    def test_selections_merged_and_pushed_below_join(self):
+        self.assertEqual(self.compile("σ InvoiceNumber>3000000 (σ Price>100 (σ Price<600 (products ⋈ sales)))"),
+                         'select * from (select * from products where ("Price"<600) and ("Price">100)) as q1 '
+                         'natural join (select * from sales where "InvoiceNumber">3000000) as q3;')
+
+    def test_projections_merged_and_pushed_below_join(self):
+        self.assertEqual(self.compile("π ProductID (π ProductID,Price (products))"),
+                         'select distinct "ProductID" from products;')
+        self.assertEqual(self.compile("π ProductName (products ⋈ sales)"),
+                         'select distinct "ProductName" from (select * from (select "ProductID","ProductName" from '
+                         'products) as q1 natural join (select "ProductID" from sales) as q3) as q4;')
+
+    def test_redundant_distinct_dropped(self):
+        self.assertEqual(self.compile("(π ProductID (sales)) ∪ (π ProductID (products))"),
+                         '(select "ProductID" from sales) union (select "ProductID" from products);')
+
+    def test_selection_kept_where_it_would_fail(self):
+        self.assertEqual(self.compile("σ ProductID=1 (π ProductName (products))"),
+                         self.compile("σ ProductID=1 (π ProductName (products))", is_optimised=False))
+
+    def test_optimiser_disabled(self):
+        ra_query = "σ Price>100 (products ⋈ sales)"
+        compile_cache = CompileCache(max_entries=2, is_optimiser_enabled=False)
+        self.assertEqual(compile_cache.get_query(ra_query).value, self.compile(ra_query, is_optimised=False))
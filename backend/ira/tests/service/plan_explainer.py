@@ -0,0 +1,59 @@
+from django.db import connection
+from django.test import TestCase
+
+from ira.service.plan_explainer import explain_ra_query, get_plan_nodes_top_down
+from ira.tests.database import populate_bundled_relations
+
+
+class PlanExplainerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def test_analysed_operators(self):
+        output = explain_ra_query("σ Price>100 (products ⋈ sales)", is_analysed=True)
+        with connection.cursor() as cursor:
+            cursor.execute(output.value["sqlQuery"])
+            number_of_rows = len(cursor.fetchall())
+        operators = output.result["operators"]
+        self.assertEqual([operator["raExpression"] for operator in operators],
+                         ["products", "σ Price>100 (products)", "sales", "(σ Price>100 (products)) ⋈ (sales)"])
+        self.assertEqual(output.result["plan"]["raPostfixIndex"], 3)
+        self.assertEqual(operators[3]["actualRows"], number_of_rows)
+        for operator in operators:
+            self.assertIsNotNone(operator["planNodeType"])
+            self.assertIsNotNone(operator["estimatedRows"])
+            self.assertIsNotNone(operator["actualTime"])
+        self.assertIsNotNone(output.result["executionTime"])
+
+    def test_estimated_operators(self):
+        output = explain_ra_query("π ProductName (products)")
+        operators = output.result["operators"]
+        self.assertEqual(operators[1]["operator"], "π")
+        self.assertIsNotNone(operators[1]["estimatedRows"])
+        self.assertIsNone(operators[1]["actualRows"])
+        self.assertIsNone(output.result["executionTime"])
+
+    def test_occurrences_of_relation(self):
+        # RA query: (sales) ⋈ (σ ProductID>2 (sales)), where the selection is turned into the filter of its scan
+        output = explain_ra_query("sales ⋈ (σ ProductID>2 (sales))")
+        scan_plan_nodes = [plan_node for plan_node in get_plan_nodes_top_down(output.result["plan"])
+                           if plan_node.get("Relation Name") == "sales"]
+        self.assertCountEqual([(("Filter" in plan_node), plan_node["raPostfixIndexes"][0])
+                               for plan_node in scan_plan_nodes], [(False, 0), (True, 1)])
+        self.assertTrue(output.result["operators"][2]["isMerged"])
+
+    def test_common_table_expression(self):
+        output = explain_ra_query("(sales ⋈ products) ⋈ (sales ⋈ products)", is_analysed=True)
+        self.assertIn("with cte2 as materialized", output.value["sqlQuery"])
+        operators = output.result["operators"]
+        # The repeated occurrence is only formed into SQL once
+        for index, counterpart_index in ((3, 0), (4, 1)):
+            self.assertEqual(operators[index]["actualRows"], operators[counterpart_index]["actualRows"])
+        self.assertEqual(operators[5]["actualRows"], operators[2]["actualRows"])
+        cte_plan_node = next(plan_node for plan_node in get_plan_nodes_top_down(output.result["plan"])
+                             if plan_node.get("Subplan Name") == "CTE cte2")
+        self.assertEqual(cte_plan_node["raPostfixIndexes"], [2])
+
+    def test_invalid_query(self):
+        self.assertRaises(Exception, explain_ra_query, "sales ⋈")
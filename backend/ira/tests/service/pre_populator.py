@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.test import TestCase
+
+from ira.service.csv_loader import CsvFile, load_csv_file
+from ira.service.pre_populator import CREATE_MANIFEST_QUERY, is_changed, read_manifest, record_load
+
+
+class PrePopulatorTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "pre_populated.csv")
+        self.write("a,b\n1,x\n")
+        self.csv_file = CsvFile(self.path, "pre_populated", ["a", "b"], is_replacing=True)
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_MANIFEST_QUERY)
+        load_csv_file(self.csv_file, on_loaded=record_load)
+
+    def write(self, content: str):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def is_changed(self) -> bool:
+        with connection.cursor() as cursor:
+            return is_changed(cursor, self.csv_file, read_manifest(cursor).get("pre_populated"))
+
+    def test_loaded_file_recorded(self):
+        with connection.cursor() as cursor:
+            entry = read_manifest(cursor)["pre_populated"]
+        self.assertEqual((entry.file_size, entry.column_names, entry.is_table_existing), (8, ["a", "b"], True))
+        self.assertFalse(self.is_changed())
+
+    def test_touched_file_unchanged(self):
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(self.is_changed())
+        with connection.cursor() as cursor:
+            self.assertEqual(read_manifest(cursor)["pre_populated"].file_modified_ns, stat.st_mtime_ns + 10 ** 9)
+
+    def test_changed_file_of_same_size(self):
+        stat = os.stat(self.path)
+        self.write("a,b\n2,y\n")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertTrue(self.is_changed())
+        load_csv_file(self.csv_file, on_loaded=record_load)
+        self.assertFalse(self.is_changed())
+        with connection.cursor() as cursor:
+            cursor.execute("select a, b from pre_populated")
+            self.assertEqual(cursor.fetchall(), [(2, "y")])
+
+    def test_dropped_table_changed(self):
+        with connection.cursor() as cursor:
+            cursor.execute("drop table pre_populated")
+        self.assertTrue(self.is_changed())
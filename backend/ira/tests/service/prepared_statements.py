@@ -0,0 +1,102 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase
+
+from ira.enum.result_format import ResultFormat
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.db_executor import execute_sql_query, execute_sql_query_as_json
+from ira.service.prepared_statements import PreparedStatements, get_prepared_statements, to_positional_parameters
+from ira.service.result_cache import RESULT_CACHE
+from ira.tests.database import populate_bundled_relations
+
+PREPARED_STATEMENTS_QUERY = "select count(*) from pg_prepared_statements"
+
+
+class PreparedStatementsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def setUp(self):
+        # Every query is to reach postgres
+        result_cache_patcher = mock.patch.object(RESULT_CACHE, "max_bytes", 0)
+        result_cache_patcher.start()
+        self.addCleanup(result_cache_patcher.stop)
+        connection.ensure_connection()
+        self.prepared_statements = PreparedStatements(max_entries=2, threshold=2)
+        patcher = mock.patch.dict("ira.service.prepared_statements.PREPARED_STATEMENTS",
+                                  {connection.connection: self.prepared_statements})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.deallocate_all)
+
+    def deallocate_all(self):
+        with connection.cursor() as cursor:
+            cursor.execute("deallocate all")
+
+    def count_prepared_statements(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(PREPARED_STATEMENTS_QUERY)
+            return cursor.fetchone()[0]
+
+    def test_same_shape_prepared_once(self):
+        for product_id in range(1, 6):
+            query = COMPILE_CACHE.get_query("σ ProductID > {product_id} (sales)".format(product_id=product_id))
+            output = execute_sql_query(query, ResultFormat.COMPACT)
+            self.assertEqual(output.status_code, HTTPStatus.OK)
+            self.assertTrue(all(row[0] > product_id for row in output.value["result"]["rows"]))
+        self.assertEqual(get_prepared_statements(connection.connection), self.prepared_statements)
+        self.assertEqual(self.prepared_statements.get_stats(),
+                         {"statements": 1, "prepares": 1, "preparedExecutions": 4, "unpreparedExecutions": 1,
+                          "evictions": 0, "staleStatements": 0})
+        self.assertEqual(self.count_prepared_statements(), 1)
+
+    def test_prepared_result_matches_unprepared_result(self):
+        ra_query = "π ProductID (σ ProductID >= 2 and ProductID < 3.5 (sales))"
+        unprepared_output = execute_sql_query(COMPILE_CACHE.get_query(ra_query))
+        prepared_output = execute_sql_query(COMPILE_CACHE.get_query(ra_query))
+        self.assertEqual(self.prepared_statements.prepares, 1)
+        self.assertEqual(prepared_output.value, unprepared_output.value)
+
+        status_code, body = execute_sql_query_as_json(COMPILE_CACHE.get_query(ra_query), ResultFormat.COMPACT)
+        self.assertEqual(status_code, HTTPStatus.OK, body)
+        status_code, prepared_body = execute_sql_query_as_json(COMPILE_CACHE.get_query(ra_query),
+                                                               ResultFormat.COMPACT)
+        self.assertEqual(prepared_body, body)
+
+    def test_least_recently_used_statement_deallocated(self):
+        for ra_query in ("σ ProductID > 1 (sales)", "σ ProductID > 2 (sales)", "σ ProductID = 1 (sales)",
+                         "σ ProductID = 2 (sales)", "σ ProductID < 1 (sales)", "σ ProductID < 2 (sales)"):
+            execute_sql_query(COMPILE_CACHE.get_query(ra_query))
+        self.assertEqual(self.prepared_statements.evictions, 1)
+        self.assertEqual(self.count_prepared_statements(), 2)
+
+    def test_failing_query_not_prepared(self):
+        for _ in range(3):
+            with transaction.atomic():
+                output = execute_sql_query(COMPILE_CACHE.get_query("σ ProductID > 'none' (sales)"))
+                transaction.set_rollback(True)
+            self.assertEqual(output.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(self.prepared_statements.prepares, 0)
+
+    def test_statement_of_changed_relation_executed_as_query(self):
+        prepared_statements = PreparedStatements(threshold=1)
+        shape = 'select * from sales where "ProductID">%s;'
+        with connection.cursor() as cursor:
+            prepared_statements.execute(cursor, 'select * from sales where "ProductID">2;', shape, [2])
+            self.assertEqual(prepared_statements.prepares, 1)
+            # As a file re-loaded with another column type does, before the catalog has been read again
+            cursor.execute('alter table sales alter column "ProductID" type double precision')
+            prepared_statements.execute(cursor, 'select * from sales where "ProductID">4;', shape, [4])
+            self.assertEqual([row[0] for row in cursor.fetchall()], [5.0])
+            self.assertEqual(prepared_statements.get_stats()["staleStatements"], 1)
+            # The transaction carries on, and the shape is prepared once more
+            prepared_statements.execute(cursor, 'select * from sales where "ProductID">4;', shape, [4])
+            self.assertEqual(prepared_statements.prepares, 2)
+            self.assertEqual(len(cursor.fetchall()), 1)
+
+    def test_positional_parameters(self):
+        self.assertEqual(to_positional_parameters('select * from r where "50%%">%s::integer and "a"=%s;'),
+                         'select * from r where "50%">$1::integer and "a"=$2;')
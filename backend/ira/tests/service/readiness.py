@@ -0,0 +1,37 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.enum.table_state import TableState
+from ira.service.pre_populator import TABLE_TO_STATE, get_readiness
+from ira.service.readiness import get_loading_output, get_loading_relation_names
+
+
+class ReadinessTestCase(SimpleTestCase):
+    def setUp(self):
+        # Loading relations are missing from the catalog, unless another process has loaded them meanwhile
+        patcher = mock.patch.dict(TABLE_TO_STATE, {"iris": TableState.READY, "sales": TableState.LOADING,
+                                                   "products": TableState.RELOADING,
+                                                   "readiness_loading": TableState.LOADING})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_loading_relations_of_query(self):
+        self.assertEqual(get_loading_relation_names("π ProductID (readiness_loading ⋈ products)"),
+                         ["readiness_loading"])
+        self.assertEqual(get_loading_relation_names("π ProductID (sales ⋈ products)"), [])
+        self.assertEqual(get_loading_relation_names("σ sepal_length > 5 (iris)"), [])
+        self.assertEqual(get_loading_relation_names("π ProductID (σ ProductID > 1 (products))"), [])
+
+    def test_loading_output(self):
+        output = get_loading_output("readiness_loading ∪ readiness_loading")
+        self.assertEqual(output.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(output.value["error"], {"code": ErrorCode.RELATION_LOADING.value,
+                                                 "relations": ["readiness_loading"]})
+        self.assertIsNone(get_loading_output("iris"))
+
+    def test_readiness_of_tables(self):
+        self.assertEqual(get_readiness()["tables"], {"iris": "ready", "products": "reloading",
+                                                     "readiness_loading": "loading", "sales": "loading"})
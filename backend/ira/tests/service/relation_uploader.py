@@ -0,0 +1,71 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ira.service.catalog import CATALOG
+from ira.service.csv_loader import BIGINT, DOUBLE_PRECISION, TEXT
+from ira.service.pre_populator import DELETE_MANIFEST_QUERY
+
+MANIFEST_ENTRY_QUERY = "select is_uploaded, column_types from ira_prepopulation_manifest where table_name = %s"
+
+
+class RelationUploaderTestCase(TestCase):
+    def upload(self, file_name: str, content: str, query_string: str = ""):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("upload_relation") + query_string,
+                                    {"file": SimpleUploadedFile(file_name, content.encode("utf-8"))})
+
+    def fetch(self, query: str, parameters=()):
+        with connection.cursor() as cursor:
+            cursor.execute(query, parameters)
+            return cursor.fetchall()
+
+    def test_csv_streamed_in_chunks(self):
+        rows = ['{index},{index}.5,"line\nbreak {index}"'.format(index=index) for index in range(200)]
+        # Chunks far smaller than the file, so that records are copied as the body is parsed
+        with mock.patch("ira.service.relation_uploader.PREPOPULATION_CHUNK_BYTES", 256), \
+                mock.patch.object(CATALOG, "invalidate") as invalidate:
+            response = self.upload("uploader_streamed.csv", "id,amount,note\n" + "\n".join(rows) + "\n")
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        result = response.json()["result"]
+        self.assertEqual((result["relationName"], result["columnNames"], result["columnTypes"], result["rows"]),
+                         ("uploader_streamed", ["id", "amount", "note"], [BIGINT, DOUBLE_PRECISION, TEXT], 200))
+        self.assertGreater(result["rowsPerSecond"], 0)
+        invalidate.assert_called_once()
+        self.assertEqual(self.fetch("select count(*), sum(id), max(note) from uploader_streamed"),
+                         [(200, 19900, "line\nbreak 99")])
+        self.assertEqual(self.fetch(MANIFEST_ENTRY_QUERY, ["uploader_streamed"]),
+                         [(True, [BIGINT, DOUBLE_PRECISION, TEXT])])
+
+    def test_tsv_replaced_only_when_asked(self):
+        self.assertEqual(self.upload("first.tsv", "a\tb\n1\tx, y\n", "?relationName=uploader_replaced").status_code,
+                         HTTPStatus.CREATED)
+        self.assertEqual(self.fetch("select a, b from uploader_replaced"), [(1, "x, y")])
+        response = self.upload("second.tsv", "a\tb\n2\tz\n", "?relationName=uploader_replaced")
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("uploaded already", response.json()["message"])
+        response = self.upload("second.tsv", "a\tb\n2\tz\n3\tw\n", "?relationName=uploader_replaced&replace=true")
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(self.fetch("select a, b from uploader_replaced order by a"), [(2, "z"), (3, "w")])
+        # Pre-population only forgets the files which are gone from resources/prepopulation
+        with connection.cursor() as cursor:
+            cursor.execute(DELETE_MANIFEST_QUERY, [["iris", "products", "sales"]])
+        self.assertEqual(self.fetch(MANIFEST_ENTRY_QUERY, ["uploader_replaced"]), [(True, [BIGINT, TEXT])])
+
+    def test_invalid_uploads_refused(self):
+        invalid_uploads = (("uploader_dotted.csv", "a.b,c\n1,2\n", "invalid literal '.'"),
+                           ("uploader_duplicate.csv", "a,a\n1,2\n", "duplicate column names"),
+                           ("Uploader.csv", "a\n1\n", "not to be valid"),
+                           ("ira_uploader.csv", "a\n1\n", "not to be valid"),
+                           ("sales.csv", "a\n1\n", "pre-populated from a file"))
+        for file_name, content, message in invalid_uploads:
+            response = self.upload(file_name, content)
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+            self.assertIn(message, response.json()["message"])
+        self.assertEqual(self.fetch("select count(*) from pg_tables where tablename like 'uploader_%%'"), [(0,)])
+        response = self.client.post(reverse("upload_relation"), {"relationName": "uploader_missing"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
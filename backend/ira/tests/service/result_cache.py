@@ -0,0 +1,108 @@
+import os
+import stat
+import tempfile
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from ira.model.query import Query
+from ira.service.result_cache import ResultCache
+
+
+def get(result_cache: ResultCache, query: Query):
+    return result_cache.get(query, result_cache.get_entry_path(query))
+
+
+def put(result_cache: ResultCache, query: Query, column_names: list, rows: list):
+    result_cache.put(query, column_names, rows, result_cache.get_entry_path(query))
+
+
+class ResultCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.result_cache = ResultCache(self.directory.name, max_bytes=1024 * 1024)
+        self.sales_query = Query("select * from sales;", {"sales"})
+        self.column_names = ["ProductID", "InvoiceNumber"]
+        self.rows = [(3, 3456644), (2, 3244446)]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_after_put(self):
+        self.assertIsNone(get(self.result_cache, self.sales_query))
+        put(self.result_cache, self.sales_query, self.column_names, self.rows)
+        self.assertEqual(get(self.result_cache, self.sales_query), (self.column_names, self.rows))
+        stats = self.result_cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_entries_are_shared_between_instances(self):
+        put(self.result_cache, self.sales_query, self.column_names, self.rows)
+        other_result_cache = ResultCache(self.directory.name, max_bytes=1024 * 1024)
+        self.assertEqual(get(other_result_cache, self.sales_query), (self.column_names, self.rows))
+
+    def test_bumping_a_read_relation_invalidates(self):
+        products_query = Query("select * from products;", {"products"})
+        put(self.result_cache, self.sales_query, self.column_names, self.rows)
+        put(self.result_cache, products_query, ["ProductID"], [(1,)])
+        self.result_cache.bump_versions(["sales"])
+        self.assertIsNone(get(self.result_cache, self.sales_query))
+        self.assertIsNotNone(get(self.result_cache, products_query))
+
+    def test_entries_and_versions_are_kept_per_database(self):
+        put(self.result_cache, self.sales_query, self.column_names, self.rows)
+        with mock.patch.dict(connections["default"].settings_dict, {"NAME": "other_database"}):
+            self.assertIsNone(get(self.result_cache, self.sales_query))
+            self.result_cache.bump_versions(["sales"])
+            self.assertEqual(self.result_cache.get_version("sales"), 1)
+        self.assertEqual(self.result_cache.get_version("sales"), 0)
+        self.assertEqual(get(self.result_cache, self.sales_query), (self.column_names, self.rows))
+
+    def test_least_recently_used_entries_are_evicted_beyond_byte_budget(self):
+        rows = [(index, "x" * 100) for index in range(10)]
+        queries = [Query("select * from sales where \"ProductID\">{};".format(index), {"sales"})
+                   for index in range(3)]
+        put(self.result_cache, queries[0], self.column_names, rows)
+        # Making the first entry the least recently used one regardless of the file system's timestamp resolution
+        os.utime(self.result_cache.get_entry_path(queries[0]), (0, 0))
+        entry_size = self.result_cache.get_stats()["bytes"]
+        small_result_cache = ResultCache(self.directory.name, max_bytes=entry_size * 2 + entry_size // 2)
+        put(small_result_cache, queries[1], self.column_names, rows)
+        put(small_result_cache, queries[2], self.column_names, rows)
+        stats = small_result_cache.get_stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertIsNone(get(small_result_cache, queries[0]))
+        self.assertIsNotNone(get(small_result_cache, queries[2]))
+
+    def test_result_over_budget_is_not_stored(self):
+        tiny_result_cache = ResultCache(self.directory.name, max_bytes=16)
+        put(tiny_result_cache, self.sales_query, self.column_names, self.rows)
+        self.assertEqual(tiny_result_cache.get_stats()["entries"], 0)
+
+    def test_result_read_before_a_write_is_not_stored_under_its_version(self):
+        entry_path = self.result_cache.get_entry_path(self.sales_query)
+        # The write commits while the query is executed
+        self.result_cache.bump_versions(["sales"])
+        self.result_cache.put(self.sales_query, self.column_names, self.rows, entry_path)
+        self.assertIsNone(get(self.result_cache, self.sales_query))
+
+    def test_entries_are_only_counted_when_the_budget_may_be_exceeded(self):
+        queries = [Query("select * from sales where \"ProductID\">{};".format(index), {"sales"}) for index in range(5)]
+        with mock.patch.object(self.result_cache, "_scan_entries", wraps=self.result_cache._scan_entries) as scan:
+            for query in queries:
+                put(self.result_cache, query, self.column_names, self.rows)
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual(self.result_cache.get_stats()["entries"], 5)
+
+    def test_directory_is_private(self):
+        directory = os.path.join(self.directory.name, "shared")
+        os.makedirs(directory, mode=0o777)
+        os.chmod(directory, 0o777)
+        self.assertTrue(ResultCache(directory, max_bytes=1024).is_enabled())
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+        # Entries of a directory another user could have written are never unpickled
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertFalse(ResultCache(directory, max_bytes=1024).is_enabled())
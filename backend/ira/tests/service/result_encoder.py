@@ -0,0 +1,36 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import SimpleTestCase
+
+from ira.enum.result_format import ResultFormat
+from ira.service.result_encoder import encode, format_result
+
+
+class ResultEncoderTestCase(SimpleTestCase):
+    def setUp(self):
+        self.column_names = ["ProductID", "Price", "ProductID", "SoldOn"]
+        self.rows = [(1, Decimal("500.50"), 1, datetime.date(2023, 4, 1)),
+                     (2, None, 3, None)]
+
+    def test_compact_format_keeps_duplicate_column_names(self):
+        result = json.loads(encode(format_result(self.column_names, self.rows, ResultFormat.COMPACT)))
+        self.assertEqual(result, {"columns": ["ProductID", "Price", "ProductID", "SoldOn"],
+                                  "rows": [[1, "500.50", 1, "2023-04-01"], [2, None, 3, None]]})
+
+    def test_columnar_format(self):
+        result = json.loads(encode(format_result(self.column_names, self.rows, ResultFormat.COLUMNAR)))
+        self.assertEqual(result["values"], [[1, 2], ["500.50", None], [1, 3], ["2023-04-01", None]])
+
+    def test_columnar_format_of_empty_result(self):
+        result = json.loads(encode(format_result(self.column_names, [], ResultFormat.COLUMNAR)))
+        self.assertEqual(result["values"], [[], [], [], []])
+
+    def test_objects_format_keeps_duplicate_keys(self):
+        result = format_result(self.column_names, self.rows, ResultFormat.OBJECTS)
+        self.assertEqual(json.dumps(result, cls=DjangoJSONEncoder),
+                         '[{"ProductID": 1, "Price": "500.50", "ProductID": 1, "SoldOn": "2023-04-01"}, '
+                         '{"ProductID": 2, "Price": null, "ProductID": 3, "SoldOn": null}]')
+        self.assertEqual(json.loads(encode(result)), json.loads(json.dumps(result, cls=DjangoJSONEncoder)))
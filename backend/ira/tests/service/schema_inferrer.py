@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase
+
+from ira.enum.column_usage import ColumnUsage
+from ira.service.lexer import Lexer
+from ira.service.parser import Parser, build_tree
+from ira.service.schema_inferrer import get_column_usages, infer_column_names
+from ira.service.transformer import transform
+
+
+class SchemaInferrerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.lexer = Lexer()
+        self.parser = Parser()
+
+    def infer(self, ra_query):
+        parsed_postfix_tokens = self.parser.parse(self.lexer.tokenize(ra_query))
+        root_token = build_tree(parsed_postfix_tokens)
+        infer_column_names(parsed_postfix_tokens)
+        return root_token.output_column_names
+
+    def get_column_usages(self, ra_query):
+        parsed_postfix_tokens = self.parser.parse(self.lexer.tokenize(ra_query))
+        build_tree(parsed_postfix_tokens)
+        infer_column_names(parsed_postfix_tokens)
+        return get_column_usages(parsed_postfix_tokens)
+
+    def test_relation(self):
+        self.assertEqual(self.infer("products"), ("ProductID", "ProductName", "Price"))
+        self.assertIsNone(self.infer("unknown_relation"))
+
+    def test_natural_join(self):
+        self.assertEqual(self.infer("products ⋈ sales"), ("ProductID", "ProductName", "Price", "InvoiceNumber"))
+        self.assertEqual(self.infer("sales ▷ products"), ("ProductID", "InvoiceNumber", "ProductName", "Price"))
+
+    def test_conditional_join_and_cartesian(self):
+        self.assertEqual(self.infer("sales ⧑ sales.ProductID = products.ProductID (products)"),
+                         ("ProductID", "InvoiceNumber", "ProductID", "ProductName", "Price"))
+        self.assertEqual(self.infer("sales ⨯ products"),
+                         ("ProductID", "InvoiceNumber", "ProductID", "ProductName", "Price"))
+
+    def test_unary_and_set_operators(self):
+        self.assertEqual(self.infer("π ProductID,Price (σ Price > 2 (products))"), ("ProductID", "Price"))
+        self.assertEqual(self.infer("(π ProductID (sales)) ∪ (π ProductID (products))"), ("ProductID",))
+        self.assertRaises(Exception, self.infer, "sales ∪ products")
+
+    def test_long_anti_join_chain(self):
+        number_of_anti_joins = 2000
+        sql_query = transform(self.parser.parse(self.lexer.tokenize(
+            " ▷ ".join(["sales"] * (number_of_anti_joins + 1)))))
+        self.assertEqual(sql_query.value.count("is NULL"), 2 * number_of_anti_joins)
+
+    def test_column_usages(self):
+        self.assertEqual(self.get_column_usages("σ ProductID > 2 and Price < 600 (products)"),
+                         {("products", "ProductID", ColumnUsage.SELECTION),
+                          ("products", "Price", ColumnUsage.SELECTION)})
+        self.assertEqual(self.get_column_usages("π ProductName (σ InvoiceNumber > 5 (products ⋈ sales))"),
+                         {("sales", "InvoiceNumber", ColumnUsage.SELECTION),
+                          ("products", "ProductID", ColumnUsage.JOIN), ("sales", "ProductID", ColumnUsage.JOIN)})
+        self.assertEqual(self.get_column_usages("sales ⧑ sales.ProductID = products.ProductID (products)"),
+                         {("products", "ProductID", ColumnUsage.JOIN), ("sales", "ProductID", ColumnUsage.JOIN)})
+        self.assertEqual(self.get_column_usages("π ProductID (sales) ∪ π ProductID (products)"), set())
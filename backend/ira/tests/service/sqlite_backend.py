@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.model.query import Query
+from ira.service import sqlite_backend as sqlite_backend_module
+from ira.service.catalog import CATALOG
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.csv_loader import CsvFile
+from ira.service.db_executor import execute_sql_query
+from ira.service.dialect import SQLITE_DIALECT, SqliteDialect
+from ira.service.result_cache import RESULT_CACHE
+from ira.service.sqlite_backend import SqliteBackend, execute_ra_query_on_sqlite, load_relation
+from ira.tests.database import populate_bundled_relations
+
+# Every operator, with columns in another order than the relations have them, as SQLite orders the columns of a natural
+# join otherwise than postgres
+RA_QUERIES = (
+    "sales",
+    "σ ProductID > 2 (sales)",
+    "σ ProductID > '2' and InvoiceNumber >= 3000000 (sales)",
+    "σ not ProductID > 2 or ProductID = 5 (sales)",
+    "π ProductName (σ Price >= 500 and ProductID < 5 (products))",
+    "σ variety = 'Setosa' or petal_width > 2 (iris)",
+    "π variety (iris)",
+    "(π InvoiceNumber,ProductID (sales)) ⋈ products",
+    "(π InvoiceNumber,ProductID (sales)) ⧑ (σ Price > 500 (products))",
+    "(π InvoiceNumber,ProductID (sales)) ⧒ (σ Price > 500 (products))",
+    "(π InvoiceNumber,ProductID (sales)) ⧓ (σ Price > 500 (products))",
+    "sales ⧑ sales.ProductID = products.ProductID (products)",
+    "sales ▷ (σ Price > 500 (products))",
+    "(π ProductID (sales)) ∪ (π ProductID (products))",
+    "(π ProductID (sales)) ∩ (π ProductID (products))",
+    "(π ProductID (products)) - ((π ProductID (sales)) ∪ (π ProductID (σ Price > 900 (products))))",
+    "products ⨯ sales",
+    "(σ Price > 500 (products)) ⋈ (π ProductID (σ Price > 500 (products)))",
+)
+
+# Queries SQLite would answer otherwise than postgres: references postgres reports as ambiguous, comparisons of values
+# postgres refuses to compare, and columns of a subquery sharing a name, which SQLite renames
+DIVERGENT_RA_QUERIES = (
+    "σ ProductID > 2 (sales ⨯ products)",
+    "π ProductID (sales ⨯ products)",
+    "sales ⧑ ProductID = ProductID (products)",
+    "σ variety < 5 (iris)",
+    "σ ProductID > 'none' (sales)",
+    "σ Price = true (products)",
+    "sales ⧑ sales.ProductID = products.ProductName (products)",
+    "(sales ⨯ products) ⨯ products",
+)
+
+CSV_CONTENT = "id,name,price,in_stock\n1,a,1.5,true\n2,,NA,FALSE\nNA,NA,.5,\n"
+
+
+class SqliteBackendTestCase(SimpleTestCase):
+    # Outside of a transaction, as the catalog only reads committed relations
+    databases = {"default"}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        populate_bundled_relations()
+        CATALOG.invalidate()
+
+    def assert_results_match_postgres(self, dialect: SqliteDialect):
+        sqlite_backend = SqliteBackend(is_enabled=True)
+        for ra_query in RA_QUERIES:
+            with self.subTest(ra_query=ra_query):
+                parsed_postfix_tokens, query = COMPILE_CACHE.compile_operator_tree(ra_query, dialect)
+                output = sqlite_backend.execute(query, parsed_postfix_tokens=parsed_postfix_tokens)
+                self.assertIsNotNone(output)
+                expected_output = execute_sql_query(COMPILE_CACHE.get_query(ra_query))
+                # Rows come in no particular order from either
+                self.assertEqual(sorted((tuple(row.items()) for row in output.result), key=repr),
+                                 sorted((tuple(row.items()) for row in expected_output.result), key=repr))
+        self.assertEqual(sqlite_backend.get_stats()["fallbacks"], 0)
+
+    def test_results_match_postgres(self):
+        self.assert_results_match_postgres(SQLITE_DIALECT)
+
+    def test_results_match_postgres_with_outer_joins_emulated(self):
+        self.assert_results_match_postgres(SqliteDialect(has_outer_joins=False))
+
+    def test_left_to_postgres(self):
+        # Relations not pre-populated from a file, and queries SQLite fails to execute
+        self.assertIsNone(SqliteBackend(is_enabled=True).execute(Query("select * from unknown_relation;",
+                                                                       ["unknown_relation"])))
+        self.assertIsNone(SqliteBackend(is_enabled=True).execute(Query("select * from sales where;", ["sales"])))
+        self.assertIsNone(SqliteBackend(is_enabled=False).execute(COMPILE_CACHE.get_sqlite_query("sales")))
+
+    def test_divergent_queries_left_to_postgres(self):
+        with mock.patch.object(sqlite_backend_module, "SQLITE_BACKEND", SqliteBackend(is_enabled=True)):
+            for ra_query in DIVERGENT_RA_QUERIES:
+                with self.subTest(ra_query=ra_query):
+                    self.assertIsNone(execute_ra_query_on_sqlite(ra_query, COMPILE_CACHE.get_query(ra_query)))
+            # Whereas the columns of a relation compared as postgres compares them are answered
+            ra_query = "σ ProductID > '2' and InvoiceNumber >= 3000000 (sales)"
+            self.assertIsNotNone(execute_ra_query_on_sqlite(ra_query, COMPILE_CACHE.get_query(ra_query)))
+        self.assertEqual(execute_sql_query(COMPILE_CACHE.get_query("σ variety < 5 (iris)")).status_code,
+                         HTTPStatus.BAD_REQUEST)
+        self.assertEqual(execute_sql_query(COMPILE_CACHE.get_query("π ProductID (sales ⨯ products)")).status_code,
+                         HTTPStatus.BAD_REQUEST)
+
+    def test_relation_above_maximum_left_to_postgres(self):
+        sqlite_backend = SqliteBackend(is_enabled=True, max_rows=10)
+        # Of 12 rows, whose file is not read again until it changes
+        for _ in range(2):
+            self.assertIsNone(sqlite_backend.execute(COMPILE_CACHE.get_sqlite_query("sales")))
+        self.assertIsNotNone(sqlite_backend.execute(COMPILE_CACHE.get_sqlite_query("products")))
+        self.assertEqual(sqlite_backend.get_stats()["loads"], 2)
+        self.assertEqual(sqlite_backend.get_stats()["relations"], 1)
+
+    def test_timeout_reported(self):
+        sqlite_backend = SqliteBackend(is_enabled=True)
+        # Bounded, should the query not be interrupted
+        query = Query("with recursive counter(n) as (select 1 union all select n + 1 from counter where n < 100000000) "
+                      "select count(*) from counter, sales;", ["sales"])
+        output = sqlite_backend.execute(query, timeout=1)
+        self.assertEqual(output.status_code, HTTPStatus.GATEWAY_TIMEOUT)
+        self.assertEqual(output.error, {"code": ErrorCode.STATEMENT_TIMEOUT.value})
+        self.assertEqual(sqlite_backend.get_stats()["timeouts"], 1)
+        # The connection is free for the next query
+        self.assertIsNotNone(sqlite_backend.execute(COMPILE_CACHE.get_sqlite_query("sales")))
+
+    @mock.patch("ira.service.db_executor.PREFLIGHT_MAX_ESTIMATED_ROWS", 2)
+    def test_result_above_preflight_threshold_left_to_postgres_unless_confirmed(self):
+        sqlite_backend = SqliteBackend(is_enabled=True)
+        query = COMPILE_CACHE.get_sqlite_query("σ ProductID > 2 (sales)")
+        self.assertIsNone(sqlite_backend.execute(query))
+        self.assertEqual(len(sqlite_backend.execute(query, is_confirmed=True).result), 5)
+
+    def test_relation_loaded_again_once_changed(self):
+        sqlite_backend = SqliteBackend(is_enabled=True)
+        for _ in range(3):
+            self.assertIsNotNone(sqlite_backend.execute(COMPILE_CACHE.get_sqlite_query("σ ProductID > 2 (sales)")))
+        self.assertEqual(sqlite_backend.get_stats()["loads"], 1)
+        RESULT_CACHE.bump_versions(["sales"])
+        self.assertIsNotNone(sqlite_backend.execute(COMPILE_CACHE.get_sqlite_query("σ ProductID > 2 (sales)")))
+        self.assertEqual(sqlite_backend.get_stats()["loads"], 2)
+
+    def test_load_relation_as_postgres_copies_it(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "items.csv")
+            with open(path, "w") as file:
+                file.write(CSV_CONTENT)
+            connection = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+            csv_file = CsvFile(path, "items", ["id", "name", "price", "in_stock"])
+            self.assertEqual(load_relation(connection, csv_file), 3)
+        self.assertEqual(connection.execute("select * from items").fetchall(),
+                         [(1, "a", 1.5, True), (2, None, None, False), (None, "NA", 0.5, None)])
+        self.assertEqual([row[2] for row in connection.execute("pragma table_info(items)")],
+                         ["INTEGER", "TEXT", "REAL", "boolean"])
+
+    def test_load_relation_above_maximum(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "items.csv")
+            with open(path, "w") as file:
+                file.write(CSV_CONTENT)
+            connection = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+            csv_file = CsvFile(path, "items", ["id", "name", "price", "in_stock"])
+            self.assertEqual(load_relation(connection, csv_file, max_rows=3), 3)
+            # The table loaded before is let go of
+            self.assertIsNone(load_relation(connection, csv_file, max_rows=2))
+        self.assertEqual(connection.execute("select * from sqlite_master").fetchall(), [])
@@ -0,0 +1,71 @@
+import json
+import socket
+import threading
+import time
+import uuid
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import TestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.model.query import Query
+from ira.service.db_executor import execute_sql_query, execute_sql_query_as_json
+from ira.service.statement_guard import StatementGuard, cancel_request, get_request_id
+
+SLEEP_QUERY = "select pg_sleep({seconds});"
+
+
+class StatementGuardTestCase(TestCase):
+    # Results of the cancelled queries go through the JSON passthrough, which skips the result cache
+    def test_statement_timeout(self):
+        with StatementGuard(timeout=50):
+            output = execute_sql_query(Query(SLEEP_QUERY.format(seconds=5)))
+        self.assertEqual(output.status_code, HTTPStatus.GATEWAY_TIMEOUT)
+        self.assertEqual(output.value["error"], {"code": ErrorCode.STATEMENT_TIMEOUT.value})
+        # The aborted transaction has been rolled back, and the timeout has not outlived it
+        with StatementGuard(timeout=1000):
+            output = execute_sql_query(Query(SLEEP_QUERY.format(seconds=0.1)))
+        self.assertEqual(output.status_code, HTTPStatus.OK)
+
+    def test_cancel_request(self):
+        request_id = str(uuid.uuid4())
+        outputs = []
+
+        def execute():
+            try:
+                with StatementGuard(request_id=request_id):
+                    outputs.append(execute_sql_query_as_json(Query(SLEEP_QUERY.format(seconds=10))))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=execute)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not cancel_request(request_id) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        thread.join()
+        status, content = outputs[0]
+        self.assertEqual(json.loads(content)["error"], {"code": ErrorCode.QUERY_CANCELLED.value})
+        self.assertEqual(cancel_request(request_id), 0)
+
+    def test_client_disconnect(self):
+        client_socket, server_socket = socket.socketpair()
+        client_socket.close()
+        started_at = time.monotonic()
+        with StatementGuard(client_socket=server_socket):
+            status, content = execute_sql_query_as_json(Query(SLEEP_QUERY.format(seconds=10)))
+        server_socket.close()
+        self.assertEqual(json.loads(content)["error"], {"code": ErrorCode.QUERY_CANCELLED.value})
+        self.assertLess(time.monotonic() - started_at, 5)
+
+    def test_request_id_must_be_random_uuid(self):
+        request_id = str(uuid.uuid4())
+        self.assertEqual(get_request_id({"requestId": request_id}), request_id)
+        self.assertIsNone(get_request_id({}))
+        # Guessable IDs, and UUIDs not drawn at random
+        for request_id in ("cancelled-request", "1", str(uuid.uuid4()).upper(), str(uuid.uuid1()),
+                           str(uuid.uuid4()).replace("-", ""), 4):
+            with self.subTest(request_id=request_id):
+                with self.assertRaises(Exception):
+                    get_request_id({"requestId": request_id})
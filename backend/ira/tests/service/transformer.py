@@ -1,9 +1,11 @@
 import copy
+from decimal import Decimal
 
 from django.test import SimpleTestCase
 
-from ira.service.lexer import Token, TokenType
-from ira.service.transformer import transform
+from ira.service.lexer import Lexer, Token, TokenType
+from ira.service.parser import Parser
+from ira.service.transformer import parameterise, transform
 
 
 class TransformerTestCase(SimpleTestCase):
@@ -102,6 +104,71 @@ class TransformerTestCase(SimpleTestCase):
                         self.SALES_IDENTITY_TOKEN, self.MOCK_ANTI_JOIN_TOKEN]
         expected_output = 'select * from (select * from sales  natural left join products as cq2 where ' \
                           'cq2."ProductID" is NULL) as q2  natural left join sales as cq4 where cq4."ProductID" is ' \
-                          'NULL;'
+                          'NULL and cq4."InvoiceNumber" is NULL;'
         actual_output = transform(actual_input)
         self.assertEqual(actual_output.value, expected_output)
+
+    def test_deeply_nested_selection(self):
+        # RA query: σ Quantity>2 (σ Quantity>2 (... (sales)))
+        number_of_selections = 5000
+        ra_query = "σ Quantity>2 (" * number_of_selections + "sales" + ")" * number_of_selections
+        actual_output = transform(Parser().parse(Lexer().tokenize(ra_query)))
+        expected_output = 'select * from (' * (number_of_selections - 1) + 'select * from sales where "Quantity">2' + \
+                          "".join(') as q{} where "Quantity">2'.format(index)
+                                  for index in range(1, number_of_selections)) + ';'
+        self.assertEqual(actual_output.value, expected_output)
+
+    def test_missing_operand(self):
+        # RA query: (sales) ∪
+        actual_input = [self.SALES_IDENTITY_TOKEN, self.MOCK_UNION_TOKEN]
+        self.assertRaises(Exception, transform, actual_input)
+
+    def test_repeated_subexpression(self):
+        ra_query = "(σ ProductID > 2 (sales)) - (π ProductID,InvoiceNumber ((σ ProductID > 2 (sales)) ⋈ products))"
+        actual_output = transform(Parser().parse(Lexer().tokenize(ra_query)))
+        expected_output = 'with cte1 as not materialized (select * from sales where "ProductID">2) select * from cte1 ' \
+                          'except (select distinct "ProductID","InvoiceNumber" from (select * from cte1 as q3 ' \
+                          'natural join products) as q5);'
+        self.assertEqual(actual_output.value, expected_output)
+        self.assertTrue(actual_output.is_dql)
+
+    def test_repeated_subexpression_materialised(self):
+        ra_query = "(σ ProductID > 2 (sales)) ∪ ((σ ProductID > 2 (sales)) ∪ (σ ProductID > 2 (sales)))"
+        actual_output = transform(Parser().parse(Lexer().tokenize(ra_query)))
+        expected_output = 'with cte1 as materialized (select * from sales where "ProductID">2) select * from cte1 ' \
+                          'union (select * from cte1 union select * from cte1);'
+        self.assertEqual(actual_output.value, expected_output)
+
+        ra_query = "(sales ⋈ products) ⋈ (sales ⋈ products)"
+        actual_output = transform(Parser().parse(Lexer().tokenize(ra_query)))
+        expected_output = 'with cte2 as materialized (select * from sales natural join products) ' \
+                          'select * from cte2 as q2 natural join cte2 as q5;'
+        self.assertEqual(actual_output.value, expected_output)
+
+    def test_anti_join_with_subquery(self):
+        ra_query = "sales ▷ (σ ProductID > 2 (products))"
+        actual_output = transform(Parser().parse(Lexer().tokenize(ra_query)))
+        expected_output = 'select * from sales  natural left join (select * from products where "ProductID">2) ' \
+                          'as cq3 where cq3."ProductID" is NULL;'
+        self.assertEqual(actual_output.value, expected_output)
+
+    def test_literals_lifted_as_parameters(self):
+        ra_query = "σ ProductID > 2 and InvoiceNumber <= 2.5 (sales)"
+        actual_output = transform(Parser().parse(Lexer().tokenize(ra_query)))
+        self.assertEqual(actual_output.value, 'select * from sales where "ProductID">2 and "InvoiceNumber"<=2.5;')
+        self.assertEqual(actual_output.shape,
+                         'select * from sales where "ProductID">%s::integer and "InvoiceNumber"<=%s::double precision;')
+        self.assertEqual(actual_output.parameters, (2, 2.5))
+
+        other_output = transform(Parser().parse(Lexer().tokenize("σ ProductID > 3 and InvoiceNumber <= 7.25 (sales)")))
+        self.assertEqual(other_output.shape, actual_output.shape)
+        self.assertEqual(other_output.parameters, (3, 7.25))
+
+    def test_string_and_large_literals_lifted_as_parameters(self):
+        shape, parameters = parameterise("select * from \"q1\" where \"a'1\"='it''s 100%' and \"b\">3000000000;")
+        self.assertEqual(shape, "select * from \"q1\" where \"a'1\"=%s and \"b\">%s::bigint;")
+        self.assertEqual(parameters, ["it's 100%", 3000000000])
+
+        shape, parameters = parameterise("select * from q1 where \"50%\">1e3 or \"b\"<0.1234567890123456;")
+        self.assertEqual(shape, "select * from q1 where \"50%%\">%s::double precision or \"b\"<%s::numeric;")
+        self.assertEqual(parameters, [1000.0, Decimal("0.1234567890123456")])
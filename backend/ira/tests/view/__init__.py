@@ -0,0 +1,2 @@
+from .execute_ra_query import *
+from .execute_ra_query_async import *
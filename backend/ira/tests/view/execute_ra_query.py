@@ -0,0 +1,74 @@
+import json
+import uuid
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import TestCase
+
+from ira.enum.error_code import ErrorCode
+from ira.service.columnar_engine import execute_ra_query_in_memory
+from ira.tests.database import populate_bundled_relations
+
+EXECUTE_RA_QUERY_PATH = "/v1/ira/execute_ra_query"
+
+
+class ExecuteRaQueryStreamTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def post(self, request_body: dict):
+        return self.client.post(EXECUTE_RA_QUERY_PATH, json.dumps(request_body), content_type="application/json")
+
+    @mock.patch("ira.service.db_executor.STREAM_BATCH_SIZE", 2)
+    def test_stream(self):
+        response = self.post({"raQuery": "σ ProductID > 2 (sales)", "stream": True})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0])["columns"], ["ProductID", "InvoiceNumber"])
+        self.assertTrue(all(json.loads(line)[0] > 2 for line in lines[1:]))
+        self.assertEqual(len(lines), 6)
+
+    @mock.patch("ira.service.db_executor.PREFLIGHT_MAX_ESTIMATED_ROWS", 1)
+    def test_stream_refused_by_preflight_before_it_starts(self):
+        response = self.post({"raQuery": "sales", "stream": True})
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.status_code, HTTPStatus.PRECONDITION_REQUIRED)
+        self.assertEqual(response.json()["error"], {"code": ErrorCode.CONFIRMATION_REQUIRED.value})
+
+        response = self.post({"raQuery": "sales", "stream": True, "confirm": True})
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 13)
+
+
+class ExecuteRaQueryInMemoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    def post(self, request_body: dict):
+        return self.client.post(EXECUTE_RA_QUERY_PATH, json.dumps(request_body), content_type="application/json")
+
+    def test_timeout_and_confirmation_passed_on(self):
+        with mock.patch("ira.view.execute_ra_query.execute_ra_query_in_memory",
+                        wraps=execute_ra_query_in_memory) as execute_in_memory:
+            response = self.post({"raQuery": "σ ProductID > 2 (sales)", "timeout": 1234, "confirm": True})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(execute_in_memory.call_args.args[3:], (1234, True))
+
+    @mock.patch("ira.service.db_executor.PREFLIGHT_MAX_ESTIMATED_ROWS", 1)
+    def test_confirmation_asked_for_by_postgres(self):
+        response = self.post({"raQuery": "sales"})
+        self.assertEqual(response.status_code, HTTPStatus.PRECONDITION_REQUIRED)
+        self.assertEqual(response.json()["error"], {"code": ErrorCode.CONFIRMATION_REQUIRED.value})
+        self.assertEqual(len(self.post({"raQuery": "sales", "confirm": True}).json()["result"]), 12)
+
+    def test_cancellable_query_left_to_postgres(self):
+        with mock.patch("ira.view.execute_ra_query.execute_ra_query_in_memory") as execute_in_memory, \
+                mock.patch("ira.view.execute_ra_query.execute_ra_query_on_sqlite") as execute_on_sqlite:
+            response = self.post({"raQuery": "σ ProductID > 2 (sales)", "requestId": str(uuid.uuid4())})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()["result"]), 5)
+        execute_in_memory.assert_not_called()
+        execute_on_sqlite.assert_not_called()
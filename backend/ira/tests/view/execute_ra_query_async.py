@@ -0,0 +1,64 @@
+import asyncio
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import TestCase
+
+from ira.service.async_db_executor import close_async_connection_pool
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.tests.database import populate_bundled_relations
+from ira.view.readiness import get_loading_response
+
+EXECUTE_RA_QUERY_ASYNC_PATH = "/v1/ira/execute_ra_query_async"
+
+
+def is_on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class ExecuteRaQueryAsyncViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        populate_bundled_relations()
+
+    async def post(self, request_body: dict):
+        try:
+            return await self.async_client.post(EXECUTE_RA_QUERY_ASYNC_PATH, json.dumps(request_body),
+                                                content_type="application/json")
+        finally:
+            # The request is served by an ASGI handler, which pools connections for the event loop of the test
+            await close_async_connection_pool()
+
+    async def test_result(self):
+        response = await self.post({"raQuery": "σ ProductID > 4 (sales)", "format": "compact"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(json.loads(response.content)["result"],
+                         {"columns": ["ProductID", "InvoiceNumber"], "rows": [[5, 7663333]]})
+
+        response = await self.post({"raQuery": "σ Missing > 4 (sales)"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    async def test_catalog_read_off_the_event_loop(self):
+        compiled_on_event_loop = []
+        checked_on_event_loop = []
+        get_query = COMPILE_CACHE.get_query
+
+        def record_compiled(ra_query):
+            compiled_on_event_loop.append(is_on_event_loop())
+            return get_query(ra_query)
+
+        def record_checked(ra_query):
+            checked_on_event_loop.append(is_on_event_loop())
+            return get_loading_response(ra_query)
+
+        with mock.patch.object(COMPILE_CACHE, "get_query", side_effect=record_compiled), \
+                mock.patch("ira.view.execute_ra_query_async.get_loading_response", side_effect=record_checked):
+            response = await self.post({"raQuery": "sales"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(compiled_on_event_loop, [False])
+        self.assertEqual(checked_on_event_loop, [False])
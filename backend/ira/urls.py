@@ -1,11 +1,27 @@
 from django.urls import path
 
+from .view.cache_stats import CacheStatsView
+from .view.cancel_ra_query import CancelRaQueryView
+from .view.connection_pool_stats import ConnectionPoolStatsView
 from .view.download_xml import DownloadXmlView
 from .view.execute_ra_query import ExecuteRaQueryView
+from .view.execute_ra_query_async import ExecuteRaQueryAsyncView
+from .view.explain_ra_query import ExplainRaQueryView
+from .view.index_advice import IndexAdviceView
 from .view.load_xml import LoadXmlView
+from .view.readiness import ReadinessView
+from .view.upload_relation import UploadRelationView
 
 urlpatterns = [
     path('execute_ra_query', ExecuteRaQueryView.as_view(), name='execute_ra_query'),
+    path('execute_ra_query_async', ExecuteRaQueryAsyncView.as_view(), name='execute_ra_query_async'),
+    path('explain_ra_query', ExplainRaQueryView.as_view(), name='explain_ra_query'),
+    path('cancel_ra_query', CancelRaQueryView.as_view(), name='cancel_ra_query'),
     path('download_xml', DownloadXmlView.as_view(), name='download_xml'),
-    path('load_xml', LoadXmlView.as_view(), name='load_xml')
+    path('load_xml', LoadXmlView.as_view(), name='load_xml'),
+    path('cache_stats', CacheStatsView.as_view(), name='cache_stats'),
+    path('connection_pool_stats', ConnectionPoolStatsView.as_view(), name='connection_pool_stats'),
+    path('readiness', ReadinessView.as_view(), name='readiness'),
+    path('index_advice', IndexAdviceView.as_view(), name='index_advice'),
+    path('upload_relation', UploadRelationView.as_view(), name='upload_relation')
 ]
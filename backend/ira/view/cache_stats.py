@@ -0,0 +1,20 @@
+from http import HTTPStatus
+
+from django.http import HttpRequest, JsonResponse
+from django.views import View
+
+from ira.service.catalog import CATALOG
+from ira.service.columnar_engine import COLUMNAR_ENGINE
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.result_cache import RESULT_CACHE
+from ira.service.sqlite_backend import SQLITE_BACKEND
+
+
+class CacheStatsView(View):
+    def get(self, request: HttpRequest):
+        return JsonResponse({"compileCache": COMPILE_CACHE.get_stats(),
+                             "resultCache": RESULT_CACHE.get_stats(),
+                             "catalog": CATALOG.get_stats(),
+                             "columnarEngine": COLUMNAR_ENGINE.get_stats(),
+                             "sqliteBackend": SQLITE_BACKEND.get_stats()},
+                            status=HTTPStatus.OK)
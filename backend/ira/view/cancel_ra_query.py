@@ -0,0 +1,36 @@
+import json
+from http import HTTPStatus
+
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from ira.model.output import Output
+from ira.service.statement_guard import cancel_request, is_request_id_valid
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CancelRaQueryView(View):
+    def post(self, request: HttpRequest):
+        if request.body:
+            request_body = json.loads(request.body)
+            if self.is_request_valid(request_body):
+                request_id = request_body["requestId"]
+                if cancel_request(request_id):
+                    output = Output(HTTPStatus.OK,
+                                    message="Query of request:{request_id} has been cancelled"
+                                    .format(request_id=request_id),
+                                    query=None)
+                else:
+                    output = Output(HTTPStatus.NOT_FOUND,
+                                    message="No query of request:{request_id} is running"
+                                    .format(request_id=request_id),
+                                    query=None)
+                return JsonResponse(output.value, status=output.status_code)
+        return JsonResponse({"message": "POST request not valid; Please ensure that only the attribute 'requestId' is "
+                                        "utilised, holding the random UUID the query has been executed with."},
+                            status=HTTPStatus.BAD_REQUEST)
+
+    def is_request_valid(self, request_body: dict):
+        return set(request_body) == {"requestId"} and is_request_id_valid(request_body["requestId"])
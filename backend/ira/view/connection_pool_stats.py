@@ -0,0 +1,17 @@
+from http import HTTPStatus
+
+from django.http import HttpRequest, JsonResponse
+from django.views import View
+
+from ira.service.async_db_executor import get_async_connection_pool_stats
+from ira.service.connection_pool import get_connection_pool_stats
+from ira.service.prepared_statements import get_prepared_statement_stats
+
+
+class ConnectionPoolStatsView(View):
+    def get(self, request: HttpRequest):
+        # Pools are per worker process, hence the figures are those of the process which serves the request
+        return JsonResponse({"connectionPools": get_connection_pool_stats(),
+                             "asyncConnectionPools": get_async_connection_pool_stats(),
+                             "preparedStatements": get_prepared_statement_stats()},
+                            status=HTTPStatus.OK)
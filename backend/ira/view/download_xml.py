@@ -7,22 +7,18 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
 from ira.model.output import Output
-from ira.service.lexer import Lexer
-from ira.service.xml_convertor import convert_tokenized_ra_to_xml
+from ira.service.compile_cache import COMPILE_CACHE
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class DownloadXmlView(View):
-    lexer = Lexer()
-
     def post(self, request: HttpRequest):
         if request.body:
             request_body = json.loads(request.body)
             if self.is_request_valid(request_body):
                 ra_query = request_body["raQuery"]
                 try:
-                    tokens = self.lexer.tokenize(ra_query)
-                    xml_content = convert_tokenized_ra_to_xml(tokens).get_tree()
+                    xml_content = COMPILE_CACHE.get_xml_tree(ra_query)
                     return FileResponse(xml_content,content_type="applications/xml",
                                         as_attachment=True)
                 except Exception as exception:
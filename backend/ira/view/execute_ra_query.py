@@ -1,33 +1,78 @@
 import json
 from http import HTTPStatus
+from typing import Optional
 
-from django.http import HttpRequest, JsonResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
+from backend.settings import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ira.enum.result_format import ResultFormat
 from ira.model.output import Output
-from ira.service.db_executor import execute_sql_query
-from ira.service.lexer import Lexer
-from ira.service.parser import Parser
-from ira.service.transformer import transform
+from ira.service.columnar_engine import execute_ra_query_in_memory
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.db_executor import execute_sql_query, execute_sql_query_as_json, preflight_sql_query, \
+    stream_sql_query
+from ira.service.index_advisor import INDEX_ADVISOR
+from ira.service.keyset_pagination import ContinuationToken, execute_sql_query_page
+from ira.service.result_encoder import encode
+from ira.service.sqlite_backend import execute_ra_query_on_sqlite
+from ira.service.statement_guard import StatementGuard, get_failure_output, get_statement_guard
+from ira.view.readiness import get_loading_response
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+JSON_CONTENT_TYPE = "application/json"
+
+OPTIONAL_REQUEST_ATTRIBUTES = ("stream", "pageSize", "continuationToken", "format", "jsonPassthrough", "timeout",
+                               "requestId", "confirm")
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ExecuteRaQueryView(View):
-    lexer = Lexer()
-    parser = Parser()
-
     def post(self, request: HttpRequest):
         if request.body:
             request_body = json.loads(request.body)
             if self.is_request_valid(request_body):
-                ra_query = request_body["raQuery"]
+                ra_query = request_body.get("raQuery")
+                loading_response = get_loading_response(ra_query)
+                if loading_response is not None:
+                    return loading_response
                 try:
-                    tokens = self.lexer.tokenize(ra_query)
-                    parsed_postfix_tokens = self.parser.parse(tokens)
-                    sql_query = transform(parsed_postfix_tokens)
-                    output = execute_sql_query(sql_query)
+                    result_format = ResultFormat(request_body.get("format", ResultFormat.OBJECTS.value))
+                    statement_guard = get_statement_guard(request, request_body)
+                    is_confirmed = request_body.get("confirm") is True
+                    if "pageSize" in request_body or "continuationToken" in request_body:
+                        with statement_guard:
+                            output = self.paginate(request_body, result_format, is_confirmed)
+                        return to_response(output, result_format)
+                    sql_query = COMPILE_CACHE.get_query(ra_query)
+                    INDEX_ADVISOR.record(sql_query)
+                    if request_body.get("stream") and sql_query.is_dql:
+                        with statement_guard:
+                            estimate, output = preflight_sql_query(sql_query, is_confirmed)
+                        if output is not None:
+                            return to_response(output, result_format)
+                        return self.stream(sql_query, statement_guard, estimate)
+                    # Queries of small relations skip the round trips to postgres, as do those SQLite executes, within
+                    # the timeout of the request, unless it is to encode the result or to be cancellable by its ID,
+                    # which only a query running in postgres is
+                    if not request_body.get("jsonPassthrough") and statement_guard.request_id is None:
+                        output = execute_ra_query_in_memory(ra_query, sql_query, result_format, statement_guard.timeout,
+                                                            is_confirmed) or \
+                            execute_ra_query_on_sqlite(ra_query, sql_query, result_format, statement_guard.timeout,
+                                                       is_confirmed)
+                        if output is not None:
+                            return to_response(output, result_format)
+                    with statement_guard:
+                        estimate, output = preflight_sql_query(sql_query, is_confirmed)
+                        if output is None and request_body.get("jsonPassthrough"):
+                            status, content = execute_sql_query_as_json(sql_query, result_format, estimate)
+                            return HttpResponse(content, content_type=JSON_CONTENT_TYPE, status=status)
+                        if output is None:
+                            output = execute_sql_query(sql_query, result_format, estimate)
+                    return to_response(output, result_format)
 
                 except Exception as exception:
                     output = Output(HTTPStatus.BAD_REQUEST,
@@ -36,9 +81,59 @@ class ExecuteRaQueryView(View):
                                     query=None)
 
                 return JsonResponse(output.value, status=output.status_code)
-        return JsonResponse({"message": "POST request not valid; Please ensure that only one attribute 'raQuery' is "
-                                        "utilised."},
+        return JsonResponse({"message": "POST request not valid; Please ensure that the attribute 'raQuery' or "
+                                        "'continuationToken' is utilised, alongside only the optional attributes: "
+                                        "{optional_attributes}."
+                            .format(optional_attributes=", ".join(OPTIONAL_REQUEST_ATTRIBUTES))},
                             status=HTTPStatus.BAD_REQUEST)
 
+    def stream(self, sql_query, statement_guard: StatementGuard, estimate: Optional[dict]):
+        lines = stream_sql_query(sql_query, statement_guard, estimate)
+        try:
+            # Executing the query before the response starts, so that a failing query still gets a proper status
+            header = next(lines)
+        except Exception as exception:
+            output = get_failure_output(sql_query, exception)
+            return JsonResponse(output.value, status=output.status_code)
+        return StreamingHttpResponse(prepend(header, lines), content_type=NDJSON_CONTENT_TYPE)
+
+    def paginate(self, request_body: dict, result_format: ResultFormat, is_confirmed: bool) -> Output:
+        page_size = request_body.get("pageSize", DEFAULT_PAGE_SIZE)
+        if not isinstance(page_size, int) or not 0 < page_size <= MAX_PAGE_SIZE:
+            raise Exception("pageSize must be an integer from 1 to {max_page_size}".format(max_page_size=MAX_PAGE_SIZE))
+        continuation_token = None
+        sql_query = None
+        if "continuationToken" in request_body:
+            continuation_token = ContinuationToken.loads(request_body["continuationToken"])
+            # Reusing the query compiled for the first page
+            sql_query = COMPILE_CACHE.get_query_by_fingerprint(continuation_token.fingerprint)
+        if sql_query is None:
+            if "raQuery" not in request_body:
+                raise Exception("The query of the continuation token is no longer compiled; "
+                                "Please send the raQuery alongside the continuation token")
+            sql_query = COMPILE_CACHE.get_query(request_body["raQuery"])
+        estimate = None
+        # The query has already been checked when its first page was fetched
+        if continuation_token is None:
+            INDEX_ADVISOR.record(sql_query)
+            estimate, output = preflight_sql_query(sql_query, is_confirmed)
+            if output is not None:
+                return output
+        return execute_sql_query_page(sql_query, page_size, continuation_token, result_format, estimate)
+
     def is_request_valid(self, request_body: dict):
-        return len(request_body.keys()) == 1 and "raQuery" in request_body
+        return ("raQuery" in request_body or "continuationToken" in request_body) and \
+            all(key == "raQuery" or key in OPTIONAL_REQUEST_ATTRIBUTES for key in request_body)
+
+
+def to_response(output: Output, result_format: ResultFormat):
+    if result_format == ResultFormat.OBJECTS:
+        return JsonResponse(output.value, status=output.status_code)
+    # The compact formats are meant for large results, hence they skip Django's encoder
+    return HttpResponse(encode(output.value), content_type=JSON_CONTENT_TYPE, status=output.status_code)
+
+
+def prepend(header, lines):
+    # Delegating with yield from, so that closing the response also closes the cursor behind the lines
+    yield header
+    yield from lines
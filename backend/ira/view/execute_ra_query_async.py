@@ -0,0 +1,65 @@
+import json
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from ira.enum.result_format import ResultFormat
+from ira.model.output import Output
+from ira.service.async_db_executor import execute_sql_query_async
+from ira.service.compile_cache import COMPILE_CACHE
+from ira.service.index_advisor import INDEX_ADVISOR
+from ira.service.statement_guard import get_request_id, get_timeout
+from ira.view.execute_ra_query import to_response
+from ira.view.readiness import get_loading_response
+
+OPTIONAL_REQUEST_ATTRIBUTES = ("format", "timeout", "requestId", "confirm")
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ExecuteRaQueryAsyncView(View):
+    """
+    Executes a RA query as ExecuteRaQueryView does, but awaits postgres rather than blocking a thread; under an
+    ASGI server, a single event loop serves many long-running queries at once. Streaming and pagination are left
+    to the synchronous view.
+    """
+
+    async def post(self, request: HttpRequest):
+        if request.body:
+            request_body = json.loads(request.body)
+            if self.is_request_valid(request_body):
+                ra_query = request_body.get("raQuery")
+                # The catalog may have to be read again from postgres, and entries from the disk tier of the compile
+                # cache, hence readiness is checked and the query compiled off the event loop
+                loading_response = await sync_to_async(get_loading_response, thread_sensitive=False)(ra_query)
+                if loading_response is not None:
+                    return loading_response
+                try:
+                    result_format = ResultFormat(request_body.get("format", ResultFormat.OBJECTS.value))
+                    sql_query = await sync_to_async(COMPILE_CACHE.get_query, thread_sensitive=False)(ra_query)
+                    INDEX_ADVISOR.record(sql_query)
+                    output = await execute_sql_query_async(sql_query, result_format, get_timeout(request_body),
+                                                           get_request_id(request_body),
+                                                           request_body.get("confirm") is True,
+                                                           is_pooled=isinstance(request, ASGIRequest))
+                    return to_response(output, result_format)
+
+                except Exception as exception:
+                    output = Output(HTTPStatus.BAD_REQUEST,
+                                    message="See exception message:{exception_message} for given raQuery:{ra_query}"
+                                    .format(exception_message=exception, ra_query=ra_query),
+                                    query=None)
+
+                return JsonResponse(output.value, status=output.status_code)
+        return JsonResponse({"message": "POST request not valid; Please ensure that the attribute 'raQuery' is "
+                                        "utilised, alongside only the optional attributes: {optional_attributes}."
+                            .format(optional_attributes=", ".join(OPTIONAL_REQUEST_ATTRIBUTES))},
+                            status=HTTPStatus.BAD_REQUEST)
+
+    def is_request_valid(self, request_body: dict):
+        return "raQuery" in request_body and \
+            all(key == "raQuery" or key in OPTIONAL_REQUEST_ATTRIBUTES for key in request_body)
@@ -0,0 +1,52 @@
+import json
+from http import HTTPStatus
+
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from ira.model.output import Output
+from ira.service.plan_explainer import explain_ra_query
+from ira.service.statement_guard import get_statement_guard
+from ira.view.readiness import get_loading_response
+
+OPTIONAL_REQUEST_ATTRIBUTES = ("analyze", "buffers")
+
+STATEMENT_GUARD_REQUEST_ATTRIBUTES = ("timeout", "requestId")
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ExplainRaQueryView(View):
+    def post(self, request: HttpRequest):
+        if request.body:
+            request_body = json.loads(request.body)
+            if self.is_request_valid(request_body):
+                ra_query = request_body.get("raQuery")
+                loading_response = get_loading_response(ra_query)
+                if loading_response is not None:
+                    return loading_response
+                try:
+                    # Analysing executes the query, hence it is bound by the statement timeout as well
+                    with get_statement_guard(request, request_body):
+                        output = explain_ra_query(ra_query, request_body.get("analyze", False),
+                                                  request_body.get("buffers", False))
+                except Exception as exception:
+                    output = Output(HTTPStatus.BAD_REQUEST,
+                                    message="See exception message:{exception_message} for given raQuery:{ra_query}"
+                                    .format(exception_message=exception, ra_query=ra_query),
+                                    query=None)
+                return JsonResponse(output.value, status=output.status_code)
+        return JsonResponse({"message": "POST request not valid; Please ensure that the attribute 'raQuery' is "
+                                        "utilised, alongside only the optional boolean attributes: "
+                                        "{optional_attributes}, and the optional attributes: "
+                                        "{statement_guard_attributes}."
+                            .format(optional_attributes=", ".join(OPTIONAL_REQUEST_ATTRIBUTES),
+                                    statement_guard_attributes=", ".join(STATEMENT_GUARD_REQUEST_ATTRIBUTES))},
+                            status=HTTPStatus.BAD_REQUEST)
+
+    def is_request_valid(self, request_body: dict):
+        return "raQuery" in request_body and \
+            all(key == "raQuery" or key in STATEMENT_GUARD_REQUEST_ATTRIBUTES or
+                (key in OPTIONAL_REQUEST_ATTRIBUTES and isinstance(value, bool))
+                for key, value in request_body.items())
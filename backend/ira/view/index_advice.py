@@ -0,0 +1,38 @@
+from http import HTTPStatus
+
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from backend.settings import INDEX_ADVISOR_CREATES_INDEXES
+from ira.enum.error_code import ErrorCode
+from ira.model.output import Output
+from ira.service.index_advisor import INDEX_ADVISOR, create_indexes
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class IndexAdviceView(View):
+    """
+    Advises indexes for the workload executed so far; posting creates the advised ones, where opted into. Without
+    hypopg, candidates are only priced by building their indexes where creating indexes is opted into.
+    """
+
+    def get(self, request: HttpRequest):
+        output = Output(HTTPStatus.OK, None,
+                        result={"indexes": INDEX_ADVISOR.advise(is_building_allowed=INDEX_ADVISOR_CREATES_INDEXES)})
+        return JsonResponse(output.value, status=output.status_code)
+
+    def post(self, request: HttpRequest):
+        if not INDEX_ADVISOR_CREATES_INDEXES:
+            output = Output(HTTPStatus.FORBIDDEN, None,
+                            message="Creating indexes is disabled; Please set IRA_INDEX_ADVISOR_CREATES_INDEXES to "
+                                    "true to opt into it",
+                            error={"code": ErrorCode.INDEX_CREATION_DISABLED.value})
+            return JsonResponse(output.value, status=output.status_code)
+        advice = INDEX_ADVISOR.advise(is_building_allowed=True)
+        index_names = create_indexes(advice)
+        output = Output(HTTPStatus.OK, None, message="Created {number_of_indexes} index(es)."
+                        .format(number_of_indexes=len(index_names)),
+                        result={"indexes": advice, "createdIndexNames": index_names})
+        return JsonResponse(output.value, status=output.status_code)
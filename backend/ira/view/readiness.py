@@ -0,0 +1,31 @@
+from http import HTTPStatus
+from typing import Optional
+
+from django.http import HttpRequest, JsonResponse
+from django.views import View
+
+from ira.service.pre_populator import get_readiness
+from ira.service.readiness import get_loading_output
+
+# How long a client is told to wait before retrying a query of a relation which is still loading
+RETRY_AFTER_SECONDS = 5
+
+
+class ReadinessView(View):
+    """Answers 503 Service Unavailable until pre-population has finished, so that it may serve as a readiness probe"""
+
+    def get(self, request: HttpRequest):
+        readiness = get_readiness()
+        return JsonResponse(readiness, status=HTTPStatus.OK if readiness["isReady"] else HTTPStatus.SERVICE_UNAVAILABLE)
+
+
+def get_loading_response(ra_query) -> Optional[JsonResponse]:
+    """The response to a query of relations which are still loading, rather than the error of a missing table"""
+    if not isinstance(ra_query, str):
+        return None
+    output = get_loading_output(ra_query)
+    if output is None:
+        return None
+    response = JsonResponse(output.value, status=output.status_code)
+    response["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
@@ -0,0 +1,29 @@
+from http import HTTPStatus
+
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from ira.model.output import Output
+from ira.service.relation_uploader import upload_relation
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class UploadRelationView(View):
+    """
+    Uploads a CSV or TSV file as multipart/form-data into a relation, named after the file unless the query string
+    names it with relationName; a relation uploaded before is only replaced when the query string asks for it with
+    replace=true
+    """
+
+    def post(self, request: HttpRequest):
+        relation_name = request.GET.get("relationName")
+        try:
+            output = upload_relation(request, relation_name, request.GET.get("replace") == "true")
+        except Exception as exception:
+            output = Output(HTTPStatus.BAD_REQUEST,
+                            message="See exception message:{exception_message} for given relationName:{relation_name}"
+                            .format(exception_message=exception, relation_name=relation_name),
+                            query=None)
+        return JsonResponse(output.value, status=output.status_code)